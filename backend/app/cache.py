@@ -0,0 +1,341 @@
+"""
+Response cache for read-mostly endpoints.
+
+Cached bodies are keyed by a version number per data namespace. Committing a
+session that wrote to a tracked table bumps the versions of its namespaces, so
+stale entries are never served again and simply age out of the LRU. The
+version also forms the ETag, letting clients revalidate without a database hit.
+
+Entries live in an in-process LRU by default, with the versions in the
+cache_versions table: each commit bumps them in its own transaction and a
+thread in every process re-reads them every CACHE_VERSION_POLL_SECONDS, so
+writes from `cli import`, `run-jobs` workers or other API workers invalidate
+this process's entries too. Lookups only read the copy in memory. The bump is
+one UPDATE of a row per namespace, so concurrent commits to the same namespace
+queue on that row lock; it is issued just before COMMIT, so the wait is the
+commit itself rather than the whole transaction. CACHE_VERSIONS=memory keeps the
+versions in process memory, which is only correct when this one process makes
+every write. With several workers, CACHE_REDIS_URL shares the entries as well
+as the versions.
+"""
+from typing import Any, Awaitable, Callable, Iterable, Optional, Tuple
+from collections import OrderedDict
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import event, insert, select, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from app.models.models import (
+    Account, AccountBalance, AccountClosingBalance, AccountClosure, AccountRollupBalance, CacheVersion, Contact, Invoice,
+    InvoiceAgingBalance, JournalEntry, JournalItem, LedgerAnomaly, PeriodClose,
+)
+
+logger = logging.getLogger(__name__)
+
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "256"))  # 0 disables caching of bodies
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL")
+CACHE_TTL_SECONDS = int(os.getenv("CACHE_TTL_SECONDS", "3600"))  # Shared backend only
+# database shares versions through the cache_versions table; memory is only safe when this process makes every write
+CACHE_VERSIONS = os.getenv("CACHE_VERSIONS", "database")
+# How stale a write from another process can look here
+CACHE_VERSION_POLL_SECONDS = float(os.getenv("CACHE_VERSION_POLL_SECONDS", "1"))
+
+# Version namespaces
+ACCOUNTS = "accounts"
+LEDGER = "ledger"
+INVOICES = "invoices"
+ANOMALIES = "anomalies"
+
+# Namespaces invalidated by a write to each table
+TABLE_NAMESPACES = {
+    Account.__tablename__: (ACCOUNTS, LEDGER),
+    JournalEntry.__tablename__: (LEDGER,),
+    JournalItem.__tablename__: (LEDGER,),
+    AccountClosure.__tablename__: (ACCOUNTS, LEDGER),
+    AccountBalance.__tablename__: (LEDGER,),
+    AccountRollupBalance.__tablename__: (LEDGER,),
+    AccountClosingBalance.__tablename__: (LEDGER,),
+    PeriodClose.__tablename__: (LEDGER,),
+    Contact.__tablename__: (INVOICES,),
+    Invoice.__tablename__: (INVOICES,),
+    InvoiceAgingBalance.__tablename__: (INVOICES,),
+    LedgerAnomaly.__tablename__: (ANOMALIES,),
+}
+
+class MemoryBackend:
+    """
+    Thread-safe in-process LRU of response bodies plus version counters.
+    """
+    def __init__(self, max_entries: int = RESPONSE_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self.versions = {}
+        self.lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self.lock:
+            body = self.entries.get(key)
+            if body is not None:
+                self.entries.move_to_end(key)
+            return body
+
+    def set(self, key: str, body: bytes) -> None:
+        if self.max_entries <= 0:
+            return
+        with self.lock:
+            self.entries[key] = body
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def version(self, namespace: str) -> int:
+        return self.versions.get(namespace, 0)
+
+    def bump(self, namespace: str) -> int:
+        with self.lock:
+            self.versions[namespace] = self.versions.get(namespace, 0) + 1
+            return self.versions[namespace]
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+
+class DatabaseBackend(MemoryBackend):
+    """
+    In-process LRU of response bodies with the version counters kept in the cache_versions
+    table, so commits made by any process invalidate every process's entries. A daemon thread,
+    started by the first lookup, copies the counters into memory every poll_seconds.
+    """
+    def __init__(self, max_entries: int = RESPONSE_CACHE_SIZE, poll_seconds: float = CACHE_VERSION_POLL_SECONDS):
+        super().__init__(max_entries)
+        self.poll_seconds = poll_seconds
+        self.poller: Optional[threading.Thread] = None
+
+    def version(self, namespace: str) -> int:
+        if self.poller is None:
+            self.start()
+        return self.versions.get(namespace, 0)
+
+    def start(self) -> None:
+        with self.lock:
+            if self.poller is None:
+                self.poller = threading.Thread(target=self._poll, name="cache-versions", daemon=True)
+                self.poller.start()
+
+    def _poll(self) -> None:
+        from app.database import engine
+
+        while True:
+            try:
+                with engine.connect() as conn:
+                    self._merge(conn.execute(select(CacheVersion.namespace, CacheVersion.version)).all())
+            except SQLAlchemyError as e:
+                logger.warning("Reading cache versions failed: %s", e)
+            time.sleep(self.poll_seconds)
+
+    def _merge(self, versions: Iterable[Tuple[str, int]]) -> None:
+        with self.lock:
+            # Replaced, not updated, so version() reads without the lock. Counters never move back:
+            # a read that started before this process's own commit may land after it.
+            merged = dict(self.versions)
+            for namespace, version in versions:
+                merged[namespace] = max(merged.get(namespace, 0), version)
+            self.versions = merged
+
+    def persist(self, session: Session, namespaces: Iterable[str]) -> None:
+        """
+        Bump namespaces inside session's transaction, so the new versions commit with the writes.
+        """
+        namespaces = list(namespaces)
+        bumped = session.execute(
+            update(CacheVersion).where(CacheVersion.namespace.in_(namespaces)).values(version=CacheVersion.version + 1)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if bumped < len(namespaces):
+            # Databases created without the migration start with no rows
+            existing = set(session.execute(select(CacheVersion.namespace).where(CacheVersion.namespace.in_(namespaces))).scalars())
+            session.execute(insert(CacheVersion), [
+                {"namespace": namespace, "version": 1} for namespace in namespaces if namespace not in existing
+            ])
+
+    def committed(self, namespaces: Iterable[str]) -> None:
+        """
+        Count a bump this process committed without waiting for the next poll; the stored
+        counters moved at least as far.
+        """
+        with self.lock:
+            merged = dict(self.versions)
+            for namespace in namespaces:
+                merged[namespace] = merged.get(namespace, 0) + 1
+            self.versions = merged
+
+    def bump(self, namespace: str) -> int:
+        from app.database import SessionLocal
+
+        with SessionLocal() as session:
+            self.persist(session, [namespace])
+            session.commit()
+        self.committed([namespace])
+        return self.version(namespace)
+
+class RedisBackend:
+    """
+    Shared backend for multi-worker deployments. Requires the redis package.
+    """
+    def __init__(self, url: str, ttl: int = CACHE_TTL_SECONDS, prefix: str = "simplefi:"):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("CACHE_REDIS_URL is set but the redis package is not installed") from e
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.client.get(self.prefix + key)
+
+    def set(self, key: str, body: bytes) -> None:
+        self.client.set(self.prefix + key, body, ex=self.ttl)
+
+    def version(self, namespace: str) -> int:
+        return int(self.client.get(f"{self.prefix}version:{namespace}") or 0)
+
+    def bump(self, namespace: str) -> int:
+        return self.client.incr(f"{self.prefix}version:{namespace}")
+
+    def clear(self) -> None:
+        for key in self.client.scan_iter(match=f"{self.prefix}*"):
+            if not key.decode().startswith(f"{self.prefix}version:"):
+                self.client.delete(key)
+
+class ResponseCache:
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    def configure(self, backend) -> None:
+        """
+        Swap in another backend (anything with get, set, version, bump and clear).
+        """
+        self.backend = backend
+
+    def get(self, key: str) -> Optional[bytes]:
+        body = self.backend.get(key)
+        if body is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return body
+
+    def set(self, key: str, body: bytes) -> None:
+        self.backend.set(key, body)
+
+    def version(self, namespace: str) -> int:
+        return self.backend.version(namespace)
+
+    def bump(self, *namespaces: str) -> None:
+        for namespace in namespaces:
+            self.backend.bump(namespace)
+
+    def clear(self) -> None:
+        self.backend.clear()
+
+    def committed(self, namespaces: Iterable[str]) -> None:
+        """
+        Record a commit that wrote to namespaces; backends that persist versions bumped them before it.
+        """
+        if hasattr(self.backend, "persist"):
+            self.backend.committed(namespaces)
+        else:
+            self.bump(*namespaces)
+
+def default_backend():
+    if CACHE_REDIS_URL:
+        return RedisBackend(CACHE_REDIS_URL)
+    if CACHE_VERSIONS == "memory":
+        return MemoryBackend()
+    if CACHE_VERSIONS != "database":
+        raise ValueError(f"CACHE_VERSIONS must be database or memory, not {CACHE_VERSIONS!r}")
+    return DatabaseBackend()
+
+response_cache = ResponseCache(default_backend())
+
+def _mark(session: Session, tables: Iterable[str]) -> None:
+    pending = session.info.setdefault("cache_namespaces", set())
+    for table in tables:
+        pending.update(TABLE_NAMESPACES.get(table, ()))
+
+@event.listens_for(Session, "after_flush")
+def _track_flush(session, flush_context):
+    # ORM unit-of-work writes
+    _mark(session, {
+        obj.__table__.name
+        for collection in (session.new, session.dirty, session.deleted)
+        for obj in collection
+    })
+
+@event.listens_for(Session, "do_orm_execute")
+def _track_statement(orm_execute_state):
+    # insert()/update()/delete() statements run through the session, including bulk executemany
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = getattr(orm_execute_state.statement, "table", None)
+        if table is not None:
+            _mark(orm_execute_state.session, [table.name])
+
+@event.listens_for(Session, "before_commit")
+def _persist_versions(session):
+    # Shared versions are written in the committing transaction; flush first so its final writes are tracked
+    persist = getattr(response_cache.backend, "persist", None)
+    if persist is None:
+        return
+    if session.new or session.dirty or session.deleted:
+        session.flush()
+    namespaces = session.info.get("cache_namespaces")
+    if namespaces:
+        persist(session, sorted(namespaces))
+
+@event.listens_for(Session, "after_commit")
+def _bump_versions(session):
+    namespaces = session.info.pop("cache_namespaces", None)
+    if namespaces:
+        response_cache.committed(sorted(namespaces))
+
+@event.listens_for(Session, "after_rollback")
+def _discard_versions(session):
+    session.info.pop("cache_namespaces", None)
+
+def _etag_matches(header: Optional[str], etag: str) -> bool:
+    if not header:
+        return False
+    candidates = [value.strip() for value in header.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+async def cached_json(request: Request, namespace: str, compute: Callable[[], Awaitable[Any]], vary: str = "") -> Response:
+    """
+    Serve the JSON result of compute() for the current version of namespace.
+    Answers 304 when If-None-Match carries the current ETag, and only calls compute on a cache miss.
+    vary keys the result on anything besides the URL it depends on, such as today's date.
+    """
+    version = response_cache.version(namespace)
+    query = "&".join(f"{name}={value}" for name, value in sorted(request.query_params.multi_items()))
+    digest = hashlib.sha1(f"{request.url.path}?{query}#{vary}".encode()).hexdigest()[:16]
+    etag = f'"{namespace}-{version}-{digest}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    key = f"{namespace}:{version}:{digest}"
+    body = response_cache.get(key)
+    if body is None:
+        body = json.dumps(jsonable_encoder(await compute()), separators=(",", ":")).encode()
+        response_cache.set(key, body)
+    return Response(content=body, media_type="application/json", headers=headers)
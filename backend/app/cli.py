@@ -0,0 +1,220 @@
+import argparse
+import asyncio
+import json
+import sys
+from datetime import date
+
+from app import cache  # noqa: F401  (bumps shared cache versions on commit)
+from app import dashboard  # noqa: F401  (hands committed balance changes to the dashboard push)
+from app.database import SessionLocal
+from app.services.journal_service import JournalService, BULK_CHUNK_SIZE
+from app.services.export_service import LEDGER_COLUMNS, REPORTS, ExportService
+from app.services.aging_service import AgingService
+from app.services.anomaly_service import AnomalyService
+from app.services.balance_service import BalanceService
+from app.services.hierarchy_service import HierarchyService
+from app.services.categorizer_service import AI_LOCAL_MODEL_PATH, MIN_WORD_COUNT, CategorizerService
+from app.services.job_service import JOB_CONCURRENCY, JOB_POLL_SECONDS, JobService
+
+def import_journal(args: argparse.Namespace) -> int:
+    """
+    Bulk import journal entries from a JSON-lines or CSV file.
+    """
+    import_format = args.format or JournalService.detect_format(args.path)
+    db = SessionLocal()
+    try:
+        with open(args.path, newline="", encoding="utf-8") as f:
+            result = JournalService.bulk_insert(db, JournalService.parse(f, import_format), chunk_size=args.chunk_size)
+    finally:
+        db.close()
+
+    print(f"Inserted {result['inserted']} entries, {result['failed']} failed")
+    for error in result["errors"]:
+        print(json.dumps(error), file=sys.stderr)
+    return 1 if result["failed"] else 0
+
+def rebuild_balances(args: argparse.Namespace) -> int:
+    """
+    Recompute the account_balances table from journal items and check it ties out.
+    """
+    db = SessionLocal()
+    try:
+        if not args.check_only:
+            BalanceService.rebuild(db)
+        mismatches = BalanceService.verify(db)
+    finally:
+        db.close()
+
+    for mismatch in mismatches:
+        print(json.dumps(mismatch), file=sys.stderr)
+    print(f"{len(mismatches)} account balance mismatches")
+    return 1 if mismatches else 0
+
+def rebuild_hierarchy(args: argparse.Namespace) -> int:
+    """
+    Recompute the account closure table from parent links, then the roll-up balances.
+    """
+    db = SessionLocal()
+    try:
+        HierarchyService.rebuild(db)
+        mismatches = [mismatch for mismatch in BalanceService.verify(db) if mismatch.get("rollup")]
+    except ValueError as e:
+        print(str(e), file=sys.stderr)
+        return 1
+    finally:
+        db.close()
+
+    for mismatch in mismatches:
+        print(json.dumps(mismatch, default=str), file=sys.stderr)
+    print(f"{len(mismatches)} roll-up balance mismatches")
+    return 1 if mismatches else 0
+
+def rebuild_aging(args: argparse.Namespace) -> int:
+    """
+    Recompute the invoice_aging_balances table from invoices and check it ties out.
+    """
+    db = SessionLocal()
+    try:
+        if not args.check_only:
+            AgingService.rebuild(db)
+        mismatches = AgingService.verify(db)
+    finally:
+        db.close()
+
+    for mismatch in mismatches:
+        print(json.dumps(mismatch, default=str), file=sys.stderr)
+    print(f"{len(mismatches)} invoice aging mismatches")
+    return 1 if mismatches else 0
+
+def train_categorizer(args: argparse.Namespace) -> int:
+    """
+    Retrain the local categorization model from the posted ledger.
+    """
+    db = SessionLocal()
+    try:
+        model = CategorizerService.train(db, min_word_count=args.min_word_count)
+    finally:
+        db.close()
+
+    meta = json.loads(str(model["meta"]))
+    if not meta["samples"]:
+        print("No described journal entries to train on", file=sys.stderr)
+        return 1
+    CategorizerService.save(model, args.output)
+    print(f"Trained on {meta['samples']} lines across {meta['accounts']} accounts, {meta['vocabulary']} words -> {args.output}")
+    return 0
+
+def export(args: argparse.Namespace) -> int:
+    """
+    Export the general ledger or a report to a local .csv, .csv.gz or .parquet file.
+    """
+    db = SessionLocal()
+    try:
+        if args.dataset == "ledger":
+            columns = LEDGER_COLUMNS
+            batches = ExportService.ledger_rows(db, args.start_date, args.end_date, args.account_id, not args.exclude_subaccounts)
+        else:
+            params = dict(start_date=args.start_date, end_date=args.end_date, as_of=args.as_of,
+                          granularity=args.granularity, account_id=args.account_id)
+            columns, rows = ExportService.report_table(db, args.dataset, params)
+            batches = [rows]
+        written = ExportService.write(args.path, columns, batches)
+    except (LookupError, RuntimeError, ValueError) as e:
+        print(str(e), file=sys.stderr)
+        return 1
+    finally:
+        db.close()
+
+    print(f"Wrote {written:,} bytes to {args.path}")
+    return 0
+
+def scan_anomalies(args: argparse.Namespace) -> int:
+    """
+    Flag outliers, duplicates, round amounts and weekend postings among new or edited rows.
+    """
+    db = SessionLocal()
+    try:
+        scan = AnomalyService.scan(db, full=args.full)
+        findings = AnomalyService.shortlist(db, args.show) if args.show else []
+    finally:
+        db.close()
+
+    for finding in findings:
+        print(json.dumps(finding, default=str))
+    print(f"{scan['kind'].capitalize()} scan of {scan['items_scanned']} journal items and {scan['invoices_scanned']} invoices "
+          f"flagged {scan['flagged']} in {scan['elapsed_ms'] / 1000:.1f} s")
+    return 0
+
+def run_jobs(args: argparse.Namespace) -> int:
+    """
+    Claim and run queued background jobs, for API servers started with JOB_QUEUE=database.
+    """
+    async def work() -> int:
+        try:
+            return await JobService.work(args.concurrency, args.poll_seconds, once=args.once)
+        finally:
+            await JobService.shutdown()
+
+    try:
+        ran = asyncio.run(work())
+    except KeyboardInterrupt:
+        return 0
+    print(f"Ran {ran} jobs")
+    return 0
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description="SimpleFi maintenance commands")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = subparsers.add_parser("import-journal", help="Bulk import journal entries")
+    import_parser.add_argument("path", help="Path to a .jsonl or .csv file")
+    import_parser.add_argument("--format", choices=["jsonl", "csv"], help="Input format (inferred from the extension by default)")
+    import_parser.add_argument("--chunk-size", type=int, default=BULK_CHUNK_SIZE, help="Entries inserted per transaction")
+    import_parser.set_defaults(func=import_journal)
+
+    balances_parser = subparsers.add_parser("rebuild-balances", help="Recompute account balances from journal items")
+    balances_parser.add_argument("--check-only", action="store_true", help="Only compare the table against journal items")
+    balances_parser.set_defaults(func=rebuild_balances)
+
+    hierarchy_parser = subparsers.add_parser("rebuild-hierarchy", help="Recompute the account hierarchy and roll-up balances")
+    hierarchy_parser.set_defaults(func=rebuild_hierarchy)
+
+    aging_parser = subparsers.add_parser("rebuild-aging", help="Recompute open invoice totals for aging reports")
+    aging_parser.add_argument("--check-only", action="store_true", help="Only compare the table against invoices")
+    aging_parser.set_defaults(func=rebuild_aging)
+
+    categorizer_parser = subparsers.add_parser("train-categorizer", help="Retrain the local transaction categorizer")
+    categorizer_parser.add_argument("--output", default=AI_LOCAL_MODEL_PATH, help="Model file to write")
+    categorizer_parser.add_argument("--min-word-count", type=int, default=MIN_WORD_COUNT, help="Ignore rarer words")
+    categorizer_parser.set_defaults(func=train_categorizer)
+
+    export_parser = subparsers.add_parser("export", help="Export the ledger or a report to a local file")
+    export_parser.add_argument("dataset", choices=["ledger", *REPORTS])
+    export_parser.add_argument("path", help="Output file; .csv, .csv.gz or .parquet")
+    export_parser.add_argument("--start-date", type=date.fromisoformat)
+    export_parser.add_argument("--end-date", type=date.fromisoformat)
+    export_parser.add_argument("--as-of", type=date.fromisoformat, help="Trial balance and consolidated reports")
+    export_parser.add_argument("--granularity", choices=["month", "quarter", "year"], default="month")
+    export_parser.add_argument("--account-id", type=int, help="Ledger account, or the consolidated report's root")
+    export_parser.add_argument("--exclude-subaccounts", action="store_true", help="With --account-id, leave out sub-accounts")
+    export_parser.set_defaults(func=export)
+
+    anomalies_parser = subparsers.add_parser("scan-anomalies", help="Flag unusual and duplicate postings and invoices")
+    anomalies_parser.add_argument("--full", action="store_true", help="Rescan everything instead of changes since the last scan")
+    anomalies_parser.add_argument("--show", type=int, default=0, help="Print this many top findings")
+    anomalies_parser.set_defaults(func=scan_anomalies)
+
+    jobs_parser = subparsers.add_parser("run-jobs", help="Run queued background jobs")
+    jobs_parser.add_argument("--concurrency", type=int, default=JOB_CONCURRENCY, help="Jobs run at once")
+    jobs_parser.add_argument("--poll-seconds", type=float, default=JOB_POLL_SECONDS, help="Wait between checks of an empty queue")
+    jobs_parser.add_argument("--once", action="store_true", help="Exit when no job is queued")
+    jobs_parser.set_defaults(func=run_jobs)
+
+    return parser
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,205 @@
+"""
+Server push of dashboard KPI deltas.
+
+BalanceService.apply and AgingService.apply leave the deltas they write on the
+session; committing it hands them to the hub and rolling back drops them. The
+hub coalesces commits until DASHBOARD_DEBOUNCE_MS pass without another one,
+or DASHBOARD_MAX_WAIT_MS after the first, then turns them into KPI changes and
+queues one update per subscriber. A subscriber that reads slowly has its
+pending changes merged rather than queued, so a bulk import of any size sends
+each client a handful of messages.
+
+Clients read a snapshot from the summary tables when they connect and only
+deltas afterwards. When nobody is subscribed, commits cost a dictionary merge.
+The hub lives in process memory: commits made by other processes (other API
+workers, `app.cli run-jobs` workers) reach a client on its next connect.
+"""
+from typing import Dict, List, Optional, Set, Tuple
+from collections import defaultdict
+from datetime import date
+import asyncio
+import contextvars
+import os
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.cache import ACCOUNTS, response_cache
+from app.database import run_in_session
+from app.services.dashboard_service import DashboardService
+
+# Quiet time after a commit before its changes are sent
+DASHBOARD_DEBOUNCE_MS = int(os.getenv("DASHBOARD_DEBOUNCE_MS", "250"))
+# Longest a change waits while commits keep arriving
+DASHBOARD_MAX_WAIT_MS = int(os.getenv("DASHBOARD_MAX_WAIT_MS", "2000"))
+# Comment lines keep idle streams from being closed by proxies
+DASHBOARD_KEEPALIVE_SECONDS = int(os.getenv("DASHBOARD_KEEPALIVE_SECONDS", "15"))
+
+def units(cents: Dict[str, int]) -> Dict[str, float]:
+    """
+    KPI cents as currency units for JSON output.
+    """
+    return {kpi: amount / 100 for kpi, amount in cents.items()}
+
+class Subscriber:
+    """
+    One connected client. Changes not yet sent are merged; only the event loop touches them.
+    """
+    def __init__(self, year: int):
+        self.year = year
+        self.changes: Dict[str, int] = {}
+        self.commits = 0
+        self.ready = asyncio.Event()
+
+    def add(self, changes: Dict[str, int], commits: int) -> None:
+        for kpi, cents in changes.items():
+            self.changes[kpi] = self.changes.get(kpi, 0) + cents
+        self.commits += commits
+        self.ready.set()
+
+class DashboardHub:
+    def __init__(self, debounce_ms: int = DASHBOARD_DEBOUNCE_MS, max_wait_ms: int = DASHBOARD_MAX_WAIT_MS):
+        self.debounce = debounce_ms / 1000
+        self.max_wait = max_wait_ms / 1000
+        self.lock = threading.Lock()
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.subscribers: Set[Subscriber] = set()
+        self.kinds: Dict[int, Optional[str]] = {}
+        self.kinds_version: Optional[int] = None
+        self.flush_task: Optional[asyncio.Future] = None
+        self.flushes = 0
+        self._reset()
+
+    def _reset(self) -> None:
+        self.balance_deltas: Dict[Tuple[int, int], List[int]] = defaultdict(lambda: [0, 0])
+        self.aging_deltas: Dict[str, int] = defaultdict(int)
+        self.commits = 0
+        self.first_at: Optional[float] = None
+        self.last_at: Optional[float] = None
+        self.scheduled = False
+
+    def record(self, balance_deltas: Dict[Tuple[int, int], List[int]], aging_deltas: Dict[str, int]) -> None:
+        """
+        Add one commit's deltas; called from whichever thread committed.
+        """
+        with self.lock:
+            if self.loop is None:
+                return
+            for key, (debit, credit) in balance_deltas.items():
+                pending = self.balance_deltas[key]
+                pending[0] += debit
+                pending[1] += credit
+            for invoice_type, amount in aging_deltas.items():
+                self.aging_deltas[invoice_type] += amount
+            self.commits += 1
+            self.last_at = time.monotonic()
+            if self.first_at is None:
+                self.first_at = self.last_at
+            if self.scheduled:
+                return
+            self.scheduled = True
+            loop = self.loop
+        try:
+            # A fresh context, so the flush's SQL is not counted against the committing request
+            loop.call_soon_threadsafe(self._start_flush, context=contextvars.Context())
+        except RuntimeError:
+            # The loop closed after its last subscriber left
+            with self.lock:
+                self._reset()
+
+    def _start_flush(self) -> None:
+        self.flush_task = asyncio.ensure_future(self._flush())
+
+    async def _flush(self) -> None:
+        while True:
+            with self.lock:
+                if self.first_at is None:
+                    return
+                delay = min(self.last_at + self.debounce, self.first_at + self.max_wait) - time.monotonic()
+            if delay <= 0:
+                break
+            await asyncio.sleep(delay)
+        with self.lock:
+            balance_deltas, aging_deltas, commits = self.balance_deltas, self.aging_deltas, self.commits
+            self._reset()
+            subscribers = list(self.subscribers)
+        if not subscribers:
+            return
+
+        self.flushes += 1
+        year = date.today().year
+        kinds = await self._kinds({account_id for account_id, _ in balance_deltas})
+        changes = DashboardService.changes(kinds, balance_deltas, aging_deltas, year)
+        for subscriber in subscribers:
+            if subscriber.year != year:
+                # The year rolled over; revenue and expenses restart from a new snapshot
+                subscriber.ready.set()
+            elif changes:
+                subscriber.add(changes, commits)
+
+    async def _kinds(self, account_ids: Set[int]) -> Dict[int, Optional[str]]:
+        # Reloaded when accounts change or a commit posts to an account not seen yet
+        version = response_cache.version(ACCOUNTS)
+        if version != self.kinds_version or not account_ids <= self.kinds.keys():
+            self.kinds = await run_in_session(DashboardService.account_kinds)
+            self.kinds_version = version
+        return self.kinds
+
+    async def subscribe(self) -> Tuple[Subscriber, Dict]:
+        """
+        Register a client and return it with its snapshot message. Registering first means
+        no commit is missed; one racing the snapshot query may be counted twice.
+        """
+        subscriber = Subscriber(date.today().year)
+        with self.lock:
+            self.loop = asyncio.get_running_loop()
+            self.subscribers.add(subscriber)
+        try:
+            return subscriber, await self._snapshot(subscriber)
+        except BaseException:
+            self.unsubscribe(subscriber)
+            raise
+
+    async def _snapshot(self, subscriber: Subscriber) -> Dict:
+        kpis = await run_in_session(DashboardService.snapshot, subscriber.year)
+        return {"type": "snapshot", "year": subscriber.year, "kpis": units(kpis)}
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        with self.lock:
+            self.subscribers.discard(subscriber)
+            if not self.subscribers:
+                self.loop = None
+                self._reset()
+
+    async def next(self, subscriber: Subscriber, timeout: float) -> Optional[Dict]:
+        """
+        The subscriber's next message, or None if nothing changed within timeout.
+        """
+        try:
+            await asyncio.wait_for(subscriber.ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        subscriber.ready.clear()
+        year = date.today().year
+        if subscriber.year != year:
+            subscriber.year, subscriber.changes, subscriber.commits = year, {}, 0
+            return await self._snapshot(subscriber)
+        changes, commits = subscriber.changes, subscriber.commits
+        subscriber.changes, subscriber.commits = {}, 0
+        return {"type": "delta", "commits": commits, "changes": units(changes)}
+
+dashboard_hub = DashboardHub()
+
+@event.listens_for(Session, "after_commit")
+def _publish_deltas(session):
+    balance_deltas = session.info.pop("balance_deltas", None)
+    aging_deltas = session.info.pop("aging_deltas", None)
+    if balance_deltas or aging_deltas:
+        dashboard_hub.record(balance_deltas or {}, aging_deltas or {})
+
+@event.listens_for(Session, "after_rollback")
+def _discard_deltas(session):
+    session.info.pop("balance_deltas", None)
+    session.info.pop("aging_deltas", None)
@@ -0,0 +1,256 @@
+"""
+Request-level performance metrics in the Prometheus text format.
+
+MetricsMiddleware times every request under its route template and counts the
+SQL statements it runs, and their time, through engine events on both the sync
+and async engines. AI calls record latency and token usage. Everything lives in
+process memory and is rendered by GET /metrics; with several workers, scrape
+each worker.
+
+Responses also carry a Server-Timing header with the database share of the
+request, so slow endpoints can be read straight from the browser's dev tools.
+"""
+from typing import Dict, Iterable, List, Optional, Tuple
+from bisect import bisect_left
+from contextvars import ContextVar
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.query_debug import observe_statement
+
+# Upper bounds in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0, 5.0)
+AI_BUCKETS = (0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 40.0, 80.0)
+FIRST_TOKEN_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0)
+# Statements per request
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+class Counter:
+    """
+    Monotonic counter with a fixed set of label names.
+    """
+    def __init__(self, name: str, documentation: str, label_names: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self.values: Dict[Tuple[str, ...], float] = {}
+        self.lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = tuple(str(labels[name]) for name in self.label_names)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            values = sorted(self.values.items())
+        for key, value in values:
+            lines.append(f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}")
+        return lines
+
+class Histogram:
+    """
+    Cumulative-bucket histogram with a fixed set of label names.
+    """
+    def __init__(self, name: str, documentation: str, label_names: Tuple[str, ...] = (), buckets: Iterable[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [per-bucket counts plus +Inf, sum]
+        self.series: Dict[Tuple[str, ...], list] = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(str(labels[name]) for name in self.label_names)
+        index = bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            series = sorted((key, list(counts), total) for key, (counts, total) in self.series.items())
+        for key, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _format_value(bound)
+                bucket_labels = _format_labels(self.label_names, key, f'le="{le}"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            labels = _format_labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+REQUEST_SECONDS = Histogram(
+    "simplefi_http_request_duration_seconds", "HTTP request latency by route template.", ("method", "route", "status"),
+)
+REQUEST_STATEMENTS = Histogram(
+    "simplefi_http_request_db_statements", "SQL statements executed per HTTP request.", ("method", "route"), COUNT_BUCKETS,
+)
+REQUEST_DB_SECONDS = Histogram(
+    "simplefi_http_request_db_seconds", "Time spent in SQL statements per HTTP request.", ("method", "route"),
+)
+STATEMENT_SECONDS = Histogram(
+    "simplefi_db_statement_duration_seconds", "SQL statement latency by engine.", ("engine",), STATEMENT_BUCKETS,
+)
+AI_CALL_SECONDS = Histogram(
+    "simplefi_ai_call_duration_seconds", "Chat model call latency per attempt.", ("outcome",), AI_BUCKETS,
+)
+AI_FIRST_TOKEN_SECONDS = Histogram(
+    "simplefi_ai_first_token_seconds", "Time from a streamed chat call to its first piece of text.", (), FIRST_TOKEN_BUCKETS,
+)
+AI_TOKENS = Counter("simplefi_ai_tokens_total", "Chat model tokens used.", ("model", "kind"))
+
+# Read from the engines' pools at scrape time
+POOL_GAUGES = {
+    "checkedout": "Connections currently in use.",
+    "checkedin": "Idle connections held by the pool.",
+    "overflow": "Connections opened beyond the pool size.",
+}
+
+REGISTRY = [
+    REQUEST_SECONDS, REQUEST_STATEMENTS, REQUEST_DB_SECONDS, STATEMENT_SECONDS, AI_CALL_SECONDS, AI_FIRST_TOKEN_SECONDS, AI_TOKENS,
+]
+
+class RequestStats:
+    """
+    SQL work done on behalf of the current request.
+    """
+    __slots__ = ("statements", "db_seconds")
+
+    def __init__(self):
+        self.statements = 0
+        self.db_seconds = 0.0
+
+# Set by MetricsMiddleware; copied into worker threads and SQLAlchemy's greenlets with the context
+_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+def current_request_stats() -> Optional[RequestStats]:
+    return _request_stats.get()
+
+def instrument_engine(engine: Engine, name: str) -> None:
+    """
+    Time every statement run on engine (pass async_engine.sync_engine for the async one).
+    """
+    @event.listens_for(engine, "before_cursor_execute")
+    def start_statement(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("statement_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def finish_statement(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["statement_started"].pop()
+        STATEMENT_SECONDS.observe(elapsed, engine=name)
+        stats = _request_stats.get()
+        if stats is not None:
+            stats.statements += 1
+            stats.db_seconds += elapsed
+        observe_statement(statement, parameters, elapsed)
+
+    @event.listens_for(engine, "handle_error")
+    def fail_statement(context):
+        started = context.connection.info.get("statement_started") if context.connection is not None else None
+        if started:
+            started.pop()
+
+def record_ai_call(seconds: float, outcome: str) -> None:
+    AI_CALL_SECONDS.observe(seconds, outcome=outcome)
+
+def record_ai_first_token(seconds: float) -> None:
+    AI_FIRST_TOKEN_SECONDS.observe(seconds)
+
+def record_ai_tokens(model: str, prompt_tokens: int, completion_tokens: int) -> None:
+    AI_TOKENS.inc(prompt_tokens, model=model, kind="prompt")
+    AI_TOKENS.inc(completion_tokens, model=model, kind="completion")
+
+def pool_stats(engine: Engine) -> Dict[str, int]:
+    """
+    Connection counts of a pool; pools without sizing (e.g. SQLite in-memory) report what they can.
+    """
+    pool = engine.pool
+    stats = {"pool": type(pool).__name__}
+    for name in ("size", "checkedin", "checkedout", "overflow"):
+        method = getattr(pool, name, None)
+        if method is not None:
+            stats[name] = method()
+    return stats
+
+def render(pools: Dict[str, Engine]) -> str:
+    """
+    Every metric in the Prometheus text exposition format, with pool gauges read now.
+    """
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    for name, documentation in POOL_GAUGES.items():
+        metric = f"simplefi_db_pool_{name}"
+        lines.append(f"# HELP {metric} {documentation}")
+        lines.append(f"# TYPE {metric} gauge")
+        for engine_name, engine in pools.items():
+            value = pool_stats(engine).get(name)
+            if value is not None:
+                lines.append(f'{metric}{{engine="{engine_name}"}} {value}')
+    return "\n".join(lines) + "\n"
+
+class MetricsMiddleware:
+    """
+    ASGI middleware timing each request through its last body chunk, so streamed
+    responses are measured in full.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        start = time.perf_counter()
+        status = [500]
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                server_timing = (
+                    f'db;dur={stats.db_seconds * 1000:.1f};desc="{stats.statements} SQL", '
+                    f"app;dur={(time.perf_counter() - start) * 1000:.1f}"
+                )
+                message = dict(message, headers=list(message.get("headers", [])) + [(b"server-timing", server_timing.encode())])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_stats.reset(token)
+            # The router leaves the matched route on the scope; unmatched paths share one label
+            route = getattr(scope.get("route"), "path", "unmatched")
+            method = scope["method"]
+            REQUEST_SECONDS.observe(time.perf_counter() - start, method=method, route=route, status=status[0])
+            REQUEST_STATEMENTS.observe(stats.statements, method=method, route=route)
+            REQUEST_DB_SECONDS.observe(stats.db_seconds, method=method, route=route)
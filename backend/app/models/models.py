@@ -1,9 +1,11 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Enum
+from sqlalchemy import Column, Integer, Float, String, Text, DateTime, ForeignKey, Enum, Index, UniqueConstraint, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import enum
 
+from app.models.money import Money
+
 Base = declarative_base()
 
 class TransactionType(enum.Enum):
@@ -17,11 +19,11 @@ class TransactionStatus(enum.Enum):
     CANCELLED = "cancelled"
 
 class AccountTypeEnum(enum.Enum):
-  Asset = 'Asset',
-  Liability = 'Liability',
-  Equity = 'Equity',
-  Revenue = 'Revenue',
-  Expense = 'Expense',
+  Asset = 'Asset'
+  Liability = 'Liability'
+  Equity = 'Equity'
+  Revenue = 'Revenue'
+  Expense = 'Expense'
 
 class NormalBalance(enum.Enum):
     DEBIT = "Debit"
@@ -36,35 +38,107 @@ class Account(Base):
     account_type = Column(Enum(AccountTypeEnum))
     description = Column(String, nullable=True)
     normal_balance = Column(Enum(NormalBalance))
+    # Roll-up parent; the full ancestry is kept in account_closure
+    parent_account_id = Column(Integer, ForeignKey("chart_of_accounts.id"), nullable=True, index=True)
+
+class AccountClosure(Base):
+    """
+    Every (ancestor, descendant) pair of the account hierarchy at depth 1 or more,
+    so a subtree or an ancestor path is one indexed lookup. Accounts are not linked to
+    themselves: one without a parent needs no rows, however it was inserted.
+    """
+    __tablename__ = "account_closure"
+    # Ancestor paths of posted accounts
+    __table_args__ = (Index("ix_account_closure_descendant_id_ancestor_id", "descendant_id", "ancestor_id"),)
+
+    ancestor_id = Column(Integer, ForeignKey("chart_of_accounts.id"), primary_key=True)
+    descendant_id = Column(Integer, ForeignKey("chart_of_accounts.id"), primary_key=True)
+    depth = Column(Integer, nullable=False)
 
 class JournalEntry(Base):
     __tablename__ = "journal_entries"
+    # Date-range filters and (entry_date, id) cursor pagination; entries edited since the last anomaly scan
+    __table_args__ = (
+        Index("ix_journal_entries_entry_date_id", "entry_date", "id"),
+        Index("ix_journal_entries_updated_at", "updated_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     entry_date = Column(DateTime, default=datetime.utcnow)
     description = Column(String)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Bumped on every update; a flush whose UPDATE matches no row at the expected version raises StaleDataError
+    version = Column(Integer, nullable=False, default=1, server_default="1")
 
     # Relationship
     journal_items = relationship("JournalItem", back_populates="journal_entry")
 
+    __mapper_args__ = {"version_id_col": version}
+
 class JournalItem(Base):
     __tablename__ = "journal_items"
+    # Per-account ledgers: the account's items, joined to their entries for the date
+    __table_args__ = (Index("ix_journal_items_account_id_journal_entry_id", "account_id", "journal_entry_id"),)
 
     id = Column(Integer, primary_key=True, index=True)
-    journal_entry_id = Column(Integer, ForeignKey("journal_entries.id"))
+    journal_entry_id = Column(Integer, ForeignKey("journal_entries.id"), index=True)
     account_id = Column(Integer, ForeignKey("chart_of_accounts.id"))
-    debit = Column(Float, default=0.0)
-    credit = Column(Float, default=0.0)
+    debit = Column(Money, default=0)
+    credit = Column(Money, default=0)
     journal_entry = relationship("JournalEntry", back_populates="journal_items")
 
+class AccountBalance(Base):
+    __tablename__ = "account_balances"
+    __table_args__ = (UniqueConstraint("account_id", "period", name="uq_account_balances_account_period"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    account_id = Column(Integer, ForeignKey("chart_of_accounts.id"), nullable=False)
+    period = Column(Integer, nullable=False)  # YYYYMM of the entry date
+    debit_total = Column(Money, default=0, nullable=False)
+    credit_total = Column(Money, default=0, nullable=False)
+
+    # Relationship
+    account = relationship("Account")
+
+class AccountRollupBalance(Base):
+    __tablename__ = "account_rollup_balances"
+    __table_args__ = (UniqueConstraint("account_id", "period", name="uq_account_rollup_balances_account_period"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    account_id = Column(Integer, ForeignKey("chart_of_accounts.id"), nullable=False)
+    period = Column(Integer, nullable=False)  # YYYYMM of the entry date
+    # Totals of the account and all its descendants, kept up to date along the ancestor path as items post
+    debit_total = Column(Money, default=0, nullable=False)
+    credit_total = Column(Money, default=0, nullable=False)
+
+class PeriodClose(Base):
+    __tablename__ = "period_closes"
+
+    id = Column(Integer, primary_key=True, index=True)
+    period = Column(Integer, nullable=False, unique=True)  # YYYYMM; this and every earlier period are closed
+    closed_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+class AccountClosingBalance(Base):
+    __tablename__ = "account_closing_balances"
+    __table_args__ = (UniqueConstraint("period", "account_id", name="uq_account_closing_balances_period_account"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    period = Column(Integer, nullable=False)  # YYYYMM of the close
+    account_id = Column(Integer, ForeignKey("chart_of_accounts.id"), nullable=False)
+    # Totals of all postings up to the end of the period
+    debit_total = Column(Money, default=0, nullable=False)
+    credit_total = Column(Money, default=0, nullable=False)
+
+    # Relationship
+    account = relationship("Account")
+
 class Contact(Base):
     __tablename__ = "contacts"
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, index=True)
-    type = Column(String)  # Customer, Vendor
+    type = Column(String, index=True)  # Customer, Vendor
     email = Column(String)
     phone = Column(String)
     address = Column(String)
@@ -74,12 +148,22 @@ class Contact(Base):
 
 class Invoice(Base):
     __tablename__ = "invoices"
+    # Open invoices by due date, e.g. for aging. The partial index holds only open invoices
+    # (aging_service.OPEN_STATUSES), which are a small share of a large book
+    __table_args__ = (
+        Index("ix_invoices_status_due_date", "status", "due_date"),
+        Index(
+            "ix_invoices_open_type_due_date", "type", "due_date",
+            sqlite_where=text("status IN ('Sent', 'Overdue')"),
+            postgresql_where=text("status IN ('Sent', 'Overdue')"),
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     invoice_number = Column(String, unique=True, index=True)
-    contact_id = Column(Integer, ForeignKey("contacts.id"))
+    contact_id = Column(Integer, ForeignKey("contacts.id"), index=True)
     type = Column(String)  # Payable, Receivable
-    amount = Column(Float)
+    amount = Column(Money)
     due_date = Column(DateTime)
     status = Column(String)  # Draft, Sent, Paid, Overdue
     
@@ -89,17 +173,135 @@ class Invoice(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+class InvoiceAgingBalance(Base):
+    __tablename__ = "invoice_aging_balances"
+    __table_args__ = (UniqueConstraint("contact_id", "type", "period", name="uq_invoice_aging_balances_contact_type_period"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    contact_id = Column(Integer, ForeignKey("contacts.id"), nullable=False)
+    type = Column(String, nullable=False)  # Payable, Receivable
+    period = Column(Integer, nullable=False)  # YYYYMM of the due date
+    open_amount = Column(Money, default=0, nullable=False)
+    open_count = Column(Integer, default=0, nullable=False)
+
+    # Relationship
+    contact = relationship("Contact")
+
 class BankReconciliation(Base):
     __tablename__ = "bank_reconciliations"
     id = Column(Integer, primary_key=True, index=True)
     account_id = Column(Integer, ForeignKey("chart_of_accounts.id"))
     statement_date = Column(DateTime)
-    statement_balance = Column(Float)
-    reconciled_balance = Column(Float)
+    statement_balance = Column(Money)
+    reconciled_balance = Column(Money)
     status = Column(String)  # In Progress, Completed
     
     # Relationship
     account = relationship("Account")
     
     created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow) 
\ No newline at end of file
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow) 
+class BankStatementLine(Base):
+    __tablename__ = "bank_statement_lines"
+
+    id = Column(Integer, primary_key=True, index=True)
+    reconciliation_id = Column(Integer, ForeignKey("bank_reconciliations.id"), nullable=False, index=True)
+    transaction_date = Column(DateTime, nullable=False)
+    amount = Column(Money, nullable=False)  # Positive for deposits, negative for withdrawals
+    description = Column(String)
+    reference = Column(String)  # Bank transaction id (OFX FITID) when available
+
+    # Relationship
+    reconciliation = relationship("BankReconciliation")
+
+class ReconciliationMatch(Base):
+    __tablename__ = "reconciliation_matches"
+
+    id = Column(Integer, primary_key=True, index=True)
+    reconciliation_id = Column(Integer, ForeignKey("bank_reconciliations.id"), nullable=False, index=True)
+    statement_line_id = Column(Integer, ForeignKey("bank_statement_lines.id"), nullable=False, index=True)
+    journal_item_id = Column(Integer, ForeignKey("journal_items.id"), nullable=False, unique=True, index=True)
+    match_type = Column(String)  # exact, near, group
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class AICacheEntry(Base):
+    __tablename__ = "ai_cache_entries"
+    __table_args__ = (UniqueConstraint("kind", "key", name="uq_ai_cache_entries_kind_key"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String, nullable=False)  # categorization, categorization_text, invoice
+    key = Column(String, nullable=False)  # Hash of the normalized input
+    normalized_text = Column(Text, nullable=False)
+    result = Column(Text, nullable=False)  # JSON
+    hits = Column(Integer, default=0, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    last_used_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+class CacheVersion(Base):
+    __tablename__ = "cache_versions"
+
+    namespace = Column(String, primary_key=True)  # accounts, ledger, invoices, anomalies
+    version = Column(Integer, nullable=False, default=0)  # Bumped by every commit that writes to the namespace
+
+class Job(Base):
+    __tablename__ = "jobs"
+    __table_args__ = (Index("ix_jobs_status_id", "status", "id"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String, nullable=False)  # report, journal_import, categorization, invoice_extraction
+    status = Column(String, nullable=False, default="queued")  # queued, running, succeeded, failed, cancelled
+    params = Column(Text, nullable=False)  # JSON
+    progress = Column(Float, nullable=False, default=0.0)  # 0 to 1
+    message = Column(String)
+    result = Column(Text)  # JSON
+    error = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+class AnomalyScan(Base):
+    __tablename__ = "anomaly_scans"
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String, nullable=False)  # full, incremental
+    # Highest ids seen; the next incremental scan reads rows above them and rows edited since started_at
+    through_item_id = Column(Integer, nullable=False, default=0)
+    through_invoice_id = Column(Integer, nullable=False, default=0)
+    items_scanned = Column(Integer, nullable=False, default=0)
+    invoices_scanned = Column(Integer, nullable=False, default=0)
+    flagged = Column(Integer, nullable=False, default=0)
+    started_at = Column(DateTime, nullable=False)
+    finished_at = Column(DateTime)
+
+class AccountAmountStats(Base):
+    """
+    Distribution of an account's posting sizes, as log10 of the amount in cents, so
+    new postings can be scored without reading the account's history again.
+    """
+    __tablename__ = "account_amount_stats"
+
+    account_id = Column(Integer, ForeignKey("chart_of_accounts.id"), primary_key=True)
+    sample_count = Column(Integer, nullable=False)  # Postings the figures were computed from
+    item_count = Column(Integer, nullable=False)  # Postings seen since; a refresh is due once it outgrows the sample
+    median = Column(Float, nullable=False)
+    mad = Column(Float, nullable=False)  # Median absolute deviation
+    q1 = Column(Float, nullable=False)
+    q3 = Column(Float, nullable=False)
+
+class LedgerAnomaly(Base):
+    """
+    A journal item or invoice flagged by the anomaly scan. The ids are not foreign keys, so
+    deleting a flagged entry or invoice is not blocked; scans drop findings whose row is gone.
+    """
+    __tablename__ = "ledger_anomalies"
+
+    id = Column(Integer, primary_key=True, index=True)
+    journal_item_id = Column(Integer, unique=True)
+    invoice_id = Column(Integer, unique=True)
+    reasons = Column(String, nullable=False)  # Comma-separated: duplicate, outlier, round, weekend
+    score = Column(Float, nullable=False, index=True)
+    amount = Column(Money, nullable=False)
+    typical_amount = Column(Money)  # The account's median posting, for outliers
+    duplicate_of = Column(Integer)  # Earlier journal item or invoice with the same key
+    detected_at = Column(DateTime, default=datetime.utcnow, nullable=False)
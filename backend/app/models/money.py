@@ -0,0 +1,50 @@
+from decimal import Decimal
+from typing import Annotated, Union
+
+from pydantic import Field, PlainSerializer
+from sqlalchemy import BigInteger
+from sqlalchemy.types import TypeDecorator
+
+CENTS = Decimal(100)
+
+def to_cents(value: Union[Decimal, int, float, str]) -> int:
+    """
+    Convert an amount in currency units to integer minor units.
+    Raises ValueError if the amount has more than two decimal places.
+    """
+    amount = value if isinstance(value, Decimal) else Decimal(str(value))
+    cents = amount * CENTS
+    if cents != cents.to_integral_value():
+        raise ValueError(f"Amount {value} has more than two decimal places")
+    return int(cents)
+
+def from_cents(cents: Union[int, Decimal]) -> Decimal:
+    """
+    Convert integer minor units back to a Decimal amount in currency units.
+    """
+    return Decimal(cents).scaleb(-2)
+
+class Money(TypeDecorator):
+    """
+    Monetary amount stored as integer cents and exposed to Python as Decimal.
+    SUM() over these columns is exact integer arithmetic in the database.
+    """
+    impl = BigInteger
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return to_cents(value)
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return from_cents(value)
+
+# Decimal at the API boundary, written to JSON as a number so clients keep doing arithmetic on it
+MoneyAmount = Annotated[
+    Decimal,
+    Field(decimal_places=2),
+    PlainSerializer(float, return_type=float, when_used="json"),
+]
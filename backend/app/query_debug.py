@@ -0,0 +1,165 @@
+"""
+Query debugging for development and CI.
+
+QUERY_REPEAT_LIMIT catches N+1 patterns: when one statement shape runs more
+than that many times within a request, usually a lazy load such as
+entry.journal_items inside a loop, it is logged with the code that issued it,
+or raised as RepeatedQueryError with QUERY_REPEAT_ACTION=raise. SLOW_QUERY_MS
+logs every statement slower than the threshold with its parameters and origin.
+Both are off by default.
+
+count_queries() and assert_max_queries() record every statement run in the
+process while a block is open, so tests can hold an endpoint to a query budget:
+
+    with assert_max_queries(3):
+        client.get("/journal_entries")
+"""
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+import logging
+import os
+import re
+import threading
+import traceback
+
+logger = logging.getLogger(__name__)
+
+# Runs of one statement shape allowed per request before it is flagged; 0 disables the check
+QUERY_REPEAT_LIMIT = int(os.getenv("QUERY_REPEAT_LIMIT", "0"))
+# warn logs the repeat once per request; raise fails the statement that crossed the limit
+QUERY_REPEAT_ACTION = os.getenv("QUERY_REPEAT_ACTION", "warn")
+# Log statements at least this slow; 0 disables the log
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "0"))
+
+# Frames under the backend directory, minus installed packages and this instrumentation, are the origin
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+INSTRUMENTATION_FILES = {os.path.abspath(__file__), os.path.join(BACKEND_DIR, "app", "metrics.py")}
+ORIGIN_FRAMES = 4
+# Long IN lists are cut when statements are listed
+SHAPE_DISPLAY_LENGTH = 300
+
+class RepeatedQueryError(RuntimeError):
+    """
+    One statement shape ran more often within a request than its repeat limit allows.
+    """
+
+def statement_shape(statement: str) -> str:
+    """
+    The statement with whitespace collapsed; parameters are already bound separately.
+    """
+    return re.sub(r"\s+", " ", statement).strip()
+
+def origin() -> str:
+    """
+    The innermost application frames on the current stack, innermost first.
+    """
+    frames = [
+        frame for frame in traceback.extract_stack()
+        if frame.filename.startswith(BACKEND_DIR)
+        and "site-packages" not in frame.filename
+        and frame.filename not in INSTRUMENTATION_FILES
+    ]
+    return " <- ".join(
+        f"{os.path.relpath(frame.filename, BACKEND_DIR)}:{frame.lineno} in {frame.name}"
+        for frame in reversed(frames[-ORIGIN_FRAMES:])
+    ) or "unknown"
+
+class QueryLog:
+    """
+    Statements seen in one scope, with repeat detection per statement shape.
+    """
+    def __init__(self, repeat_limit: int = 0, action: str = "warn"):
+        self.repeat_limit = repeat_limit
+        self.action = action
+        self.statements: List[Tuple[str, Any]] = []
+        self.shapes: Counter = Counter()
+        self.reported = set()
+
+    def __len__(self) -> int:
+        return len(self.statements)
+
+    def record(self, statement: str, parameters: Any) -> None:
+        shape = statement_shape(statement)
+        self.statements.append((shape, parameters))
+        self.shapes[shape] += 1
+        count = self.shapes[shape]
+        if not self.repeat_limit or count <= self.repeat_limit or shape in self.reported:
+            return
+        message = f"Statement ran {count} times (limit {self.repeat_limit}), likely N+1 from {origin()}: {shape}"
+        if self.action == "raise":
+            raise RepeatedQueryError(message)
+        self.reported.add(shape)
+        logger.warning(message)
+
+    def repeated(self) -> Dict[str, int]:
+        """
+        Statement shapes that ran more than once, most frequent first.
+        """
+        return {shape: count for shape, count in self.shapes.most_common() if count > 1}
+
+# The log of the request being served, set by QueryDebugMiddleware
+_request_log: ContextVar[Optional[QueryLog]] = ContextVar("query_log", default=None)
+# Process-wide logs opened by count_queries; TestClient serves requests on another thread, so a context variable would miss them
+_open_logs: List[QueryLog] = []
+_open_logs_lock = threading.Lock()
+
+def observe_statement(statement: str, parameters: Any, seconds: float) -> None:
+    """
+    Called by the engine instrumentation after every statement.
+    """
+    if SLOW_QUERY_MS and seconds * 1000 >= SLOW_QUERY_MS:
+        logger.warning("Slow query (%.1f ms) from %s: %s; parameters %r", seconds * 1000, origin(), statement_shape(statement), parameters)
+    request_log = _request_log.get()
+    if request_log is not None:
+        request_log.record(statement, parameters)
+    if _open_logs:
+        with _open_logs_lock:
+            logs = list(_open_logs)
+        for log in logs:
+            log.record(statement, parameters)
+
+@contextmanager
+def count_queries(repeat_limit: int = 0, action: str = "raise") -> Iterator[QueryLog]:
+    """
+    Record every statement the process runs inside the block.
+    """
+    log = QueryLog(repeat_limit, action)
+    with _open_logs_lock:
+        _open_logs.append(log)
+    try:
+        yield log
+    finally:
+        with _open_logs_lock:
+            _open_logs.remove(log)
+
+@contextmanager
+def assert_max_queries(limit: int) -> Iterator[QueryLog]:
+    """
+    Fail with the statements run if the block runs more than limit of them.
+    """
+    with count_queries() as log:
+        yield log
+    if len(log) > limit:
+        listing = "\n".join(f"  {shape[:SHAPE_DISPLAY_LENGTH]}" for shape, _ in log.statements)
+        raise AssertionError(f"Expected at most {limit} queries, ran {len(log)}:\n{listing}")
+
+class QueryDebugMiddleware:
+    """
+    ASGI middleware giving each request its own QueryLog with the configured repeat limit.
+    """
+    def __init__(self, app, repeat_limit: int = QUERY_REPEAT_LIMIT, action: str = QUERY_REPEAT_ACTION):
+        self.app = app
+        self.repeat_limit = repeat_limit
+        self.action = action
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        token = _request_log.set(QueryLog(self.repeat_limit, self.action))
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _request_log.reset(token)
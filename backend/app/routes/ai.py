@@ -0,0 +1,168 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
+import json
+import time
+from pydantic import BaseModel, Field
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import get_async_db, run_in_session
+from app.models.models import Account
+from app.services.ai_cache import CATEGORIZATION, CATEGORIZATION_TEXT, INVOICE, INVOICE_CHUNK, AICache
+from app.services.ai_service import AI_BATCH_SIZE, AI_MAX_CONCURRENCY, AIService
+from app.services.categorizer_service import CategorizerService
+from app.services.invoice_pipeline import INVOICE_CHUNK_TOKENS, InvoicePipeline
+from app.services.pdf_text import estimate_tokens
+from app.services.summary_service import SummaryService
+
+router = APIRouter(prefix="/ai")
+
+class TransactionText(BaseModel):
+    description: str
+    amount: Optional[float] = None
+
+class CategorizationBatchRequest(BaseModel):
+    transactions: List[TransactionText] = Field(..., max_length=20000)
+    accounts: Optional[List[str]] = Field(None, description="Account names to choose from; defaults to the chart of accounts")
+    batch_size: int = Field(AI_BATCH_SIZE, ge=1, le=200, description="Transactions per prompt")
+    concurrency: int = Field(AI_MAX_CONCURRENCY, ge=1, le=32, description="Prompts in flight at once")
+
+class InvoiceBatchRequest(BaseModel):
+    invoices: List[str] = Field(..., max_length=1000)
+    concurrency: int = Field(AI_MAX_CONCURRENCY, ge=1, le=32)
+
+class ChatMessage(BaseModel):
+    role: str = Field(..., pattern="^(user|assistant)$")
+    content: str
+
+class ChatRequest(BaseModel):
+    message: str = Field(..., min_length=1, max_length=4000)
+    history: List[ChatMessage] = Field([], max_length=20, description="Earlier turns of the conversation, oldest first")
+    stream: bool = Field(True, description="Stream the reply as server-sent events")
+
+class InvoiceExtractRequest(BaseModel):
+    invoice_text: Optional[str] = Field(None, description="Invoice text to extract in one prompt")
+    file: Optional[str] = Field(None, description="PDF in the invoice storage directory, processed in chunks")
+
+@router.post("/chat")
+async def chat(request: ChatRequest):
+    """
+    Answer a question about the books. The model sees a compact ledger summary, not the
+    transactions. Streams server-sent events: token events with the text as it arrives, then
+    done with the prompt size and time to first token, or error. With stream false the reply
+    is returned whole as {"response": ...}, or {"status": "error", "error": ...} if the model call fails.
+    """
+    context = await run_in_session(SummaryService.context)
+    messages = AIService.chat_messages(context, request.message, [turn.model_dump() for turn in request.history])
+    if not request.stream:
+        try:
+            reply, _ = await AIService.chat(messages)
+        except Exception as e:
+            return {"status": "error", "error": str(e)}
+        return {"response": reply}
+
+    async def events():
+        start = time.perf_counter()
+        first_token_ms = None
+        try:
+            async for piece in AIService.chat_stream(messages):
+                if first_token_ms is None:
+                    first_token_ms = round((time.perf_counter() - start) * 1000, 1)
+                yield f"event: token\ndata: {json.dumps({'text': piece})}\n\n"
+        except Exception as e:
+            yield f"event: error\ndata: {json.dumps({'detail': str(e)})}\n\n"
+            return
+        done = {
+            "prompt_tokens": sum(estimate_tokens(message["content"]) for message in messages),
+            "time_to_first_token_ms": first_token_ms,
+            "elapsed_ms": round((time.perf_counter() - start) * 1000, 1),
+        }
+        yield f"event: done\ndata: {json.dumps(done)}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@router.post("/extract-invoice-data")
+async def extract_invoice_data(request: InvoiceExtractRequest):
+    """
+    Extract an invoice from text, or from a stored PDF of any length.
+    """
+    if request.file is None:
+        if not request.invoice_text:
+            raise HTTPException(status_code=400, detail="Provide invoice_text or file")
+        return await AIService.process_invoice(request.invoice_text)
+    try:
+        paths = InvoicePipeline.resolve([request.file])
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    result = None
+    async for event in InvoicePipeline.run(paths):
+        if event["event"] == "file_done":
+            result = event
+    return result
+
+@router.get("/invoices/extract/stream")
+async def stream_invoice_extraction(
+    files: Optional[List[str]] = Query(None, description="PDFs in the invoice storage directory; all of them by default"),
+    concurrency: int = Query(AI_MAX_CONCURRENCY, ge=1, le=32),
+    chunk_tokens: int = Query(INVOICE_CHUNK_TOKENS, ge=200, le=100000),
+):
+    """
+    Extract stored PDFs and stream progress as server-sent events: started, file_parsed,
+    chunk_done, file_done (with the merged invoice) and a final done summary.
+    """
+    try:
+        paths = InvoicePipeline.resolve(files)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+    async def events():
+        async for event in InvoicePipeline.run(paths, concurrency=concurrency, max_tokens=chunk_tokens):
+            yield f"event: {event['event']}\ndata: {json.dumps(event)}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@router.post("/suggest-categorization/batch")
+async def suggest_categorization_batch(request: CategorizationBatchRequest, db: AsyncSession = Depends(get_async_db)):
+    """
+    Categorize many transactions with batched, concurrent model calls.
+    """
+    accounts = request.accounts
+    if accounts is None:
+        accounts = list((await db.execute(select(Account.account_name).order_by(Account.account_code))).scalars())
+    return await AIService.suggest_categorizations(
+        [transaction.model_dump() for transaction in request.transactions],
+        accounts=accounts or None,
+        batch_size=request.batch_size,
+        concurrency=request.concurrency,
+    )
+
+@router.post("/extract-invoice-data/batch")
+async def extract_invoice_data_batch(request: InvoiceBatchRequest):
+    """
+    Extract several invoices concurrently.
+    """
+    return await AIService.process_invoices(request.invoices, concurrency=request.concurrency)
+
+@router.get("/cache/stats")
+async def ai_cache_stats():
+    """
+    Exact and semantic hit rates of the AI result cache since this worker started.
+    """
+    return AICache.stats()
+
+@router.get("/categorizer")
+async def local_categorizer():
+    """
+    Local categorizer model details and how often it answered without the language model.
+    """
+    return CategorizerService.info()
+
+@router.delete("/cache")
+async def clear_ai_cache(kind: Optional[str] = None):
+    """
+    Drop cached AI results, optionally only one kind (categorization, categorization_text, invoice, invoice_chunk).
+    """
+    if kind is not None and kind not in (CATEGORIZATION, CATEGORIZATION_TEXT, INVOICE, INVOICE_CHUNK):
+        raise HTTPException(status_code=400, detail=f"Unknown cache kind: {kind}")
+    return {"deleted": await AICache.clear(kind)}
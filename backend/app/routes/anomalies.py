@@ -0,0 +1,24 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import get_async_db, run_in_session
+from app.services.anomaly_service import AnomalyService
+
+router = APIRouter(prefix="/anomalies")
+
+@router.get("")
+async def list_anomalies(limit: int = Query(50, ge=1, le=1000), db: AsyncSession = Depends(get_async_db)):
+    """
+    Journal items and invoices flagged by the anomaly scan, highest score first. Postings made
+    since the background scan last ran are not scored yet.
+    """
+    return await db.run_sync(AnomalyService.shortlist, limit)
+
+@router.post("/scan")
+async def scan_anomalies(
+    full: bool = Query(False, description="Rescan everything and recompute account statistics"),
+):
+    """
+    Score the journal items and invoices added or edited since the last scan and store the findings.
+    """
+    return await run_in_session(AnomalyService.scan, full)
@@ -0,0 +1,46 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
+from datetime import date
+import json
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.dashboard import DASHBOARD_KEEPALIVE_SECONDS, dashboard_hub, units
+from app.database import get_async_db
+from app.services.dashboard_service import DashboardService
+
+router = APIRouter(prefix="/dashboard")
+
+def server_sent_event(message: dict) -> str:
+    return f"event: {message['type']}\ndata: {json.dumps(message, separators=(',', ':'))}\n\n"
+
+@router.get("")
+async def get_dashboard(db: AsyncSession = Depends(get_async_db)):
+    """
+    Current KPIs: cash, open receivables and payables, and this year's revenue and expenses.
+    """
+    year = date.today().year
+    kpis = await db.run_sync(DashboardService.snapshot, year)
+    return {"year": year, "kpis": units(kpis)}
+
+@router.get("/stream")
+async def stream_dashboard():
+    """
+    Server-sent events: a snapshot event with every KPI on connect, then delta events carrying
+    the change of each KPI that moved, with bursts of commits coalesced into one event.
+    """
+    async def events():
+        subscriber, snapshot = await dashboard_hub.subscribe()
+        try:
+            yield server_sent_event(snapshot)
+            while True:
+                message = await dashboard_hub.next(subscriber, DASHBOARD_KEEPALIVE_SECONDS)
+                yield server_sent_event(message) if message else ": keepalive\n\n"
+        finally:
+            dashboard_hub.unsubscribe(subscriber)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # Proxies must pass each event on rather than buffer the response
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,76 @@
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from typing import Iterator, Optional
+from datetime import date
+
+from app.database import SessionLocal, run_in_session
+from app.routes.reports import GRANULARITY_PATTERN
+from app.services.export_service import LEDGER_COLUMNS, REPORTS, ExportService
+
+router = APIRouter(prefix="/exports")
+
+FORMAT_PATTERN = "^(csv|parquet)$"
+
+def check_format(format: str) -> None:
+    try:
+        ExportService.check_format(format)
+    except RuntimeError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+
+def attachment(chunks: Iterator[bytes], name: str, format: str, compress: bool) -> StreamingResponse:
+    filename = ExportService.filename(name, format, compress)
+    return StreamingResponse(
+        chunks,
+        media_type=ExportService.media_type(format, compress),
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+@router.get("/ledger")
+async def export_ledger(
+    format: str = Query("csv", pattern=FORMAT_PATTERN),
+    start_date: Optional[date] = Query(None, description="Only items of entries on or after this date"),
+    end_date: Optional[date] = Query(None, description="Only items of entries on or before this date"),
+    account_id: Optional[int] = Query(None, description="Only items posted to this account"),
+    include_subaccounts: bool = Query(True, description="With account_id, also items posted to its sub-accounts"),
+    gzip: bool = Query(False, description="Gzip CSV output as it is written"),
+):
+    """
+    Stream the general ledger, one row per journal item in date order, in constant memory.
+    """
+    check_format(format)
+
+    def generate():
+        # Runs in the threadpool with its own session, since the body outlives the request
+        db = SessionLocal()
+        try:
+            rows = ExportService.ledger_rows(db, start_date, end_date, account_id, include_subaccounts)
+            yield from ExportService.stream(format, LEDGER_COLUMNS, rows, gzip)
+        finally:
+            db.close()
+
+    name = "ledger" + "".join(f"-{value}" for value in (start_date, end_date) if value is not None)
+    return attachment(generate(), name, format, gzip)
+
+@router.get("/reports/{report}")
+async def export_report(
+    report: str,
+    format: str = Query("csv", pattern=FORMAT_PATTERN),
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    as_of: Optional[date] = None,
+    granularity: str = Query("month", pattern=GRANULARITY_PATTERN),
+    account_id: Optional[int] = Query(None, description="Root account of the consolidated report"),
+    gzip: bool = False,
+):
+    """
+    Export a report as a table: trial-balance, income-statement, balance-sheet or consolidated.
+    """
+    if report not in REPORTS:
+        raise HTTPException(status_code=404, detail=f"Unknown report: {report}")
+    check_format(format)
+    params = dict(start_date=start_date, end_date=end_date, as_of=as_of, granularity=granularity, account_id=account_id)
+    try:
+        columns, rows = await run_in_session(ExportService.report_table, report, params)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return attachment(ExportService.stream(format, columns, [rows], gzip), report, format, gzip)
@@ -0,0 +1,159 @@
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Response, UploadFile
+from fastapi.responses import JSONResponse
+from typing import List, Optional
+from datetime import date
+import asyncio
+import os
+import shutil
+import uuid
+from pydantic import BaseModel, Field
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import get_async_db
+from app.models.models import Account
+from app.routes.ai import TransactionText
+from app.routes.reports import GRANULARITY_PATTERN, INVOICE_TYPE_PATTERN
+from app.services.ai_service import AI_BATCH_SIZE, AI_MAX_CONCURRENCY
+from app.services.invoice_pipeline import INVOICE_CHUNK_TOKENS, InvoicePipeline
+from app.services.job_handlers import REPORTS
+from app.services.job_service import CANCELLED, FAILED, JOB_STORAGE_DIR, SUCCEEDED, JobService
+from app.services.journal_service import JournalService, BULK_CHUNK_SIZE
+
+router = APIRouter(prefix="/jobs")
+
+STATUS_PATTERN = "^(queued|running|succeeded|failed|cancelled)$"
+
+class ReportJobCreate(BaseModel):
+    report: str = Field(..., description=", ".join(REPORTS))
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
+    as_of: Optional[date] = None
+    granularity: str = Field("month", pattern=GRANULARITY_PATTERN)
+    compare: bool = False
+    type: str = Field("Receivable", pattern=INVOICE_TYPE_PATTERN, description="Invoice type for the aging report")
+    contact_id: Optional[int] = None
+
+class CategorizationJobCreate(BaseModel):
+    transactions: List[TransactionText] = Field(..., max_length=200000)
+    accounts: Optional[List[str]] = Field(None, description="Account names to choose from; defaults to the chart of accounts")
+    batch_size: int = Field(AI_BATCH_SIZE, ge=1, le=200)
+    concurrency: int = Field(AI_MAX_CONCURRENCY, ge=1, le=32)
+
+class InvoiceExtractionJobCreate(BaseModel):
+    files: Optional[List[str]] = Field(None, description="PDFs in the invoice storage directory; all of them by default")
+    concurrency: int = Field(AI_MAX_CONCURRENCY, ge=1, le=32)
+    chunk_tokens: int = Field(INVOICE_CHUNK_TOKENS, ge=200, le=100000)
+
+def save_upload(file: UploadFile, path: str) -> None:
+    with open(path, "wb") as f:
+        shutil.copyfileobj(file.file, f)
+
+async def enqueue(db: AsyncSession, kind: str, params: dict) -> JSONResponse:
+    """
+    Create a job, hand it to the queue and answer 202 with where to poll.
+    """
+    job = await db.run_sync(JobService.create, kind, params)
+    JobService.get_queue().submit(job["id"])
+    return JSONResponse(
+        status_code=202,
+        content={"id": job["id"], "kind": kind, "status": job["status"]},
+        headers={"Location": f"/jobs/{job['id']}"},
+    )
+
+@router.post("/reports", status_code=202)
+async def create_report_job(request: ReportJobCreate, db: AsyncSession = Depends(get_async_db)):
+    """
+    Build a report in the background; the result has the same body as the matching /reports endpoint.
+    """
+    if request.report not in REPORTS:
+        raise HTTPException(status_code=400, detail=f"Unknown report: {request.report}")
+    return await enqueue(db, "report", request.model_dump(mode="json", exclude_none=True))
+
+@router.post("/journal-import", status_code=202)
+async def create_journal_import_job(
+    file: UploadFile = File(..., description="JSON-lines (one entry per line) or CSV (one item per row)"),
+    format: Optional[str] = Query(None, description="jsonl or csv; inferred from the file name when omitted"),
+    chunk_size: int = Query(BULK_CHUNK_SIZE, ge=1, le=10000, description="Entries inserted per transaction"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Import journal entries in the background. The result has the same body as POST /journal_entries/bulk.
+    """
+    import_format = format or JournalService.detect_format(file.filename)
+    if import_format not in ("jsonl", "csv"):
+        raise HTTPException(status_code=400, detail=f"Unsupported import format: {import_format}")
+    os.makedirs(JOB_STORAGE_DIR, exist_ok=True)
+    path = os.path.join(JOB_STORAGE_DIR, f"{uuid.uuid4().hex}.{import_format}")
+    # The copy blocks on disk, so it runs off the event loop
+    await asyncio.to_thread(save_upload, file, path)
+    return await enqueue(db, "journal_import", {
+        "path": path, "filename": file.filename, "format": import_format, "chunk_size": chunk_size,
+    })
+
+@router.post("/categorizations", status_code=202)
+async def create_categorization_job(request: CategorizationJobCreate, db: AsyncSession = Depends(get_async_db)):
+    """
+    Categorize transactions in the background; the result matches POST /ai/suggest-categorization/batch.
+    """
+    params = request.model_dump()
+    if params["accounts"] is None:
+        params["accounts"] = list((await db.execute(select(Account.account_name).order_by(Account.account_code))).scalars()) or None
+    return await enqueue(db, "categorization", params)
+
+@router.post("/invoice-extractions", status_code=202)
+async def create_invoice_extraction_job(request: InvoiceExtractionJobCreate, db: AsyncSession = Depends(get_async_db)):
+    """
+    Extract stored PDFs in the background, one file_done result per PDF plus a summary.
+    """
+    try:
+        InvoicePipeline.resolve(request.files)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return await enqueue(db, "invoice_extraction", request.model_dump())
+
+@router.get("")
+async def list_jobs(
+    status: Optional[str] = Query(None, pattern=STATUS_PATTERN),
+    kind: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    db: AsyncSession = Depends(get_async_db),
+):
+    return await db.run_sync(JobService.list_jobs, status, kind, limit)
+
+@router.get("/{job_id}")
+async def get_job(job_id: int, db: AsyncSession = Depends(get_async_db)):
+    """
+    Status and progress of a job.
+    """
+    job = await db.run_sync(JobService.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.get("/{job_id}/result")
+async def get_job_result(job_id: int, response: Response, db: AsyncSession = Depends(get_async_db)):
+    """
+    Result of a succeeded job. 202 with the job's status while it is queued or running,
+    409 with its error once it failed or was cancelled.
+    """
+    job = await db.run_sync(JobService.get, job_id, True)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["status"] == SUCCEEDED:
+        return job["result"]
+    if job["status"] in (FAILED, CANCELLED):
+        raise HTTPException(status_code=409, detail=job["error"] or f"Job {job['status']}")
+    response.status_code = 202
+    response.headers["Location"] = f"/jobs/{job_id}"
+    return {key: job[key] for key in ("id", "status", "progress", "message")}
+
+@router.delete("/{job_id}")
+async def cancel_job(job_id: int, db: AsyncSession = Depends(get_async_db)):
+    """
+    Cancel a queued or running job. Cancelling a finished job changes nothing.
+    """
+    job = await db.run_sync(JobService.cancel, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
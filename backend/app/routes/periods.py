@@ -0,0 +1,48 @@
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel, Field
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import get_async_db
+from app.services.period_service import PeriodService, parse_period
+
+router = APIRouter(prefix="/periods")
+
+PERIOD_PATTERN = r"^\d{4}-\d{2}$"
+
+class PeriodCloseCreate(BaseModel):
+    period: str = Field(..., pattern=PERIOD_PATTERN, description="Close this YYYY-MM period and every earlier one")
+
+@router.get("/closes")
+async def list_period_closes(db: AsyncSession = Depends(get_async_db)):
+    return await db.run_sync(PeriodService.list_closes)
+
+@router.post("/closes")
+async def close_period(close: PeriodCloseCreate, db: AsyncSession = Depends(get_async_db)):
+    """
+    Lock a period against edits and snapshot account totals at its end.
+    """
+    try:
+        period = parse_period(close.period)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        return await db.run_sync(PeriodService.close, period)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@router.delete("/closes/{period}")
+async def reopen_period(period: str, db: AsyncSession = Depends(get_async_db)):
+    """
+    Reopen the most recently closed period.
+    """
+    try:
+        parsed = parse_period(period)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        await db.run_sync(PeriodService.reopen, parsed)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"message": f"Period {period} reopened"}
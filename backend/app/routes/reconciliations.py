@@ -0,0 +1,96 @@
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile
+from typing import Optional
+from datetime import datetime
+from decimal import Decimal
+import asyncio
+from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import get_async_db, run_in_session
+from app.models.money import MoneyAmount
+from app.services.reconciliation_service import (
+    AMOUNT_TOLERANCE,
+    DATE_WINDOW_DAYS,
+    NEAR_DATE_WINDOW_DAYS,
+    ReconciliationService,
+)
+
+router = APIRouter(prefix="/reconciliations")
+
+class BankReconciliationCreate(BaseModel):
+    account_id: int
+    statement_date: datetime
+    statement_balance: MoneyAmount
+
+@router.post("")
+async def create_reconciliation(reconciliation: BankReconciliationCreate, db: AsyncSession = Depends(get_async_db)):
+    """
+    Open a reconciliation for a bank account statement.
+    """
+    created = await db.run_sync(
+        ReconciliationService.create_reconciliation,
+        reconciliation.account_id,
+        reconciliation.statement_date,
+        reconciliation.statement_balance,
+    )
+    if created is None:
+        raise HTTPException(status_code=400, detail=f"Unknown account_id {reconciliation.account_id}")
+    return await db.run_sync(ReconciliationService.summary, created.id)
+
+@router.get("/{reconciliation_id}")
+async def get_reconciliation(reconciliation_id: int, db: AsyncSession = Depends(get_async_db)):
+    summary = await db.run_sync(ReconciliationService.summary, reconciliation_id)
+    if summary is None:
+        raise HTTPException(status_code=404, detail="Reconciliation not found")
+    return summary
+
+@router.post("/{reconciliation_id}/statement")
+async def upload_statement(
+    reconciliation_id: int,
+    file: UploadFile = File(..., description="CSV (date, amount[, description, reference]) or OFX/QFX statement"),
+    format: Optional[str] = Query(None, pattern="^(csv|ofx)$", description="Inferred from the file name when omitted"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Import statement lines into a reconciliation.
+    """
+    if await db.run_sync(ReconciliationService.summary, reconciliation_id) is None:
+        raise HTTPException(status_code=404, detail="Reconciliation not found")
+    try:
+        text = (await file.read()).decode("utf-8-sig")
+        statement = await asyncio.to_thread(
+            ReconciliationService.parse, text, format or ReconciliationService.detect_format(file.filename)
+        )
+    except (UnicodeDecodeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    imported = await run_in_session(ReconciliationService.import_statement, reconciliation_id, statement)
+    return {"imported": imported}
+
+@router.post("/{reconciliation_id}/match")
+async def match_statement(
+    reconciliation_id: int,
+    date_window: int = Query(DATE_WINDOW_DAYS, ge=0, le=31, description="Days either side for exact amount matches"),
+    near_date_window: int = Query(NEAR_DATE_WINDOW_DAYS, ge=0, le=62, description="Days either side for near matches"),
+    amount_tolerance: Decimal = Query(AMOUNT_TOLERANCE, ge=0, decimal_places=2, description="Largest amount difference for near matches"),
+):
+    """
+    Match unmatched statement lines against unreconciled ledger items of the bank account.
+    """
+    summary = await run_in_session(ReconciliationService.reconcile, reconciliation_id, date_window, near_date_window, amount_tolerance)
+    if summary is None:
+        raise HTTPException(status_code=404, detail="Reconciliation not found")
+    return summary
+
+@router.get("/{reconciliation_id}/unmatched")
+async def get_unmatched(
+    reconciliation_id: int,
+    limit: int = Query(500, ge=1, le=5000),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Statement lines and ledger items of the statement period still awaiting a match.
+    """
+    unmatched = await db.run_sync(ReconciliationService.unmatched, reconciliation_id, limit)
+    if unmatched is None:
+        raise HTTPException(status_code=404, detail="Reconciliation not found")
+    return unmatched
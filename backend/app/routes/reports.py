@@ -0,0 +1,90 @@
+from fastapi import APIRouter, HTTPException, Query, Request
+from typing import Optional
+from datetime import date
+
+from app.cache import INVOICES, LEDGER, cached_json
+from app.database import run_in_session
+from app.services.aging_service import AgingService
+from app.services.balance_service import BalanceService
+from app.services.hierarchy_service import HierarchyService
+from app.services.report_service import ReportService
+
+router = APIRouter(prefix="/reports")
+
+GRANULARITY_PATTERN = "^(month|quarter|year)$"
+INVOICE_TYPE_PATTERN = "^(Receivable|Payable)$"
+
+@router.get("/trial-balance")
+async def get_trial_balance(request: Request, as_of: Optional[date] = None):
+    """
+    Trial balance read from the materialized account balances.
+    """
+    return await cached_json(request, LEDGER, lambda: run_in_session(BalanceService.trial_balance, as_of))
+
+@router.get("/consolidated")
+async def get_consolidated_balances(
+    request: Request,
+    as_of: Optional[date] = None,
+    account_id: Optional[int] = Query(None, description="Only this account and its sub-accounts"),
+):
+    """
+    Chart of accounts as a tree with own and consolidated balances, read from the roll-up balances.
+    """
+    async def compute():
+        report = await run_in_session(HierarchyService.consolidated, as_of, account_id)
+        if report is None:
+            raise HTTPException(status_code=404, detail="Account not found")
+        return report
+    return await cached_json(request, LEDGER, compute)
+
+@router.get("/income-statement")
+async def get_income_statement(
+    request: Request,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    granularity: str = Query("month", pattern=GRANULARITY_PATTERN),
+    compare: bool = Query(False, description="Include period-over-period changes"),
+):
+    """
+    Profit & loss per period.
+    """
+    return await cached_json(request, LEDGER, lambda: run_in_session(ReportService.income_statement, start_date, end_date, granularity, compare))
+
+@router.get("/balance-sheet")
+async def get_balance_sheet(
+    request: Request,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    granularity: str = Query("month", pattern=GRANULARITY_PATTERN),
+):
+    """
+    Closing balances of assets, liabilities and equity per period.
+    """
+    return await cached_json(request, LEDGER, lambda: run_in_session(ReportService.balance_sheet, start_date, end_date, granularity))
+
+@router.get("/cash-flow")
+async def get_cash_flow(
+    request: Request,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    granularity: str = Query("month", pattern=GRANULARITY_PATTERN),
+):
+    """
+    Operating, investing and financing cash flows per period.
+    """
+    return await cached_json(request, LEDGER, lambda: run_in_session(ReportService.cash_flow, start_date, end_date, granularity))
+
+@router.get("/aging")
+async def get_aging(
+    request: Request,
+    type: str = Query("Receivable", pattern=INVOICE_TYPE_PATTERN, description="Receivable (AR) or Payable (AP)"),
+    as_of: Optional[date] = None,
+    contact_id: Optional[int] = None,
+):
+    """
+    Open invoices per contact in 0-30, 31-60, 61-90 and 90+ days past due buckets.
+    """
+    as_of = as_of or date.today()
+    return await cached_json(
+        request, INVOICES, lambda: run_in_session(AgingService.aging, type, as_of, contact_id), vary=as_of.isoformat()
+    )
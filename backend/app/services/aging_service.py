@@ -0,0 +1,325 @@
+"""
+Accounts receivable and payable aging.
+
+Open invoices (Sent or Overdue) are bucketed by days past due as of a date:
+0-30 (including invoices not yet due), 31-60, 61-90 and 90+, summed per
+contact with CASE expressions in one grouped query.
+
+invoice_aging_balances keeps open totals per contact, invoice type and due
+month. Session hooks maintain it as invoices are added, deleted or change
+status, amount, contact or due date. A report reads whole due months from it
+and only reads raw invoices for the months that straddle a bucket boundary.
+Core insert()/update() statements bypass the hooks, so run
+`python -m app.cli rebuild-aging` after loading invoices that way.
+"""
+from typing import Dict, Iterable, List, Optional, Tuple
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from sqlalchemy import and_, bindparam, case, delete, event, extract, func, insert, inspect, literal, or_, select, union_all, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.models.models import Contact, Invoice, InvoiceAgingBalance
+from app.models.money import Money, from_cents, to_cents
+from app.services.balance_service import ZERO, period_of
+
+OPEN_STATUSES = ("Sent", "Overdue")
+INVOICE_TYPES = ("Receivable", "Payable")
+BUCKETS = ("0-30", "31-60", "61-90", "90+")
+# Invoice attributes that decide whether and where an invoice is counted
+TRACKED_ATTRIBUTES = ("contact_id", "type", "due_date", "amount", "status")
+
+# ((contact_id, type, period), amount, count)
+AgingChange = Tuple[Tuple[int, str, int], Decimal, int]
+
+def _month_start(period: int) -> datetime:
+    return datetime(period // 100, period % 100, 1)
+
+def _next_month_start(period: int) -> datetime:
+    year, month = divmod(period, 100)
+    return datetime(year + month // 12, month % 12 + 1, 1)
+
+def _is_open():
+    # Statuses are rendered inline so the planner can match the partial index of open invoices.
+    # Invoices without a contact are dropped when grouping rather than filtered here, since
+    # contact_id IS NOT NULL would let the planner walk every invoice through the contact index
+    statuses = bindparam("open_statuses", OPEN_STATUSES, expanding=True, literal_execute=True)
+    return and_(Invoice.status.in_(statuses), Invoice.type.in_(INVOICE_TYPES), Invoice.due_date.isnot(None))
+
+class AgingService:
+    @staticmethod
+    def _values(invoice: Invoice, committed: bool) -> Dict:
+        """
+        The tracked attributes of an invoice as last flushed (committed=True) or as now.
+        """
+        state = inspect(invoice)
+        values = {}
+        for name in TRACKED_ATTRIBUTES:
+            history = state.attrs[name].history
+            values[name] = history.deleted[0] if committed and history.deleted else getattr(invoice, name)
+        return values
+
+    @staticmethod
+    def _change(values: Dict, sign: int) -> List[AgingChange]:
+        if (
+            values["status"] not in OPEN_STATUSES
+            or values["type"] not in INVOICE_TYPES
+            or values["contact_id"] is None
+            or values["due_date"] is None
+        ):
+            return []
+        key = (values["contact_id"], values["type"], period_of(values["due_date"]))
+        return [(key, sign * (values["amount"] or ZERO), sign)]
+
+    @staticmethod
+    def session_changes(session: Session) -> List[AgingChange]:
+        """
+        Open-total changes implied by the invoices a session is about to flush.
+        """
+        changes = []
+        for invoice in session.new:
+            if isinstance(invoice, Invoice):
+                changes += AgingService._change(AgingService._values(invoice, committed=False), 1)
+        for invoice in session.dirty:
+            if isinstance(invoice, Invoice) and session.is_modified(invoice):
+                changes += AgingService._change(AgingService._values(invoice, committed=True), -1)
+                changes += AgingService._change(AgingService._values(invoice, committed=False), 1)
+        for invoice in session.deleted:
+            if isinstance(invoice, Invoice):
+                changes += AgingService._change(AgingService._values(invoice, committed=True), -1)
+        return changes
+
+    @staticmethod
+    def apply(db: Session, changes: Iterable[AgingChange]) -> None:
+        """
+        Add changes to the open totals inside the caller's transaction.
+        """
+        # Accumulated in integer cents
+        deltas: Dict[Tuple[int, str, int], List[int]] = defaultdict(lambda: [0, 0])
+        for key, amount, count in changes:
+            delta = deltas[key]
+            delta[0] += to_cents(amount)
+            delta[1] += count
+        deltas = {key: delta for key, delta in deltas.items() if delta != [0, 0]}
+        if not deltas:
+            return
+        # Left on the session until it commits, for listeners such as the dashboard push
+        pending = db.info.setdefault("aging_deltas", defaultdict(int))
+        for (_, invoice_type, _), (amount, _) in deltas.items():
+            pending[invoice_type] += amount
+
+        # Sorted so concurrent writers lock rows in the same order
+        rows = [
+            {"contact_id": contact_id, "type": invoice_type, "period": period, "open_amount": from_cents(amount), "open_count": count}
+            for (contact_id, invoice_type, period), (amount, count) in sorted(deltas.items())
+        ]
+
+        dialect = db.get_bind().dialect.name
+        if dialect in ("postgresql", "sqlite"):
+            dialect_insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+            stmt = dialect_insert(InvoiceAgingBalance)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[InvoiceAgingBalance.contact_id, InvoiceAgingBalance.type, InvoiceAgingBalance.period],
+                set_={
+                    "open_amount": InvoiceAgingBalance.open_amount + stmt.excluded.open_amount,
+                    "open_count": InvoiceAgingBalance.open_count + stmt.excluded.open_count,
+                },
+            )
+            db.execute(stmt, rows)
+            return
+
+        for row in rows:
+            result = db.execute(
+                update(InvoiceAgingBalance)
+                .where(
+                    InvoiceAgingBalance.contact_id == row["contact_id"],
+                    InvoiceAgingBalance.type == row["type"],
+                    InvoiceAgingBalance.period == row["period"],
+                )
+                .values(
+                    open_amount=InvoiceAgingBalance.open_amount + row["open_amount"],
+                    open_count=InvoiceAgingBalance.open_count + row["open_count"],
+                )
+            )
+            if result.rowcount == 0:
+                db.execute(insert(InvoiceAgingBalance), [row])
+
+    @staticmethod
+    def _aggregate_invoices():
+        period = extract("year", Invoice.due_date) * 100 + extract("month", Invoice.due_date)
+        return (
+            select(
+                Invoice.contact_id,
+                Invoice.type,
+                period.label("period"),
+                func.coalesce(func.sum(Invoice.amount), 0),
+                func.count(),
+            )
+            .where(_is_open(), Invoice.contact_id.isnot(None))
+            .group_by(Invoice.contact_id, Invoice.type, period)
+        )
+
+    @staticmethod
+    def rebuild(db: Session) -> None:
+        """
+        Recompute every open total from the invoices in one statement.
+        """
+        db.execute(delete(InvoiceAgingBalance))
+        db.execute(
+            insert(InvoiceAgingBalance).from_select(
+                ["contact_id", "type", "period", "open_amount", "open_count"],
+                AgingService._aggregate_invoices(),
+            )
+        )
+        db.commit()
+
+    @staticmethod
+    def verify(db: Session) -> List[Dict]:
+        """
+        Compare the open totals against the invoices and return any mismatches.
+        """
+        expected = {
+            (contact_id, invoice_type, int(period)): (amount, count)
+            for contact_id, invoice_type, period, amount, count in db.execute(AgingService._aggregate_invoices())
+        }
+        actual = {
+            (row.contact_id, row.type, row.period): (row.open_amount, row.open_count)
+            for row in db.execute(select(InvoiceAgingBalance)).scalars()
+        }
+
+        mismatches = []
+        for key in sorted(expected.keys() | actual.keys()):
+            expected_amount, expected_count = expected.get(key, (ZERO, 0))
+            actual_amount, actual_count = actual.get(key, (ZERO, 0))
+            if expected_amount != actual_amount or expected_count != actual_count:
+                mismatches.append({
+                    "contact_id": key[0],
+                    "type": key[1],
+                    "period": key[2],
+                    "expected_amount": expected_amount,
+                    "actual_amount": actual_amount,
+                    "expected_count": expected_count,
+                    "actual_count": actual_count,
+                })
+        return mismatches
+
+    @staticmethod
+    def _cutoffs(as_of: date) -> List[datetime]:
+        """
+        Earliest due date of the 0-30, 31-60 and 61-90 buckets.
+        """
+        return [datetime.combine(as_of - timedelta(days=days), datetime.min.time()) for days in (30, 60, 90)]
+
+    @staticmethod
+    def _invoice_rows(invoice_type: str, cutoffs: List[datetime]):
+        """
+        Open invoices of a type as (contact_id, amount per bucket..., invoices) rows.
+        """
+        bounds = [(cutoffs[0], None), (cutoffs[1], cutoffs[0]), (cutoffs[2], cutoffs[1]), (None, cutoffs[2])]
+        amounts = []
+        for lower, upper in bounds:
+            conditions = []
+            if lower is not None:
+                conditions.append(Invoice.due_date >= lower)
+            if upper is not None:
+                conditions.append(Invoice.due_date < upper)
+            amounts.append(case((and_(*conditions), Invoice.amount), else_=0))
+        return select(Invoice.contact_id, *amounts, literal(1).label("invoices")).where(_is_open(), Invoice.type == invoice_type)
+
+    @staticmethod
+    def _report(db: Session, invoice_type: str, as_of: date, rows, contact_id: Optional[int] = None) -> Dict:
+        """
+        Group bucket rows per contact in one statement and shape the report.
+        """
+        rows = rows.subquery()
+        bucket_columns = list(rows.c)[1:1 + len(BUCKETS)]
+        grouped = (
+            select(rows.c.contact_id, *(func.sum(column) for column in bucket_columns), func.sum(rows.c.invoices).label("invoices"))
+            .where(rows.c.contact_id.isnot(None))
+            .group_by(rows.c.contact_id)
+        )
+        if contact_id is not None:
+            grouped = grouped.where(rows.c.contact_id == contact_id)
+        grouped = grouped.subquery()
+        query = (
+            select(Contact.name, *grouped.c)
+            .select_from(grouped)
+            .outerjoin(Contact, Contact.id == grouped.c.contact_id)
+            .where(grouped.c.invoices > 0)
+        )
+
+        contacts = []
+        totals = {bucket: ZERO for bucket in BUCKETS}
+        total_count = 0
+        for name, row_contact_id, *amounts, count in db.execute(query):
+            row = {"contact_id": row_contact_id, "contact_name": name}
+            for bucket, amount in zip(BUCKETS, amounts):
+                row[bucket] = amount
+                totals[bucket] += amount
+            row["total"] = sum(amounts, ZERO)
+            row["invoices"] = count
+            total_count += count
+            contacts.append(row)
+        contacts.sort(key=lambda row: (-row["total"], row["contact_id"]))
+        return {
+            "type": invoice_type,
+            "as_of": as_of,
+            "buckets": list(BUCKETS),
+            "contacts": contacts,
+            "totals": {**totals, "total": sum(totals.values(), ZERO), "invoices": total_count},
+        }
+
+    @staticmethod
+    def aging_from_invoices(db: Session, invoice_type: str = "Receivable", as_of: Optional[date] = None, contact_id: Optional[int] = None) -> Dict:
+        """
+        Aging computed from the open invoices alone, in one grouped pass.
+        """
+        as_of = as_of or date.today()
+        rows = AgingService._invoice_rows(invoice_type, AgingService._cutoffs(as_of))
+        if contact_id is not None:
+            rows = rows.where(Invoice.contact_id == contact_id)
+        return AgingService._report(db, invoice_type, as_of, rows, contact_id)
+
+    @staticmethod
+    def aging(db: Session, invoice_type: str = "Receivable", as_of: Optional[date] = None, contact_id: Optional[int] = None) -> Dict:
+        """
+        Aging per contact as of a date (default today).
+        Due months entirely inside the 0-30 or 90+ bucket come from the open totals;
+        only the months spanning the 30, 60 and 90 day boundaries read raw invoices.
+        """
+        as_of = as_of or date.today()
+        cutoffs = AgingService._cutoffs(as_of)
+        first, last = period_of(cutoffs[2]), period_of(cutoffs[0])
+        boundary_months = AgingService._invoice_rows(invoice_type, cutoffs).where(
+            Invoice.due_date >= _month_start(first), Invoice.due_date < _next_month_start(last)
+        )
+
+        recent = InvoiceAgingBalance.period > last
+        old = InvoiceAgingBalance.period < first
+        zero = literal(ZERO, Money)
+        whole_months = select(
+            InvoiceAgingBalance.contact_id,
+            case((recent, InvoiceAgingBalance.open_amount), else_=0),
+            zero,
+            zero,
+            case((old, InvoiceAgingBalance.open_amount), else_=0),
+            InvoiceAgingBalance.open_count,
+        ).where(InvoiceAgingBalance.type == invoice_type, or_(recent, old))
+
+        if contact_id is not None:
+            boundary_months = boundary_months.where(Invoice.contact_id == contact_id)
+            whole_months = whole_months.where(InvoiceAgingBalance.contact_id == contact_id)
+        return AgingService._report(db, invoice_type, as_of, union_all(boundary_months, whole_months), contact_id)
+
+@event.listens_for(Session, "before_flush")
+def _track_invoices(session, flush_context, instances):
+    # Keep the open totals in step with ORM invoice writes, in the same transaction
+    changes = AgingService.session_changes(session)
+    if changes:
+        AgingService.apply(session, changes)
+
+# Load the previous value on assignment so status changes on unloaded attributes are still seen
+for _name in TRACKED_ATTRIBUTES:
+    event.listen(getattr(Invoice, _name), "set", lambda target, value, oldvalue, initiator: value, active_history=True, retval=True)
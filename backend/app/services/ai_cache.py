@@ -0,0 +1,369 @@
+"""
+Persistent cache of model results for categorization and invoice extraction.
+
+Inputs are normalized and hashed, so a repeat of a known input is answered by
+an exact lookup. Categorization misses then go through a local similarity
+index (hashed character n-grams weighted by IDF, compared by cosine), which
+catches recurring vendors whose descriptions differ only in reference numbers
+or punctuation. Only inputs that miss both are sent to the model.
+
+The index is a scipy.sparse matrix holding only the n-grams each entry has,
+8 bytes per distinct n-gram: about 20 MB per kind and worker for 50,000
+bank-feed descriptions of 50 characters, where a dense layout took 200 MB.
+It is built in a worker thread and rebuilt every AI_CACHE_INDEX_REFRESH_SECONDS,
+or sooner once appends have doubled it; results stored in between are appended to
+it, weighted by the IDF it was built with.
+
+Entries expire after AI_CACHE_TTL_DAYS and each kind keeps at most
+AI_CACHE_MAX_ENTRIES, evicting the least recently used.
+"""
+from typing import Dict, List, Optional
+from collections import defaultdict
+from datetime import datetime, timedelta
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+import zlib
+
+import numpy as np
+import scipy.sparse as sparse
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.database import AsyncSessionLocal
+from app.models.models import AICacheEntry
+
+logger = logging.getLogger(__name__)
+
+AI_CACHE_ENABLED = os.getenv("AI_CACHE_ENABLED", "true").lower() == "true"
+# Similarity lookups for categorization; exact lookups always run while the cache is enabled
+AI_CACHE_SEMANTIC = os.getenv("AI_CACHE_SEMANTIC", "true").lower() == "true"
+# Minimum cosine similarity for a semantic hit
+AI_CACHE_SIMILARITY = float(os.getenv("AI_CACHE_SIMILARITY", "0.85"))
+AI_CACHE_TTL_DAYS = float(os.getenv("AI_CACHE_TTL_DAYS", "90"))
+# Entries kept per kind
+AI_CACHE_MAX_ENTRIES = int(os.getenv("AI_CACHE_MAX_ENTRIES", "50000"))
+# Seconds before the similarity index is reloaded to pick up other workers' entries
+AI_CACHE_INDEX_REFRESH_SECONDS = float(os.getenv("AI_CACHE_INDEX_REFRESH_SECONDS", "60"))
+
+# Cache kinds
+CATEGORIZATION = "categorization"  # Structured batch suggestions
+CATEGORIZATION_TEXT = "categorization_text"  # Free-text single suggestions
+INVOICE = "invoice"
+INVOICE_CHUNK = "invoice_chunk"  # Structured extraction of one chunk of a PDF
+
+# Kinds that may be answered by a similar earlier input; invoices must match exactly
+SEMANTIC_KINDS = {CATEGORIZATION, CATEGORIZATION_TEXT}
+
+DATE_WORDS = re.compile(
+    r"\b(jan(uary)?|feb(ruary)?|mar(ch)?|apr(il)?|may|jun(e)?|jul(y)?|aug(ust)?|sep(t|tember)?|oct(ober)?|nov(ember)?|dec(ember)?)\b"
+)
+
+VECTOR_DIMENSIONS = 1024
+NGRAM = 3
+# Keys per IN (...) clause
+CHUNK_SIZE = 500
+# Queries per similarity product, which is dense: entries x queries
+QUERY_CHUNK_SIZE = 64
+
+# Per-kind similarity index: entry keys and their rows, results, IDF weights, sparse unit vectors and load time
+_indexes: Dict[str, Dict] = {}
+# One rebuild per kind at a time; other lookups wait for it instead of building their own
+_index_locks: Dict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+_stats: Dict[str, Dict[str, int]] = defaultdict(lambda: {"exact_hits": 0, "semantic_hits": 0, "misses": 0, "stores": 0})
+
+def normalize(text: str, kind: str) -> str:
+    """
+    Canonical form of an input for hashing and similarity. Categorization text is
+    lowercased with digit runs, month names and punctuation folded, since reference
+    numbers and dates vary between otherwise identical transactions. Invoices only
+    have whitespace collapsed.
+    """
+    text = text or ""
+    if kind in SEMANTIC_KINDS:
+        text = DATE_WORDS.sub("#", re.sub(r"\d+", "#", text.lower()))
+        text = re.sub(r"[^\w#]+|_", " ", text)
+    return " ".join(text.split())
+
+def cache_key(normalized_text: str) -> str:
+    return hashlib.sha256(normalized_text.encode()).hexdigest()
+
+def vectorize(texts: List[str]) -> sparse.csr_matrix:
+    """
+    Hashed counts of character trigrams and whole words, one sparse row per text.
+    """
+    rows, columns = [], []
+    for row, text in enumerate(texts):
+        padded = f" {text} "
+        features = [padded[i:i + NGRAM] for i in range(len(padded) - NGRAM + 1)] + text.split()
+        rows.extend([row] * len(features))
+        columns.extend(zlib.crc32(feature.encode()) % VECTOR_DIMENSIONS for feature in features)
+    # Repeated (row, column) pairs are summed into counts by the conversion to CSR
+    return sparse.coo_matrix(
+        (np.ones(len(rows), dtype=np.float32), (np.array(rows, dtype=np.int32), np.array(columns, dtype=np.int32))),
+        shape=(len(texts), VECTOR_DIMENSIONS),
+    ).tocsr()
+
+def _unit_rows(matrix: sparse.csr_matrix) -> sparse.csr_matrix:
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    return (sparse.diags(1 / np.maximum(norms, 1e-12)) @ matrix).astype(np.float32).tocsr()
+
+def _build_index(rows: List) -> Dict:
+    counts = vectorize([row.normalized_text for row in rows])
+    # Every stored (entry, feature) pair is one entry containing the feature
+    document_frequency = np.bincount(counts.indices, minlength=VECTOR_DIMENSIONS)
+    idf = (np.log((1 + len(rows)) / (1 + document_frequency)) + 1).astype(np.float32)
+    return {
+        "keys": [row.key for row in rows],
+        "positions": {row.key: position for position, row in enumerate(rows)},
+        "results": [row.result for row in rows],
+        "idf": sparse.diags(idf),
+        "vectors": _unit_rows(counts @ sparse.diags(idf)),
+        "built_entries": len(rows),
+        "loaded_at": time.monotonic(),
+    }
+
+def _append_index(kind: str, rows: List[Dict]) -> None:
+    """
+    Add stored rows to the kind's index, if one is loaded, until its next rebuild.
+    Rows for keys it already holds replace their results in place.
+    """
+    index = _indexes.get(kind)
+    if index is None:
+        return
+    added = []
+    for row in rows:
+        position = index["positions"].get(row["key"])
+        if position is None:
+            added.append(row)
+        else:
+            index["results"][position] = row["result"]
+    if not added:
+        return
+    vectors = _unit_rows(vectorize([row["normalized_text"] for row in added]) @ index["idf"])
+    for row in added:
+        index["positions"][row["key"]] = len(index["keys"])
+        index["keys"].append(row["key"])
+        index["results"].append(row["result"])
+    index["vectors"] = sparse.vstack([index["vectors"], vectors], format="csr")
+
+class AICache:
+    @staticmethod
+    def _cutoff() -> datetime:
+        return datetime.utcnow() - timedelta(days=AI_CACHE_TTL_DAYS)
+
+    @staticmethod
+    async def _load_index(db, kind: str) -> Dict:
+        """
+        Return the similarity index for kind, rebuilding it in a worker thread when stale.
+        """
+        def fresh(index: Optional[Dict]) -> bool:
+            # Doubling before a rebuild keeps rebuilds to a few while the cache fills and its IDF settles
+            return (
+                index is not None
+                and time.monotonic() - index["loaded_at"] < AI_CACHE_INDEX_REFRESH_SECONDS
+                and len(index["keys"]) <= 2 * index["built_entries"]
+            )
+
+        if fresh(_indexes.get(kind)):
+            return _indexes[kind]
+        async with _index_locks[kind]:
+            if fresh(_indexes.get(kind)):
+                return _indexes[kind]
+            rows = (await db.execute(
+                select(AICacheEntry.key, AICacheEntry.normalized_text, AICacheEntry.result)
+                .where(AICacheEntry.kind == kind, AICacheEntry.created_at >= AICache._cutoff())
+            )).all()
+            index = await asyncio.to_thread(_build_index, rows)
+            _indexes[kind] = index
+            return index
+
+    @staticmethod
+    async def lookup_many(kind: str, texts: List[str]) -> List[Optional[Dict]]:
+        """
+        Cached results for texts, in order, with None for misses. A hit is a dict with
+        result, cache ("exact" or "semantic") and similarity.
+        """
+        found: List[Optional[Dict]] = [None] * len(texts)
+        if not AI_CACHE_ENABLED or not texts:
+            return found
+
+        normalized = [normalize(text, kind) for text in texts]
+        keys = [cache_key(text) for text in normalized]
+        used_keys = set()
+        try:
+            async with AsyncSessionLocal() as db:
+                exact = {}
+                unique_keys = list(set(keys))
+                for start in range(0, len(unique_keys), CHUNK_SIZE):
+                    rows = await db.execute(
+                        select(AICacheEntry.key, AICacheEntry.result).where(
+                            AICacheEntry.kind == kind,
+                            AICacheEntry.key.in_(unique_keys[start:start + CHUNK_SIZE]),
+                            AICacheEntry.created_at >= AICache._cutoff(),
+                        )
+                    )
+                    exact.update((row.key, row) for row in rows)
+                for position, key in enumerate(keys):
+                    row = exact.get(key)
+                    if row is not None:
+                        found[position] = {"result": json.loads(row.result), "cache": "exact", "similarity": 1.0}
+                        used_keys.add(key)
+
+                misses = [position for position, hit in enumerate(found) if hit is None]
+                if misses and AI_CACHE_SEMANTIC and kind in SEMANTIC_KINDS:
+                    index = await AICache._load_index(db, kind)
+                    if index["keys"]:
+                        for start in range(0, len(misses), QUERY_CHUNK_SIZE):
+                            chunk = misses[start:start + QUERY_CHUNK_SIZE]
+                            queries = _unit_rows(vectorize([normalized[position] for position in chunk]) @ index["idf"])
+                            # Sparse entries times dense queries: one column of similarities per query
+                            similarities = index["vectors"] @ queries.toarray().T
+                            best = similarities.argmax(axis=0)
+                            scores = similarities[best, np.arange(len(chunk))]
+                            for position, match, score in zip(chunk, best, scores):
+                                if score >= AI_CACHE_SIMILARITY:
+                                    found[position] = {
+                                        "result": json.loads(index["results"][match]),
+                                        "cache": "semantic",
+                                        "similarity": round(float(score), 4),
+                                    }
+                                    used_keys.add(index["keys"][match])
+
+                if used_keys:
+                    used = sorted(used_keys)
+                    for start in range(0, len(used), CHUNK_SIZE):
+                        await db.execute(
+                            update(AICacheEntry)
+                            .where(AICacheEntry.kind == kind, AICacheEntry.key.in_(used[start:start + CHUNK_SIZE]))
+                            .values(hits=AICacheEntry.hits + 1, last_used_at=datetime.utcnow())
+                        )
+                    await db.commit()
+        except SQLAlchemyError as e:
+            # The cache is an optimization; fall through to the model if it is unavailable
+            logger.warning("AI cache lookup failed: %s", e)
+
+        stats = _stats[kind]
+        for hit in found:
+            if hit is None:
+                stats["misses"] += 1
+            else:
+                stats[f"{hit['cache']}_hits"] += 1
+        return found
+
+    @staticmethod
+    async def lookup(kind: str, text: str) -> Optional[Dict]:
+        return (await AICache.lookup_many(kind, [text]))[0]
+
+    @staticmethod
+    async def store_many(kind: str, texts: List[str], results: List) -> None:
+        """
+        Save model results for texts, replacing any existing entry for the same normalized input,
+        then drop expired entries and evict the least recently used beyond AI_CACHE_MAX_ENTRIES.
+        """
+        if not AI_CACHE_ENABLED or not texts:
+            return
+
+        now = datetime.utcnow()
+        rows = {}
+        for text, result in zip(texts, results):
+            normalized = normalize(text, kind)
+            rows[cache_key(normalized)] = {
+                "kind": kind,
+                "key": cache_key(normalized),
+                "normalized_text": normalized,
+                "result": json.dumps(result),
+                "hits": 0,
+                "created_at": now,
+                "last_used_at": now,
+            }
+        try:
+            async with AsyncSessionLocal() as db:
+                dialect = db.get_bind().dialect.name
+                if dialect in ("postgresql", "sqlite"):
+                    dialect_insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+                    stmt = dialect_insert(AICacheEntry)
+                    stmt = stmt.on_conflict_do_update(
+                        index_elements=[AICacheEntry.kind, AICacheEntry.key],
+                        set_={
+                            "result": stmt.excluded.result,
+                            "created_at": stmt.excluded.created_at,
+                            "last_used_at": stmt.excluded.last_used_at,
+                        },
+                    )
+                    await db.execute(stmt, list(rows.values()))
+                else:
+                    await db.execute(
+                        delete(AICacheEntry).where(AICacheEntry.kind == kind, AICacheEntry.key.in_(list(rows)))
+                    )
+                    await db.execute(AICacheEntry.__table__.insert(), list(rows.values()))
+
+                await db.execute(
+                    delete(AICacheEntry).where(AICacheEntry.kind == kind, AICacheEntry.created_at < AICache._cutoff())
+                )
+                count = await db.scalar(select(func.count(AICacheEntry.id)).where(AICacheEntry.kind == kind))
+                if count > AI_CACHE_MAX_ENTRIES:
+                    keep_after = await db.scalar(
+                        select(AICacheEntry.last_used_at)
+                        .where(AICacheEntry.kind == kind)
+                        .order_by(AICacheEntry.last_used_at.desc(), AICacheEntry.id.desc())
+                        .offset(AI_CACHE_MAX_ENTRIES - 1)
+                        .limit(1)
+                    )
+                    await db.execute(
+                        delete(AICacheEntry).where(AICacheEntry.kind == kind, AICacheEntry.last_used_at < keep_after)
+                    )
+                await db.commit()
+        except SQLAlchemyError as e:
+            logger.warning("AI cache store failed: %s", e)
+            return
+
+        _stats[kind]["stores"] += len(rows)
+        if kind in SEMANTIC_KINDS:
+            _append_index(kind, list(rows.values()))
+
+    @staticmethod
+    async def clear(kind: Optional[str] = None) -> int:
+        """
+        Delete cached results of one kind, or all of them. Returns the number of entries removed.
+        """
+        stmt = delete(AICacheEntry)
+        if kind is not None:
+            stmt = stmt.where(AICacheEntry.kind == kind)
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(stmt)
+            await db.commit()
+        if kind is None:
+            _indexes.clear()
+        else:
+            _indexes.pop(kind, None)
+        return result.rowcount
+
+    @staticmethod
+    def stats() -> Dict:
+        """
+        Hit and miss counters per kind since this process started.
+        """
+        kinds = {}
+        for kind, counters in sorted(_stats.items()):
+            lookups = counters["exact_hits"] + counters["semantic_hits"] + counters["misses"]
+            hits = counters["exact_hits"] + counters["semantic_hits"]
+            kinds[kind] = {
+                **counters,
+                "lookups": lookups,
+                "hit_rate": round(hits / lookups, 4) if lookups else None,
+                "indexed_entries": len(_indexes[kind]["keys"]) if kind in _indexes else None,
+            }
+        return {
+            "enabled": AI_CACHE_ENABLED,
+            "semantic": AI_CACHE_SEMANTIC,
+            "similarity_threshold": AI_CACHE_SIMILARITY,
+            "ttl_days": AI_CACHE_TTL_DAYS,
+            "max_entries": AI_CACHE_MAX_ENTRIES,
+            "kinds": kinds,
+        }
@@ -0,0 +1,94 @@
+from typing import AsyncIterator, Dict, List, Optional
+from abc import ABC, abstractmethod
+from dotenv import load_dotenv
+import os
+
+from app import metrics
+
+# Load environment variables
+load_dotenv()
+
+OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4")
+# Point at any OpenAI-compatible server, e.g. a local fake model server for testing
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL")
+OPENAI_TIMEOUT_SECONDS = float(os.getenv("OPENAI_TIMEOUT_SECONDS", "60"))
+
+def _retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Seconds from a Retry-After header; HTTP-date values are ignored in favour of backoff.
+    """
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+class RetryableError(Exception):
+    """
+    A chat call failed in a way worth retrying (rate limit, timeout, server error).
+    retry_after carries the server's requested delay in seconds when it sent one.
+    """
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class ChatClient(ABC):
+    """
+    Minimal chat completion interface used by AIService. Subclass it to plug in
+    another provider or a fake for tests.
+    """
+    @abstractmethod
+    async def complete(self, messages: List[Dict[str, str]], json_output: bool = False) -> str:
+        """
+        Return the whole reply. Raise RetryableError for failures worth retrying.
+        """
+
+    async def stream(self, messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+        """
+        Yield the reply in pieces as the model produces them. Clients that cannot
+        stream yield the whole completion once.
+        """
+        yield await self.complete(messages)
+
+class OpenAIChatClient(ChatClient):
+    """
+    Chat client for the OpenAI API or any server implementing /v1/chat/completions.
+    Retries are left to the caller so backoff is applied in one place.
+    """
+    def __init__(self, api_key: Optional[str] = None, base_url: Optional[str] = OPENAI_BASE_URL, model: str = OPENAI_MODEL):
+        import openai
+
+        self.openai = openai
+        self.model = model
+        self.client = openai.AsyncOpenAI(
+            api_key=api_key or os.getenv("OPENAI_API_KEY"),
+            base_url=base_url,
+            timeout=OPENAI_TIMEOUT_SECONDS,
+            max_retries=0,
+        )
+
+    async def complete(self, messages: List[Dict[str, str]], json_output: bool = False) -> str:
+        options = {"response_format": {"type": "json_object"}} if json_output else {}
+        try:
+            response = await self.client.chat.completions.create(model=self.model, messages=messages, **options)
+        except (self.openai.RateLimitError, self.openai.InternalServerError) as e:
+            raise RetryableError(str(e), _retry_after(e.response.headers.get("retry-after"))) from e
+        except (self.openai.APITimeoutError, self.openai.APIConnectionError) as e:
+            raise RetryableError(str(e)) from e
+        if response.usage is not None:
+            metrics.record_ai_tokens(self.model, response.usage.prompt_tokens, response.usage.completion_tokens)
+        return response.choices[0].message.content
+
+    async def stream(self, messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+        try:
+            response = await self.client.chat.completions.create(model=self.model, messages=messages, stream=True)
+            async for chunk in response:
+                # Servers that report usage on a stream send it with the last chunk
+                usage = getattr(chunk, "usage", None)
+                if usage is not None:
+                    metrics.record_ai_tokens(self.model, usage.prompt_tokens, usage.completion_tokens)
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        except (self.openai.RateLimitError, self.openai.InternalServerError) as e:
+            raise RetryableError(str(e), _retry_after(e.response.headers.get("retry-after"))) from e
+        except (self.openai.APITimeoutError, self.openai.APIConnectionError) as e:
+            raise RetryableError(str(e)) from e
@@ -1,15 +1,124 @@
-from typing import Dict, List, Optional
-import openai
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple, Union
 from dotenv import load_dotenv
+import asyncio
+import json
 import os
+import random
+import time
+
+from app import metrics
+from app.services.ai_cache import CATEGORIZATION, CATEGORIZATION_TEXT, INVOICE, AICache, cache_key, normalize
+from app.services.ai_client import ChatClient, OpenAIChatClient, RetryableError
+from app.services.categorizer_service import CategorizerService
 
 # Load environment variables
 load_dotenv()
 
-# Configure OpenAI
-openai.api_key = os.getenv("OPENAI_API_KEY")
+# Transactions packed into one categorization prompt
+AI_BATCH_SIZE = int(os.getenv("AI_BATCH_SIZE", "50"))
+# Model calls in flight at once for batch operations
+AI_MAX_CONCURRENCY = int(os.getenv("AI_MAX_CONCURRENCY", "4"))
+# Retries after a rate limit, timeout or server error
+AI_MAX_RETRIES = int(os.getenv("AI_MAX_RETRIES", "5"))
+# Earlier chat turns sent back to the model with each question
+AI_CHAT_HISTORY_MESSAGES = int(os.getenv("AI_CHAT_HISTORY_MESSAGES", "10"))
+BACKOFF_BASE_SECONDS = 0.5
+BACKOFF_MAX_SECONDS = 30.0
 
 class AIService:
+    client: Optional[ChatClient] = None
+
+    @staticmethod
+    def configure(client: ChatClient) -> None:
+        """
+        Use the given chat client for all model calls (e.g. a fake model server in tests).
+        """
+        AIService.client = client
+
+    @staticmethod
+    def get_client() -> ChatClient:
+        if AIService.client is None:
+            AIService.client = OpenAIChatClient()
+        return AIService.client
+
+    @staticmethod
+    def backoff_delay(attempt: int, retry_after: Optional[float] = None) -> float:
+        """
+        Seconds to wait before retry number attempt: exponential backoff with jitter,
+        never shorter than the server's Retry-After.
+        """
+        delay = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** (attempt - 1)) * random.uniform(0.5, 1.0)
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, BACKOFF_MAX_SECONDS))
+        return delay
+
+    @staticmethod
+    async def chat(messages: List[Dict[str, str]], json_output: bool = False) -> Tuple[str, int]:
+        """
+        Run one chat completion, retrying retryable failures. Returns the reply and the number of attempts.
+        """
+        client = AIService.get_client()
+        for attempt in range(1, AI_MAX_RETRIES + 2):
+            start = time.perf_counter()
+            try:
+                reply = await client.complete(messages, json_output=json_output)
+            except RetryableError as e:
+                metrics.record_ai_call(time.perf_counter() - start, "retryable_error")
+                if attempt > AI_MAX_RETRIES:
+                    raise
+                await asyncio.sleep(AIService.backoff_delay(attempt, e.retry_after))
+            except Exception:
+                metrics.record_ai_call(time.perf_counter() - start, "error")
+                raise
+            else:
+                metrics.record_ai_call(time.perf_counter() - start, "ok")
+                return reply, attempt
+
+    @staticmethod
+    async def chat_stream(messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+        """
+        Stream one chat completion piece by piece. Failures before the first piece are
+        retried like chat(); once text has been yielded they propagate.
+        """
+        client = AIService.get_client()
+        for attempt in range(1, AI_MAX_RETRIES + 2):
+            start = time.perf_counter()
+            started = False
+            try:
+                async for piece in client.stream(messages):
+                    if not started:
+                        started = True
+                        metrics.record_ai_first_token(time.perf_counter() - start)
+                    yield piece
+            except RetryableError as e:
+                metrics.record_ai_call(time.perf_counter() - start, "retryable_error")
+                if started or attempt > AI_MAX_RETRIES:
+                    raise
+                await asyncio.sleep(AIService.backoff_delay(attempt, e.retry_after))
+            except Exception:
+                metrics.record_ai_call(time.perf_counter() - start, "error")
+                raise
+            else:
+                metrics.record_ai_call(time.perf_counter() - start, "ok")
+                return
+
+    @staticmethod
+    def chat_messages(context: str, message: str, history: Optional[List[Dict[str, str]]] = None) -> List[Dict[str, str]]:
+        """
+        Messages for an assistant answer: the ledger summary as context, the last
+        AI_CHAT_HISTORY_MESSAGES turns of the conversation and the new question.
+        """
+        history = (history or [])[-AI_CHAT_HISTORY_MESSAGES:] if AI_CHAT_HISTORY_MESSAGES > 0 else []
+        return [
+            {
+                "role": "system",
+                "content": "You are an accounting assistant for a small business. Answer from the ledger summary below; "
+                           "say so when it does not hold the figures a question needs.\n\n" + context,
+            },
+            *({"role": turn["role"], "content": turn["content"]} for turn in history),
+            {"role": "user", "content": message},
+        ]
+
     @staticmethod
     async def analyze_financial_health(financial_data: Dict) -> Dict:
         """
@@ -31,16 +140,13 @@ class AIService:
             4. Potential risks
             """
 
-            response = await openai.ChatCompletion.acreate(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": "You are a skilled financial analyst."},
-                    {"role": "user", "content": prompt}
-                ]
-            )
+            content, _ = await AIService.chat([
+                {"role": "system", "content": "You are a skilled financial analyst."},
+                {"role": "user", "content": prompt}
+            ])
 
             return {
-                "analysis": response.choices[0].message.content,
+                "analysis": content,
                 "status": "success"
             }
         except Exception as e:
@@ -56,6 +162,10 @@ class AIService:
         Extract information from invoice text using OpenAI's GPT model.
         """
         try:
+            cached = await AICache.lookup(INVOICE, invoice_text)
+            if cached:
+                return {**cached["result"], "status": "success", "cache": cached["cache"]}
+
             prompt = f"""
             Extract the following information from this invoice:
             1. Invoice number
@@ -70,16 +180,14 @@ class AIService:
             Return the information in a structured format.
             """
 
-            response = await openai.ChatCompletion.acreate(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": "You are an expert at processing invoices."},
-                    {"role": "user", "content": prompt}
-                ]
-            )
+            content, _ = await AIService.chat([
+                {"role": "system", "content": "You are an expert at processing invoices."},
+                {"role": "user", "content": prompt}
+            ])
+            await AICache.store_many(INVOICE, [invoice_text], [{"extracted_data": content}])
 
             return {
-                "extracted_data": response.choices[0].message.content,
+                "extracted_data": content,
                 "status": "success"
             }
         except Exception as e:
@@ -95,6 +203,19 @@ class AIService:
         Suggest account categorization for a transaction using OpenAI's GPT model.
         """
         try:
+            local = CategorizerService.suggest([transaction_description])[0]
+            if local:
+                return {
+                    "suggestion": AIService._format_local_suggestion(local),
+                    "status": "success",
+                    "source": "local",
+                    "probability": local["probability"],
+                }
+
+            cached = await AICache.lookup(CATEGORIZATION_TEXT, transaction_description)
+            if cached:
+                return {**cached["result"], "status": "success", "cache": cached["cache"], "similarity": cached["similarity"]}
+
             prompt = f"""
             Suggest the appropriate accounting categorization for this transaction:
             Transaction: {transaction_description}
@@ -105,16 +226,14 @@ class AIService:
             3. Confidence level (High, Medium, Low)
             """
 
-            response = await openai.ChatCompletion.acreate(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": "You are an expert accountant."},
-                    {"role": "user", "content": prompt}
-                ]
-            )
+            content, _ = await AIService.chat([
+                {"role": "system", "content": "You are an expert accountant."},
+                {"role": "user", "content": prompt}
+            ])
+            await AICache.store_many(CATEGORIZATION_TEXT, [transaction_description], [{"suggestion": content}])
 
             return {
-                "suggestion": response.choices[0].message.content,
+                "suggestion": content,
                 "status": "success"
             }
         except Exception as e:
@@ -125,38 +244,224 @@ class AIService:
             }
 
     @staticmethod
-    async def generate_financial_insights(transactions: List[Dict]) -> Dict:
+    def _confidence_level(probability: float) -> str:
+        return "High" if probability >= 0.95 else "Medium" if probability >= 0.75 else "Low"
+
+    @staticmethod
+    def _format_local_suggestion(prediction: Dict) -> str:
         """
-        Generate insights from transaction history using OpenAI's GPT model.
+        Render a local prediction in the same shape as the model's free-text answer.
         """
-        try:
-            # Format transactions for the prompt
-            transactions_text = "\n".join([
-                f"- {t['date']}: {t['description']} (${t['amount']:,.2f})"
-                for t in transactions
-            ])
+        return (
+            f"1. Account category: {prediction['category']}\n"
+            f"2. Specific account: {prediction['account']}\n"
+            f"3. Confidence level: {AIService._confidence_level(prediction['probability'])} ({prediction['probability']:.0%})"
+        )
 
+    @staticmethod
+    def _categorization_prompt(batch: List[Tuple[int, Dict]], accounts: Optional[List[str]] = None) -> str:
+        transactions = json.dumps([
+            {"id": item_id, "description": transaction.get("description"), "amount": transaction.get("amount")}
+            for item_id, transaction in batch
+        ])
+        account_hint = f"Choose accounts from this chart of accounts where possible: {json.dumps(accounts)}" if accounts else ""
+        return f"""
+            Suggest the appropriate accounting categorization for each transaction below.
+            {account_hint}
+
+            Transactions (JSON):
+            {transactions}
+
+            Reply with a JSON object of the form
+            {{"results": [{{"id": <transaction id>, "category": "Revenue|Expense|Asset|Liability|Equity", "account": "<account name>", "confidence": "High|Medium|Low"}}]}}
+            containing exactly one result for every transaction id.
+            """
+
+    @staticmethod
+    def _parse_categorizations(content: str) -> Dict[int, Dict]:
+        """
+        Map transaction id to suggestion from a structured batch reply. Raises ValueError if it is not valid JSON.
+        """
+        text = content.strip()
+        if text.startswith("```"):
+            text = text.strip("`").split("\n", 1)[-1]
+        data = json.loads(text)
+        results = data.get("results", []) if isinstance(data, dict) else data
+        return {
+            int(result["id"]): {
+                "category": result.get("category"),
+                "account": result.get("account"),
+                "confidence": result.get("confidence"),
+                "status": "success",
+            }
+            for result in results
+            if isinstance(result, dict) and "id" in result
+        }
+
+    @staticmethod
+    async def suggest_categorizations(
+        transactions: List[Union[str, Dict]],
+        accounts: Optional[List[str]] = None,
+        batch_size: int = AI_BATCH_SIZE,
+        concurrency: int = AI_MAX_CONCURRENCY,
+        progress: Optional[Callable[[int, int], Awaitable[None]]] = None,
+    ) -> Dict:
+        """
+        Categorize many transactions (descriptions or dicts with description and amount), packing
+        batch_size of them into each prompt and running at most concurrency prompts at once.
+        Suggestions are returned in input order, with latency and attempts per batch.
+        progress, if given, is awaited with the batches finished and the batch count.
+
+        Confident local predictions and cached results answer what they can; the rest are
+        sent to the model once per distinct normalized description, and successful answers are cached.
+        """
+        start = time.perf_counter()
+        items = [transaction if isinstance(transaction, dict) else {"description": transaction} for transaction in transactions]
+        descriptions = [item.get("description") or "" for item in items]
+        suggestions: List[Optional[Dict]] = [None] * len(items)
+        for item_id, local in enumerate(CategorizerService.suggest(descriptions)):
+            if local:
+                suggestions[item_id] = {
+                    "description": items[item_id].get("description"),
+                    "category": local["category"],
+                    "account": local["account"],
+                    "confidence": AIService._confidence_level(local["probability"]),
+                    "status": "success",
+                    "source": "local",
+                    "probability": local["probability"],
+                }
+        escalated = [item_id for item_id, suggestion in enumerate(suggestions) if suggestion is None]
+
+        groups: Dict[str, List[int]] = {}
+        cached = await AICache.lookup_many(CATEGORIZATION, [descriptions[item_id] for item_id in escalated])
+        for item_id, hit in zip(escalated, cached):
+            if hit:
+                suggestions[item_id] = {
+                    "description": items[item_id].get("description"),
+                    **hit["result"],
+                    "status": "success",
+                    "cache": hit["cache"],
+                    "similarity": hit["similarity"],
+                }
+            else:
+                groups.setdefault(cache_key(normalize(descriptions[item_id], CATEGORIZATION)), []).append(item_id)
+
+        indexed = [(item_ids[0], items[item_ids[0]]) for item_ids in groups.values()]
+        batches = [indexed[offset:offset + batch_size] for offset in range(0, len(indexed), batch_size)]
+        batch_metrics: List[Optional[Dict]] = [None] * len(batches)
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def run(index: int, batch: List[Tuple[int, Dict]]) -> None:
+            async with semaphore:
+                start = time.perf_counter()
+                attempts, error, results = 0, None, {}
+                try:
+                    content, attempts = await AIService.chat([
+                        {"role": "system", "content": "You are an expert accountant. Reply with JSON only."},
+                        {"role": "user", "content": AIService._categorization_prompt(batch, accounts)}
+                    ], json_output=True)
+                    results = AIService._parse_categorizations(content)
+                except RetryableError as e:
+                    attempts, error = AI_MAX_RETRIES + 1, str(e)
+                except Exception as e:
+                    error = str(e)
+                latency = time.perf_counter() - start
+
+            for item_id, transaction in batch:
+                suggestion = results.get(item_id) or {"status": "error", "error": error or "Missing from model response"}
+                suggestions[item_id] = {"description": transaction.get("description"), **suggestion}
+            batch_metrics[index] = {
+                "batch": index,
+                "size": len(batch),
+                "latency_ms": round(latency * 1000, 1),
+                "attempts": attempts,
+                "status": "error" if error else "success",
+            }
+            if progress is not None:
+                await progress(sum(1 for metric in batch_metrics if metric is not None), len(batches))
+
+        await asyncio.gather(*(run(index, batch) for index, batch in enumerate(batches)))
+
+        fresh = [item_ids[0] for item_ids in groups.values() if suggestions[item_ids[0]]["status"] == "success"]
+        await AICache.store_many(
+            CATEGORIZATION,
+            [descriptions[item_id] for item_id in fresh],
+            [{field: suggestions[item_id][field] for field in ("category", "account", "confidence")} for item_id in fresh],
+        )
+        for item_ids in groups.values():
+            for item_id in item_ids[1:]:
+                suggestions[item_id] = {**suggestions[item_ids[0]], "description": items[item_id].get("description")}
+        elapsed = time.perf_counter() - start
+
+        failed = sum(1 for suggestion in suggestions if suggestion["status"] != "success")
+        cache_hits = [suggestion.get("cache") for suggestion in suggestions]
+        return {
+            "suggestions": suggestions,
+            "status": "success" if not failed else ("error" if failed == len(items) else "partial"),
+            "failed": failed,
+            "local": len(items) - len(escalated),
+            "cache": {
+                "exact": cache_hits.count("exact"),
+                "semantic": cache_hits.count("semantic"),
+                "model_items": len(indexed),
+            },
+            "batches": batch_metrics,
+            "throughput": {
+                "items": len(items),
+                "elapsed_ms": round(elapsed * 1000, 1),
+                "items_per_second": round(len(items) / elapsed, 1) if elapsed > 0 else None,
+            },
+        }
+
+    @staticmethod
+    async def process_invoices(invoice_texts: List[str], concurrency: int = AI_MAX_CONCURRENCY) -> Dict:
+        """
+        Extract several invoices, one prompt each, with at most concurrency calls in flight.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def run(invoice_text: str) -> Dict:
+            async with semaphore:
+                start = time.perf_counter()
+                result = await AIService.process_invoice(invoice_text)
+                return {**result, "latency_ms": round((time.perf_counter() - start) * 1000, 1)}
+
+        start = time.perf_counter()
+        results = await asyncio.gather(*(run(invoice_text) for invoice_text in invoice_texts))
+        elapsed = time.perf_counter() - start
+        return {
+            "invoices": results,
+            "throughput": {
+                "items": len(results),
+                "elapsed_ms": round(elapsed * 1000, 1),
+                "items_per_second": round(len(results) / elapsed, 1) if elapsed > 0 else None,
+            },
+        }
+
+    @staticmethod
+    async def generate_financial_insights(context: str) -> Dict:
+        """
+        Generate insights from a ledger summary (SummaryService.context) using OpenAI's GPT model.
+        """
+        try:
             prompt = f"""
-            Analyze these transactions and provide insights:
-            {transactions_text}
+            Analyze this ledger summary and provide insights:
+            {context}
 
             Please provide:
             1. Spending patterns
-            2. Unusual transactions
+            2. Unusual months and flagged postings
             3. Cost-saving opportunities
             4. Cash flow predictions
             """
 
-            response = await openai.ChatCompletion.acreate(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": "You are a financial advisor specializing in business analytics."},
-                    {"role": "user", "content": prompt}
-                ]
-            )
+            content, _ = await AIService.chat([
+                {"role": "system", "content": "You are a financial advisor specializing in business analytics."},
+                {"role": "user", "content": prompt}
+            ])
 
             return {
-                "insights": response.choices[0].message.content,
+                "insights": content,
                 "status": "success"
             }
         except Exception as e:
@@ -0,0 +1,531 @@
+"""
+Local anomaly and duplicate detection over journal items and invoices.
+
+Each journal item is checked four ways, vectorized over all items at once:
+
+- outlier: it is far larger than the account's usual posting, both by robust
+  z-score (median and MAD of log amounts) and beyond Tukey's upper IQR fence.
+  Small postings are left alone: they are common and rarely worth a review;
+- duplicate: an earlier item on the same account has the same signed amount
+  and entry description within ANOMALY_DUPLICATE_DAYS;
+- round: a whole multiple of ANOMALY_ROUND_UNIT of at least ANOMALY_ROUND_MIN;
+- weekend: dated on a Saturday or Sunday.
+
+An invoice is a duplicate when an earlier one has the same contact, type and
+amount with a due date within the window. Round amounts and weekend dates are
+weak signals that only count together or alongside a strong one. Items scoring
+ANOMALY_MIN_SCORE or more are stored in ledger_anomalies: the shortlist that
+GET /anomalies and the AI ledger summary read, instead of the raw postings.
+
+A scan reads only rows added or edited since the previous one, plus the
+postings near them needed to spot duplicates. Account statistics are kept in
+account_amount_stats and recomputed once an account has grown by
+ANOMALY_STATS_REFRESH, so new postings are scored without reading history.
+
+Scans run on their own: the API scans at startup and then checks every
+ANOMALY_SCAN_INTERVAL_SECONDS whether the ledger or invoice cache versions moved
+since its last scan, in a worker thread. GET /anomalies and the AI context only
+read the stored findings, so a new posting shows up within one interval.
+"""
+from typing import Dict, List, Optional, Tuple
+from datetime import datetime, timedelta
+from decimal import Decimal
+import asyncio
+import logging
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import BigInteger, delete, exists, func, insert, or_, select, type_coerce, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.cache import INVOICES, LEDGER, response_cache
+from app.database import SessionLocal
+from app.models.models import (
+    Account, AccountAmountStats, AnomalyScan, Contact, Invoice, JournalEntry, JournalItem, LedgerAnomaly,
+)
+from app.models.money import from_cents, to_cents
+
+# Robust z-score (distance from the account's median in MADs) from which a posting is an outlier
+ANOMALY_Z = float(os.getenv("ANOMALY_Z", "3.5"))
+# Days within which a repeated amount counts as a duplicate
+ANOMALY_DUPLICATE_DAYS = int(os.getenv("ANOMALY_DUPLICATE_DAYS", "3"))
+# Round amounts are whole multiples of the unit, from the minimum up
+ANOMALY_ROUND_UNIT = Decimal(os.getenv("ANOMALY_ROUND_UNIT", "100"))
+ANOMALY_ROUND_MIN = Decimal(os.getenv("ANOMALY_ROUND_MIN", "1000"))
+# Postings an account needs before its outliers are scored
+ANOMALY_MIN_ITEMS = int(os.getenv("ANOMALY_MIN_ITEMS", "30"))
+# Growth since an account's statistics were computed that triggers a refresh
+ANOMALY_STATS_REFRESH = float(os.getenv("ANOMALY_STATS_REFRESH", "0.1"))
+# How often the API looks for new postings to scan; 0 leaves scans to POST /anomalies/scan and the CLI
+ANOMALY_SCAN_INTERVAL_SECONDS = float(os.getenv("ANOMALY_SCAN_INTERVAL_SECONDS", "10"))
+
+# Tukey's fence: this many interquartile ranges above the upper quartile
+IQR_FENCE = 1.5
+# Smallest MAD used, in log10 units (about 12%), so accounts with fixed amounts do not flag every change
+MIN_MAD = 0.05
+# Scores per reason; outliers score their z-score and a finding needs ANOMALY_MIN_SCORE
+DUPLICATE_SCORE = 10.0
+WEAK_SCORE = 1.0
+ANOMALY_MIN_SCORE = 2.0
+# Ids per IN list
+ID_CHUNK_SIZE = 500
+
+ITEM_COLUMNS = ["id", "entry_id", "account_id", "day", "cents"]
+INVOICE_COLUMNS = ["id", "contact_id", "type", "day", "cents"]
+STATS_COLUMNS = ["sample_count", "median", "mad", "q1", "q3"]
+EPOCH = datetime(1970, 1, 1)
+
+logger = logging.getLogger(__name__)
+
+# One scan at a time per process, and the ledger and invoice versions the last one started from
+_scan_lock = threading.RLock()
+_scanned_versions: Optional[Tuple[int, int]] = None
+
+def _cents(expression):
+    return type_coerce(func.coalesce(expression, 0), BigInteger)
+
+def _days(values) -> np.ndarray:
+    # Days since EPOCH, a Thursday
+    return np.fromiter((value.toordinal() for value in values), np.int64, len(values)) - EPOCH.toordinal()
+
+def _chunks(ids) -> List[List[int]]:
+    ids = [int(i) for i in ids]
+    return [ids[start:start + ID_CHUNK_SIZE] for start in range(0, len(ids), ID_CHUNK_SIZE)]
+
+def _normalize(text: Optional[str]) -> str:
+    return " ".join((text or "").casefold().split())
+
+def repeats(keys: np.ndarray, days: np.ndarray, ids: np.ndarray, window: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Positions (later, earlier) of every pair of rows with the same key hash at most window days
+    apart, the later one after the earlier in (key, day, id) order. Rows are sorted once and
+    compared with the row one place back, then two places back and so on while any row still
+    has a match that far back, so a row in between with another description hides nothing.
+    Pairs come nearest first.
+    """
+    order = np.lexsort((ids, days, keys))
+    keys, days = keys[order], days[order]
+    later, earlier = [np.array([], dtype=np.intp)], [np.array([], dtype=np.intp)]
+    rows, lag = np.arange(1, len(order)), 1
+    while rows.size:
+        # A row that matches lag places back also matches every nearer row, so the candidates only shrink
+        rows = rows[(keys[rows] == keys[rows - lag]) & (days[rows] - days[rows - lag] <= window)]
+        later.append(order[rows])
+        earlier.append(order[rows - lag])
+        lag += 1
+        rows = rows[rows >= lag]
+    return np.concatenate(later), np.concatenate(earlier)
+
+def nearest(later: np.ndarray, earlier: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    The first pair of each later row, which repeats() yields nearest first.
+    """
+    later, first = np.unique(later, return_index=True)
+    return later, earlier[first]
+
+def account_stats(items: pd.DataFrame) -> pd.DataFrame:
+    """
+    Per-account sample_count, median, mad, q1 and q3 of log10 posting sizes, indexed by account_id.
+    """
+    sizes = items.loc[items["cents"] != 0, ["account_id"]].assign(x=np.log10(items["cents"].abs()))
+    grouped = sizes.groupby("account_id")["x"]
+    median = grouped.median()
+    quartiles = grouped.quantile([0.25, 0.75]).unstack()
+    deviation = (sizes["x"] - sizes["account_id"].map(median)).abs()
+    return pd.DataFrame({
+        "sample_count": grouped.size(),
+        "median": median,
+        "mad": deviation.groupby(sizes["account_id"]).median(),
+        "q1": quartiles[0.25],
+        "q3": quartiles[0.75],
+    })
+
+def score_items(items: pd.DataFrame, stats: pd.DataFrame, duplicate_of: pd.Series) -> pd.DataFrame:
+    """
+    Reasons, score and typical amount of each item, given its account's statistics and the
+    earlier item each duplicates (indexed by position).
+    """
+    cents = items["cents"].to_numpy()
+    size = np.abs(cents)
+    account = stats.reindex(items["account_id"].to_numpy())
+    x = np.log10(np.maximum(size, 1))
+    z = 0.6745 * (x - account["median"].to_numpy()) / np.maximum(account["mad"].to_numpy(), MIN_MAD)
+    iqr = (account["q3"] - account["q1"]).to_numpy()
+    beyond = x > account["q3"].to_numpy() + IQR_FENCE * iqr
+    outlier = (z >= ANOMALY_Z) & beyond & (account["sample_count"].to_numpy() >= ANOMALY_MIN_ITEMS)
+
+    unit, minimum = to_cents(ANOMALY_ROUND_UNIT), to_cents(ANOMALY_ROUND_MIN)
+    round_amount = (size >= minimum) & (size % unit == 0)
+    weekend = (items["day"].to_numpy() + 3) % 7 >= 5
+    duplicate = duplicate_of.notna().to_numpy()
+
+    scores = (
+        np.where(outlier, np.nan_to_num(z), 0)
+        + np.where(duplicate, DUPLICATE_SCORE, 0)
+        + WEAK_SCORE * (round_amount.astype(int) + weekend.astype(int))
+    )
+    # Spelled out only for the rows that make the shortlist
+    found = scores >= ANOMALY_MIN_SCORE
+    reasons = pd.Series("", index=items.index)
+    for name, mask in (("duplicate", duplicate), ("outlier", outlier), ("round", round_amount), ("weekend", weekend)):
+        reasons[mask & found] += "," + name
+    typical = np.where(outlier, np.sign(cents) * np.round(10 ** np.nan_to_num(account["median"].to_numpy())), np.nan)
+    return pd.DataFrame({"score": scores, "reasons": reasons.str[1:], "typical": typical, "duplicate_of": duplicate_of})
+
+class AnomalyService:
+    @staticmethod
+    def _items(db: Session, *conditions) -> pd.DataFrame:
+        """
+        Journal items as id, entry_id, account_id, day and signed cents (debits positive).
+        """
+        # Core rows: the ORM result layer would double the time to read a large ledger
+        rows = db.connection().execute(
+            select(JournalItem.id, JournalItem.journal_entry_id, JournalItem.account_id, JournalEntry.entry_date,
+                   _cents(JournalItem.debit) - _cents(JournalItem.credit))
+            .join(JournalEntry, JournalItem.journal_entry_id == JournalEntry.id)
+            .where(JournalItem.account_id.is_not(None), JournalEntry.entry_date.is_not(None), *conditions)
+        ).all()
+        if not rows:
+            return pd.DataFrame({column: np.array([], dtype=np.int64) for column in ITEM_COLUMNS})
+        ids, entry_ids, account_ids, dates, cents = zip(*rows)
+        return pd.DataFrame({
+            "id": np.array(ids, dtype=np.int64), "entry_id": np.array(entry_ids, dtype=np.int64),
+            "account_id": np.array(account_ids, dtype=np.int64), "day": _days(dates), "cents": np.array(cents, dtype=np.int64),
+        })
+
+    @staticmethod
+    def _invoices(db: Session, *conditions) -> pd.DataFrame:
+        rows = db.connection().execute(
+            select(Invoice.id, func.coalesce(Invoice.contact_id, 0), func.coalesce(Invoice.type, ""), Invoice.due_date,
+                   _cents(Invoice.amount))
+            .where(Invoice.due_date.is_not(None), *conditions)
+        ).all()
+        if not rows:
+            return pd.DataFrame({column: np.array([], dtype=np.int64) for column in INVOICE_COLUMNS})
+        ids, contact_ids, types, dates, cents = zip(*rows)
+        return pd.DataFrame({
+            "id": np.array(ids, dtype=np.int64), "contact_id": np.array(contact_ids, dtype=np.int64),
+            "type": list(types), "day": _days(dates), "cents": np.array(cents, dtype=np.int64),
+        })
+
+    @staticmethod
+    def _window(frame: pd.DataFrame, column, values) -> list:
+        # Rows near the scanned ones that may be the other half of a duplicate
+        start = EPOCH + timedelta(days=int(frame["day"].min()) - ANOMALY_DUPLICATE_DAYS)
+        end = EPOCH + timedelta(days=int(frame["day"].max()) + ANOMALY_DUPLICATE_DAYS + 1)
+        return [column >= start, column < end, values]
+
+    @staticmethod
+    def _duplicate_pairs(db: Session, items: pd.DataFrame, scanned: np.ndarray) -> pd.Series:
+        """
+        The nearest earlier item id each item repeats, by account, signed amount and entry
+        description, for pairs involving a scanned item. Amount matches are found by hashing;
+        descriptions are only read for those candidates.
+        """
+        keys = pd.util.hash_pandas_object(items[["account_id", "cents"]], index=False).to_numpy()
+        later, earlier = repeats(keys, items["day"].to_numpy(), items["id"].to_numpy(), ANOMALY_DUPLICATE_DAYS)
+        entry_ids = items["entry_id"].to_numpy()
+        keep = (
+            (scanned[later] | scanned[earlier])
+            & (entry_ids[later] != entry_ids[earlier])
+            & (items["account_id"].to_numpy()[later] == items["account_id"].to_numpy()[earlier])
+            & (items["cents"].to_numpy()[later] == items["cents"].to_numpy()[earlier])
+        )
+        later, earlier = later[keep], earlier[keep]
+        descriptions = {}
+        for chunk in _chunks(np.unique(np.concatenate([entry_ids[later], entry_ids[earlier]]))):
+            descriptions.update(db.execute(select(JournalEntry.id, JournalEntry.description).where(JournalEntry.id.in_(chunk))).all())
+        same = np.array(
+            [_normalize(descriptions.get(a)) == _normalize(descriptions.get(b)) for a, b in zip(entry_ids[later], entry_ids[earlier])],
+            dtype=bool,
+        )
+        later, earlier = nearest(later[same], earlier[same])
+        duplicate_of = pd.Series(np.nan, index=items.index)
+        duplicate_of.iloc[later] = items["id"].to_numpy()[earlier]
+        return duplicate_of
+
+    @staticmethod
+    def _refresh_stats(db: Session, scanned: pd.DataFrame, full: bool, items: Optional[pd.DataFrame]) -> pd.DataFrame:
+        """
+        Statistics of the scanned items' accounts, recomputed for accounts without them or grown
+        past ANOMALY_STATS_REFRESH, and stored.
+        """
+        if full:
+            db.execute(delete(AccountAmountStats))
+            stats = account_stats(items)
+            stats["item_count"] = stats["sample_count"]
+            fresh = stats
+        else:
+            account_ids = [int(a) for a in scanned["account_id"].unique()]
+            stored = pd.DataFrame(
+                db.execute(select(AccountAmountStats.account_id, AccountAmountStats.item_count,
+                                  *(getattr(AccountAmountStats, column) for column in STATS_COLUMNS))
+                           .where(AccountAmountStats.account_id.in_(account_ids))).all(),
+                columns=["account_id", "item_count", *STATS_COLUMNS],
+            ).set_index("account_id")
+            stats = stored.reindex(account_ids)
+            stats["item_count"] = stats["item_count"].fillna(0) + scanned.loc[scanned["new"]].groupby("account_id").size().reindex(account_ids, fill_value=0)
+            stale = stats.index[stats["sample_count"].isna() | (stats["item_count"] > stats["sample_count"] * (1 + ANOMALY_STATS_REFRESH))]
+            fresh = pd.DataFrame(columns=STATS_COLUMNS)
+            if len(stale):
+                history = pd.concat([AnomalyService._items(db, JournalItem.account_id.in_(chunk)) for chunk in _chunks(stale)])
+                fresh = account_stats(history)
+                fresh["item_count"] = fresh["sample_count"]
+                stats.update(fresh)
+                db.execute(delete(AccountAmountStats).where(AccountAmountStats.account_id.in_([int(a) for a in stale])))
+            stats = stats.astype(float)
+            counted = stats.index.difference(fresh.index)
+            for account_id, item_count in stats.loc[counted, "item_count"].dropna().items():
+                db.execute(
+                    update(AccountAmountStats).where(AccountAmountStats.account_id == int(account_id)).values(item_count=int(item_count))
+                )
+        if len(fresh):
+            db.execute(insert(AccountAmountStats), [
+                {"account_id": int(row.Index), "sample_count": int(row.sample_count), "item_count": int(row.item_count),
+                 "median": float(row.median), "mad": float(row.mad), "q1": float(row.q1), "q3": float(row.q3)}
+                for row in fresh.itertuples()
+            ])
+        return stats
+
+    @staticmethod
+    def _clear(db: Session, column, ids) -> None:
+        for chunk in _chunks(ids):
+            db.execute(delete(LedgerAnomaly).where(column.in_(chunk)))
+
+    @staticmethod
+    def scan(db: Session, full: bool = False) -> Dict:
+        """
+        Score journal items and invoices added or edited since the last scan (everything when
+        full, or when no scan has run) and store the findings. Returns the scan's counts.
+        """
+        global _scanned_versions
+        with _scan_lock:
+            # Read first, so commits landing during the scan leave the versions moved for the next one
+            versions = AnomalyService._versions()
+            result = AnomalyService._scan(db, full)
+            _scanned_versions = versions
+            return result
+
+    @staticmethod
+    def _versions() -> Tuple[int, int]:
+        return response_cache.version(LEDGER), response_cache.version(INVOICES)
+
+    @staticmethod
+    def refresh(db: Session) -> Optional[Dict]:
+        """
+        Scan incrementally if the ledger or invoices changed since this process last scanned.
+        Returns the scan, or None if the findings were current, a scan in this process was already
+        running, or another process was storing the same findings at once.
+        """
+        if AnomalyService._versions() == _scanned_versions:
+            return None
+        if not _scan_lock.acquire(blocking=False):
+            return None
+        try:
+            if AnomalyService._versions() == _scanned_versions:
+                return None
+            return AnomalyService.scan(db)
+        except IntegrityError:
+            db.rollback()
+            return None
+        finally:
+            _scan_lock.release()
+
+    @staticmethod
+    async def watch(interval: float = ANOMALY_SCAN_INTERVAL_SECONDS) -> None:
+        """
+        Refresh the findings now and then every interval seconds until cancelled, so new postings
+        are scanned whoever posts them (API requests, `cli import`, job workers). Scans run in a
+        worker thread and never on the event loop.
+        """
+        def refresh() -> Optional[Dict]:
+            db = SessionLocal()
+            try:
+                return AnomalyService.refresh(db)
+            finally:
+                db.close()
+
+        while True:
+            try:
+                await asyncio.to_thread(refresh)
+            except Exception:
+                logger.exception("Background anomaly scan failed")
+            await asyncio.sleep(interval)
+
+    @staticmethod
+    def _scan(db: Session, full: bool) -> Dict:
+        started_at = datetime.utcnow()
+        last = db.execute(select(AnomalyScan).order_by(AnomalyScan.id.desc()).limit(1)).scalar_one_or_none()
+        full = full or last is None
+        through_item_id = db.execute(select(func.max(JournalItem.id))).scalar() or 0
+        through_invoice_id = db.execute(select(func.max(Invoice.id))).scalar() or 0
+
+        if full:
+            db.execute(delete(LedgerAnomaly))
+            items = AnomalyService._items(db, JournalItem.id <= through_item_id)
+            items["new"] = True
+            invoices = AnomalyService._invoices(db, Invoice.id <= through_invoice_id)
+            invoices["new"] = True
+        else:
+            # Drop findings whose item or invoice has been deleted
+            db.execute(delete(LedgerAnomaly).where(
+                LedgerAnomaly.journal_item_id.is_not(None), ~exists().where(JournalItem.id == LedgerAnomaly.journal_item_id),
+            ))
+            db.execute(delete(LedgerAnomaly).where(
+                LedgerAnomaly.invoice_id.is_not(None), ~exists().where(Invoice.id == LedgerAnomaly.invoice_id),
+            ))
+            # New items by id and items of edited entries by updated_at, as two indexed reads
+            items = pd.concat([
+                AnomalyService._items(db, JournalItem.id.between(last.through_item_id + 1, through_item_id)),
+                AnomalyService._items(db, JournalEntry.updated_at >= last.started_at),
+            ], ignore_index=True)
+            items = items[items["id"] <= through_item_id].drop_duplicates("id", ignore_index=True)
+            items["new"] = items["id"] > last.through_item_id
+            invoices = AnomalyService._invoices(db, or_(
+                Invoice.id.between(last.through_invoice_id + 1, through_invoice_id),
+                (Invoice.updated_at >= last.started_at) & (Invoice.id <= last.through_invoice_id),
+            ))
+            invoices["new"] = invoices["id"] > last.through_invoice_id
+
+        flagged = 0
+        if len(items):
+            scanned_items = items
+            if not full:
+                nearby = AnomalyService._items(db, *AnomalyService._window(
+                    items, JournalEntry.entry_date, JournalItem.account_id.in_([int(a) for a in items["account_id"].unique()]),
+                ), JournalItem.id <= through_item_id)
+                nearby = nearby[~nearby["id"].isin(items["id"])].assign(new=False)
+                items = pd.concat([items, nearby], ignore_index=True)
+            scanned = np.zeros(len(items), dtype=bool)
+            scanned[:len(scanned_items)] = True
+            stats = AnomalyService._refresh_stats(db, scanned_items, full, items)
+            duplicate_of = AnomalyService._duplicate_pairs(db, items, scanned)
+            scores = score_items(items, stats, duplicate_of)
+            # Scanned items, and earlier items that a back-dated scanned item turned into duplicates
+            scored = scanned | duplicate_of.notna().to_numpy()
+            if not full:
+                AnomalyService._clear(db, LedgerAnomaly.journal_item_id, items.loc[scored, "id"])
+            found = scored & (scores["score"].to_numpy() >= ANOMALY_MIN_SCORE)
+            rows = [
+                {"journal_item_id": int(item_id), "reasons": reasons, "score": float(score), "amount": from_cents(int(cents)),
+                 "typical_amount": None if np.isnan(typical) else from_cents(int(typical)),
+                 "duplicate_of": None if np.isnan(duplicate) else int(duplicate), "detected_at": started_at}
+                for item_id, cents, score, reasons, typical, duplicate in zip(
+                    items["id"][found], items["cents"][found], scores["score"][found], scores["reasons"][found],
+                    scores["typical"][found], scores["duplicate_of"][found],
+                )
+            ]
+            if rows:
+                db.execute(insert(LedgerAnomaly), rows)
+            flagged += len(rows)
+            items = scanned_items
+
+        if len(invoices):
+            scanned_invoices = invoices
+            if not full:
+                nearby = AnomalyService._invoices(db, *AnomalyService._window(
+                    invoices, Invoice.due_date, Invoice.contact_id.in_([int(c) for c in invoices["contact_id"].unique()]),
+                ), Invoice.id <= through_invoice_id)
+                nearby = nearby[~nearby["id"].isin(invoices["id"])].assign(new=False)
+                invoices = pd.concat([invoices, nearby], ignore_index=True)
+            scanned = np.zeros(len(invoices), dtype=bool)
+            scanned[:len(scanned_invoices)] = True
+            keys = pd.util.hash_pandas_object(invoices[["contact_id", "type", "cents"]], index=False).to_numpy()
+            later, earlier = repeats(keys, invoices["day"].to_numpy(), invoices["id"].to_numpy(), ANOMALY_DUPLICATE_DAYS)
+            same = (
+                (scanned[later] | scanned[earlier])
+                & (invoices["contact_id"].to_numpy()[later] == invoices["contact_id"].to_numpy()[earlier])
+                & (invoices["type"].to_numpy()[later] == invoices["type"].to_numpy()[earlier])
+                & (invoices["cents"].to_numpy()[later] == invoices["cents"].to_numpy()[earlier])
+            )
+            later, earlier = nearest(later[same], earlier[same])
+            if not full:
+                AnomalyService._clear(db, LedgerAnomaly.invoice_id, np.union1d(invoices["id"].to_numpy()[scanned], invoices["id"].to_numpy()[later]))
+            rows = [
+                {"invoice_id": int(invoice_id), "reasons": "duplicate", "score": DUPLICATE_SCORE, "amount": from_cents(int(cents)),
+                 "duplicate_of": int(duplicate), "detected_at": started_at}
+                for invoice_id, cents, duplicate in zip(
+                    invoices["id"].to_numpy()[later], invoices["cents"].to_numpy()[later], invoices["id"].to_numpy()[earlier],
+                )
+            ]
+            if rows:
+                db.execute(insert(LedgerAnomaly), rows)
+            flagged += len(rows)
+            invoices = scanned_invoices
+
+        scan = AnomalyScan(
+            kind="full" if full else "incremental", through_item_id=through_item_id, through_invoice_id=through_invoice_id,
+            items_scanned=len(items), invoices_scanned=len(invoices), flagged=flagged,
+            started_at=started_at, finished_at=datetime.utcnow(),
+        )
+        db.add(scan)
+        db.commit()
+        return AnomalyService.serialize_scan(scan)
+
+    @staticmethod
+    def serialize_scan(scan: AnomalyScan) -> Dict:
+        return {
+            "id": scan.id,
+            "kind": scan.kind,
+            "items_scanned": scan.items_scanned,
+            "invoices_scanned": scan.invoices_scanned,
+            "flagged": scan.flagged,
+            "started_at": scan.started_at,
+            "elapsed_ms": round((scan.finished_at - scan.started_at).total_seconds() * 1000, 1),
+        }
+
+    @staticmethod
+    def shortlist(db: Session, limit: int = 50) -> List[Dict]:
+        """
+        Stored findings, highest score first, with the entry or invoice they point at.
+        """
+        rows = db.execute(
+            select(
+                LedgerAnomaly, JournalItem.journal_entry_id, JournalEntry.entry_date, JournalEntry.description,
+                Account.account_code, Account.account_name, Invoice.invoice_number, Invoice.type, Invoice.due_date, Contact.name,
+            )
+            .outerjoin(JournalItem, JournalItem.id == LedgerAnomaly.journal_item_id)
+            .outerjoin(JournalEntry, JournalEntry.id == JournalItem.journal_entry_id)
+            .outerjoin(Account, Account.id == JournalItem.account_id)
+            .outerjoin(Invoice, Invoice.id == LedgerAnomaly.invoice_id)
+            .outerjoin(Contact, Contact.id == Invoice.contact_id)
+            # Rows deleted since the last scan
+            .where(or_(JournalItem.id.is_not(None), Invoice.id.is_not(None)))
+            .order_by(LedgerAnomaly.score.desc(), LedgerAnomaly.id)
+            .limit(limit)
+        ).all()
+        findings = []
+        for finding, entry_id, entry_date, description, account_code, account_name, invoice_number, invoice_type, due_date, contact in rows:
+            common = {
+                "id": finding.id,
+                "reasons": finding.reasons.split(","),
+                "score": round(finding.score, 2),
+                "amount": finding.amount,
+                "duplicate_of": finding.duplicate_of,
+            }
+            if finding.journal_item_id is not None:
+                findings.append({
+                    **common,
+                    "source": "journal_item",
+                    "journal_item_id": finding.journal_item_id,
+                    "journal_entry_id": entry_id,
+                    "date": entry_date.date().isoformat(),
+                    "description": description,
+                    "account_code": account_code,
+                    "account_name": account_name,
+                    "typical_amount": finding.typical_amount,
+                })
+            else:
+                findings.append({
+                    **common,
+                    "source": "invoice",
+                    "invoice_id": finding.invoice_id,
+                    "invoice_number": invoice_number,
+                    "type": invoice_type,
+                    "date": due_date.date().isoformat(),
+                    "contact": contact,
+                })
+        return findings
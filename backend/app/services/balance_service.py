@@ -0,0 +1,320 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from sqlalchemy import delete, extract, func, insert, select, union_all, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.models.models import (
+    Account, AccountBalance, AccountClosingBalance, AccountClosure, AccountRollupBalance, JournalEntry, JournalItem, PeriodClose,
+)
+from app.models.money import from_cents, to_cents
+
+# (account_id, entry_date, debit, credit)
+Posting = Tuple[int, datetime, Decimal, Decimal]
+
+ZERO = Decimal("0.00")
+
+def period_of(value: date) -> int:
+    """
+    Return the YYYYMM bucket a date falls into.
+    """
+    return value.year * 100 + value.month
+
+class BalanceService:
+    @staticmethod
+    def postings(entry_date: datetime, items: Iterable) -> List[Posting]:
+        """
+        Turn journal items (ORM objects or dicts) of one entry into postings.
+        """
+        postings = []
+        for item in items:
+            if isinstance(item, dict):
+                postings.append((item["account_id"], entry_date, item.get("debit") or ZERO, item.get("credit") or ZERO))
+            else:
+                postings.append((item.account_id, entry_date, item.debit or ZERO, item.credit or ZERO))
+        return postings
+
+    @staticmethod
+    def apply(db: Session, postings: Iterable[Posting], sign: int = 1) -> None:
+        """
+        Add (sign=1) or remove (sign=-1) postings from the running balances and
+        the roll-up balances of each posted account and its ancestors.
+        Runs inside the caller's transaction; the caller commits.
+        """
+        # Accumulated in integer cents
+        deltas: Dict[Tuple[int, int], List[int]] = defaultdict(lambda: [0, 0])
+        for account_id, entry_date, debit, credit in postings:
+            delta = deltas[(account_id, period_of(entry_date))]
+            delta[0] += sign * to_cents(debit)
+            delta[1] += sign * to_cents(credit)
+        if not deltas:
+            return
+        # Left on the session until it commits, for listeners such as the dashboard push
+        pending = db.info.setdefault("balance_deltas", defaultdict(lambda: [0, 0]))
+        for key, (debit, credit) in deltas.items():
+            pending[key][0] += debit
+            pending[key][1] += credit
+
+        # Every posting also counts toward each ancestor's roll-up
+        ancestors: Dict[int, List[int]] = defaultdict(list)
+        links = db.execute(
+            select(AccountClosure.descendant_id, AccountClosure.ancestor_id)
+            .where(AccountClosure.descendant_id.in_(sorted({account_id for account_id, _ in deltas})))
+        )
+        for descendant_id, ancestor_id in links:
+            ancestors[descendant_id].append(ancestor_id)
+        rollups: Dict[Tuple[int, int], List[int]] = defaultdict(lambda: [0, 0])
+        for (account_id, period), (debit, credit) in deltas.items():
+            for node_id in (account_id, *ancestors[account_id]):
+                rollup = rollups[(node_id, period)]
+                rollup[0] += debit
+                rollup[1] += credit
+
+        BalanceService.add_totals(db, AccountBalance, deltas)
+        BalanceService.add_totals(db, AccountRollupBalance, rollups)
+
+    @staticmethod
+    def add_totals(db: Session, model, deltas: Dict[Tuple[int, int], List[int]]) -> None:
+        """
+        Add {(account_id, period): [debit cents, credit cents]} to a per-account, per-period totals table
+        (account_balances or account_rollup_balances), creating missing rows.
+        """
+        # Sorted so concurrent writers lock rows in the same order
+        rows = [
+            {"account_id": account_id, "period": period, "debit_total": from_cents(debit), "credit_total": from_cents(credit)}
+            for (account_id, period), (debit, credit) in sorted(deltas.items())
+        ]
+        if not rows:
+            return
+
+        dialect = db.get_bind().dialect.name
+        if dialect in ("postgresql", "sqlite"):
+            dialect_insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+            stmt = dialect_insert(model)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[model.account_id, model.period],
+                set_={
+                    "debit_total": model.debit_total + stmt.excluded.debit_total,
+                    "credit_total": model.credit_total + stmt.excluded.credit_total,
+                },
+            )
+            db.execute(stmt, rows)
+            return
+
+        for row in rows:
+            result = db.execute(
+                update(model)
+                .where(model.account_id == row["account_id"], model.period == row["period"])
+                .values(
+                    debit_total=model.debit_total + row["debit_total"],
+                    credit_total=model.credit_total + row["credit_total"],
+                )
+            )
+            if result.rowcount == 0:
+                db.execute(insert(model), [row])
+
+    @staticmethod
+    def _aggregate_items():
+        period = extract("year", JournalEntry.entry_date) * 100 + extract("month", JournalEntry.entry_date)
+        return (
+            select(
+                JournalItem.account_id,
+                period.label("period"),
+                func.coalesce(func.sum(JournalItem.debit), 0),
+                func.coalesce(func.sum(JournalItem.credit), 0),
+            )
+            .join(JournalEntry, JournalItem.journal_entry_id == JournalEntry.id)
+            .group_by(JournalItem.account_id, period)
+        )
+
+    @staticmethod
+    def _aggregate_rollups():
+        """
+        Roll-up totals per account and period: its own balances plus those of every descendant.
+        """
+        own = select(AccountBalance.account_id, AccountBalance.period, AccountBalance.debit_total, AccountBalance.credit_total)
+        inherited = (
+            select(AccountClosure.ancestor_id, AccountBalance.period, AccountBalance.debit_total, AccountBalance.credit_total)
+            .join(AccountClosure, AccountClosure.descendant_id == AccountBalance.account_id)
+        )
+        combined = union_all(own, inherited).subquery()
+        return (
+            select(combined.c.account_id, combined.c.period, func.sum(combined.c.debit_total), func.sum(combined.c.credit_total))
+            .group_by(combined.c.account_id, combined.c.period)
+        )
+
+    @staticmethod
+    def rebuild_rollups(db: Session) -> None:
+        """
+        Recompute the roll-up balances from the running balances and the hierarchy.
+        Runs inside the caller's transaction; the caller commits.
+        """
+        db.execute(delete(AccountRollupBalance))
+        db.execute(
+            insert(AccountRollupBalance).from_select(
+                ["account_id", "period", "debit_total", "credit_total"],
+                BalanceService._aggregate_rollups(),
+            )
+        )
+
+    @staticmethod
+    def rebuild(db: Session) -> None:
+        """
+        Recompute every running balance from the raw journal items in one statement,
+        then the roll-ups from them.
+        """
+        db.execute(delete(AccountBalance))
+        db.execute(
+            insert(AccountBalance).from_select(
+                ["account_id", "period", "debit_total", "credit_total"],
+                BalanceService._aggregate_items(),
+            )
+        )
+        BalanceService.rebuild_rollups(db)
+        db.commit()
+
+    @staticmethod
+    def verify(db: Session) -> List[Dict]:
+        """
+        Compare the running balances against the raw journal items, and the roll-ups against
+        the running balances, and return any mismatches.
+        """
+        expected = {
+            (account_id, int(period)): (debit, credit)
+            for account_id, period, debit, credit in db.execute(BalanceService._aggregate_items())
+        }
+        actual = {
+            (row.account_id, row.period): (row.debit_total, row.credit_total)
+            for row in db.execute(select(AccountBalance)).scalars()
+        }
+        mismatches = BalanceService._compare(expected, actual)
+
+        expected_rollups = {
+            (account_id, int(period)): (debit, credit)
+            for account_id, period, debit, credit in db.execute(BalanceService._aggregate_rollups())
+        }
+        actual_rollups = {
+            (row.account_id, row.period): (row.debit_total, row.credit_total)
+            for row in db.execute(select(AccountRollupBalance)).scalars()
+        }
+        mismatches.extend({**mismatch, "rollup": True} for mismatch in BalanceService._compare(expected_rollups, actual_rollups))
+        return mismatches
+
+    @staticmethod
+    def _compare(expected: Dict[Tuple[int, int], Tuple], actual: Dict[Tuple[int, int], Tuple]) -> List[Dict]:
+        mismatches = []
+        for key in sorted(expected.keys() | actual.keys()):
+            expected_debit, expected_credit = expected.get(key, (ZERO, ZERO))
+            actual_debit, actual_credit = actual.get(key, (ZERO, ZERO))
+            if expected_debit != actual_debit or expected_credit != actual_credit:
+                mismatches.append({
+                    "account_id": key[0],
+                    "period": key[1],
+                    "expected_debit": expected_debit,
+                    "actual_debit": actual_debit,
+                    "expected_credit": expected_credit,
+                    "actual_credit": actual_credit,
+                })
+        return mismatches
+
+    @staticmethod
+    def latest_close(db: Session, before: Optional[int] = None) -> Optional[int]:
+        """
+        The most recent closed period, or the most recent one earlier than the YYYYMM period before.
+        """
+        query = select(func.max(PeriodClose.period))
+        if before is not None:
+            query = query.where(PeriodClose.period < before)
+        return db.execute(query).scalar()
+
+    @staticmethod
+    def closing_totals(db: Session, period: int) -> Dict[int, Tuple[Decimal, Decimal]]:
+        """
+        Return {account_id: (total debit, total credit)} from the snapshot taken when period was closed.
+        """
+        rows = db.execute(
+            select(AccountClosingBalance.account_id, AccountClosingBalance.debit_total, AccountClosingBalance.credit_total)
+            .where(AccountClosingBalance.period == period)
+        )
+        return {account_id: (debit, credit) for account_id, debit, credit in rows}
+
+    @staticmethod
+    def account_totals(db: Session, as_of: Optional[date] = None) -> Dict[int, Tuple[Decimal, Decimal]]:
+        """
+        Return {account_id: (total debit, total credit)} up to and including as_of.
+        Starts from the latest closing snapshot before as_of, adds whole months after it from the
+        balance table, and reads raw items only for the partial month of as_of.
+        """
+        before = period_of(as_of) if as_of is not None else None
+        closed = BalanceService.latest_close(db, before)
+        totals = BalanceService.closing_totals(db, closed) if closed is not None else {}
+
+        query = select(
+            AccountBalance.account_id,
+            func.sum(AccountBalance.debit_total),
+            func.sum(AccountBalance.credit_total),
+        ).group_by(AccountBalance.account_id)
+        if closed is not None:
+            query = query.where(AccountBalance.period > closed)
+        if before is not None:
+            query = query.where(AccountBalance.period < before)
+
+        for account_id, debit, credit in db.execute(query):
+            prior_debit, prior_credit = totals.get(account_id, (ZERO, ZERO))
+            totals[account_id] = (prior_debit + (debit or ZERO), prior_credit + (credit or ZERO))
+
+        if as_of is not None:
+            month_start = datetime(as_of.year, as_of.month, 1)
+            partial = db.execute(
+                select(JournalItem.account_id, func.sum(JournalItem.debit), func.sum(JournalItem.credit))
+                .join(JournalEntry, JournalItem.journal_entry_id == JournalEntry.id)
+                .where(
+                    JournalEntry.entry_date >= month_start,
+                    JournalEntry.entry_date < datetime.combine(as_of + timedelta(days=1), datetime.min.time()),
+                )
+                .group_by(JournalItem.account_id)
+            )
+            for account_id, debit, credit in partial:
+                prior_debit, prior_credit = totals.get(account_id, (ZERO, ZERO))
+                totals[account_id] = (prior_debit + (debit or ZERO), prior_credit + (credit or ZERO))
+
+        return totals
+
+    @staticmethod
+    def trial_balance(db: Session, as_of: Optional[date] = None) -> Dict:
+        """
+        Build a trial balance with each account's net balance shown on its debit or credit side.
+        """
+        totals = BalanceService.account_totals(db, as_of)
+        accounts = db.execute(
+            select(Account.id, Account.account_code, Account.account_name, Account.account_type)
+            .order_by(Account.account_code)
+        ).all()
+
+        rows = []
+        total_debit = total_credit = ZERO
+        for account_id, account_code, account_name, account_type in accounts:
+            if account_id not in totals:
+                continue
+            debit, credit = totals[account_id]
+            net = debit - credit
+            rows.append({
+                "account_id": account_id,
+                "account_code": account_code,
+                "account_name": account_name,
+                "account_type": account_type.name if account_type else None,
+                "debit": net if net > 0 else ZERO,
+                "credit": -net if net < 0 else ZERO,
+            })
+            total_debit += max(net, ZERO)
+            total_credit += max(-net, ZERO)
+
+        return {
+            "as_of": as_of.isoformat() if as_of else None,
+            "accounts": rows,
+            "total_debit": total_debit,
+            "total_credit": total_credit,
+        }
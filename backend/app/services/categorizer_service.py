@@ -0,0 +1,202 @@
+"""
+Local transaction categorizer trained from posted journal entries.
+
+Each journal entry description is paired with the accounts it was posted to,
+leaving out the entry's funding side (the account that appears in the most
+entries overall, typically the bank or cash account). A multinomial naive
+Bayes model over the description's words then predicts the account for new
+descriptions in microseconds. Words never seen in training carry no evidence,
+so unfamiliar vendors come out with low confidence and are escalated to the
+language model.
+
+The model is written to AI_LOCAL_MODEL_PATH by `python -m app.cli
+train-categorizer` and loaded on first use; a retrained file is picked up
+without a restart.
+"""
+from typing import Dict, List, Optional
+from collections import Counter
+from datetime import datetime
+import json
+import os
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.models.models import Account, JournalEntry, JournalItem
+from app.services.ai_cache import CATEGORIZATION, normalize
+
+AI_LOCAL_ENABLED = os.getenv("AI_LOCAL_ENABLED", "true").lower() == "true"
+AI_LOCAL_MODEL_PATH = os.getenv("AI_LOCAL_MODEL_PATH", "data/categorizer.npz")
+# Minimum probability for a local answer; anything lower goes to the language model
+AI_LOCAL_CONFIDENCE = float(os.getenv("AI_LOCAL_CONFIDENCE", "0.9"))
+
+MIN_WORD_COUNT = 2
+MAX_VOCABULARY = 50000
+SMOOTHING = 0.1
+
+def tokenize(description: str) -> List[str]:
+    """
+    Words of the normalized description; folded numbers and dates carry no signal.
+    """
+    return [word for word in normalize(description, CATEGORIZATION).split() if word != "#"]
+
+class CategorizerService:
+    model: Optional[Dict] = None
+    model_mtime: Optional[float] = None
+    stats = {"local": 0, "escalated": 0}
+
+    @staticmethod
+    def training_samples(db: Session) -> List[tuple]:
+        """
+        (description, account id) pairs from the ledger, one per non-funding line.
+        """
+        rows = (
+            db.query(JournalEntry.id, JournalEntry.description, JournalItem.account_id)
+            .join(JournalItem, JournalItem.journal_entry_id == JournalEntry.id)
+            .filter(JournalEntry.description.isnot(None), JournalItem.account_id.isnot(None))
+            .order_by(JournalEntry.id)
+            .yield_per(10000)
+        )
+        entries = {}
+        for entry_id, description, account_id in rows:
+            entries.setdefault(entry_id, (description, set()))[1].add(account_id)
+
+        entry_counts = Counter(account_id for _, accounts in entries.values() for account_id in accounts)
+        samples = []
+        for description, accounts in entries.values():
+            if len(accounts) > 1:
+                funding = max(accounts, key=lambda account_id: (entry_counts[account_id], -account_id))
+                accounts = accounts - {funding}
+            samples.extend((description, account_id) for account_id in sorted(accounts))
+        return samples
+
+    @staticmethod
+    def train(db: Session, min_word_count: int = MIN_WORD_COUNT) -> Dict:
+        """
+        Fit the model on the current ledger. Returns the model arrays and training metadata.
+        """
+        samples = CategorizerService.training_samples(db)
+        tokens = [tokenize(description) for description, _ in samples]
+        word_counts = Counter(word for words in tokens for word in words)
+        vocabulary = [word for word, count in word_counts.most_common(MAX_VOCABULARY) if count >= min_word_count]
+        word_index = {word: row for row, word in enumerate(vocabulary)}
+
+        account_ids = sorted({account_id for _, account_id in samples})
+        class_index = {account_id: column for column, account_id in enumerate(account_ids)}
+        rows, columns = [], []
+        for words, (_, account_id) in zip(tokens, samples):
+            known = [word_index[word] for word in words if word in word_index]
+            rows.extend(known)
+            columns.extend([class_index[account_id]] * len(known))
+        counts = np.zeros((len(vocabulary), len(account_ids)), dtype=np.float64)
+        np.add.at(counts, (np.array(rows, dtype=np.intp), np.array(columns, dtype=np.intp)), 1)
+        class_samples = np.bincount([class_index[account_id] for _, account_id in samples], minlength=len(account_ids)).astype(np.float64)
+
+        log_likelihood = np.log(counts + SMOOTHING) - np.log(counts.sum(axis=0) + SMOOTHING * max(len(vocabulary), 1))
+        log_prior = np.log(np.maximum(class_samples, 1) / max(class_samples.sum(), 1))
+        accounts = {account.id: account for account in db.query(Account).filter(Account.id.in_(account_ids))}
+        return {
+            "words": np.array(vocabulary, dtype=str),
+            "log_likelihood": log_likelihood.astype(np.float32),
+            "log_prior": log_prior.astype(np.float32),
+            "account_ids": np.array(account_ids, dtype=np.int64),
+            "account_names": np.array([accounts[account_id].account_name or "" for account_id in account_ids], dtype=str),
+            "account_types": np.array([
+                accounts[account_id].account_type.value if accounts[account_id].account_type else "" for account_id in account_ids
+            ], dtype=str),
+            "meta": np.array(json.dumps({
+                "trained_at": datetime.utcnow().isoformat(),
+                "samples": len(samples),
+                "accounts": len(account_ids),
+                "vocabulary": len(vocabulary),
+            })),
+        }
+
+    @staticmethod
+    def save(model: Dict, path: str = AI_LOCAL_MODEL_PATH) -> None:
+        """
+        Write the model atomically so running workers never read a partial file.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temporary = f"{path}.tmp"
+        with open(temporary, "wb") as f:
+            np.savez_compressed(f, **model)
+        os.replace(temporary, path)
+
+    @staticmethod
+    def load(path: str = AI_LOCAL_MODEL_PATH) -> Dict:
+        with np.load(path, allow_pickle=False) as data:
+            model = {name: data[name] for name in data.files}
+        model["word_index"] = {word: row for row, word in enumerate(model["words"].tolist())}
+        model["meta"] = json.loads(str(model["meta"]))
+        return model
+
+    @staticmethod
+    def get_model(path: str = AI_LOCAL_MODEL_PATH) -> Optional[Dict]:
+        """
+        The trained model, loaded on first use and reloaded when the file changes. None if untrained.
+        """
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            return None
+        if CategorizerService.model is None or CategorizerService.model_mtime != mtime:
+            CategorizerService.model = CategorizerService.load(path)
+            CategorizerService.model_mtime = mtime
+        return CategorizerService.model
+
+    @staticmethod
+    def predict(descriptions: List[str]) -> List[Optional[Dict]]:
+        """
+        Most likely account and its probability for each description, or None when
+        there is no model or none of the description's words were seen in training.
+        """
+        model = CategorizerService.get_model() if AI_LOCAL_ENABLED else None
+        if model is None:
+            return [None] * len(descriptions)
+
+        word_index = model["word_index"]
+        predictions = []
+        for description in descriptions:
+            rows = [word_index[word] for word in tokenize(description) if word in word_index]
+            if not rows:
+                predictions.append(None)
+                continue
+            scores = model["log_prior"] + model["log_likelihood"][rows].sum(axis=0)
+            best = int(scores.argmax())
+            probability = 1.0 / np.exp(scores - scores[best]).sum()
+            predictions.append({
+                "account_id": int(model["account_ids"][best]),
+                "account": str(model["account_names"][best]),
+                "category": str(model["account_types"][best]),
+                "probability": round(float(probability), 4),
+            })
+        return predictions
+
+    @staticmethod
+    def suggest(descriptions: List[str], threshold: float = AI_LOCAL_CONFIDENCE) -> List[Optional[Dict]]:
+        """
+        Local predictions confident enough to skip the language model, None for the rest.
+        """
+        suggestions = []
+        for prediction in CategorizerService.predict(descriptions):
+            confident = prediction is not None and prediction["probability"] >= threshold
+            suggestions.append(prediction if confident else None)
+            CategorizerService.stats["local" if confident else "escalated"] += 1
+        return suggestions
+
+    @staticmethod
+    def info() -> Dict:
+        model = CategorizerService.get_model() if AI_LOCAL_ENABLED else None
+        answered = CategorizerService.stats["local"] + CategorizerService.stats["escalated"]
+        return {
+            "enabled": AI_LOCAL_ENABLED,
+            "model_path": AI_LOCAL_MODEL_PATH,
+            "trained": model is not None,
+            "model": model["meta"] if model else None,
+            "confidence_threshold": AI_LOCAL_CONFIDENCE,
+            **CategorizerService.stats,
+            "escalation_rate": round(CategorizerService.stats["escalated"] / answered, 4) if answered else None,
+        }
@@ -0,0 +1,105 @@
+"""
+Dashboard KPIs: cash, receivables, payables, and this year's revenue and expenses.
+
+A snapshot is read from the summary tables (account_balances and
+invoice_aging_balances), never from raw items. Between snapshots the KPIs move
+by the deltas BalanceService.apply and AgingService.apply leave on the session
+(balance_deltas and aging_deltas in session.info), which changes() turns into
+KPI changes. All amounts are integer cents.
+"""
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.models.models import Account, AccountBalance, AccountTypeEnum, InvoiceAgingBalance
+from app.models.money import to_cents
+from app.services.report_service import ReportService
+
+KPIS = ("cash", "receivables", "payables", "revenue", "expenses")
+AGING_KPIS = {"Receivable": "receivables", "Payable": "payables"}
+
+class DashboardService:
+    @staticmethod
+    def account_kinds(db: Session) -> Dict[int, Optional[str]]:
+        """
+        {account_id: KPI its postings move} for every account; None for accounts no KPI tracks.
+        """
+        cash_ids = set(ReportService.cash_account_ids(db))
+        kinds = {}
+        for account_id, account_type in db.execute(select(Account.id, Account.account_type)):
+            if account_id in cash_ids:
+                kinds[account_id] = "cash"
+            elif account_type == AccountTypeEnum.Revenue:
+                kinds[account_id] = "revenue"
+            elif account_type == AccountTypeEnum.Expense:
+                kinds[account_id] = "expenses"
+            else:
+                kinds[account_id] = None
+        return kinds
+
+    @staticmethod
+    def snapshot(db: Session, year: int, kinds: Optional[Dict[int, Optional[str]]] = None) -> Dict[str, int]:
+        """
+        Every KPI in cents: cash and open invoices to date, revenue and expenses for the year.
+        """
+        kinds = DashboardService.account_kinds(db) if kinds is None else kinds
+        kpis = dict.fromkeys(KPIS, 0)
+        cash_ids = [account_id for account_id, kind in kinds.items() if kind == "cash"]
+        # Debit and credit are summed separately; SQL arithmetic on two sums would drop the cents type
+        if cash_ids:
+            debit, credit = db.execute(
+                select(func.sum(AccountBalance.debit_total), func.sum(AccountBalance.credit_total))
+                .where(AccountBalance.account_id.in_(cash_ids))
+            ).one()
+            kpis["cash"] = to_cents(debit or 0) - to_cents(credit or 0)
+
+        rows = db.execute(
+            select(Account.account_type, func.sum(AccountBalance.debit_total), func.sum(AccountBalance.credit_total))
+            .join(Account, Account.id == AccountBalance.account_id)
+            .where(
+                Account.account_type.in_([AccountTypeEnum.Revenue, AccountTypeEnum.Expense]),
+                AccountBalance.period.between(year * 100 + 1, year * 100 + 12),
+            )
+            .group_by(Account.account_type)
+        )
+        for account_type, debit, credit in rows:
+            net = to_cents(debit or 0) - to_cents(credit or 0)
+            if account_type == AccountTypeEnum.Revenue:
+                kpis["revenue"] = -net
+            else:
+                kpis["expenses"] = net
+
+        rows = db.execute(
+            select(InvoiceAgingBalance.type, func.sum(InvoiceAgingBalance.open_amount)).group_by(InvoiceAgingBalance.type)
+        )
+        for invoice_type, amount in rows:
+            if invoice_type in AGING_KPIS:
+                kpis[AGING_KPIS[invoice_type]] = to_cents(amount or 0)
+        return kpis
+
+    @staticmethod
+    def changes(
+        kinds: Dict[int, Optional[str]],
+        balance_deltas: Dict[Tuple[int, int], List[int]],
+        aging_deltas: Dict[str, int],
+        year: int,
+    ) -> Dict[str, int]:
+        """
+        KPI changes in cents implied by {(account_id, period): [debit, credit]} ledger deltas and
+        {invoice type: open amount} aging deltas. Zero changes are left out.
+        """
+        changes = dict.fromkeys(KPIS, 0)
+        for (account_id, period), (debit, credit) in balance_deltas.items():
+            kind = kinds.get(account_id)
+            if kind == "cash":
+                changes["cash"] += debit - credit
+            elif kind == "revenue" and period // 100 == year:
+                changes["revenue"] += credit - debit
+            elif kind == "expenses" and period // 100 == year:
+                changes["expenses"] += debit - credit
+        for invoice_type, amount in aging_deltas.items():
+            if invoice_type in AGING_KPIS:
+                changes[AGING_KPIS[invoice_type]] += amount
+        return {kpi: cents for kpi, cents in changes.items() if cents}
+
@@ -0,0 +1,281 @@
+"""
+Streaming exports of the general ledger and reports as CSV or Parquet.
+
+The ledger is read through a server-side cursor EXPORT_BATCH_SIZE rows at a
+time and each batch is written out before the next is fetched, so memory
+stays flat however large the ledger is. CSV can be gzipped on the fly.
+Parquet is written one row group of EXPORT_ROW_GROUP_SIZE rows at a time into
+a sink that is drained after every group; it needs the pyarrow package.
+Reports are small and computed up front, then written the same way.
+"""
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from datetime import date, datetime, timedelta
+import csv
+import io
+import os
+import zlib
+
+from sqlalchemy import or_, select
+from sqlalchemy.orm import Session
+
+from app.models.models import Account, AccountClosure, JournalEntry, JournalItem
+from app.models.money import from_cents, to_cents
+from app.services.balance_service import BalanceService
+from app.services.hierarchy_service import HierarchyService
+from app.services.report_service import ReportService
+
+# Rows fetched from the cursor per batch
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "5000"))
+# Rows per Parquet row group; each group is held in memory while it is encoded
+EXPORT_ROW_GROUP_SIZE = int(os.getenv("EXPORT_ROW_GROUP_SIZE", "100000"))
+
+FORMATS = ("csv", "parquet")
+MEDIA_TYPES = {"csv": "text/csv", "csv.gz": "application/gzip", "parquet": "application/vnd.apache.parquet"}
+
+# (name, kind) with kind one of int, str, date, money
+Column = Tuple[str, str]
+
+LEDGER_COLUMNS: List[Column] = [
+    ("journal_entry_id", "int"),
+    ("date", "date"),
+    ("description", "str"),
+    ("journal_item_id", "int"),
+    ("account_id", "int"),
+    ("account_code", "str"),
+    ("account_name", "str"),
+    ("debit", "money"),
+    ("credit", "money"),
+]
+
+REPORTS = ("trial-balance", "income-statement", "balance-sheet", "consolidated")
+
+def _arrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError as e:
+        raise RuntimeError("Parquet export needs the pyarrow package") from e
+    return pyarrow
+
+class _Sink:
+    """
+    Write-only file object collecting what the Parquet writer produces, so it can be
+    passed on as it is written.
+    """
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def writable(self) -> bool:
+        return True
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+class ExportService:
+    @staticmethod
+    def check_format(format: str) -> None:
+        """
+        Raise ValueError for unknown formats and RuntimeError if the format's package is missing.
+        """
+        if format not in FORMATS:
+            raise ValueError(f"Unsupported export format: {format}")
+        if format == "parquet":
+            _arrow()
+
+    @staticmethod
+    def filename(name: str, format: str, compress: bool = False) -> str:
+        return f"{name}.{format}" + (".gz" if compress and format == "csv" else "")
+
+    @staticmethod
+    def media_type(format: str, compress: bool = False) -> str:
+        return MEDIA_TYPES["csv.gz" if compress and format == "csv" else format]
+
+    @staticmethod
+    def ledger_rows(
+        db: Session,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        account_id: Optional[int] = None,
+        include_subaccounts: bool = True,
+        batch_size: int = EXPORT_BATCH_SIZE,
+    ) -> Iterator[List[Tuple]]:
+        """
+        Yield journal items in date order, batch_size rows at a time, from a server-side cursor.
+        account_id limits the export to that account and, by default, its sub-accounts.
+        """
+        query = (
+            select(
+                JournalEntry.id, JournalEntry.entry_date, JournalEntry.description, JournalItem.id,
+                JournalItem.account_id, Account.account_code, Account.account_name, JournalItem.debit, JournalItem.credit,
+            )
+            .join(JournalItem, JournalItem.journal_entry_id == JournalEntry.id)
+            .join(Account, Account.id == JournalItem.account_id)
+            .order_by(JournalEntry.entry_date, JournalEntry.id, JournalItem.id)
+        )
+        if start_date is not None:
+            query = query.where(JournalEntry.entry_date >= datetime.combine(start_date, datetime.min.time()))
+        if end_date is not None:
+            # end_date is inclusive, so compare against the start of the following day
+            query = query.where(JournalEntry.entry_date < datetime.combine(end_date + timedelta(days=1), datetime.min.time()))
+        if account_id is not None:
+            if include_subaccounts:
+                subtree = select(AccountClosure.descendant_id).where(AccountClosure.ancestor_id == account_id)
+                query = query.where(or_(JournalItem.account_id == account_id, JournalItem.account_id.in_(subtree)))
+            else:
+                query = query.where(JournalItem.account_id == account_id)
+
+        # Plain rows on the session's connection skip the ORM's per-row loading
+        result = db.connection().execute(query.execution_options(stream_results=True, yield_per=batch_size))
+        for partition in result.partitions():
+            yield [
+                (entry_id, entry_date.date() if entry_date else None, description, item_id,
+                 item_account_id, account_code, account_name, debit, credit)
+                for entry_id, entry_date, description, item_id, item_account_id, account_code, account_name, debit, credit in partition
+            ]
+
+    @staticmethod
+    def report_table(db: Session, report: str, params: Dict[str, Any]) -> Tuple[List[Column], List[Tuple]]:
+        """
+        A report flattened to columns and rows: one row per account, plus section totals for
+        the period reports, whose amounts get one column per period.
+        """
+        if report == "trial-balance":
+            result = BalanceService.trial_balance(db, params.get("as_of"))
+            columns = [("account_id", "int"), ("account_code", "str"), ("account_name", "str"), ("account_type", "str"),
+                       ("debit", "money"), ("credit", "money")]
+            return columns, [tuple(row[name] for name, _ in columns) for row in result["accounts"]]
+
+        if report == "consolidated":
+            result = HierarchyService.consolidated(db, params.get("as_of"), params.get("account_id"))
+            if result is None:
+                raise LookupError("Account not found")
+            columns = [("account_id", "int"), ("parent_account_id", "int"), ("depth", "int"), ("account_code", "str"),
+                       ("account_name", "str"), ("account_type", "str"), ("own_balance", "money"), ("balance", "money")]
+            rows = []
+            pending = [(node, 0) for node in reversed(result["accounts"])]
+            while pending:
+                node, depth = pending.pop()
+                rows.append(tuple(depth if name == "depth" else node[name] for name, _ in columns))
+                pending.extend((child, depth + 1) for child in reversed(node["children"]))
+            return columns, rows
+
+        if report in ("income-statement", "balance-sheet"):
+            build = ReportService.income_statement if report == "income-statement" else ReportService.balance_sheet
+            result = build(db, params.get("start_date"), params.get("end_date"), params.get("granularity", "month"))
+            columns = [("section", "str"), ("account_id", "int"), ("account_code", "str"), ("account_name", "str")]
+            columns += [(str(period), "money") for period in result["periods"]]
+            rows = []
+            for section, content in result["sections"].items():
+                # The report's amounts are floats for JSON; exports carry them as exact decimals
+                for account in content["accounts"]:
+                    amounts = [from_cents(to_cents(value)) for value in account["values"]]
+                    rows.append((section, account["account_id"], account["account_code"], account["account_name"], *amounts))
+                rows.append((section, None, None, f"Total {section}", *(from_cents(to_cents(value)) for value in content["totals"])))
+            return columns, rows
+
+        raise ValueError(f"Unknown report: {report}")
+
+    @staticmethod
+    def csv_stream(columns: Sequence[Column], batches: Iterable[List[Tuple]], compress: bool = False) -> Iterator[bytes]:
+        """
+        Encode batches of rows as CSV with a header row, one chunk per batch, gzipped if compress.
+        """
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow([name for name, _ in columns])
+        for batch in batches:
+            writer.writerows(batch)
+            data = buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+            if compressor is not None:
+                data = compressor.compress(data)
+            if data:
+                yield data
+        data = buffer.getvalue().encode()
+        if compressor is not None:
+            data = compressor.compress(data) + compressor.flush()
+        if data:
+            yield data
+
+    @staticmethod
+    def parquet_stream(columns: Sequence[Column], batches: Iterable[List[Tuple]], row_group_size: int = EXPORT_ROW_GROUP_SIZE) -> Iterator[bytes]:
+        """
+        Encode batches of rows as Parquet, writing and passing on one row group of
+        row_group_size rows at a time. Amounts are exact decimals.
+        """
+        pa = _arrow()
+        types = {"int": pa.int64(), "str": pa.string(), "date": pa.date32(), "money": pa.decimal128(18, 2)}
+        schema = pa.schema([(name, types[kind]) for name, kind in columns])
+        sink = _Sink()
+        writer = pa.parquet.ParquetWriter(sink, schema)
+        # Each batch is converted to columnar arrays as it arrives, so a pending row group
+        # is held in Arrow's compact form rather than as Python tuples
+        group: List[Any] = []
+        pending = 0
+
+        def write_group() -> bytes:
+            writer.write_table(pa.Table.from_batches(group, schema=schema), row_group_size=row_group_size)
+            group.clear()
+            return sink.drain()
+
+        try:
+            for batch in batches:
+                if not batch:
+                    continue
+                values = list(zip(*batch))
+                table = pa.record_batch([pa.array(column, type=field.type) for column, field in zip(values, schema)], schema=schema)
+                while table.num_rows:
+                    take = min(row_group_size - pending, table.num_rows)
+                    group.append(table.slice(0, take))
+                    table, pending = table.slice(take), pending + take
+                    if pending == row_group_size:
+                        yield write_group()
+                        pending = 0
+            if group:
+                yield write_group()
+        finally:
+            writer.close()
+        yield sink.drain()
+
+    @staticmethod
+    def stream(format: str, columns: Sequence[Column], batches: Iterable[List[Tuple]], compress: bool = False) -> Iterator[bytes]:
+        if format == "parquet":
+            return ExportService.parquet_stream(columns, batches)
+        return ExportService.csv_stream(columns, batches, compress)
+
+    @staticmethod
+    def write(path: str, columns: Sequence[Column], batches: Iterable[List[Tuple]]) -> int:
+        """
+        Write an export to a local file, the format taken from its extension (.csv, .csv.gz or
+        .parquet). Returns the bytes written.
+        """
+        compress = path.endswith(".csv.gz")
+        format = "csv" if compress else os.path.splitext(path)[1].lstrip(".").lower()
+        ExportService.check_format(format)
+        written = 0
+        with open(path, "wb") as f:
+            for chunk in ExportService.stream(format, columns, batches, compress):
+                f.write(chunk)
+                written += len(chunk)
+        return written
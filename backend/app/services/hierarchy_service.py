@@ -0,0 +1,240 @@
+"""
+Chart of accounts hierarchy and roll-up balances.
+
+Accounts roll up into parents of the same type. Besides parent_account_id,
+account_closure stores every (ancestor, descendant) pair, so a subtree or an
+ancestor path is one indexed lookup however deep the tree is.
+account_rollup_balances holds each account's monthly totals including all of
+its descendants: BalanceService.apply adds postings to every account on the
+ancestor path in the posting's transaction, and moving an account shifts its
+subtree's totals from the old ancestors to the new ones. Consolidated
+balances therefore never walk the tree or sum descendants at read time.
+"""
+from typing import Dict, List, Optional, Tuple
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from sqlalchemy import delete, func, insert, or_, select, union_all
+from sqlalchemy.orm import Session
+
+from app.models.models import (
+    Account, AccountBalance, AccountClosingBalance, AccountClosure, AccountRollupBalance, AccountTypeEnum, JournalEntry, JournalItem,
+)
+from app.models.money import to_cents
+from app.services.balance_service import ZERO, BalanceService, period_of
+
+# Types whose balances are shown as debit minus credit
+DEBIT_NORMAL = {AccountTypeEnum.Asset, AccountTypeEnum.Expense}
+
+class HierarchyService:
+    @staticmethod
+    def ancestors(db: Session, account_id: int) -> Dict[int, int]:
+        """
+        {ancestor id: depth} of an account, its parent at depth 1.
+        """
+        rows = db.execute(
+            select(AccountClosure.ancestor_id, AccountClosure.depth).where(AccountClosure.descendant_id == account_id)
+        )
+        return dict(rows.all())
+
+    @staticmethod
+    def descendants(db: Session, account_id: int) -> Dict[int, int]:
+        """
+        {descendant id: depth} of an account, its children at depth 1.
+        """
+        rows = db.execute(
+            select(AccountClosure.descendant_id, AccountClosure.depth).where(AccountClosure.ancestor_id == account_id)
+        )
+        return dict(rows.all())
+
+    @staticmethod
+    def set_parent(db: Session, account: Account, parent_id: Optional[int]) -> None:
+        """
+        Move an account, with its subtree, under parent_id, or to the top level for None.
+        Raises ValueError for a missing parent, one of another type, or a cycle.
+        Runs inside the caller's transaction; the caller commits.
+        """
+        if parent_id == account.parent_account_id:
+            return
+        subtree = {account.id: 0, **HierarchyService.descendants(db, account.id)}
+        new_ancestors: Dict[int, int] = {}
+        if parent_id is not None:
+            parent = db.get(Account, parent_id)
+            if parent is None:
+                raise ValueError(f"Parent account {parent_id} not found")
+            if parent_id in subtree:
+                raise ValueError("An account cannot be moved under itself or one of its sub-accounts")
+            if parent.account_type != account.account_type:
+                raise ValueError("A sub-account must have the same account type as its parent")
+            new_ancestors = {parent_id: 1, **{ancestor_id: depth + 1 for ancestor_id, depth in HierarchyService.ancestors(db, parent_id).items()}}
+        old_ancestors = HierarchyService.ancestors(db, account.id)
+
+        # The account's roll-up is its subtree's total; take it off the old path and add it to the new one
+        deltas: Dict[Tuple[int, int], List[int]] = defaultdict(lambda: [0, 0])
+        rollups = db.execute(
+            select(AccountRollupBalance.period, AccountRollupBalance.debit_total, AccountRollupBalance.credit_total)
+            .where(AccountRollupBalance.account_id == account.id)
+        ).all()
+        for ancestor_ids, sign in ((old_ancestors, -1), (new_ancestors, 1)):
+            for ancestor_id in ancestor_ids:
+                for period, debit, credit in rollups:
+                    delta = deltas[(ancestor_id, period)]
+                    delta[0] += sign * to_cents(debit)
+                    delta[1] += sign * to_cents(credit)
+        BalanceService.add_totals(db, AccountRollupBalance, {key: delta for key, delta in deltas.items() if any(delta)})
+
+        if old_ancestors:
+            db.execute(
+                delete(AccountClosure)
+                .where(AccountClosure.descendant_id.in_(list(subtree)), AccountClosure.ancestor_id.in_(list(old_ancestors)))
+            )
+        if new_ancestors:
+            db.execute(insert(AccountClosure), [
+                {"ancestor_id": ancestor_id, "descendant_id": descendant_id, "depth": ancestor_depth + descendant_depth}
+                for ancestor_id, ancestor_depth in new_ancestors.items()
+                for descendant_id, descendant_depth in subtree.items()
+            ])
+        account.parent_account_id = parent_id
+
+    @staticmethod
+    def check_type(db: Session, account: Account) -> None:
+        """
+        Raise ValueError if the account's type differs from its parent's or a child's.
+        """
+        mismatched = db.execute(
+            select(func.count()).select_from(Account).where(
+                or_(Account.id == account.parent_account_id, Account.parent_account_id == account.id),
+                Account.account_type != account.account_type,
+            )
+        ).scalar()
+        if mismatched:
+            raise ValueError("A sub-account must have the same account type as its parent")
+
+    @staticmethod
+    def remove(db: Session, account: Account) -> None:
+        """
+        Take an account without sub-accounts or postings out of the hierarchy before it is deleted.
+        Raises ValueError if it still has either, since its balances would be left behind.
+        """
+        if db.execute(select(Account.id).where(Account.parent_account_id == account.id).limit(1)).first():
+            raise ValueError("Account has sub-accounts; move or delete them first")
+        posted = or_(
+            select(JournalItem.id).where(JournalItem.account_id == account.id).exists(),
+            select(AccountBalance.id).where(AccountBalance.account_id == account.id).exists(),
+            select(AccountClosingBalance.id).where(AccountClosingBalance.account_id == account.id).exists(),
+        )
+        if db.execute(select(posted)).scalar():
+            raise ValueError("Account has postings or balance history; it cannot be deleted")
+        HierarchyService.set_parent(db, account, None)
+        db.execute(delete(AccountRollupBalance).where(AccountRollupBalance.account_id == account.id))
+
+    @staticmethod
+    def rebuild(db: Session) -> None:
+        """
+        Recompute the closure table from the parent links, then the roll-ups from it.
+        Raises ValueError if the parent links contain a cycle.
+        """
+        parents = dict(db.execute(select(Account.id, Account.parent_account_id)).all())
+        rows = []
+        for account_id in parents:
+            ancestor_id, depth = parents[account_id], 1
+            while ancestor_id is not None:
+                if ancestor_id == account_id or depth > len(parents):
+                    raise ValueError(f"Account {account_id} is its own ancestor")
+                rows.append({"ancestor_id": ancestor_id, "descendant_id": account_id, "depth": depth})
+                ancestor_id, depth = parents.get(ancestor_id), depth + 1
+        db.execute(delete(AccountClosure))
+        if rows:
+            db.execute(insert(AccountClosure), rows)
+        BalanceService.rebuild_rollups(db)
+        db.commit()
+
+    @staticmethod
+    def rollup_totals(db: Session, as_of: Optional[date] = None, account_ids: Optional[List[int]] = None) -> Dict[int, Tuple[Decimal, Decimal]]:
+        """
+        Return {account_id: (total debit, total credit)} of each account and its descendants
+        up to and including as_of, optionally only for the given accounts. Whole months come
+        from the roll-up table; only the partial month of as_of reads raw items.
+        """
+        query = select(
+            AccountRollupBalance.account_id,
+            func.sum(AccountRollupBalance.debit_total),
+            func.sum(AccountRollupBalance.credit_total),
+        ).group_by(AccountRollupBalance.account_id)
+        if as_of is not None:
+            query = query.where(AccountRollupBalance.period < period_of(as_of))
+        if account_ids is not None:
+            query = query.where(AccountRollupBalance.account_id.in_(account_ids))
+        totals = {account_id: (debit or ZERO, credit or ZERO) for account_id, debit, credit in db.execute(query)}
+
+        if as_of is not None:
+            items = (
+                select(JournalItem.account_id, JournalItem.debit, JournalItem.credit)
+                .join(JournalEntry, JournalItem.journal_entry_id == JournalEntry.id)
+                .where(
+                    JournalEntry.entry_date >= datetime(as_of.year, as_of.month, 1),
+                    JournalEntry.entry_date < datetime.combine(as_of + timedelta(days=1), datetime.min.time()),
+                )
+                .subquery()
+            )
+            combined = union_all(
+                select(items.c.account_id, items.c.debit, items.c.credit),
+                select(AccountClosure.ancestor_id, items.c.debit, items.c.credit)
+                .join(AccountClosure, AccountClosure.descendant_id == items.c.account_id),
+            ).subquery()
+            partial = (
+                select(combined.c.account_id, func.sum(combined.c.debit), func.sum(combined.c.credit))
+                .group_by(combined.c.account_id)
+            )
+            if account_ids is not None:
+                partial = partial.where(combined.c.account_id.in_(account_ids))
+            for account_id, debit, credit in db.execute(partial):
+                prior_debit, prior_credit = totals.get(account_id, (ZERO, ZERO))
+                totals[account_id] = (prior_debit + (debit or ZERO), prior_credit + (credit or ZERO))
+        return totals
+
+    @staticmethod
+    def consolidated(db: Session, as_of: Optional[date] = None, root_id: Optional[int] = None) -> Optional[Dict]:
+        """
+        The chart of accounts as a tree with each account's own balance and the consolidated
+        balance of its subtree, for the whole chart or below root_id (None if it does not exist).
+        Balances are signed by the account type's normal side.
+        """
+        query = select(Account.id, Account.account_code, Account.account_name, Account.account_type, Account.parent_account_id)
+        account_ids = None
+        if root_id is not None:
+            subtree = select(AccountClosure.descendant_id).where(AccountClosure.ancestor_id == root_id)
+            query = query.where(or_(Account.id == root_id, Account.id.in_(subtree)))
+        accounts = db.execute(query.order_by(Account.account_code)).all()
+        if root_id is not None:
+            if not accounts:
+                return None
+            account_ids = [account.id for account in accounts]
+        totals = HierarchyService.rollup_totals(db, as_of, account_ids)
+
+        nodes = {}
+        for account_id, account_code, account_name, account_type, parent_id in accounts:
+            debit, credit = totals.get(account_id, (ZERO, ZERO))
+            sign = 1 if account_type in DEBIT_NORMAL else -1
+            nodes[account_id] = {
+                "account_id": account_id,
+                "account_code": account_code,
+                "account_name": account_name,
+                "account_type": account_type.name if account_type else None,
+                "parent_account_id": parent_id,
+                "debit": debit,
+                "credit": credit,
+                "balance": sign * (debit - credit),
+                "own_balance": sign * (debit - credit),
+                "children": [],
+            }
+        roots = []
+        for node in nodes.values():
+            parent = nodes.get(node["parent_account_id"]) if node["account_id"] != root_id else None
+            if parent is None:
+                roots.append(node)
+                continue
+            parent["children"].append(node)
+            parent["own_balance"] -= node["balance"]
+        return {"as_of": as_of.isoformat() if as_of else None, "accounts": roots}
@@ -0,0 +1,240 @@
+"""
+Invoice extraction pipeline for PDFs of any length.
+
+Each PDF is read page by page in a process pool (text extraction is
+CPU-bound), in ranges of INVOICE_PAGES_PER_TASK pages so long statements are
+spread across workers. Pages are packed into chunks within a token budget and
+every chunk is extracted by the model concurrently. Chunk results are then
+merged into one invoice: header fields from the first chunk that has them,
+the total from the last, and line items in page order.
+
+Progress is reported as a stream of events, which the API serves as SSE.
+"""
+from typing import AsyncIterator, Dict, Iterable, List, Optional
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import asyncio
+import json
+import multiprocessing
+import os
+import re
+import time
+
+from app.services import pdf_text
+from app.services.ai_cache import INVOICE_CHUNK, AICache
+from app.services.ai_service import AI_MAX_CONCURRENCY, AIService
+
+INVOICE_STORAGE_DIR = os.getenv(
+    "INVOICE_STORAGE_DIR", str(Path(__file__).resolve().parents[2] / "public" / "storage" / "invoices")
+)
+# Prompt budget for the document text of one chunk
+INVOICE_CHUNK_TOKENS = int(os.getenv("INVOICE_CHUNK_TOKENS", "3000"))
+# Worker processes parsing PDFs
+INVOICE_PARSE_WORKERS = int(os.getenv("INVOICE_PARSE_WORKERS", str(os.cpu_count() or 1)))
+INVOICE_PAGES_PER_TASK = 25
+
+HEADER_FIELDS = ("invoice_number", "date", "vendor", "currency")
+NUMBER = re.compile(r"-?\d+(?:\.\d+)?")
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+def _number(value) -> Optional[float]:
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = NUMBER.search(str(value or "").replace(",", ""))
+    return float(match.group()) if match else None
+
+class InvoicePipeline:
+    @staticmethod
+    def get_pool() -> ProcessPoolExecutor:
+        """
+        Shared parsing pool. Workers are spawned rather than forked so they never
+        inherit the server's threads or open connections.
+        """
+        global _pool
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=INVOICE_PARSE_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+    @staticmethod
+    def shutdown() -> None:
+        global _pool
+        if _pool is not None:
+            _pool.shutdown(cancel_futures=True)
+            _pool = None
+
+    @staticmethod
+    def resolve(names: Optional[Iterable[str]] = None, directory: str = INVOICE_STORAGE_DIR) -> List[str]:
+        """
+        Paths of the named PDFs in the storage directory, or of every PDF in it.
+        Raises ValueError for names that leave the directory or do not exist.
+        """
+        root = os.path.realpath(directory)
+        if names is None:
+            with os.scandir(root) as entries:
+                return sorted(entry.path for entry in entries if entry.is_file() and entry.name.lower().endswith(".pdf"))
+
+        paths = []
+        for name in names:
+            path = os.path.realpath(os.path.join(root, name))
+            if os.path.commonpath([root, path]) != root:
+                raise ValueError(f"{name} is outside the invoice directory")
+            if not os.path.isfile(path):
+                raise ValueError(f"{name} not found")
+            paths.append(path)
+        return paths
+
+    @staticmethod
+    def _prompt(chunk: Dict, pages: int) -> str:
+        return f"""
+            Extract invoice data from this part of a document (pages {chunk['first_page']}-{chunk['last_page']} of {pages}).
+            Reply with a JSON object of the form
+            {{"invoice_number": ..., "date": ..., "vendor": ..., "currency": ..., "total": <number or null>,
+              "line_items": [{{"description": ..., "quantity": ..., "unit_price": ..., "amount": ...}}]}}
+            Only include line items that appear in this part, and use null for fields it does not show.
+
+            Document text:
+            {chunk['text']}
+            """
+
+    @staticmethod
+    def _parse_reply(content: str) -> Dict:
+        text = content.strip()
+        if text.startswith("```"):
+            text = text.strip("`").split("\n", 1)[-1]
+        data = json.loads(text)
+        if not isinstance(data, dict):
+            raise ValueError("Expected a JSON object")
+        return data
+
+    @staticmethod
+    async def extract_chunk(chunk: Dict, pages: int, semaphore: asyncio.Semaphore) -> Dict:
+        """
+        Structured data for one chunk, from the cache when the same text was extracted before.
+        """
+        cached = await AICache.lookup(INVOICE_CHUNK, chunk["text"])
+        if cached:
+            return {"data": cached["result"], "cache": cached["cache"], "attempts": 0}
+        async with semaphore:
+            content, attempts = await AIService.chat([
+                {"role": "system", "content": "You are an expert at processing invoices. Reply with JSON only."},
+                {"role": "user", "content": InvoicePipeline._prompt(chunk, pages)}
+            ], json_output=True)
+        data = InvoicePipeline._parse_reply(content)
+        await AICache.store_many(INVOICE_CHUNK, [chunk["text"]], [data])
+        return {"data": data, "cache": None, "attempts": attempts}
+
+    @staticmethod
+    def merge(chunk_results: List[Dict]) -> Dict:
+        """
+        Combine chunk extractions, given in page order, into one invoice.
+        """
+        merged = {field: None for field in HEADER_FIELDS}
+        merged["total"] = None
+        line_items = []
+        for result in chunk_results:
+            for field in HEADER_FIELDS:
+                if merged[field] is None and result.get(field) not in (None, ""):
+                    merged[field] = result[field]
+            if _number(result.get("total")) is not None:
+                merged["total"] = _number(result["total"])
+            for item in result.get("line_items") or []:
+                if isinstance(item, dict):
+                    line_items.append({
+                        "description": item.get("description"),
+                        "quantity": _number(item.get("quantity")),
+                        "unit_price": _number(item.get("unit_price")),
+                        "amount": _number(item.get("amount")),
+                    })
+        merged["line_items"] = line_items
+        merged["line_items_total"] = round(sum(item["amount"] or 0 for item in line_items), 2)
+        return merged
+
+    @staticmethod
+    async def process_file(path: str, pool: ProcessPoolExecutor, semaphore: asyncio.Semaphore, emit, max_tokens: int) -> Dict:
+        loop = asyncio.get_running_loop()
+        name = os.path.basename(path)
+        start = time.perf_counter()
+        pages = await loop.run_in_executor(pool, pdf_text.page_count, path)
+        ranges = [(first, min(first + INVOICE_PAGES_PER_TASK, pages)) for first in range(0, pages, INVOICE_PAGES_PER_TASK)]
+        parsed = await asyncio.gather(*(
+            loop.run_in_executor(pool, pdf_text.parse_range, path, first, stop, max_tokens) for first, stop in ranges
+        ))
+        chunks = [chunk for chunk_list in parsed for chunk in chunk_list]
+        await emit({"event": "file_parsed", "file": name, "pages": pages, "chunks": len(chunks)})
+        if not chunks:
+            raise ValueError("No extractable text (scanned PDFs need OCR first)")
+
+        async def run(index: int, chunk: Dict) -> Dict:
+            result = await InvoicePipeline.extract_chunk(chunk, pages, semaphore)
+            await emit({
+                "event": "chunk_done",
+                "file": name,
+                "chunk": index + 1,
+                "chunks": len(chunks),
+                "pages": [chunk["first_page"], chunk["last_page"]],
+                "cache": result["cache"],
+            })
+            return result
+
+        results = await asyncio.gather(*(run(index, chunk) for index, chunk in enumerate(chunks)))
+        return {
+            "event": "file_done",
+            "file": name,
+            "status": "success",
+            "pages": pages,
+            "chunks": len(chunks),
+            "model_calls": sum(1 for result in results if result["cache"] is None),
+            "elapsed_ms": round((time.perf_counter() - start) * 1000, 1),
+            "invoice": InvoicePipeline.merge([result["data"] for result in results]),
+        }
+
+    @staticmethod
+    async def run(
+        paths: List[str],
+        concurrency: int = AI_MAX_CONCURRENCY,
+        max_tokens: int = INVOICE_CHUNK_TOKENS,
+        files_in_flight: Optional[int] = None,
+    ) -> AsyncIterator[Dict]:
+        """
+        Process PDFs and yield progress events as they happen, ending with a done event.
+        At most concurrency model calls and files_in_flight files are in progress at once,
+        so a directory of thousands of PDFs is streamed rather than loaded up front.
+        """
+        pool = InvoicePipeline.get_pool()
+        semaphore = asyncio.Semaphore(concurrency)
+        queue: asyncio.Queue = asyncio.Queue()
+        pending = iter(paths)
+        totals = {"files": len(paths), "failed": 0, "pages": 0, "chunks": 0, "model_calls": 0}
+        start = time.perf_counter()
+
+        async def worker() -> None:
+            for path in pending:
+                try:
+                    result = await InvoicePipeline.process_file(path, pool, semaphore, queue.put, max_tokens)
+                    totals["pages"] += result["pages"]
+                    totals["chunks"] += result["chunks"]
+                    totals["model_calls"] += result["model_calls"]
+                except Exception as e:
+                    # Malformed PDFs and failed model calls are reported per file without stopping the run
+                    totals["failed"] += 1
+                    result = {"event": "file_done", "file": os.path.basename(path), "status": "error", "error": f"{type(e).__name__}: {e}"}
+                await queue.put(result)
+
+        files_in_flight = files_in_flight or 2 * max(INVOICE_PARSE_WORKERS, concurrency)
+        workers = [asyncio.create_task(worker()) for _ in range(max(1, min(files_in_flight, len(paths))))]
+        finished = asyncio.ensure_future(asyncio.gather(*workers))
+        finished.add_done_callback(lambda _: queue.put_nowait(None))
+
+        yield {"event": "started", "files": len(paths)}
+        try:
+            while True:
+                event = await queue.get()
+                if event is None:
+                    break
+                yield event
+        finally:
+            # Stop work if the consumer goes away, e.g. the client closed the event stream
+            for task in workers:
+                task.cancel()
+        yield {"event": "done", **totals, "elapsed_ms": round((time.perf_counter() - start) * 1000, 1)}
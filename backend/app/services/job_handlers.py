@@ -0,0 +1,114 @@
+"""
+Handlers for each job kind. A handler is a coroutine taking the job's params
+and its JobContext and returning a JSON-serializable result. Functions run in
+the worker pool are top-level so they can be pickled; they open their own
+sessions, since connections cannot cross process boundaries.
+"""
+from typing import Any, Awaitable, Callable, Dict, Optional
+from contextlib import aclosing
+from datetime import date
+import codecs
+import os
+
+from fastapi.encoders import jsonable_encoder
+
+from app.cache import LEDGER, response_cache
+from app.database import SessionLocal
+from app.services.aging_service import AgingService
+from app.services.ai_service import AIService
+from app.services.balance_service import BalanceService
+from app.services.invoice_pipeline import InvoicePipeline
+from app.services.job_service import JobContext
+from app.services.journal_service import JournalService
+from app.services.report_service import ReportService
+
+def _date(value: Optional[str]) -> Optional[date]:
+    return date.fromisoformat(value) if value else None
+
+# Report name -> function of a session and the job params
+REPORTS: Dict[str, Callable[[Any, Dict], Dict]] = {
+    "trial_balance": lambda db, p: BalanceService.trial_balance(db, _date(p.get("as_of"))),
+    "income_statement": lambda db, p: ReportService.income_statement(
+        db, _date(p.get("start_date")), _date(p.get("end_date")), p.get("granularity", "month"), p.get("compare", False)
+    ),
+    "balance_sheet": lambda db, p: ReportService.balance_sheet(
+        db, _date(p.get("start_date")), _date(p.get("end_date")), p.get("granularity", "month")
+    ),
+    "cash_flow": lambda db, p: ReportService.cash_flow(
+        db, _date(p.get("start_date")), _date(p.get("end_date")), p.get("granularity", "month")
+    ),
+    "aging": lambda db, p: AgingService.aging(
+        db, p.get("type", "Receivable"), _date(p.get("as_of")) or date.today(), p.get("contact_id")
+    ),
+}
+
+def compute_report(params: Dict) -> Any:
+    """
+    Build a report in a worker process.
+    """
+    db = SessionLocal()
+    try:
+        return jsonable_encoder(REPORTS[params["report"]](db, params))
+    finally:
+        db.close()
+
+def import_journal_file(job_id: int, path: str, import_format: str, chunk_size: int) -> Dict:
+    """
+    Import an uploaded file in a worker process, reporting how far through the file it is.
+    Chunks committed before a cancellation stay imported.
+    """
+    context = JobContext(job_id)
+    size = os.path.getsize(path) or 1
+    db = SessionLocal()
+    try:
+        with open(path, "rb") as f:
+            rows = JournalService.parse(codecs.iterdecode(f, "utf-8"), import_format)
+            return JournalService.bulk_insert(
+                db, rows, chunk_size, progress=lambda inserted: context.report(f.tell() / size, f"{inserted} entries inserted")
+            )
+    finally:
+        db.close()
+
+async def report(params: Dict, context: JobContext) -> Any:
+    await context.progress(0.0, f"Computing {params['report']}", force=True)
+    return await context.run_cpu(compute_report, params)
+
+async def journal_import(params: Dict, context: JobContext) -> Dict:
+    try:
+        return await context.run_cpu(import_journal_file, context.job_id, params["path"], params["format"], params["chunk_size"])
+    finally:
+        # With CACHE_VERSIONS=memory, commits in the worker process do not reach this process's response cache
+        response_cache.bump(LEDGER)
+        if os.path.exists(params["path"]):
+            os.remove(params["path"])
+
+async def categorization(params: Dict, context: JobContext) -> Dict:
+    async def progress(done: int, total: int) -> None:
+        await context.progress(done / total, f"{done} of {total} batches")
+
+    return await AIService.suggest_categorizations(
+        params["transactions"],
+        accounts=params.get("accounts"),
+        batch_size=params["batch_size"],
+        concurrency=params["concurrency"],
+        progress=progress,
+    )
+
+async def invoice_extraction(params: Dict, context: JobContext) -> Dict:
+    paths = InvoicePipeline.resolve(params.get("files"))
+    files, summary = [], None
+    async with aclosing(InvoicePipeline.run(paths, concurrency=params["concurrency"], max_tokens=params["chunk_tokens"])) as events:
+        async for event in events:
+            if event["event"] == "file_done":
+                files.append(event)
+                await context.progress(len(files) / len(paths), f"{len(files)} of {len(paths)} files")
+            elif event["event"] == "done":
+                summary = event
+    return {"files": files, "summary": summary}
+
+HANDLERS: Dict[str, Callable[[Dict, JobContext], Awaitable[Any]]] = {
+    "report": report,
+    "journal_import": journal_import,
+    "categorization": categorization,
+    "invoice_extraction": invoice_extraction,
+}
@@ -0,0 +1,446 @@
+"""
+Background jobs for work that outlives a request: reports over long ranges,
+journal imports and AI batches.
+
+Jobs are rows in the jobs table, so their status, progress and result are
+visible to every API worker. The API inserts a job, hands its id to the
+configured queue and answers at once with the id. Handlers are coroutines in
+the queue's event loop; CPU-heavy steps go to a pool of spawned worker
+processes through JobContext.run_cpu.
+
+The local queue (JOB_QUEUE=local, the default) runs jobs as tasks in the API
+process that created them. With JOB_QUEUE=database the API only inserts rows
+and `python -m app.cli run-jobs` workers claim them, so jobs survive API
+restarts and can run on other machines, given JOB_STORAGE_DIR is storage they
+share with the API for uploaded imports. Tests can swap in their own queue
+with JobService.configure.
+
+Progress writes double as cancellation checks: once a job is cancelled, its
+next progress update stops it.
+
+A running job holds a lease: the process running it refreshes updated_at
+every third of JOB_LEASE_SECONDS. If that process dies, the lease runs out
+and the job is marked failed the next time any process claims a job or the
+job is read, rather than staying running forever. Jobs are failed rather than
+requeued because imports commit as they go and must not run twice.
+"""
+from typing import Any, Callable, Dict, List, Optional
+from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import time
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from app.database import AsyncSessionLocal, SessionLocal
+from app.models.models import Job
+
+logger = logging.getLogger(__name__)
+
+# local runs jobs inside the API process; database leaves them to `run-jobs` workers
+JOB_QUEUE = os.getenv("JOB_QUEUE", "local")
+# Jobs run at once per queue or worker
+JOB_CONCURRENCY = int(os.getenv("JOB_CONCURRENCY", "2"))
+# Processes for CPU-heavy job steps
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", str(os.cpu_count() or 1)))
+# Seconds a database worker sleeps when no job is queued
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "1"))
+# Uploaded files waiting to be imported
+JOB_STORAGE_DIR = os.getenv("JOB_STORAGE_DIR", str(Path(__file__).resolve().parents[2] / "data" / "jobs"))
+# Seconds without a heartbeat after which a running job is taken to have lost its process
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "300"))
+# Progress is written at most this often per job
+PROGRESS_INTERVAL_SECONDS = 0.5
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+_pool: Optional[ProcessPoolExecutor] = None
+# Contexts of the jobs running in this process, so a cancel can stop them without waiting for a progress write
+_running: Dict[int, "JobContext"] = {}
+
+class JobCancelled(Exception):
+    """
+    The job was cancelled while it ran.
+    """
+
+class JobContext:
+    """
+    Handle a running job uses to report progress and offload CPU work. It only
+    carries the job id, so it can be rebuilt in a worker process to report from there.
+    """
+    def __init__(self, job_id: int):
+        self.job_id = job_id
+        self.cancelled = False
+        self.task: Optional[asyncio.Task] = None
+        self._written = 0.0
+
+    def _due(self, force: bool) -> bool:
+        now = time.monotonic()
+        if not force and now - self._written < PROGRESS_INTERVAL_SECONDS:
+            return False
+        self._written = now
+        return True
+
+    def stop(self) -> None:
+        self.cancelled = True
+        if self.task is not None:
+            self.task.cancel()
+
+    async def progress(self, fraction: float, message: Optional[str] = None, force: bool = False) -> None:
+        """
+        Record progress from the event loop. Raises JobCancelled if the job was cancelled.
+        """
+        if self.cancelled:
+            raise JobCancelled(f"Job {self.job_id} was cancelled")
+        if not self._due(force):
+            return
+        async with AsyncSessionLocal() as db:
+            running = await db.run_sync(JobService.set_progress, self.job_id, fraction, message)
+        if not running:
+            self.stop()
+            raise JobCancelled(f"Job {self.job_id} was cancelled")
+
+    def report(self, fraction: float, message: Optional[str] = None, force: bool = False) -> None:
+        """
+        Record progress from synchronous code, e.g. inside a worker process.
+        """
+        if not self._due(force):
+            return
+        db = SessionLocal()
+        try:
+            running = JobService.set_progress(db, self.job_id, fraction, message)
+        finally:
+            db.close()
+        if not running:
+            raise JobCancelled(f"Job {self.job_id} was cancelled")
+
+    async def run_cpu(self, fn: Callable, *args) -> Any:
+        """
+        Run a picklable top-level function in the job worker pool.
+        """
+        return await asyncio.get_running_loop().run_in_executor(JobService.get_pool(), fn, *args)
+
+class JobQueue(ABC):
+    """
+    Where created jobs are sent. Subclass it to run jobs elsewhere, or inline in tests.
+    """
+    @abstractmethod
+    def submit(self, job_id: int) -> None:
+        """
+        Hand over a queued job; called right after it is created.
+        """
+
+    async def close(self) -> None:
+        pass
+
+class LocalJobQueue(JobQueue):
+    """
+    Runs jobs as asyncio tasks in this process, at most concurrency at a time.
+    """
+    def __init__(self, concurrency: int = JOB_CONCURRENCY):
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.tasks: Dict[int, asyncio.Task] = {}
+
+    def submit(self, job_id: int) -> None:
+        task = asyncio.get_running_loop().create_task(self._run(job_id))
+        self.tasks[job_id] = task
+        task.add_done_callback(lambda _: self.tasks.pop(job_id, None))
+
+    async def _run(self, job_id: int) -> None:
+        async with self.semaphore:
+            await JobService.run(job_id)
+
+    async def join(self) -> None:
+        """
+        Wait until every submitted job has finished.
+        """
+        while self.tasks:
+            await asyncio.gather(*list(self.tasks.values()), return_exceptions=True)
+
+    async def close(self) -> None:
+        tasks = list(self.tasks.items())
+        for _, task in tasks:
+            task.cancel()
+        await asyncio.gather(*(task for _, task in tasks), return_exceptions=True)
+        # Jobs this process was running will not resume; queued ones are left for a later run
+        async with AsyncSessionLocal() as db:
+            for job_id, _ in tasks:
+                await db.run_sync(JobService.finish, job_id, FAILED, error="Interrupted by server shutdown")
+
+class DatabaseJobQueue(JobQueue):
+    """
+    Leaves jobs in the table for `run-jobs` workers to claim.
+    """
+    def submit(self, job_id: int) -> None:
+        pass
+
+class JobService:
+    queue: Optional[JobQueue] = None
+
+    @staticmethod
+    def configure(queue: JobQueue) -> None:
+        """
+        Send new jobs to the given queue (e.g. one that runs them inline in tests).
+        """
+        JobService.queue = queue
+
+    @staticmethod
+    def get_queue() -> JobQueue:
+        if JobService.queue is None:
+            if JOB_QUEUE not in ("local", "database"):
+                raise ValueError(f"Unknown JOB_QUEUE: {JOB_QUEUE}")
+            JobService.queue = LocalJobQueue() if JOB_QUEUE == "local" else DatabaseJobQueue()
+        return JobService.queue
+
+    @staticmethod
+    def get_pool() -> ProcessPoolExecutor:
+        """
+        Shared pool for CPU-heavy steps, spawned rather than forked so workers never
+        inherit the server's threads or open connections.
+        """
+        global _pool
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=JOB_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+    @staticmethod
+    async def shutdown() -> None:
+        global _pool
+        if JobService.queue is not None:
+            await JobService.queue.close()
+        if _pool is not None:
+            _pool.shutdown(cancel_futures=True)
+            _pool = None
+
+    @staticmethod
+    def serialize(job: Job, include_result: bool = False) -> Dict:
+        data = {
+            "id": job.id,
+            "kind": job.kind,
+            "status": job.status,
+            "progress": job.progress,
+            "message": job.message,
+            "error": job.error,
+            "created_at": job.created_at,
+            "started_at": job.started_at,
+            "finished_at": job.finished_at,
+        }
+        if include_result:
+            data["result"] = json.loads(job.result) if job.result is not None else None
+        return data
+
+    @staticmethod
+    def create(db: Session, kind: str, params: Dict) -> Dict:
+        from app.services.job_handlers import HANDLERS
+
+        if kind not in HANDLERS:
+            raise ValueError(f"Unknown job kind: {kind}")
+        now = datetime.utcnow()
+        job = Job(kind=kind, status=QUEUED, params=json.dumps(params), progress=0.0, created_at=now, updated_at=now)
+        db.add(job)
+        db.commit()
+        return JobService.serialize(job)
+
+    @staticmethod
+    def get(db: Session, job_id: int, include_result: bool = False) -> Optional[Dict]:
+        JobService.expire(db, job_id)
+        job = db.get(Job, job_id)
+        return JobService.serialize(job, include_result) if job is not None else None
+
+    @staticmethod
+    def list_jobs(db: Session, status: Optional[str] = None, kind: Optional[str] = None, limit: int = 50) -> List[Dict]:
+        """
+        Most recent jobs first, without their results.
+        """
+        query = select(Job).order_by(Job.id.desc()).limit(limit)
+        if status is not None:
+            query = query.where(Job.status == status)
+        if kind is not None:
+            query = query.where(Job.kind == kind)
+        return [JobService.serialize(job) for job in db.execute(query).scalars()]
+
+    @staticmethod
+    def cancel(db: Session, job_id: int) -> Optional[Dict]:
+        """
+        Cancel a queued or running job. Finished jobs are returned unchanged; None if there is no such job.
+        A running job stops at its next progress update, or at once if it runs in this process.
+        """
+        now = datetime.utcnow()
+        db.execute(
+            update(Job)
+            .where(Job.id == job_id, Job.status.in_((QUEUED, RUNNING)))
+            .values(status=CANCELLED, finished_at=now, updated_at=now)
+        )
+        db.commit()
+        context = _running.get(job_id)
+        if context is not None:
+            context.stop()
+        return JobService.get(db, job_id)
+
+    @staticmethod
+    def expire(db: Session, job_id: Optional[int] = None, lease_seconds: float = JOB_LEASE_SECONDS) -> int:
+        """
+        Fail running jobs, the given one or all, whose lease ran out because the process
+        running them stopped. Returns how many were failed.
+        """
+        now = datetime.utcnow()
+        query = update(Job).where(Job.status == RUNNING, Job.updated_at < now - timedelta(seconds=lease_seconds))
+        if job_id is not None:
+            query = query.where(Job.id == job_id)
+        expired = db.execute(query.values(
+            status=FAILED, error=f"Worker stopped: no heartbeat for {lease_seconds:g} seconds", finished_at=now, updated_at=now,
+        )).rowcount
+        db.commit()
+        if expired:
+            logger.warning("Failed %s job(s) whose worker stopped", expired)
+        return expired
+
+    @staticmethod
+    def claim(db: Session, job_id: Optional[int] = None) -> Optional[Job]:
+        """
+        Mark a queued job as running, the given one or else the oldest. The update is
+        conditional on the job still being queued, so of several workers only one wins.
+        Jobs whose lease ran out are failed first.
+        """
+        JobService.expire(db)
+        while True:
+            if job_id is None:
+                candidate = db.execute(
+                    select(Job.id).where(Job.status == QUEUED).order_by(Job.id).limit(1)
+                ).scalar_one_or_none()
+                if candidate is None:
+                    return None
+            else:
+                candidate = job_id
+            now = datetime.utcnow()
+            claimed = db.execute(
+                update(Job)
+                .where(Job.id == candidate, Job.status == QUEUED)
+                .values(status=RUNNING, started_at=now, updated_at=now)
+            ).rowcount
+            db.commit()
+            if claimed:
+                return db.get(Job, candidate)
+            if job_id is not None:
+                return None
+
+    @staticmethod
+    def set_progress(db: Session, job_id: int, fraction: float, message: Optional[str] = None) -> bool:
+        """
+        Record progress of a running job. False if it is no longer running.
+        """
+        values = {"progress": min(max(fraction, 0.0), 1.0), "updated_at": datetime.utcnow()}
+        if message is not None:
+            values["message"] = message
+        updated = db.execute(update(Job).where(Job.id == job_id, Job.status == RUNNING).values(**values)).rowcount
+        db.commit()
+        return bool(updated)
+
+    @staticmethod
+    def heartbeat(db: Session, job_id: int) -> bool:
+        """
+        Renew a running job's lease. False if it is no longer running.
+        """
+        updated = db.execute(update(Job).where(Job.id == job_id, Job.status == RUNNING).values(updated_at=datetime.utcnow())).rowcount
+        db.commit()
+        return bool(updated)
+
+    @staticmethod
+    def finish(db: Session, job_id: int, status: str, result: Any = None, error: Optional[str] = None) -> bool:
+        """
+        Store the outcome of a running job; a job cancelled meanwhile keeps its cancelled status.
+        """
+        now = datetime.utcnow()
+        values = {"status": status, "error": error, "finished_at": now, "updated_at": now}
+        if status == SUCCEEDED:
+            values.update(progress=1.0, result=json.dumps(result))
+        updated = db.execute(update(Job).where(Job.id == job_id, Job.status == RUNNING).values(**values)).rowcount
+        db.commit()
+        return bool(updated)
+
+    @staticmethod
+    async def run(job_id: Optional[int] = None) -> Optional[str]:
+        """
+        Claim a job, the given one or the oldest queued, and run its handler to completion.
+        Returns the final status, or None if there was nothing to claim.
+        """
+        from app.services.job_handlers import HANDLERS
+
+        async with AsyncSessionLocal() as db:
+            job = await db.run_sync(JobService.claim, job_id)
+            if job is None:
+                return None
+            job_id, kind, params = job.id, job.kind, json.loads(job.params)
+
+        context = JobContext(job_id)
+        context.task = asyncio.ensure_future(HANDLERS[kind](params, context))
+        _running[job_id] = context
+        heartbeat = asyncio.ensure_future(JobService._heartbeat(context))
+        status, result, error = SUCCEEDED, None, None
+        try:
+            result = await context.task
+        except asyncio.CancelledError:
+            if not context.cancelled:
+                raise
+            status = CANCELLED
+        except JobCancelled:
+            status = CANCELLED
+        except Exception as e:
+            logger.exception("Job %s (%s) failed", job_id, kind)
+            status, error = FAILED, f"{type(e).__name__}: {e}"
+        finally:
+            heartbeat.cancel()
+            _running.pop(job_id, None)
+
+        if status != CANCELLED:
+            async with AsyncSessionLocal() as db:
+                await db.run_sync(JobService.finish, job_id, status, result, error)
+        return status
+
+    @staticmethod
+    async def _heartbeat(context: JobContext, interval: float = JOB_LEASE_SECONDS / 3) -> None:
+        """
+        Renew the job's lease until it finishes, even through long CPU steps that report no progress.
+        Stops the job if it is no longer running, e.g. cancelled or failed after a missed lease.
+        """
+        while True:
+            await asyncio.sleep(interval)
+            async with AsyncSessionLocal() as db:
+                running = await db.run_sync(JobService.heartbeat, context.job_id)
+            if not running:
+                context.stop()
+                return
+
+    @staticmethod
+    async def work(concurrency: int = JOB_CONCURRENCY, poll_seconds: float = JOB_POLL_SECONDS, once: bool = False) -> int:
+        """
+        Claim and run queued jobs, concurrency at a time, until cancelled. With once,
+        return when the queue is empty. Returns the number of jobs run.
+        """
+        ran = 0
+
+        async def runner() -> None:
+            nonlocal ran
+            while True:
+                status = await JobService.run()
+                if status is not None:
+                    ran += 1
+                    continue
+                if once:
+                    return
+                await asyncio.sleep(poll_seconds)
+
+        await asyncio.gather(*(runner() for _ in range(concurrency)))
+        return ran
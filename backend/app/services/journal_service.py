@@ -0,0 +1,459 @@
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from datetime import date, datetime, timedelta
+from decimal import Decimal, InvalidOperation
+import base64
+import csv
+import json
+
+from sqlalchemy import insert, select, tuple_
+from sqlalchemy.orm import Session, joinedload, selectinload
+from sqlalchemy.orm.exc import StaleDataError
+
+from app.models.models import Account, JournalEntry, JournalItem
+from app.models.money import from_cents, to_cents
+from app.services.balance_service import BalanceService
+from app.services.period_service import PeriodService
+
+# Number of entries loaded per round trip when streaming the ledger
+STREAM_CHUNK_SIZE = 500
+
+# Number of entries inserted per transaction by bulk imports
+BULK_CHUNK_SIZE = 1000
+
+# Columns expected in CSV imports, one row per journal item
+CSV_COLUMNS = ["entry_ref", "date", "description", "account_id", "debit", "credit"]
+
+class StaleEntryError(ValueError):
+    """
+    A journal entry changed after the client read it.
+    """
+
+class JournalService:
+    @staticmethod
+    def encode_cursor(entry: JournalEntry) -> str:
+        """
+        Build an opaque keyset cursor pointing just after the given entry.
+        """
+        raw = f"{entry.entry_date.isoformat()}|{entry.id}"
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+
+    @staticmethod
+    def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+        """
+        Parse a cursor produced by encode_cursor. Raises ValueError if it is malformed.
+        """
+        try:
+            entry_date, entry_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+            return datetime.fromisoformat(entry_date), int(entry_id)
+        except Exception as e:
+            raise ValueError("Invalid cursor") from e
+
+    @staticmethod
+    def build_query(
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        account_id: Optional[int] = None,
+        cursor: Optional[str] = None,
+    ):
+        """
+        Select journal entries ordered by (entry_date, id) with the given filters applied.
+        """
+        query = select(JournalEntry).options(selectinload(JournalEntry.journal_items))
+
+        if start_date is not None:
+            query = query.where(JournalEntry.entry_date >= datetime.combine(start_date, datetime.min.time()))
+        if end_date is not None:
+            # end_date is inclusive, so compare against the start of the following day
+            query = query.where(JournalEntry.entry_date < datetime.combine(end_date + timedelta(days=1), datetime.min.time()))
+        if account_id is not None:
+            query = query.where(
+                JournalEntry.id.in_(
+                    select(JournalItem.journal_entry_id).where(JournalItem.account_id == account_id)
+                )
+            )
+        if cursor is not None:
+            after_date, after_id = JournalService.decode_cursor(cursor)
+            query = query.where(tuple_(JournalEntry.entry_date, JournalEntry.id) > tuple_(after_date, after_id))
+
+        return query.order_by(JournalEntry.entry_date, JournalEntry.id)
+
+    @staticmethod
+    def fetch_page(
+        db: Session,
+        limit: int,
+        cursor: Optional[str] = None,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        account_id: Optional[int] = None,
+    ) -> Tuple[List[JournalEntry], Optional[str]]:
+        """
+        Fetch one page of journal entries and the cursor for the next page (None on the last page).
+        """
+        query = JournalService.build_query(start_date, end_date, account_id, cursor)
+        # Fetch one extra row to find out whether another page exists
+        entries = db.execute(query.limit(limit + 1)).scalars().all()
+        if len(entries) <= limit:
+            return entries, None
+        entries = entries[:limit]
+        return entries, JournalService.encode_cursor(entries[-1])
+
+    @staticmethod
+    def iter_entries(
+        db: Session,
+        cursor: Optional[str] = None,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        account_id: Optional[int] = None,
+        chunk_size: int = STREAM_CHUNK_SIZE,
+    ) -> Iterator[List[JournalEntry]]:
+        """
+        Yield matching journal entries in chunks of chunk_size, keeping at most one chunk in memory.
+        """
+        query = JournalService.build_query(start_date, end_date, account_id, cursor)
+        result = db.execute(query.execution_options(yield_per=chunk_size)).scalars()
+        for chunk in result.partitions():
+            yield chunk
+
+    @staticmethod
+    def serialize(entry: JournalEntry) -> Dict:
+        """
+        Convert a journal entry and its items into the JournalEntryResponse shape.
+        """
+        return {
+            "id": entry.id,
+            "date": entry.entry_date.date().isoformat() if entry.entry_date else None,
+            "description": entry.description,
+            "version": entry.version,
+            "items": [
+                {
+                    "id": item.id,
+                    "journal_entry_id": item.journal_entry_id,
+                    "account_id": item.account_id,
+                    "debit": item.debit,
+                    "credit": item.credit,
+                }
+                for item in entry.journal_items
+            ],
+        }
+
+    @staticmethod
+    def _load_entry(db: Session, journal_entry_id: int) -> Optional[JournalEntry]:
+        return db.query(JournalEntry).options(joinedload(JournalEntry.journal_items)).filter(JournalEntry.id == journal_entry_id).first()
+
+    @staticmethod
+    def get_entry(db: Session, journal_entry_id: int) -> Optional[Dict]:
+        """
+        Fetch one serialized journal entry, or None if it does not exist.
+        """
+        journal_entry = JournalService._load_entry(db, journal_entry_id)
+        return JournalService.serialize(journal_entry) if journal_entry is not None else None
+
+    @staticmethod
+    def _check_items(db: Session, entry_date: date, items: List[Dict]) -> List[Dict]:
+        """
+        Run validate_entry on one entry's items against the accounts they reference and return them normalized.
+        Raises ValueError if there are none, they post to unknown accounts or debits and credits differ by a cent.
+        """
+        referenced = sorted({item.get("account_id") for item in items if isinstance(item.get("account_id"), int)})
+        account_ids = set(db.execute(select(Account.id).where(Account.id.in_(referenced))).scalars())
+        return JournalService.validate_entry({"date": entry_date.isoformat(), "items": items}, account_ids)["items"]
+
+    @staticmethod
+    def create_entry(db: Session, entry_date: date, description: str, items: List[Dict], adjust_closed: bool = False) -> Dict:
+        """
+        Create a journal entry with its items and post them to the running balances in one transaction.
+        Raises ValueError if the items are empty, unbalanced or post to unknown accounts, and
+        ClosedPeriodError for dates in a closed period unless adjust_closed posts it as an adjusting entry.
+        """
+        items = JournalService._check_items(db, entry_date, items)
+        entry_date, description = PeriodService.route_entry(db, entry_date, description, adjust_closed)
+        entry_date = datetime.combine(entry_date, datetime.min.time())
+        db_journal_entry = JournalEntry(entry_date=entry_date, description=description)
+        db_journal_entry.journal_items = [JournalItem(**item) for item in items]
+        db.add(db_journal_entry)
+        # Flushed for the id only; the header commits together with its items and balances
+        db.flush()
+        BalanceService.apply(db, BalanceService.postings(entry_date, items))
+
+        db.commit()
+        db.refresh(db_journal_entry)
+        return JournalService.serialize(db_journal_entry)
+
+    @staticmethod
+    def update_entry(db: Session, journal_entry_id: int, entry_date: date, description: str, items: List[Dict],
+                     version: Optional[int] = None) -> Optional[Dict]:
+        """
+        Update a journal entry's date, description and items. Returns None if it does not exist.
+        Items with an id update that item, items without one are added, and existing items left out
+        are deleted. Raises ClosedPeriodError if the old or new date is in a closed period,
+        StaleEntryError if version is given and the entry has changed since, and ValueError for
+        item ids that are not on the entry or items that do not balance.
+        """
+        checked = JournalService._check_items(db, entry_date, items)
+        items = [dict(normalized, id=item.get("id")) for item, normalized in zip(items, checked)]
+        db_journal_entry = JournalService._load_entry(db, journal_entry_id)
+        if db_journal_entry is None:
+            return None
+        if version is not None and db_journal_entry.version != version:
+            raise StaleEntryError(f"Journal entry {journal_entry_id} is at version {db_journal_entry.version}, not {version}")
+        new_date = datetime.combine(entry_date, datetime.min.time())
+        PeriodService.check_open(db, [db_journal_entry.entry_date, new_date])
+
+        existing = {item.id: item for item in db_journal_entry.journal_items}
+        kept = [item["id"] for item in items if item.get("id") is not None]
+        kept_ids = set(kept)
+        unknown = sorted(kept_ids - existing.keys())
+        if unknown:
+            raise ValueError(f"Journal items {unknown} do not belong to entry {journal_entry_id}")
+        if len(kept) != len(kept_ids):
+            raise ValueError("Each journal item id may appear only once")
+
+        # Pair each incoming item with the row it updates, or None for a new row
+        changes = []
+        for item in items:
+            fields = {key: value for key, value in item.items() if key != "id"}
+            db_item = existing.get(item.get("id"))
+            if db_item is not None and all(getattr(db_item, key) == value for key, value in fields.items()):
+                fields = None
+            changes.append((db_item, fields))
+        removed = [db_item for item_id, db_item in existing.items() if item_id not in kept_ids]
+
+        # Only changed lines move the balances, unless the whole entry moves to another date
+        if new_date != db_journal_entry.entry_date:
+            reversed_items = list(existing.values())
+            posted_items = [fields or db_item for db_item, fields in changes]
+        else:
+            reversed_items = [db_item for db_item, fields in changes if db_item is not None and fields is not None] + removed
+            posted_items = [fields for _, fields in changes if fields is not None]
+        postings = [
+            (account_id, posted, -debit, -credit)
+            for account_id, posted, debit, credit in BalanceService.postings(db_journal_entry.entry_date, reversed_items)
+        ]
+        postings += BalanceService.postings(new_date, posted_items)
+        # Runs before any ORM change so the item writes below go out in a single flush
+        BalanceService.apply(db, postings)
+
+        for db_item, fields in changes:
+            if db_item is None:
+                db_journal_entry.journal_items.append(JournalItem(**fields))
+            elif fields is not None:
+                for key, value in fields.items():
+                    setattr(db_item, key, value)
+        for db_item in removed:
+            db_journal_entry.journal_items.remove(db_item)
+            db.delete(db_item)
+        db_journal_entry.entry_date = new_date
+        db_journal_entry.description = description
+        # Always UPDATE the entry row, so item-only edits also bump and check its version
+        db_journal_entry.updated_at = datetime.utcnow()
+
+        try:
+            db.commit()
+        except StaleDataError as e:
+            db.rollback()
+            raise StaleEntryError(f"Journal entry {journal_entry_id} was changed by another request") from e
+        db.refresh(db_journal_entry)
+        return JournalService.serialize(db_journal_entry)
+
+    @staticmethod
+    def delete_entry(db: Session, journal_entry_id: int) -> bool:
+        """
+        Delete a journal entry and its items, reversing their postings. Returns False if it does not exist.
+        Raises ClosedPeriodError if the entry is in a closed period.
+        """
+        db_journal_entry = JournalService._load_entry(db, journal_entry_id)
+        if db_journal_entry is None:
+            return False
+        PeriodService.check_open(db, [db_journal_entry.entry_date])
+        BalanceService.apply(db, BalanceService.postings(db_journal_entry.entry_date, db_journal_entry.journal_items), sign=-1)
+        for db_item in db_journal_entry.journal_items:
+            db.delete(db_item)
+        db.delete(db_journal_entry)
+        db.commit()
+        return True
+
+    @staticmethod
+    def stream_ndjson(db: Session, **filters) -> Iterator[bytes]:
+        """
+        Serialize matching journal entries as newline-delimited JSON, one chunk at a time.
+        """
+        for chunk in JournalService.iter_entries(db, **filters):
+            # Decimal amounts are written as JSON numbers, matching the JSON responses
+            yield "".join(json.dumps(JournalService.serialize(entry), default=float) + "\n" for entry in chunk).encode()
+
+    @staticmethod
+    def parse_jsonl(lines: Iterable[str]) -> Iterator[Tuple[int, Any]]:
+        """
+        Parse JSON-lines input into (line number, entry) pairs. Undecodable lines yield a ValueError instead of an entry.
+        """
+        for line_number, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                # Parse amounts straight to Decimal so they never pass through float
+                yield line_number, json.loads(line, parse_float=Decimal)
+            except json.JSONDecodeError as e:
+                yield line_number, ValueError(f"Invalid JSON: {e.msg}")
+
+    @staticmethod
+    def parse_csv(lines: Iterable[str]) -> Iterator[Tuple[int, Any]]:
+        """
+        Parse CSV input with one journal item per row into (line number, entry) pairs.
+        Consecutive rows sharing an entry_ref form one entry.
+        """
+        reader = csv.DictReader(lines)
+        missing = set(CSV_COLUMNS) - set(reader.fieldnames or [])
+        if missing:
+            yield 1, ValueError(f"Missing CSV columns: {', '.join(sorted(missing))}")
+            return
+
+        current_ref, current_line, current_entry = None, None, None
+        for row in reader:
+            if row["entry_ref"] != current_ref:
+                if current_entry is not None:
+                    yield current_line, current_entry
+                current_ref, current_line = row["entry_ref"], reader.line_num
+                current_entry = {"date": row["date"], "description": row["description"], "items": []}
+            if isinstance(current_entry, Exception):
+                continue
+            try:
+                current_entry["items"].append({
+                    "account_id": int(row["account_id"]),
+                    "debit": Decimal(row["debit"] or 0),
+                    "credit": Decimal(row["credit"] or 0),
+                })
+            except (TypeError, ValueError, InvalidOperation):
+                current_entry = ValueError(f"Invalid amount or account_id on line {reader.line_num}")
+        if current_entry is not None:
+            yield current_line, current_entry
+
+    @staticmethod
+    def parse(lines: Iterable[str], format: str) -> Iterator[Tuple[int, Any]]:
+        """
+        Parse bulk import input in the given format ("jsonl" or "csv").
+        """
+        if format == "jsonl":
+            return JournalService.parse_jsonl(lines)
+        if format == "csv":
+            return JournalService.parse_csv(lines)
+        raise ValueError(f"Unsupported import format: {format}")
+
+    @staticmethod
+    def detect_format(filename: Optional[str]) -> str:
+        """
+        Guess the bulk import format from a file name, defaulting to JSON-lines.
+        """
+        if filename and filename.lower().endswith(".csv"):
+            return "csv"
+        return "jsonl"
+
+    @staticmethod
+    def validate_entry(entry: Any, account_ids: set, closed_through: Optional[int] = None) -> Dict:
+        """
+        Check a raw entry payload and normalize it for insertion. Raises ValueError describing the first problem found.
+        Entries dated in or before the closed_through period are rejected.
+        """
+        if isinstance(entry, Exception):
+            raise entry
+        if not isinstance(entry, dict):
+            raise ValueError("Entry must be an object")
+        try:
+            entry_date = datetime.fromisoformat(str(entry["date"]))
+        except (KeyError, ValueError):
+            raise ValueError("Missing or invalid date")
+        if closed_through is not None:
+            PeriodService.check_open(None, [entry_date], closed_through)
+
+        items = entry.get("items") or []
+        if not items:
+            raise ValueError("Entry has no items")
+
+        normalized_items = []
+        total_debit = total_credit = 0
+        for item in items:
+            try:
+                account_id = int(item["account_id"])
+                debit = to_cents(item.get("debit") or 0)
+                credit = to_cents(item.get("credit") or 0)
+            except ValueError as e:
+                raise ValueError(f"Invalid item: {e}")
+            except (KeyError, TypeError, InvalidOperation):
+                raise ValueError("Invalid item")
+            if account_id not in account_ids:
+                raise ValueError(f"Unknown account_id {account_id}")
+            if debit < 0 or credit < 0:
+                raise ValueError("Debit and credit must not be negative")
+            total_debit += debit
+            total_credit += credit
+            normalized_items.append({"account_id": account_id, "debit": from_cents(debit), "credit": from_cents(credit)})
+
+        if total_debit != total_credit:
+            raise ValueError(f"Debits ({from_cents(total_debit)}) do not equal credits ({from_cents(total_credit)})")
+
+        return {
+            "entry_date": entry_date,
+            "description": entry.get("description") or "",
+            "items": normalized_items,
+        }
+
+    @staticmethod
+    def _insert_chunk(db: Session, chunk: List[Dict]) -> None:
+        now = datetime.utcnow()
+        entry_ids = db.execute(
+            insert(JournalEntry).returning(JournalEntry.id, sort_by_parameter_order=True),
+            [
+                {"entry_date": entry["entry_date"], "description": entry["description"], "created_at": now, "updated_at": now}
+                for entry in chunk
+            ],
+        ).scalars().all()
+        db.execute(
+            insert(JournalItem),
+            [
+                {"journal_entry_id": entry_id, **item}
+                for entry_id, entry in zip(entry_ids, chunk)
+                for item in entry["items"]
+            ],
+        )
+        BalanceService.apply(db, [
+            posting
+            for entry in chunk
+            for posting in BalanceService.postings(entry["entry_date"], entry["items"])
+        ])
+        db.commit()
+
+    @staticmethod
+    def bulk_insert(
+        db: Session,
+        rows: Iterable[Tuple[int, Any]],
+        chunk_size: int = BULK_CHUNK_SIZE,
+        progress: Optional[Callable[[int], None]] = None,
+    ) -> Dict:
+        """
+        Validate and insert parsed entries, committing once per chunk_size entries.
+        Invalid rows are skipped and reported individually. progress, if given, is
+        called with the running total after each commit.
+        """
+        account_ids = set(db.execute(select(Account.id)).scalars())
+        closed_through = BalanceService.latest_close(db)
+        inserted = 0
+        errors = []
+        chunk = []
+
+        for row_number, entry in rows:
+            try:
+                chunk.append(JournalService.validate_entry(entry, account_ids, closed_through))
+            except ValueError as e:
+                errors.append({"row": row_number, "error": str(e)})
+                continue
+            if len(chunk) >= chunk_size:
+                JournalService._insert_chunk(db, chunk)
+                inserted += len(chunk)
+                chunk = []
+                if progress is not None:
+                    progress(inserted)
+
+        if chunk:
+            JournalService._insert_chunk(db, chunk)
+            inserted += len(chunk)
+
+        return {"inserted": inserted, "failed": len(errors), "errors": errors}
@@ -0,0 +1,83 @@
+"""
+PDF text extraction and token-budget chunking for the invoice pipeline.
+
+These functions run in worker processes, so they take and return plain,
+picklable values and only import what parsing needs. Requires the pypdf package.
+"""
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+# Rough prompt-size estimate; close enough for budgeting without a tokenizer
+CHARS_PER_TOKEN = 4
+
+def _reader(path: str):
+    try:
+        from pypdf import PdfReader
+    except ImportError as e:
+        raise RuntimeError("Reading PDFs requires the pypdf package") from e
+    return PdfReader(path)
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+def page_count(path: str) -> int:
+    return len(_reader(path).pages)
+
+def iter_pages(path: str, start: int = 0, stop: int = None) -> Iterator[Tuple[int, str]]:
+    """
+    Yield (page number, text) one page at a time, numbered from 1.
+    """
+    reader = _reader(path)
+    stop = len(reader.pages) if stop is None else min(stop, len(reader.pages))
+    for index in range(start, stop):
+        yield index + 1, reader.pages[index].extract_text() or ""
+
+def _split_page(text: str, max_chars: int) -> List[str]:
+    """
+    Break an oversized page on line boundaries, hard-splitting only lines longer than the budget.
+    """
+    pieces, current = [], ""
+    for line in text.splitlines(keepends=True):
+        while len(line) > max_chars:
+            if current:
+                pieces.append(current)
+                current = ""
+            pieces.append(line[:max_chars])
+            line = line[max_chars:]
+        if current and len(current) + len(line) > max_chars:
+            pieces.append(current)
+            current = ""
+        current += line
+    if current:
+        pieces.append(current)
+    return pieces
+
+def chunk_pages(pages: Iterable[Tuple[int, str]], max_tokens: int) -> Iterator[Dict]:
+    """
+    Pack consecutive pages into chunks of at most max_tokens, keeping pages whole where they fit.
+    Each chunk has first_page, last_page and text.
+    """
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    current, first_page, last_page = [], None, None
+    size = 0
+    for page_number, text in pages:
+        text = text.strip()
+        if not text:
+            continue
+        pieces = [text] if len(text) <= max_chars else _split_page(text, max_chars)
+        for piece in pieces:
+            if current and size + len(piece) + 2 > max_chars:
+                yield {"first_page": first_page, "last_page": last_page, "text": "\n\n".join(current)}
+                current, first_page, size = [], None, 0
+            if first_page is None:
+                first_page = page_number
+            current.append(piece)
+            last_page = page_number
+            size += len(piece) + 2
+    if current:
+        yield {"first_page": first_page, "last_page": last_page, "text": "\n\n".join(current)}
+
+def parse_range(path: str, start: int, stop: int, max_tokens: int) -> List[Dict]:
+    """
+    Chunks for pages [start, stop) of one PDF. Runs in a worker process.
+    """
+    return list(chunk_pages(iter_pages(path, start, stop), max_tokens))
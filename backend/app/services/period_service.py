@@ -0,0 +1,167 @@
+"""
+Fiscal period close.
+
+Closing a YYYYMM period locks it and every earlier period, and snapshots each
+account's totals of all postings up to the end of the period into
+account_closing_balances. The snapshot is built from the previous snapshot
+plus the monthly account_balances buckets since it, so closing costs one
+period's worth of rows. Reports then start from the latest snapshot and only
+add what was posted after it.
+
+Journal writes dated in a closed period raise ClosedPeriodError; new entries
+can instead be posted as adjusting entries on the first day of the first open
+period.
+"""
+from typing import Dict, Iterable, List, Optional, Tuple
+from datetime import date, datetime
+
+from sqlalchemy import delete, func, insert, literal, select, union_all
+from sqlalchemy.orm import Session
+
+from app.models.models import AccountBalance, AccountClosingBalance, PeriodClose
+from app.services.balance_service import ZERO, BalanceService, period_of
+
+class ClosedPeriodError(ValueError):
+    """
+    A write would change a closed period.
+    """
+
+def format_period(period: int) -> str:
+    return f"{period // 100:04d}-{period % 100:02d}"
+
+def parse_period(value: str) -> int:
+    """
+    Parse YYYY-MM into a YYYYMM integer.
+    """
+    try:
+        parsed = datetime.strptime(value, "%Y-%m")
+    except ValueError as e:
+        raise ValueError(f"Invalid period {value!r}, expected YYYY-MM") from e
+    return parsed.year * 100 + parsed.month
+
+def first_day_after(period: int) -> date:
+    year, month = divmod(period, 100)
+    return date(year + month // 12, month % 12 + 1, 1)
+
+class PeriodService:
+    @staticmethod
+    def check_open(db: Session, dates: Iterable[date], closed_through: Optional[int] = None) -> None:
+        """
+        Raise ClosedPeriodError if any of the dates falls in a closed period.
+        """
+        if closed_through is None:
+            closed_through = BalanceService.latest_close(db)
+        if closed_through is None:
+            return
+        for value in dates:
+            if period_of(value) <= closed_through:
+                raise ClosedPeriodError(
+                    f"{value:%Y-%m-%d} is in a closed period (closed through {format_period(closed_through)})"
+                )
+
+    @staticmethod
+    def route_entry(db: Session, entry_date: date, description: str, adjust_closed: bool = False) -> Tuple[date, str]:
+        """
+        Date and description to post a new entry under. Entries dated in a closed period are
+        rejected, or with adjust_closed become adjusting entries in the first open period.
+        """
+        closed_through = BalanceService.latest_close(db)
+        if closed_through is None or period_of(entry_date) > closed_through:
+            return entry_date, description
+        if not adjust_closed:
+            PeriodService.check_open(db, [entry_date], closed_through)
+        return first_day_after(closed_through), f"Adjustment for {entry_date:%Y-%m-%d}: {description}"
+
+    @staticmethod
+    def close(db: Session, period: int) -> Dict:
+        """
+        Close period and every earlier one, snapshotting account totals at its end.
+        Raises ValueError if period is not after the latest close.
+        """
+        previous = BalanceService.latest_close(db)
+        if previous is not None and period <= previous:
+            raise ValueError(f"Periods through {format_period(previous)} are already closed")
+
+        # Previous snapshot plus the monthly buckets since it, summed per account in one statement
+        rows = [
+            select(AccountBalance.account_id, AccountBalance.debit_total, AccountBalance.credit_total)
+            .where(AccountBalance.period <= period, *([AccountBalance.period > previous] if previous is not None else []))
+        ]
+        if previous is not None:
+            rows.append(
+                select(AccountClosingBalance.account_id, AccountClosingBalance.debit_total, AccountClosingBalance.credit_total)
+                .where(AccountClosingBalance.period == previous)
+            )
+        combined = union_all(*rows).subquery()
+        db.execute(
+            insert(AccountClosingBalance).from_select(
+                ["period", "account_id", "debit_total", "credit_total"],
+                select(
+                    literal(period),
+                    combined.c.account_id,
+                    func.sum(combined.c.debit_total),
+                    func.sum(combined.c.credit_total),
+                ).group_by(combined.c.account_id),
+            )
+        )
+        db.add(PeriodClose(period=period))
+        db.commit()
+        return PeriodService.describe(db, period)
+
+    @staticmethod
+    def reopen(db: Session, period: int) -> None:
+        """
+        Reopen the most recent close. Raises LookupError if period is not closed and
+        ValueError if a later close depends on it.
+        """
+        latest = BalanceService.latest_close(db)
+        if latest is None or db.execute(select(PeriodClose.id).where(PeriodClose.period == period)).scalar() is None:
+            raise LookupError(f"{format_period(period)} is not a closed period")
+        if period != latest:
+            raise ValueError(f"Reopen {format_period(latest)} first")
+        db.execute(delete(AccountClosingBalance).where(AccountClosingBalance.period == period))
+        db.execute(delete(PeriodClose).where(PeriodClose.period == period))
+        db.commit()
+
+    @staticmethod
+    def describe(db: Session, period: int) -> Dict:
+        close = db.execute(select(PeriodClose).where(PeriodClose.period == period)).scalar_one()
+        totals = BalanceService.closing_totals(db, period)
+        return {
+            "period": format_period(period),
+            "closed_at": close.closed_at,
+            "accounts": len(totals),
+            "debit_total": sum((debit for debit, _ in totals.values()), ZERO),
+            "credit_total": sum((credit for _, credit in totals.values()), ZERO),
+        }
+
+    @staticmethod
+    def list_closes(db: Session) -> List[Dict]:
+        closes = db.execute(select(PeriodClose.period, PeriodClose.closed_at).order_by(PeriodClose.period)).all()
+        return [{"period": format_period(period), "closed_at": closed_at} for period, closed_at in closes]
+
+    @staticmethod
+    def verify(db: Session) -> List[Dict]:
+        """
+        Compare every closing snapshot against the balance table and return any mismatches.
+        """
+        mismatches = []
+        for (period,) in db.execute(select(PeriodClose.period).order_by(PeriodClose.period)).all():
+            expected = {
+                account_id: (debit or ZERO, credit or ZERO)
+                for account_id, debit, credit in db.execute(
+                    select(AccountBalance.account_id, func.sum(AccountBalance.debit_total), func.sum(AccountBalance.credit_total))
+                    .where(AccountBalance.period <= period)
+                    .group_by(AccountBalance.account_id)
+                )
+            }
+            actual = BalanceService.closing_totals(db, period)
+            for account_id in sorted(expected.keys() | actual.keys()):
+                if expected.get(account_id, (ZERO, ZERO)) != actual.get(account_id, (ZERO, ZERO)):
+                    mismatches.append({
+                        "period": format_period(period),
+                        "account_id": account_id,
+                        "expected": expected.get(account_id, (ZERO, ZERO)),
+                        "actual": actual.get(account_id, (ZERO, ZERO)),
+                    })
+        return mismatches
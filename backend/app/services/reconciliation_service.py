@@ -0,0 +1,464 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+from collections import Counter
+from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation
+import csv
+import io
+import re
+
+import numpy as np
+from sqlalchemy import BigInteger, func, insert, select, type_coerce
+from sqlalchemy.orm import Session
+
+from app.models.models import Account, BankReconciliation, BankStatementLine, JournalEntry, JournalItem, ReconciliationMatch
+from app.models.money import from_cents, to_cents
+
+# Days either side of a statement line searched for an exact amount match
+DATE_WINDOW_DAYS = 3
+
+# Wider window and amount tolerance for near matches (bank fees, late posting)
+NEAR_DATE_WINDOW_DAYS = 7
+AMOUNT_TOLERANCE = Decimal("1.00")
+
+# Statement lines inserted per round trip on import
+IMPORT_CHUNK_SIZE = 5000
+
+# Columns expected in CSV statements; description and reference are optional
+STATEMENT_CSV_COLUMNS = ["date", "amount"]
+
+# (id, day ordinal, signed amount in cents)
+Line = Tuple[int, int, int]
+
+# (statement_line_id, journal_item_id, match_type)
+Match = Tuple[int, int, str]
+
+# Ledger ids, days and amounts as parallel int64 arrays
+LedgerArrays = Tuple[np.ndarray, np.ndarray, np.ndarray]
+
+# Bits reserved for the day in the combined (amount, day) sort key
+DAY_BITS = 20
+
+OFX_TRANSACTION = re.compile(r"<STMTTRN>(.*?)</STMTTRN>", re.S | re.I)
+OFX_FIELD = re.compile(r"<(\w+)>([^<\r\n]*)")
+
+def _cents(expression):
+    return type_coerce(expression, BigInteger)
+
+def _line(line_id: int, value: datetime, cents: int) -> Line:
+    return int(line_id), value.toordinal(), int(cents)
+
+class ReconciliationService:
+    @staticmethod
+    def parse_csv(lines: Iterable[str]) -> List[Dict]:
+        """
+        Parse a CSV statement with date and signed amount columns.
+        Raises ValueError naming the first invalid line.
+        """
+        reader = csv.DictReader(lines)
+        missing = set(STATEMENT_CSV_COLUMNS) - set(reader.fieldnames or [])
+        if missing:
+            raise ValueError(f"Missing CSV columns: {', '.join(sorted(missing))}")
+
+        statement = []
+        for row in reader:
+            try:
+                amount = Decimal(row["amount"].strip())
+                to_cents(amount)
+                transaction_date = datetime.fromisoformat(row["date"].strip())
+            except (AttributeError, ValueError, InvalidOperation):
+                raise ValueError(f"Invalid date or amount on line {reader.line_num}")
+            statement.append({
+                "transaction_date": transaction_date,
+                "amount": amount,
+                "description": row.get("description"),
+                "reference": row.get("reference"),
+            })
+        return statement
+
+    @staticmethod
+    def parse_ofx(text: str) -> List[Dict]:
+        """
+        Parse the STMTTRN records of an OFX/QFX statement (SGML or XML flavour).
+        """
+        statement = []
+        for number, block in enumerate(OFX_TRANSACTION.findall(text), start=1):
+            fields = {tag.upper(): value.strip() for tag, value in OFX_FIELD.findall(block)}
+            try:
+                amount = Decimal(fields["TRNAMT"])
+                to_cents(amount)
+                transaction_date = datetime.strptime(fields["DTPOSTED"][:8], "%Y%m%d")
+            except (KeyError, ValueError, InvalidOperation):
+                raise ValueError(f"Invalid OFX transaction {number}")
+            statement.append({
+                "transaction_date": transaction_date,
+                "amount": amount,
+                "description": fields.get("NAME") or fields.get("MEMO"),
+                "reference": fields.get("FITID"),
+            })
+        return statement
+
+    @staticmethod
+    def detect_format(filename: Optional[str]) -> str:
+        if filename and filename.lower().endswith((".ofx", ".qfx")):
+            return "ofx"
+        return "csv"
+
+    @staticmethod
+    def parse(text: str, format: str) -> List[Dict]:
+        """
+        Parse statement text in the given format ("csv" or "ofx").
+        """
+        if format == "csv":
+            return ReconciliationService.parse_csv(io.StringIO(text))
+        if format == "ofx":
+            return ReconciliationService.parse_ofx(text)
+        raise ValueError(f"Unsupported statement format: {format}")
+
+    @staticmethod
+    def create_reconciliation(db: Session, account_id: int, statement_date: datetime, statement_balance: Decimal) -> Optional[BankReconciliation]:
+        """
+        Open a reconciliation for a bank account. Returns None if the account does not exist.
+        """
+        if db.get(Account, account_id) is None:
+            return None
+        reconciliation = BankReconciliation(
+            account_id=account_id,
+            statement_date=statement_date,
+            statement_balance=statement_balance,
+            reconciled_balance=Decimal("0"),
+            status="In Progress",
+        )
+        db.add(reconciliation)
+        db.commit()
+        db.refresh(reconciliation)
+        return reconciliation
+
+    @staticmethod
+    def import_statement(db: Session, reconciliation_id: int, statement: List[Dict]) -> int:
+        """
+        Store parsed statement lines against a reconciliation and return how many were added.
+        """
+        for offset in range(0, len(statement), IMPORT_CHUNK_SIZE):
+            db.execute(
+                insert(BankStatementLine),
+                [{"reconciliation_id": reconciliation_id, **line} for line in statement[offset:offset + IMPORT_CHUNK_SIZE]],
+            )
+        db.commit()
+        return len(statement)
+
+    @staticmethod
+    def _arrays(lines: List[Line]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Split lines into id, day and amount arrays.
+        """
+        table = np.array(lines, dtype=np.int64).reshape(-1, 3)
+        return table[:, 0], table[:, 1], table[:, 2]
+
+    @staticmethod
+    def match_exact(statement: List[Line], ledger: LedgerArrays, taken: np.ndarray, date_window: int) -> List[Match]:
+        """
+        Pair each statement line with an untaken ledger line of the same amount, closest in date within the window.
+        Ledger lines are sorted once by an (amount, day) key, so each statement line's candidates are one
+        contiguous slice and all slice bounds come from a single vectorized search.
+        """
+        ids, days, amounts = ledger
+        if not statement or not ids.size:
+            return []
+        line_ids, line_days, line_amounts = ReconciliationService._arrays(statement)
+        base = min(int(days.min()), int(line_days.min())) - date_window
+        keys = (amounts << DAY_BITS) + (days - base)
+        order = np.argsort(keys, kind="stable")
+        keys = keys[order]
+        targets = (line_amounts << DAY_BITS) + (line_days - base)
+        lows = np.searchsorted(keys, targets - date_window, "left")
+        highs = np.searchsorted(keys, targets + date_window, "right")
+
+        matches = []
+        for i in np.flatnonzero(highs > lows):
+            candidates = order[lows[i]:highs[i]]
+            candidates = candidates[~taken[candidates]]
+            if not candidates.size:
+                continue
+            best = candidates[np.abs(days[candidates] - line_days[i]).argmin()]
+            taken[best] = True
+            matches.append((int(line_ids[i]), int(ids[best]), "exact"))
+        return matches
+
+    @staticmethod
+    def match_near(statement: List[Line], ledger: LedgerArrays, taken: np.ndarray, date_window: int, tolerance: int) -> List[Match]:
+        """
+        Pair statement lines with untaken ledger lines whose amount is within tolerance cents,
+        preferring the closest amount and then the closest date. Ledger lines are sorted by the same
+        (amount, day) key as the exact pass, so for each distinct ledger amount within tolerance the
+        candidates are one slice already bounded by the date window; recurring amounts (payroll,
+        rent) cost a search per amount rather than a scan of every posting of it.
+        """
+        ids, days, amounts = ledger
+        if not statement or not ids.size:
+            return []
+        line_ids, line_days, line_amounts = ReconciliationService._arrays(statement)
+        base = min(int(days.min()), int(line_days.min())) - date_window
+        keys = (amounts << DAY_BITS) + (days - base)
+        order = np.argsort(keys, kind="stable")
+        keys = keys[order]
+        distinct = np.unique(amounts)
+        amount_lows = np.searchsorted(distinct, line_amounts - tolerance, "left")
+        amount_highs = np.searchsorted(distinct, line_amounts + tolerance, "right")
+
+        matches = []
+        for i in np.flatnonzero(amount_highs > amount_lows):
+            targets = (distinct[amount_lows[i]:amount_highs[i]] << DAY_BITS) + (line_days[i] - base)
+            lows = np.searchsorted(keys, targets - date_window, "left")
+            highs = np.searchsorted(keys, targets + date_window, "right")
+            spans = np.flatnonzero(highs > lows)
+            if not spans.size:
+                continue
+            candidates = np.concatenate([order[lows[j]:highs[j]] for j in spans])
+            candidates = candidates[~taken[candidates]]
+            if not candidates.size:
+                continue
+            score = np.abs(amounts[candidates] - line_amounts[i]) * (date_window + 1) + np.abs(days[candidates] - line_days[i])
+            best = candidates[score.argmin()]
+            taken[best] = True
+            matches.append((int(line_ids[i]), int(ids[best]), "near"))
+        return matches
+
+    @staticmethod
+    def _pair(candidates: np.ndarray, amounts: np.ndarray, target: int) -> Optional[List[int]]:
+        """
+        Two ledger lines among candidates summing exactly to target, found with one sort and a vectorized search.
+        """
+        values = amounts[candidates]
+        order = np.argsort(values, kind="stable")
+        ordered = values[order]
+        position = np.searchsorted(ordered, target - ordered)
+        # searchsorted returns the first equal value, which may be the line itself
+        position = np.where(position == np.arange(len(ordered)), position + 1, position)
+        in_range = position < len(ordered)
+        hits = np.flatnonzero(in_range & (ordered[np.minimum(position, len(ordered) - 1)] == target - ordered))
+        if not hits.size:
+            return None
+        first = hits[0]
+        return [int(candidates[order[first]]), int(candidates[order[position[first]]])]
+
+    @staticmethod
+    def match_groups(statement: List[Line], ledger: LedgerArrays, taken: np.ndarray, date_window: int) -> List[Match]:
+        """
+        Match one statement line to several untaken ledger lines posted on the same day (a batched
+        deposit or payment run): all of that day's same-signed lines if they add up, or else a pair.
+        Days are tried nearest first; ledger lines are sorted by day so each day is one slice.
+        """
+        ids, days, amounts = ledger
+        if not statement or not ids.size:
+            return []
+        order = np.argsort(days, kind="stable")
+        sorted_days = days[order]
+        offsets = sorted(range(-date_window, date_window + 1), key=abs)
+
+        matches = []
+        for line_id, day, cents in statement:
+            for offset in offsets:
+                lo = np.searchsorted(sorted_days, day + offset, "left")
+                hi = np.searchsorted(sorted_days, day + offset, "right")
+                candidates = order[lo:hi]
+                candidates = candidates[
+                    ~taken[candidates]
+                    & (np.sign(amounts[candidates]) == np.sign(cents))
+                    & (np.abs(amounts[candidates]) < abs(cents))
+                ]
+                if candidates.size < 2:
+                    continue
+                if amounts[candidates].sum() == cents:
+                    group = [int(i) for i in candidates]
+                else:
+                    group = ReconciliationService._pair(candidates, amounts, cents)
+                if group is None:
+                    continue
+                taken[group] = True
+                matches.extend((line_id, int(ids[index]), "group") for index in group)
+                break
+        return matches
+
+    @staticmethod
+    def match(
+        statement: List[Line],
+        ledger: List[Line],
+        date_window: int = DATE_WINDOW_DAYS,
+        near_date_window: int = NEAR_DATE_WINDOW_DAYS,
+        tolerance: int = to_cents(AMOUNT_TOLERANCE),
+    ) -> List[Match]:
+        """
+        Run the exact, near and many-to-one passes in turn, each over the lines the previous left unmatched.
+        Each ledger line is matched at most once.
+        """
+        arrays = ReconciliationService._arrays(ledger)
+        taken = np.zeros(len(ledger), dtype=bool)
+        matches: List[Match] = []
+        passes = [
+            lambda lines: ReconciliationService.match_exact(lines, arrays, taken, date_window),
+            lambda lines: ReconciliationService.match_near(lines, arrays, taken, near_date_window, tolerance),
+            lambda lines: ReconciliationService.match_groups(lines, arrays, taken, date_window),
+        ]
+        for run_pass in passes:
+            matched = {line_id for line_id, _, _ in matches}
+            matches += run_pass([line for line in statement if line[0] not in matched])
+        return matches
+
+    @staticmethod
+    def _ledger_query(account_id: int, start: datetime, end: datetime):
+        """
+        Unreconciled items of a bank account in a date range, as (id, entry date, signed cents).
+        """
+        return (
+            select(JournalItem.id, JournalEntry.entry_date, _cents(JournalItem.debit) - _cents(JournalItem.credit))
+            .join(JournalEntry, JournalItem.journal_entry_id == JournalEntry.id)
+            .where(
+                JournalItem.account_id == account_id,
+                JournalEntry.entry_date >= start,
+                JournalEntry.entry_date < end,
+                JournalItem.id.not_in(select(ReconciliationMatch.journal_item_id)),
+            )
+            .order_by(JournalEntry.entry_date, JournalItem.id)
+        )
+
+    @staticmethod
+    def _unmatched_statement_query(reconciliation_id: int):
+        return (
+            select(BankStatementLine.id, BankStatementLine.transaction_date, _cents(BankStatementLine.amount))
+            .where(
+                BankStatementLine.reconciliation_id == reconciliation_id,
+                BankStatementLine.id.not_in(
+                    select(ReconciliationMatch.statement_line_id).where(ReconciliationMatch.reconciliation_id == reconciliation_id)
+                ),
+            )
+            .order_by(BankStatementLine.transaction_date, BankStatementLine.id)
+        )
+
+    @staticmethod
+    def reconcile(
+        db: Session,
+        reconciliation_id: int,
+        date_window: int = DATE_WINDOW_DAYS,
+        near_date_window: int = NEAR_DATE_WINDOW_DAYS,
+        amount_tolerance: Decimal = AMOUNT_TOLERANCE,
+    ) -> Optional[Dict]:
+        """
+        Match the unmatched statement lines of a reconciliation against unreconciled ledger items
+        of its bank account, store the matches and refresh the reconciled balance.
+        """
+        reconciliation = db.get(BankReconciliation, reconciliation_id)
+        if reconciliation is None:
+            return None
+
+        statement = [_line(*row) for row in db.execute(ReconciliationService._unmatched_statement_query(reconciliation_id))]
+        matches: List[Match] = []
+        if statement:
+            window = timedelta(days=max(date_window, near_date_window))
+            start = datetime.fromordinal(statement[0][1]) - window
+            end = datetime.fromordinal(statement[-1][1]) + window + timedelta(days=1)
+            ledger = [_line(*row) for row in db.execute(ReconciliationService._ledger_query(reconciliation.account_id, start, end))]
+            matches = ReconciliationService.match(statement, ledger, date_window, near_date_window, to_cents(amount_tolerance))
+
+        if matches:
+            now = datetime.utcnow()
+            db.execute(insert(ReconciliationMatch), [
+                {
+                    "reconciliation_id": reconciliation_id,
+                    "statement_line_id": line_id,
+                    "journal_item_id": item_id,
+                    "match_type": match_type,
+                    "created_at": now,
+                }
+                for line_id, item_id, match_type in matches
+            ])
+
+        summary = ReconciliationService.refresh(db, reconciliation)
+        summary["new_matches"] = dict(Counter(match_type for _, _, match_type in matches))
+        return summary
+
+    @staticmethod
+    def _counts(db: Session, reconciliation_id: int) -> Tuple[int, Dict[str, int]]:
+        """
+        Number of statement lines and of matched lines per match type.
+        """
+        line_count = db.execute(
+            select(func.count(BankStatementLine.id)).where(BankStatementLine.reconciliation_id == reconciliation_id)
+        ).scalar()
+        matched_counts = dict(db.execute(
+            select(ReconciliationMatch.match_type, func.count(func.distinct(ReconciliationMatch.statement_line_id)))
+            .where(ReconciliationMatch.reconciliation_id == reconciliation_id)
+            .group_by(ReconciliationMatch.match_type)
+        ).all())
+        return line_count, matched_counts
+
+    @staticmethod
+    def refresh(db: Session, reconciliation: BankReconciliation) -> Dict:
+        """
+        Recompute the reconciled balance (ledger total of matched items) and status, commit, and return a summary.
+        """
+        cleared = db.execute(
+            select(func.coalesce(func.sum(_cents(JournalItem.debit) - _cents(JournalItem.credit)), 0))
+            .join(ReconciliationMatch, ReconciliationMatch.journal_item_id == JournalItem.id)
+            .where(ReconciliationMatch.reconciliation_id == reconciliation.id)
+        ).scalar()
+        line_count, matched_counts = ReconciliationService._counts(db, reconciliation.id)
+
+        reconciliation.reconciled_balance = from_cents(int(cleared))
+        reconciliation.status = "Completed" if line_count and sum(matched_counts.values()) == line_count else "In Progress"
+        db.commit()
+        return ReconciliationService.serialize(reconciliation, line_count, matched_counts)
+
+    @staticmethod
+    def serialize(reconciliation: BankReconciliation, line_count: int, matched_counts: Dict[str, int]) -> Dict:
+        statement_balance = reconciliation.statement_balance or Decimal("0")
+        reconciled_balance = reconciliation.reconciled_balance or Decimal("0")
+        matched_lines = sum(matched_counts.values())
+        return {
+            "id": reconciliation.id,
+            "account_id": reconciliation.account_id,
+            "statement_date": reconciliation.statement_date,
+            "statement_balance": float(statement_balance),
+            "reconciled_balance": float(reconciled_balance),
+            "difference": float(statement_balance - reconciled_balance),
+            "status": reconciliation.status,
+            "statement_lines": line_count,
+            "matched_lines": matched_lines,
+            "unmatched_lines": line_count - matched_lines,
+            "matched_by_type": matched_counts,
+        }
+
+    @staticmethod
+    def summary(db: Session, reconciliation_id: int) -> Optional[Dict]:
+        reconciliation = db.get(BankReconciliation, reconciliation_id)
+        if reconciliation is None:
+            return None
+        return ReconciliationService.serialize(reconciliation, *ReconciliationService._counts(db, reconciliation_id))
+
+    @staticmethod
+    def unmatched(db: Session, reconciliation_id: int, limit: int = 500) -> Optional[Dict]:
+        """
+        Statement lines and ledger items of the statement period still awaiting a match.
+        """
+        reconciliation = db.get(BankReconciliation, reconciliation_id)
+        if reconciliation is None:
+            return None
+        statement = db.execute(ReconciliationService._unmatched_statement_query(reconciliation_id).limit(limit)).all()
+        bounds = db.execute(
+            select(func.min(BankStatementLine.transaction_date), func.max(BankStatementLine.transaction_date))
+            .where(BankStatementLine.reconciliation_id == reconciliation_id)
+        ).one()
+        ledger = []
+        if bounds[0] is not None:
+            ledger = db.execute(
+                ReconciliationService._ledger_query(reconciliation.account_id, bounds[0], bounds[1] + timedelta(days=1)).limit(limit)
+            ).all()
+        return {
+            "statement_lines": [
+                {"id": line_id, "date": transaction_date, "amount": float(from_cents(cents))}
+                for line_id, transaction_date, cents in statement
+            ],
+            "journal_items": [
+                {"id": item_id, "date": entry_date, "amount": float(from_cents(cents))}
+                for item_id, entry_date, cents in ledger
+            ],
+        }
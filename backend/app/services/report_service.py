@@ -0,0 +1,344 @@
+from typing import Dict, List, Optional
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import BigInteger, extract, func, select, type_coerce
+from sqlalchemy.orm import Session, aliased
+
+from app.models.models import Account, AccountBalance, AccountClosingBalance, JournalEntry, JournalItem
+from app.services.balance_service import BalanceService, period_of
+from app.services.period_service import first_day_after
+
+GRANULARITIES = ("month", "quarter", "year")
+
+# Account types whose balances are reported with a credit-positive sign
+CREDIT_TYPES = ["Liability", "Equity", "Revenue"]
+
+# Account name fragments identifying cash accounts when none are given explicitly
+CASH_ACCOUNT_KEYWORDS = ("cash", "bank")
+
+# Cash flow section for the counterpart account type of each cash movement
+CASH_FLOW_SECTIONS = {
+    "Revenue": "operating",
+    "Expense": "operating",
+    "Asset": "investing",
+    "Liability": "financing",
+    "Equity": "financing",
+}
+
+FRAME_COLUMNS = ["account_id", "account_code", "account_name", "account_type", "period", "debit", "credit"]
+
+def _period_expression():
+    return extract("year", JournalEntry.entry_date) * 100 + extract("month", JournalEntry.entry_date)
+
+def _date_filters(start_date: Optional[date], end_date: Optional[date]) -> List:
+    filters = []
+    if start_date is not None:
+        filters.append(JournalEntry.entry_date >= datetime.combine(start_date, datetime.min.time()))
+    if end_date is not None:
+        filters.append(JournalEntry.entry_date < datetime.combine(end_date + timedelta(days=1), datetime.min.time()))
+    return filters
+
+def _cents(expression):
+    # Read Money columns as raw integer cents so pandas aggregates exact int64 arrays
+    return type_coerce(expression, BigInteger)
+
+def _units(cents) -> List[float]:
+    """
+    Convert integer cents to currency units for JSON output.
+    """
+    return (np.asarray(cents, dtype=np.int64) / 100).tolist()
+
+def _bucket(periods: np.ndarray, granularity: str) -> np.ndarray:
+    """
+    Map YYYYMM integers to period labels for the requested granularity.
+    """
+    years = periods // 100
+    months = periods % 100
+    if granularity == "month":
+        return np.char.add(np.char.add(years.astype(str), "-"), np.char.zfill(months.astype(str), 2))
+    if granularity == "quarter":
+        return np.char.add(np.char.add(years.astype(str), "-Q"), ((months - 1) // 3 + 1).astype(str))
+    if granularity == "year":
+        return years.astype(str)
+    raise ValueError(f"Unsupported granularity: {granularity}")
+
+class ReportService:
+    @staticmethod
+    def load_frame(db: Session, start_date: Optional[date] = None, end_date: Optional[date] = None) -> pd.DataFrame:
+        """
+        Load debit/credit totals per account and YYYYMM period with account attributes attached.
+        Month-aligned ranges read the maintained account_balances buckets; other ranges group raw items in one query.
+        """
+        month_aligned = (start_date is None or start_date.day == 1) and (end_date is None or (end_date + timedelta(days=1)).day == 1)
+        if month_aligned:
+            query = select(
+                AccountBalance.account_id,
+                AccountBalance.period,
+                _cents(AccountBalance.debit_total),
+                _cents(AccountBalance.credit_total),
+            )
+            if start_date is not None:
+                query = query.where(AccountBalance.period >= period_of(start_date))
+            if end_date is not None:
+                query = query.where(AccountBalance.period <= period_of(end_date))
+        else:
+            period = _period_expression()
+            query = (
+                select(
+                    JournalItem.account_id,
+                    period.label("period"),
+                    _cents(func.coalesce(func.sum(JournalItem.debit), 0)),
+                    _cents(func.coalesce(func.sum(JournalItem.credit), 0)),
+                )
+                .join(JournalEntry, JournalItem.journal_entry_id == JournalEntry.id)
+                .where(*_date_filters(start_date, end_date))
+                .group_by(JournalItem.account_id, period)
+            )
+
+        return ReportService._attach_accounts(db, db.execute(query).all())
+
+    @staticmethod
+    def load_snapshot(db: Session, period: int) -> pd.DataFrame:
+        """
+        Load the closing snapshot of a closed period as one row per account, in the load_frame layout.
+        """
+        query = select(
+            AccountClosingBalance.account_id,
+            AccountClosingBalance.period,
+            _cents(AccountClosingBalance.debit_total),
+            _cents(AccountClosingBalance.credit_total),
+        ).where(AccountClosingBalance.period == period)
+        return ReportService._attach_accounts(db, db.execute(query).all())
+
+    @staticmethod
+    def _attach_accounts(db: Session, rows) -> pd.DataFrame:
+        totals = pd.DataFrame(rows, columns=["account_id", "period", "debit", "credit"])
+        totals = totals.astype({"account_id": np.int64, "period": np.int64, "debit": np.int64, "credit": np.int64})
+        accounts = pd.DataFrame(
+            db.execute(select(Account.id, Account.account_code, Account.account_name, Account.account_type)).all(),
+            columns=["account_id", "account_code", "account_name", "account_type"],
+        )
+        accounts["account_id"] = accounts["account_id"].astype(np.int64)
+        accounts["account_type"] = accounts["account_type"].map(lambda value: value.name if value is not None else None)
+        return totals.merge(accounts, on="account_id", how="inner")[FRAME_COLUMNS]
+
+    @staticmethod
+    def signed_amounts(frame: pd.DataFrame) -> pd.Series:
+        """
+        Net amount in cents per row, positive on the account type's normal side.
+        """
+        net = frame["debit"].to_numpy() - frame["credit"].to_numpy()
+        return pd.Series(np.where(frame["account_type"].isin(CREDIT_TYPES), -net, net), index=frame.index)
+
+    @staticmethod
+    def pivot(frame: pd.DataFrame, granularity: str = "month") -> pd.DataFrame:
+        """
+        Pivot signed cents into one row per account and one column per period label.
+        """
+        if frame.empty:
+            return pd.DataFrame()
+        data = frame.assign(
+            amount=ReportService.signed_amounts(frame),
+            label=_bucket(frame["period"].to_numpy(), granularity),
+        )
+        return data.pivot_table(
+            index=["account_type", "account_id", "account_code", "account_name"],
+            columns="label",
+            values="amount",
+            aggfunc="sum",
+            fill_value=0,
+        ).sort_index(axis=1)
+
+    @staticmethod
+    def _type_totals(table: pd.DataFrame, account_type: str) -> np.ndarray:
+        """
+        Per-period totals in cents for one account type.
+        """
+        if table.empty or account_type not in table.index.get_level_values("account_type"):
+            return np.zeros(len(table.columns), dtype=np.int64)
+        return table.xs(account_type, level="account_type").to_numpy().sum(axis=0)
+
+    @staticmethod
+    def _sections(table: pd.DataFrame, account_types: List[str]) -> Dict:
+        sections = {}
+        for account_type in account_types:
+            totals = _units(ReportService._type_totals(table, account_type))
+            if table.empty or account_type not in table.index.get_level_values("account_type"):
+                sections[account_type] = {"accounts": [], "totals": totals}
+                continue
+            rows = table.xs(account_type, level="account_type")
+            sections[account_type] = {
+                "accounts": [
+                    {
+                        "account_id": int(account_id),
+                        "account_code": account_code,
+                        "account_name": account_name,
+                        "values": _units(values),
+                    }
+                    for (account_id, account_code, account_name), values in zip(rows.index, rows.to_numpy())
+                ],
+                "totals": totals,
+            }
+        return sections
+
+    @staticmethod
+    def period_over_period(cents: np.ndarray) -> Dict:
+        """
+        Change and percentage change between consecutive periods (None where the prior period is zero).
+        """
+        cents = np.asarray(cents, dtype=np.int64)
+        if cents.size < 2:
+            return {"change": [], "percent_change": []}
+        previous = cents[:-1]
+        change = np.diff(cents)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            percent = np.where(previous != 0, change / np.abs(previous) * 100, np.nan)
+        return {
+            "change": _units(change),
+            "percent_change": [None if np.isnan(p) else round(float(p), 2) for p in percent],
+        }
+
+    @staticmethod
+    def income_statement(
+        db: Session,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        granularity: str = "month",
+        compare: bool = False,
+    ) -> Dict:
+        """
+        Revenue, expenses and net income per period.
+        """
+        frame = ReportService.load_frame(db, start_date, end_date)
+        frame = frame[frame["account_type"].isin(["Revenue", "Expense"])]
+        table = ReportService.pivot(frame, granularity)
+
+        revenue = ReportService._type_totals(table, "Revenue")
+        expense = ReportService._type_totals(table, "Expense")
+        net_income = revenue - expense
+        report = {
+            "periods": list(table.columns),
+            "sections": ReportService._sections(table, ["Revenue", "Expense"]),
+            "net_income": _units(net_income),
+        }
+        if compare:
+            report["comparison"] = {
+                "revenue": ReportService.period_over_period(revenue),
+                "expense": ReportService.period_over_period(expense),
+                "net_income": ReportService.period_over_period(net_income),
+            }
+        return report
+
+    @staticmethod
+    def balance_sheet(
+        db: Session,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        granularity: str = "month",
+    ) -> Dict:
+        """
+        Closing balances of assets, liabilities and equity at the end of each period.
+        Balances include all history before start_date; current earnings roll into equity.
+        History up to the last close before start_date comes from its snapshot rather than a rescan.
+        """
+        closed = BalanceService.latest_close(db, period_of(start_date)) if start_date is not None else None
+        if closed is None:
+            frame = ReportService.load_frame(db, None, end_date)
+        else:
+            frame = pd.concat(
+                [ReportService.load_snapshot(db, closed), ReportService.load_frame(db, first_day_after(closed), end_date)],
+                ignore_index=True,
+            )
+        table = ReportService.pivot(frame, granularity)
+        if table.empty:
+            return {"periods": [], "sections": ReportService._sections(table, ["Asset", "Liability", "Equity"]),
+                    "retained_earnings": [], "total_liabilities_and_equity": []}
+
+        # Closing balances are running totals across periods
+        cumulative = table.cumsum(axis=1)
+        if start_date is not None:
+            first_label = _bucket(np.array([start_date.year * 100 + start_date.month]), granularity)[0]
+            cumulative = cumulative.loc[:, cumulative.columns >= first_label]
+
+        retained_earnings = ReportService._type_totals(cumulative, "Revenue") - ReportService._type_totals(cumulative, "Expense")
+        liabilities_and_equity = (
+            ReportService._type_totals(cumulative, "Liability")
+            + ReportService._type_totals(cumulative, "Equity")
+            + retained_earnings
+        )
+        return {
+            "periods": list(cumulative.columns),
+            "sections": ReportService._sections(cumulative, ["Asset", "Liability", "Equity"]),
+            "retained_earnings": _units(retained_earnings),
+            "total_liabilities_and_equity": _units(liabilities_and_equity),
+        }
+
+    @staticmethod
+    def cash_account_ids(db: Session) -> List[int]:
+        """
+        Asset accounts whose names look like cash or bank accounts.
+        """
+        rows = db.execute(select(Account.id, Account.account_name, Account.account_type)).all()
+        return [
+            account_id
+            for account_id, account_name, account_type in rows
+            if account_type is not None and account_type.name == "Asset"
+            and any(keyword in (account_name or "").lower() for keyword in CASH_ACCOUNT_KEYWORDS)
+        ]
+
+    @staticmethod
+    def cash_flow(
+        db: Session,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        granularity: str = "month",
+        cash_account_ids: Optional[List[int]] = None,
+    ) -> Dict:
+        """
+        Direct-method cash flow: the non-cash side of every entry touching a cash account,
+        classified as operating, investing or financing by its account type.
+        """
+        if cash_account_ids is None:
+            cash_account_ids = ReportService.cash_account_ids(db)
+        periods: List[str] = []
+        sections = {section: [] for section in ("operating", "investing", "financing")}
+        if not cash_account_ids:
+            return {"periods": periods, "sections": sections, "net_change": []}
+
+        cash_item = aliased(JournalItem)
+        period = _period_expression()
+        query = (
+            select(
+                Account.account_type,
+                period.label("period"),
+                _cents(func.coalesce(func.sum(JournalItem.credit), 0) - func.coalesce(func.sum(JournalItem.debit), 0)).label("amount"),
+            )
+            .join(JournalEntry, JournalItem.journal_entry_id == JournalEntry.id)
+            .join(Account, JournalItem.account_id == Account.id)
+            .where(
+                JournalItem.account_id.not_in(cash_account_ids),
+                # Uncorrelated so the database builds the set of cash entries once
+                JournalItem.journal_entry_id.in_(
+                    select(cash_item.journal_entry_id).where(cash_item.account_id.in_(cash_account_ids))
+                ),
+                *_date_filters(start_date, end_date),
+            )
+            .group_by(Account.account_type, period)
+        )
+        frame = pd.DataFrame(db.execute(query).all(), columns=["account_type", "period", "amount"])
+        if frame.empty:
+            return {"periods": periods, "sections": sections, "net_change": []}
+
+        frame["section"] = frame["account_type"].map(lambda value: CASH_FLOW_SECTIONS.get(value.name if value is not None else None, "operating"))
+        frame["label"] = _bucket(frame["period"].astype(np.int64).to_numpy(), granularity)
+        frame["amount"] = frame["amount"].astype(np.int64)
+        table = frame.pivot_table(index="section", columns="label", values="amount", aggfunc="sum", fill_value=0)
+        table = table.reindex(list(sections), fill_value=0).sort_index(axis=1)
+
+        return {
+            "periods": list(table.columns),
+            "sections": {section: _units(table.loc[section].to_numpy()) for section in sections},
+            "net_change": _units(table.to_numpy().sum(axis=0)),
+        }
@@ -0,0 +1,209 @@
+"""
+Compact ledger summaries for AI prompts.
+
+A summary holds the dashboard KPIs, the largest balance sheet accounts, the
+largest income and expense accounts this year, revenue and expenses per month
+the months where an account moved far from its usual amount, and the
+postings the anomaly scan flagged. Everything is read from account_balances,
+invoice_aging_balances and ledger_anomalies, and every list is capped, so the
+prompt stays the same size however many items the ledger holds. The rendered
+text is cached per version of the ledger, accounts, invoices and findings.
+"""
+from typing import Dict, List, Optional
+from datetime import date
+import os
+
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.cache import ACCOUNTS, ANOMALIES, INVOICES, LEDGER, response_cache
+from app.models.models import Account, AccountBalance, AccountTypeEnum
+from app.models.money import to_cents
+from app.services.anomaly_service import AnomalyService
+from app.services.balance_service import period_of
+from app.services.dashboard_service import DashboardService
+from app.services.hierarchy_service import DEBIT_NORMAL
+
+# Accounts listed per section
+AI_CONTEXT_TOP_ACCOUNTS = int(os.getenv("AI_CONTEXT_TOP_ACCOUNTS", "8"))
+# Months of revenue and expense trend, ending with the current month
+AI_CONTEXT_MONTHS = int(os.getenv("AI_CONTEXT_MONTHS", "12"))
+# Unusual account months, and flagged postings, listed
+AI_CONTEXT_ANOMALIES = int(os.getenv("AI_CONTEXT_ANOMALIES", "5"))
+# Modified z-score (distance from the median in MADs) from which a month counts as unusual
+ANOMALY_SCORE = 3.5
+
+BALANCE_SHEET_TYPES = (AccountTypeEnum.Asset, AccountTypeEnum.Liability, AccountTypeEnum.Equity)
+
+def _shift(period: int, months: int) -> int:
+    index = (period // 100) * 12 + period % 100 - 1 + months
+    return (index // 12) * 100 + index % 12 + 1
+
+def _label(period: int) -> str:
+    return f"{period // 100}-{period % 100:02d}"
+
+def _amount(cents: int) -> str:
+    return f"{cents / 100:,.2f}"
+
+class SummaryService:
+    @staticmethod
+    def summary(db: Session, as_of: Optional[date] = None) -> Dict:
+        """
+        The ledger summary as data, amounts in cents.
+        """
+        as_of = as_of or date.today()
+        current = period_of(as_of)
+        first = _shift(current, 1 - AI_CONTEXT_MONTHS)
+        periods = [_shift(first, offset) for offset in range(AI_CONTEXT_MONTHS)]
+        accounts = {
+            account_id: (account_code, account_name, account_type)
+            for account_id, account_code, account_name, account_type in db.execute(
+                select(Account.id, Account.account_code, Account.account_name, Account.account_type)
+            )
+        }
+
+        def signed(account_id: int, debit, credit) -> int:
+            # Positive on the account type's normal side
+            net = to_cents(debit or 0) - to_cents(credit or 0)
+            return net if accounts[account_id][2] in DEBIT_NORMAL else -net
+
+        def describe(account_id: int, cents: int) -> Dict:
+            account_code, account_name, account_type = accounts[account_id]
+            return {"account_code": account_code, "account_name": account_name,
+                    "account_type": account_type.name if account_type else None, "amount": cents}
+
+        balances = {
+            account_id: signed(account_id, debit, credit)
+            for account_id, debit, credit in db.execute(
+                select(AccountBalance.account_id, func.sum(AccountBalance.debit_total), func.sum(AccountBalance.credit_total))
+                .group_by(AccountBalance.account_id)
+            )
+            if account_id in accounts
+        }
+        # One row per account and month of the window
+        monthly: Dict[int, Dict[int, int]] = {}
+        for account_id, period, debit, credit in db.execute(
+            select(AccountBalance.account_id, AccountBalance.period, AccountBalance.debit_total, AccountBalance.credit_total)
+            .where(AccountBalance.period >= first, AccountBalance.period <= current)
+        ):
+            if account_id in accounts:
+                monthly.setdefault(account_id, {})[period] = signed(account_id, debit, credit)
+
+        def top(account_ids, amounts: Dict[int, int]) -> List[Dict]:
+            ranked = sorted((account_id for account_id in account_ids if amounts.get(account_id)), key=lambda a: -abs(amounts[a]))
+            return [describe(account_id, amounts[account_id]) for account_id in ranked[:AI_CONTEXT_TOP_ACCOUNTS]]
+
+        year_start = as_of.year * 100 + 1
+        this_year = {
+            account_id: sum(cents for period, cents in months.items() if period >= year_start)
+            for account_id, months in monthly.items()
+        }
+        trend = {period: {"revenue": 0, "expenses": 0} for period in periods}
+        for account_id, months in monthly.items():
+            kind = {AccountTypeEnum.Revenue: "revenue", AccountTypeEnum.Expense: "expenses"}.get(accounts[account_id][2])
+            if kind:
+                for period, cents in months.items():
+                    trend[period][kind] += cents
+
+        return {
+            "as_of": as_of.isoformat(),
+            "kpis": DashboardService.snapshot(db, as_of.year),
+            "balance_sheet": top((a for a, (_, _, t) in accounts.items() if t in BALANCE_SHEET_TYPES), balances),
+            "income_and_expenses": top(
+                (a for a, (_, _, t) in accounts.items() if t in (AccountTypeEnum.Revenue, AccountTypeEnum.Expense)), this_year
+            ),
+            "months": [{"period": _label(period), **trend[period]} for period in periods],
+            "unusual": [
+                {**describe(account_id, cents), "period": _label(period), "typical": typical}
+                for account_id, period, cents, typical in SummaryService.unusual_months(monthly, periods[:-1])
+            ],
+            "flagged": SummaryService.flagged(db),
+        }
+
+    @staticmethod
+    def flagged(db: Session) -> List[Dict]:
+        """
+        The top AI_CONTEXT_ANOMALIES findings of the anomaly scan, one per journal entry or invoice.
+        """
+        seen, flagged = set(), []
+        # Both lines of a duplicated entry are flagged; read enough findings to fill the list after folding them
+        for finding in AnomalyService.shortlist(db, AI_CONTEXT_ANOMALIES * 4):
+            key = ("entry", finding["journal_entry_id"]) if finding["source"] == "journal_item" else ("invoice", finding["invoice_id"])
+            if key not in seen and len(flagged) < AI_CONTEXT_ANOMALIES:
+                seen.add(key)
+                flagged.append(finding)
+        return flagged
+
+    @staticmethod
+    def unusual_months(monthly: Dict[int, Dict[int, int]], periods: List[int]) -> List[tuple]:
+        """
+        (account_id, period, amount, typical amount) of the account months furthest from the
+        account's median month, by modified z-score, at most AI_CONTEXT_ANOMALIES of them.
+        Only complete months are scored and accounts need activity in four of them.
+        """
+        if not monthly or len(periods) < 4:
+            return []
+        account_ids = list(monthly)
+        amounts = np.array([[monthly[account_id].get(period, 0) for period in periods] for account_id in account_ids], dtype=np.float64)
+        active = (amounts != 0).sum(axis=1) >= 4
+        median = np.median(amounts, axis=1, keepdims=True)
+        deviation = np.abs(amounts - median)
+        # Floors keep steady accounts from flagging cent-sized wobbles
+        scale = np.maximum.reduce([1.4826 * np.median(deviation, axis=1, keepdims=True), 0.1 * np.abs(median), np.full_like(median, 100)])
+        scores = np.where(active[:, None], deviation / scale, 0)
+        found = []
+        for row, column in zip(*np.nonzero(scores >= ANOMALY_SCORE)):
+            found.append((scores[row, column], account_ids[row], periods[column], int(amounts[row, column]), int(median[row, 0])))
+        found.sort(key=lambda item: -item[0])
+        return [item[1:] for item in found[:AI_CONTEXT_ANOMALIES]]
+
+    @staticmethod
+    def render(summary: Dict) -> str:
+        """
+        The summary as compact prompt text.
+        """
+        kpis = summary["kpis"]
+        lines = [
+            f"Ledger summary as of {summary['as_of']}.",
+            f"Cash {_amount(kpis['cash'])}; open receivables {_amount(kpis['receivables'])}; "
+            f"open payables {_amount(kpis['payables'])}; revenue this year {_amount(kpis['revenue'])}; "
+            f"expenses this year {_amount(kpis['expenses'])}.",
+        ]
+        for title, key in (("Largest balances", "balance_sheet"), ("Largest income and expense accounts this year", "income_and_expenses")):
+            if summary[key]:
+                lines.append(f"{title}: " + "; ".join(
+                    f"{a['account_code']} {a['account_name']} ({a['account_type']}) {_amount(a['amount'])}" for a in summary[key]
+                ) + ".")
+        lines.append("Revenue / expenses / net by month (last month to date):")
+        lines.extend(
+            f"{month['period']}: {_amount(month['revenue'])} / {_amount(month['expenses'])} / {_amount(month['revenue'] - month['expenses'])}"
+            for month in summary["months"]
+        )
+        if summary["unusual"]:
+            lines.append("Unusual months: " + "; ".join(
+                f"{a['account_code']} {a['account_name']} {a['period']} {_amount(a['amount'])} (usually {_amount(a['typical'])})"
+                for a in summary["unusual"]
+            ) + ".")
+        if summary["flagged"]:
+            lines.append("Flagged postings: " + "; ".join(
+                f"{f['date']} {f.get('account_name') or f.get('contact')} {f.get('description') or f.get('invoice_number')} "
+                f"{_amount(to_cents(f['amount']))} ({', '.join(f['reasons'])})"
+                for f in summary["flagged"]
+            ) + ".")
+        return "\n".join(lines)
+
+    @staticmethod
+    def context(db: Session) -> str:
+        """
+        The rendered summary for today, computed once per version of the data it reads.
+        The flagged list is whatever the background anomaly scan has stored.
+        """
+        versions = "-".join(str(response_cache.version(namespace)) for namespace in (LEDGER, ACCOUNTS, INVOICES, ANOMALIES))
+        key = f"ai-context:{versions}:{date.today().isoformat()}"
+        cached = response_cache.get(key)
+        if cached is not None:
+            return cached.decode()
+        text = SummaryService.render(SummaryService.summary(db))
+        response_cache.set(key, text.encode())
+        return text
@@ -0,0 +1,107 @@
+"""
+Time AR/AP aging over a large invoice book.
+
+Compares a Python loop over ORM invoices, the single grouped CASE query over
+open invoices, and the report read from the incrementally maintained
+invoice_aging_balances table. Then pays and reopens invoices through the ORM
+to time the incremental maintenance, and checks all three agree.
+
+    python -m benchmarks.aging --invoices 1000000
+"""
+import argparse
+import random
+import statistics
+import sys
+import time
+from datetime import date
+
+from sqlalchemy import select, text
+
+from app.models.models import Invoice
+from app.services.aging_service import BUCKETS, OPEN_STATUSES, AgingService
+from app.services.balance_service import ZERO
+from benchmarks.common import make_session_factory, seed_invoices, timer
+
+def python_aging(db, invoice_type: str, as_of: date) -> dict:
+    """
+    The naive approach: load every invoice and bucket it in Python.
+    """
+    totals = {bucket: ZERO for bucket in BUCKETS}
+    for invoice in db.execute(select(Invoice)).scalars():
+        if invoice.type != invoice_type or invoice.status not in OPEN_STATUSES or invoice.due_date is None or invoice.contact_id is None:
+            continue
+        days = (as_of - invoice.due_date.date()).days
+        bucket = BUCKETS[0] if days <= 30 else BUCKETS[1] if days <= 60 else BUCKETS[2] if days <= 90 else BUCKETS[3]
+        totals[bucket] += invoice.amount or ZERO
+    return totals
+
+def median_ms(run, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--invoices", type=int, default=1000000)
+    parser.add_argument("--contacts", type=int, default=5000)
+    parser.add_argument("--years", type=int, default=5)
+    parser.add_argument("--updates", type=int, default=2000, help="Invoices paid or reopened through the ORM")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--skip-python", action="store_true", help="Skip the ORM loop baseline")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    Session = make_session_factory()
+    db = Session()
+    seed_invoices(db, args.contacts, args.invoices, years=args.years, seed=args.seed)
+    db.execute(text("ANALYZE"))
+    db.commit()
+    results = {}
+    with timer(results, "rebuild"):
+        AgingService.rebuild(db)
+    as_of = date(2024, 12, 31)
+
+    before = AgingService.aging_from_invoices(db, "Receivable", as_of)
+    if not args.skip_python:
+        with timer(results, "python"):
+            python_totals = python_aging(db, "Receivable", as_of)
+        db.expunge_all()
+    single_pass = median_ms(lambda: AgingService.aging_from_invoices(db, "Receivable", as_of), args.repeat)
+    summary = median_ms(lambda: AgingService.aging(db, "Receivable", as_of), args.repeat)
+    one_contact = median_ms(lambda: AgingService.aging(db, "Receivable", as_of, contact_id=7), args.repeat)
+
+    # Pay open invoices and reopen paid ones, one commit each as the API would
+    rng = random.Random(args.seed)
+    updates = []
+    for invoice_id in rng.sample(range(1, args.invoices + 1), min(args.updates, args.invoices)):
+        invoice = db.get(Invoice, invoice_id)
+        invoice.status = "Sent" if invoice.status == "Paid" else "Paid"
+        start = time.perf_counter()
+        db.commit()
+        updates.append(time.perf_counter() - start)
+
+    expected = AgingService.aging_from_invoices(db, "Receivable", as_of)
+    actual = AgingService.aging(db, "Receivable", as_of)
+    mismatches = AgingService.verify(db)
+    db.close()
+
+    print(f"invoices: {args.invoices:,}  open receivable: {expected['totals']['invoices']:,}  "
+          f"contacts: {len(expected['contacts']):,}  as of {as_of}")
+    print(f"rebuild summary        {results['rebuild'] * 1000:9.1f} ms")
+    if not args.skip_python:
+        print(f"python loop over ORM   {results['python'] * 1000:9.1f} ms")
+    print(f"single CASE query      {single_pass:9.1f} ms")
+    print(f"summary table          {summary:9.1f} ms  ({single_pass / summary:.1f}x faster than the single query)")
+    print(f"summary, one contact   {one_contact:9.1f} ms")
+    print(f"status change commit   {statistics.median(updates) * 1000:9.2f} ms p50 over {len(updates):,} updates")
+    ok = actual == expected and not mismatches
+    if not args.skip_python:
+        ok = ok and all(python_totals[bucket] == before["totals"][bucket] for bucket in BUCKETS)
+    print(f"results agree          {ok}  ({len(mismatches)} summary mismatches)")
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+"""
+Compare one-call-per-transaction categorization with batched, concurrent calls
+against the local fake model server (benchmarks/fake_model.py) over HTTP.
+
+The sequential path is timed on a sample and extrapolated to the full import.
+
+    python -m benchmarks.ai_batch --transactions 5000 --batch-size 50 --concurrency 8
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import string
+import sys
+import tempfile
+import time
+
+# The app binds its engines at import time, so point it at a scratch database first
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='simplefi-bench-'), 'bench.db')}"
+# Measure model batching, not AI result cache hits or local predictions
+os.environ["AI_CACHE_ENABLED"] = "false"
+os.environ["AI_LOCAL_ENABLED"] = "false"
+
+from app.services.ai_client import OpenAIChatClient
+from app.services.ai_service import AIService
+from benchmarks import fake_model
+
+VENDORS = [
+    "AWS monthly invoice", "Payroll ADP", "Office rent March", "Client payment INV-{n}",
+    "Stripe payout {n}", "Dell laptop purchase", "Gusto salary run", "Azure subscription",
+    "Loan repayment {n}", "Coffee supplies",
+]
+
+async def run(args) -> int:
+    rng = random.Random(args.seed)
+    # A letter code per transaction keeps descriptions distinct, so none are folded into one model call
+    transactions = [
+        {
+            "description": f"{rng.choice(VENDORS).format(n=rng.randint(1000, 9999))} {''.join(rng.choices(string.ascii_uppercase, k=6))}",
+            "amount": round(rng.uniform(5, 5000), 2),
+        }
+        for _ in range(args.transactions)
+    ]
+
+    start = time.perf_counter()
+    for transaction in transactions[:args.sequential]:
+        await AIService.suggest_categorization(transaction["description"])
+    per_item = (time.perf_counter() - start) / args.sequential
+    sequential_total = per_item * len(transactions)
+
+    rate_limited_before = fake_model.stats["rate_limited"]
+    result = await AIService.suggest_categorizations(transactions, batch_size=args.batch_size, concurrency=args.concurrency)
+    latencies = [batch["latency_ms"] for batch in result["batches"]]
+    retries = sum(batch["attempts"] - 1 for batch in result["batches"] if batch["attempts"])
+    batched_total = result["throughput"]["elapsed_ms"] / 1000
+
+    print(f"transactions: {len(transactions):,}  batch size: {args.batch_size}  concurrency: {args.concurrency}")
+    print(f"sequential     {per_item * 1000:8.1f} ms/item  -> {sequential_total:8.1f} s for the import (extrapolated from {args.sequential})")
+    print(f"batched        {batched_total:8.2f} s  ({result['throughput']['items_per_second']:,.0f} items/s)")
+    print(f"batch latency  p50 {statistics.median(latencies):.0f} ms  max {max(latencies):.0f} ms over {len(latencies)} batches")
+    print(f"rate limited   {fake_model.stats['rate_limited'] - rate_limited_before} responses, {retries} retries, {result['failed']} failed items")
+    speedup = sequential_total / batched_total
+    print(f"speedup        {speedup:.0f}x")
+    return 0 if result["failed"] == 0 and speedup >= args.min_speedup else 1
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--transactions", type=int, default=5000)
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--sequential", type=int, default=50, help="Transactions timed one call at a time")
+    parser.add_argument("--server-concurrency", type=int, default=6, help="Fake server limit before it answers 429")
+    parser.add_argument("--latency-ms", type=float, default=100, help="Fake model latency per call")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--min-speedup", type=float, default=20.0)
+    args = parser.parse_args(argv)
+
+    fake_model.settings.update(max_concurrency=args.server_concurrency, latency_ms=args.latency_ms)
+    AIService.configure(OpenAIChatClient(api_key="fake", base_url=fake_model.start_fake_server()))
+    return asyncio.run(run(args))
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+"""
+Measure the AI result cache on recurring transactions against the local fake
+model server (benchmarks/fake_model.py).
+
+Two months of bank feed are categorized in turn. Most lines come from a fixed
+set of vendors whose descriptions vary by reference number, date and month
+name; the rest are one-off vendors. The first month fills the cache, the
+second should be answered mostly by exact and semantic hits.
+
+    python -m benchmarks.ai_cache --transactions 5000 --vendors 300
+"""
+import argparse
+import asyncio
+import os
+import random
+import string
+import sys
+import tempfile
+import time
+
+# The app binds its engines at import time, so point it at a scratch database first
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='simplefi-bench-'), 'bench.db')}"
+# Measure the result cache, not local predictions
+os.environ["AI_LOCAL_ENABLED"] = "false"
+
+from app.database import engine
+from app.models.models import Base
+from app.services.ai_cache import AICache
+from app.services.ai_client import OpenAIChatClient
+from app.services.ai_service import AIService
+from benchmarks import fake_model
+
+KEYWORDS = ["aws", "azure", "hosting", "payroll", "salary", "rent", "lease", "client", "stripe payout", "loan", "laptop", "furniture", "catering"]
+MONTHS = ["january", "february"]
+TEMPLATES = [
+    "{vendor} {n}",
+    "POS {vendor} ref {n}",
+    "{vendor} - {month} {n}",
+    "ACH {vendor} {month} batch {n}",
+]
+
+def word(rng, length=6) -> str:
+    return "".join(rng.choices(string.ascii_lowercase, k=length))
+
+def make_feed(rng, vendors, count, month, one_off_share):
+    feed = []
+    for _ in range(count):
+        vendor = rng.choice(vendors) if rng.random() >= one_off_share else f"{word(rng)} {rng.choice(KEYWORDS)} {word(rng)}"
+        template = rng.choice(TEMPLATES)
+        feed.append({"description": template.format(vendor=vendor, month=month, n=rng.randint(1000, 999999)), "amount": round(rng.uniform(5, 5000), 2)})
+    return feed
+
+async def categorize(feed, args):
+    requests_before = fake_model.stats["requests"]
+    start = time.perf_counter()
+    result = await AIService.suggest_categorizations(feed, batch_size=args.batch_size, concurrency=args.concurrency)
+    elapsed = time.perf_counter() - start
+    semantic = [suggestion for suggestion in result["suggestions"] if suggestion.get("cache") == "semantic"]
+    wrong = sum(1 for suggestion in semantic if suggestion["account"] != fake_model.categorize(suggestion["description"])["account"])
+    return {
+        "elapsed": elapsed,
+        "model_calls": fake_model.stats["requests"] - requests_before,
+        "exact": result["cache"]["exact"],
+        "semantic": len(semantic),
+        "semantic_wrong": wrong,
+        "failed": result["failed"],
+    }
+
+async def run(args) -> int:
+    rng = random.Random(args.seed)
+    vendors = [f"{word(rng)} {rng.choice(KEYWORDS)} {word(rng, 4)}" for _ in range(args.vendors)]
+    months = [make_feed(rng, vendors, args.transactions, month, args.one_off_share) for month in MONTHS]
+
+    print(f"transactions per month: {args.transactions:,}  recurring vendors: {args.vendors}  one-off share: {args.one_off_share:.0%}")
+    print(f"{'':8} {'elapsed':>9} {'model calls':>12} {'exact':>7} {'semantic':>9} {'sem. wrong':>11} {'failed':>7}")
+    passes = []
+    for month, feed in zip(MONTHS, months):
+        result = await categorize(feed, args)
+        passes.append(result)
+        print(f"{month:8} {result['elapsed']:8.2f}s {result['model_calls']:12,} {result['exact']:7,} {result['semantic']:9,} {result['semantic_wrong']:11,} {result['failed']:7,}")
+
+    invoice = "INVOICE 2024-117\nAcme Hosting Ltd\nDate: 2024-03-01\nTotal: $1,250.00\n  Managed servers  x1"
+    requests_before = fake_model.stats["requests"]
+    for _ in range(args.invoices):
+        await AIService.process_invoice(invoice)
+    print(f"invoice  {args.invoices} extractions of the same document -> {fake_model.stats['requests'] - requests_before} model call(s)")
+
+    stats = AICache.stats()["kinds"]["categorization"]
+    warm, cold = passes[1], passes[0]
+    print(f"warm month hit rate {(warm['exact'] + warm['semantic']) / args.transactions:.1%}, overall {stats['hit_rate']:.1%} over {stats['lookups']:,} lookups")
+    reduction = 1 - warm["model_calls"] / max(cold["model_calls"], 1)
+    print(f"model calls saved in the warm month: {reduction:.0%}")
+    ok = warm["failed"] == 0 and reduction >= args.min_reduction and warm["semantic_wrong"] <= warm["semantic"] * args.max_wrong_share
+    return 0 if ok else 1
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--transactions", type=int, default=5000, help="Bank feed lines per month")
+    parser.add_argument("--vendors", type=int, default=300, help="Recurring vendors")
+    parser.add_argument("--one-off-share", type=float, default=0.1, help="Share of lines from vendors seen only once")
+    parser.add_argument("--invoices", type=int, default=20)
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency-ms", type=float, default=100, help="Fake model latency per call")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--min-reduction", type=float, default=0.5, help="Fail if the warm month saves fewer model calls")
+    parser.add_argument("--max-wrong-share", type=float, default=0.02, help="Fail if more semantic hits than this disagree with the model")
+    args = parser.parse_args(argv)
+
+    Base.metadata.create_all(engine)
+    fake_model.settings.update(latency_ms=args.latency_ms)
+    AIService.configure(OpenAIChatClient(api_key="fake", base_url=fake_model.start_fake_server()))
+    return asyncio.run(run(args))
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,134 @@
+"""
+Compare a transaction-dump chat prompt with the ledger summary prompt, streamed,
+against the local fake model server (benchmarks/fake_model.py) over HTTP.
+
+For each ledger size, generates books with benchmarks.datagen, then asks the
+same question twice: once with every journal entry listed in the prompt and
+the reply awaited whole, as generate_financial_insights used to, and once
+with SummaryService's summary and the reply streamed, as POST /ai/chat does.
+The fake model charges prefill time per prompt token and time per reply
+token, so the prompt size shows up as latency. Prompts larger than the
+context window are reported but not sent.
+
+    python -m benchmarks.ai_chat --items 10k,100k --prefill-ms 40 --token-ms 15
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from datetime import date
+
+# The app binds its engines at import time, so point it at a scratch database first
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = os.getenv("BENCH_DATABASE_URL") or f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='simplefi-bench-'), 'bench.db')}"
+
+from sqlalchemy import select
+
+from app.database import SessionLocal, engine
+from app.models.models import Base, JournalEntry, JournalItem
+from app.services.ai_client import OpenAIChatClient
+from app.services.ai_service import AIService
+from app.services.pdf_text import estimate_tokens
+from app.services.summary_service import SummaryService
+from benchmarks import fake_model
+from benchmarks.datagen import generate, parse_scale
+
+QUESTION = "How is the business doing, and is there anything unusual I should look at?"
+
+def transaction_dump(db) -> str:
+    """
+    Every journal entry as a line, the prompt generate_financial_insights used to build.
+    """
+    rows = db.execute(
+        select(JournalEntry.entry_date, JournalEntry.description, JournalItem.debit)
+        .join(JournalItem, JournalItem.journal_entry_id == JournalEntry.id)
+        .where(JournalItem.debit > 0)
+        .order_by(JournalEntry.id)
+    )
+    return "Transactions:\n" + "\n".join(f"- {entry_date:%Y-%m-%d}: {description} (${debit:,.2f})" for entry_date, description, debit in rows)
+
+def prompt_tokens(messages) -> int:
+    return sum(estimate_tokens(message["content"]) for message in messages)
+
+async def streamed(messages):
+    start = time.perf_counter()
+    first = None
+    async for _ in AIService.chat_stream(messages):
+        if first is None:
+            first = time.perf_counter() - start
+    return first, time.perf_counter() - start
+
+async def measure(args, items: int) -> dict:
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    db = SessionLocal()
+    try:
+        books = generate(db, items)
+        db.commit()
+        as_of = date.fromisoformat(books["end"])
+
+        start = time.perf_counter()
+        dump = transaction_dump(db)
+        dump_build = time.perf_counter() - start
+        start = time.perf_counter()
+        summary = SummaryService.render(SummaryService.summary(db, as_of))
+        summary_build = time.perf_counter() - start
+        SummaryService.context(db)
+        start = time.perf_counter()
+        SummaryService.context(db)
+        cached = time.perf_counter() - start
+    finally:
+        db.close()
+
+    dump_messages = AIService.chat_messages(dump, QUESTION)
+    summary_messages = AIService.chat_messages(summary, QUESTION)
+    result = {
+        "items": books["items"],
+        "dump_tokens": prompt_tokens(dump_messages),
+        "dump_build": dump_build,
+        "dump_reply": None,
+        "summary_tokens": prompt_tokens(summary_messages),
+        "summary_build": summary_build,
+        "cached": cached,
+    }
+    if result["dump_tokens"] <= args.context_window:
+        start = time.perf_counter()
+        await AIService.chat(dump_messages)
+        result["dump_reply"] = time.perf_counter() - start
+    result["first_token"], result["summary_reply"] = await streamed(summary_messages)
+    return result
+
+async def run(args) -> int:
+    results = [await measure(args, items) for items in args.items]
+    print(f"{'items':>10} {'prompt':>8} {'tokens':>9} {'build ms':>9} {'first text ms':>14} {'full reply ms':>14}")
+    for result in results:
+        dump_reply = f"{result['dump_reply'] * 1000:14.0f}" if result["dump_reply"] is not None else f"{'over window':>14}"
+        print(f"{result['items']:>10,} {'dump':>8} {result['dump_tokens']:>9,} {result['dump_build'] * 1000:9.1f} {dump_reply:>14} {dump_reply:>14}")
+        print(
+            f"{'':>10} {'summary':>8} {result['summary_tokens']:>9,} {result['summary_build'] * 1000:9.1f} "
+            f"{result['first_token'] * 1000:14.0f} {result['summary_reply'] * 1000:14.0f}"
+        )
+        print(f"{'':>10} {'cached summary':>18} {result['cached'] * 1000:9.2f} ms")
+    largest = max(result["summary_tokens"] for result in results)
+    print(f"largest summary prompt: {largest:,} tokens (limit {args.max_prompt_tokens:,})")
+    return 0 if largest <= args.max_prompt_tokens else 1
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=lambda value: [parse_scale(v) for v in value.split(",")], default="10k,100k",
+                        help="Comma-separated ledger sizes in journal items")
+    parser.add_argument("--latency-ms", type=float, default=100, help="Fake model latency per call")
+    parser.add_argument("--prefill-ms", type=float, default=40, help="Fake model time per thousand prompt tokens")
+    parser.add_argument("--token-ms", type=float, default=15, help="Fake model time per reply token")
+    parser.add_argument("--context-window", type=int, default=128000, help="Largest prompt sent, in tokens")
+    parser.add_argument("--max-prompt-tokens", type=int, default=2000, help="Fail if a summary prompt is larger")
+    args = parser.parse_args(argv)
+
+    fake_model.settings.update(latency_ms=args.latency_ms, prefill_ms=args.prefill_ms, token_ms=args.token_ms)
+    AIService.configure(OpenAIChatClient(api_key="fake", base_url=fake_model.start_fake_server()))
+    return asyncio.run(run(args))
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,131 @@
+"""
+Time the local anomaly scan and check it finds planted duplicates and outliers.
+
+Generates books with benchmarks.datagen, then plants duplicated entries (the
+same lines and description a day or two later), outliers (an entry at a
+thousand times the amount) and duplicated invoices (same contact, type and
+amount, due a day later). Runs a full scan and reports its time, how many
+planted rows it found and how the shortlist compares in prompt tokens with
+listing every posting. Then posts a batch of new entries with more planted
+rows and times the incremental scan.
+
+    python -m benchmarks.anomalies --items 1M --planted 50 --new-entries 1000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+# The app binds its engines at import time, so point it at a scratch database first
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = os.getenv("BENCH_DATABASE_URL") or f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='simplefi-bench-'), 'bench.db')}"
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.orm import selectinload
+
+from app.database import SessionLocal, engine
+from app.models.models import Base, Invoice, JournalEntry
+from app.services.anomaly_service import AnomalyService
+from app.services.journal_service import JournalService
+from app.services.pdf_text import estimate_tokens
+from benchmarks.datagen import generate, parse_scale
+
+def plant(db, rng: random.Random, entries, count: int, shift_days: int, number: int):
+    """
+    Post count duplicates and count outliers of entries picked from entries; returns (duplicate ids, outlier ids).
+    """
+    picked = rng.sample(entries, 2 * count)
+    rows = []
+    for index, entry in enumerate(picked):
+        duplicate = index < count
+        day = (entry.entry_date + timedelta(days=rng.randint(1, shift_days) if duplicate else 0)).date()
+        factor = 1 if duplicate else 1000
+        rows.append((number + index, {
+            "date": day.isoformat(),
+            "description": entry.description if duplicate else f"Adjustment {number + index}",
+            "items": [{"account_id": item.account_id, "debit": str(item.debit * factor), "credit": str(item.credit * factor)}
+                      for item in entry.journal_items],
+        }))
+    first = (db.execute(select(func.max(JournalEntry.id))).scalar() or 0) + 1
+    JournalService.bulk_insert(db, iter(rows), chunk_size=1000)
+    ids = list(range(first, first + len(rows)))
+    return set(ids[:count]), set(ids[count:])
+
+def found(db, duplicates, outliers, invoices):
+    reasons = {}
+    for finding in AnomalyService.shortlist(db, 1000000):
+        key = finding.get("journal_entry_id") or ("invoice", finding.get("invoice_id"))
+        reasons.setdefault(key, set()).update(finding["reasons"])
+    hits = sum("duplicate" in reasons.get(entry_id, ()) for entry_id in duplicates)
+    hits += sum("outlier" in reasons.get(entry_id, ()) for entry_id in outliers)
+    hits += sum("duplicate" in reasons.get(("invoice", invoice_id), ()) for invoice_id in invoices)
+    return hits, len(duplicates) + len(outliers) + len(invoices)
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=parse_scale, default=parse_scale("1M"), help="Journal items in the generated books")
+    parser.add_argument("--planted", type=int, default=50, help="Duplicates, outliers and duplicate invoices planted, each")
+    parser.add_argument("--new-entries", type=int, default=1000, help="Entries posted before the incremental scan")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+    rng = random.Random(args.seed)
+
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    db = SessionLocal()
+    books = generate(db, args.items, seed=args.seed)
+    db.commit()
+    entries = list(db.execute(
+        select(JournalEntry).options(selectinload(JournalEntry.journal_items))
+        .where(JournalEntry.id.in_(rng.sample(range(1, books["entries"] + 1), 4 * args.planted)))
+    ).scalars())
+    duplicates, outliers = plant(db, rng, entries, args.planted, 2, 1)
+    invoices = rng.sample(list(db.execute(select(Invoice)).scalars()), args.planted)
+    first_invoice = db.execute(select(func.max(Invoice.id))).scalar() + 1
+    db.execute(insert(Invoice), [
+        {"invoice_number": f"DUP-{number}", "contact_id": invoice.contact_id, "type": invoice.type, "amount": invoice.amount,
+         "due_date": invoice.due_date + timedelta(days=1), "status": invoice.status}
+        for number, invoice in enumerate(invoices)
+    ])
+    db.commit()
+    planted_invoices = set(range(first_invoice, first_invoice + args.planted))
+
+    start = time.perf_counter()
+    full = AnomalyService.scan(db, full=True)
+    full_seconds = time.perf_counter() - start
+    full_hits, full_planted = found(db, duplicates, outliers, planted_invoices)
+    shortlist = AnomalyService.shortlist(db, 1000000)
+    dump_tokens = estimate_tokens("\n".join(f"- 2024-01-01: Entry description (${i:,.2f})" for i in range(full["items_scanned"])))
+    shortlist_tokens = estimate_tokens("\n".join(str(finding) for finding in shortlist))
+
+    # New postings at the end of the books: copies of recent entries plus more planted rows
+    recent = list(db.execute(
+        select(JournalEntry).options(selectinload(JournalEntry.journal_items))
+        .where(JournalEntry.entry_date >= date.fromisoformat(books["end"]) - timedelta(days=60))
+        .limit(args.new_entries + 4 * args.planted)
+    ).scalars())
+    end = date.fromisoformat(books["end"])
+    JournalService.bulk_insert(db, ((number, {
+        "date": (end - timedelta(days=rng.randint(0, 30))).isoformat(),
+        "description": f"Batch posting {number}",
+        "items": [{"account_id": item.account_id, "debit": str(item.debit), "credit": str(item.credit)} for item in entry.journal_items],
+    }) for number, entry in enumerate(recent[:args.new_entries])), chunk_size=1000)
+    new_duplicates, new_outliers = plant(db, rng, recent[args.new_entries:], args.planted, 2, 1)
+    start = time.perf_counter()
+    incremental = AnomalyService.scan(db)
+    incremental_seconds = time.perf_counter() - start
+    new_hits, new_planted = found(db, new_duplicates, new_outliers, set())
+    db.close()
+
+    print(f"books: {full['items_scanned']:,} journal items, {full['invoices_scanned']:,} invoices")
+    print(f"full scan          {full_seconds:7.2f} s  {full['flagged']:,} flagged, {full_hits}/{full_planted} planted found")
+    print(f"incremental scan   {incremental_seconds:7.2f} s  {incremental['items_scanned']:,} new items, "
+          f"{incremental['flagged']:,} flagged, {new_hits}/{new_planted} planted found")
+    print(f"prompt tokens      {dump_tokens:,} listing every posting, {shortlist_tokens:,} for the whole shortlist")
+    return 0 if full_hits == full_planted and new_hits == new_planted else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
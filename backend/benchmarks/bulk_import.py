@@ -0,0 +1,76 @@
+"""
+Compare bulk journal ingestion against the per-entry insert pattern used by
+POST /journal_entries (header commit, then item commit for every entry).
+
+    python -m benchmarks.bulk_import --entries 20000
+"""
+import argparse
+import random
+import sys
+from datetime import datetime, timedelta
+
+from app.models.models import JournalEntry, JournalItem
+from app.models.money import from_cents
+from app.services.journal_service import JournalService, BULK_CHUNK_SIZE
+from benchmarks.common import make_session_factory, seed_accounts, timer
+
+def generate_entries(count: int, account_ids, seed: int = 42):
+    rng = random.Random(seed)
+    start = datetime(2020, 1, 1)
+    for i in range(count):
+        amount = str(from_cents(rng.randint(100, 500000)))
+        debit_account, credit_account = rng.sample(account_ids, 2)
+        yield {
+            "date": (start + timedelta(days=i % 1500)).date().isoformat(),
+            "description": f"Entry {i}",
+            "items": [
+                {"account_id": debit_account, "debit": amount, "credit": 0},
+                {"account_id": credit_account, "debit": 0, "credit": amount},
+            ],
+        }
+
+def insert_per_entry(db, entries):
+    for entry in entries:
+        db_entry = JournalEntry(entry_date=datetime.fromisoformat(entry["date"]), description=entry["description"])
+        db.add(db_entry)
+        db.commit()
+        db.refresh(db_entry)
+        for item in entry["items"]:
+            db.add(JournalItem(journal_entry_id=db_entry.id, **item))
+        db.commit()
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=5000)
+    parser.add_argument("--chunk-size", type=int, default=BULK_CHUNK_SIZE)
+    parser.add_argument("--min-speedup", type=float, default=10.0)
+    args = parser.parse_args(argv)
+
+    results = {}
+
+    Session = make_session_factory()
+    db = Session()
+    account_ids = seed_accounts(db)
+    entries = list(generate_entries(args.entries, account_ids))
+    with timer(results, "per_entry"):
+        insert_per_entry(db, entries)
+    db.close()
+
+    Session = make_session_factory()
+    db = Session()
+    account_ids = seed_accounts(db)
+    entries = list(generate_entries(args.entries, account_ids))
+    with timer(results, "bulk"):
+        result = JournalService.bulk_insert(db, enumerate(entries, start=1), chunk_size=args.chunk_size)
+    db.close()
+    assert result["inserted"] == args.entries, result
+
+    speedup = results["per_entry"] / results["bulk"]
+    print(f"entries:   {args.entries}")
+    print(f"per-entry: {results['per_entry']:.3f}s ({args.entries / results['per_entry']:,.0f} entries/s)")
+    print(f"bulk:      {results['bulk']:.3f}s ({args.entries / results['bulk']:,.0f} entries/s)")
+    print(f"speedup:   {speedup:.1f}x (required {args.min_speedup:.1f}x)")
+    return 0 if speedup >= args.min_speedup else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,99 @@
+"""
+Measure the response cache on the endpoints every page load calls.
+
+For each endpoint: a cache miss (full query), a cache hit, and a conditional
+request answered with 304. Also checks that hits run no SQL besides the
+shared version poll and that a journal entry write invalidates the cached
+reports.
+
+    python -m benchmarks.cache --entries 100000
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+# The app binds its engines at import time, so point it at a scratch database first
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='simplefi-bench-'), 'bench.db')}"
+
+import httpx
+from sqlalchemy import event
+
+from app.cache import response_cache
+from app.database import SessionLocal, async_engine, engine
+from app.models.models import Base
+from app.services.balance_service import BalanceService
+from benchmarks.common import seed_accounts, seed_ledger
+from main import app
+
+ENDPOINTS = [
+    "/accounts",
+    "/reports/trial-balance",
+    "/reports/income-statement?granularity=month",
+    "/reports/balance-sheet?granularity=quarter",
+]
+
+async def median_ms(client: httpx.AsyncClient, path: str, requests: int, headers=None, clear: bool = False) -> float:
+    samples = []
+    for _ in range(requests):
+        if clear:
+            response_cache.clear()
+        start = time.perf_counter()
+        await client.get(path, headers=headers)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+async def main_async(args) -> int:
+    statements = []
+    for bound in (engine, async_engine.sync_engine):
+        # Polls of the shared cache versions run at most once a second whatever the traffic, so they are not counted
+        event.listen(bound, "before_cursor_execute", lambda *a, **k: "cache_versions" in a[2] or statements.append(a[2]))
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        print(f"{'endpoint':<45} {'miss ms':>8} {'hit ms':>8} {'304 ms':>8} {'hit SQL':>8}")
+        hit_queries = 0
+        for path in ENDPOINTS:
+            miss = await median_ms(client, path, args.requests, clear=True)
+            etag = (await client.get(path)).headers["etag"]
+            before = len(statements)
+            hit = await median_ms(client, path, args.requests)
+            not_modified = await median_ms(client, path, args.requests, headers={"If-None-Match": etag})
+            queries = len(statements) - before
+            hit_queries += queries
+            print(f"{path:<45} {miss:>8.2f} {hit:>8.2f} {not_modified:>8.2f} {queries:>8}")
+
+        etag = (await client.get(ENDPOINTS[1])).headers["etag"]
+        response = await client.post("/journal_entries", json={
+            "date": "2024-06-30",
+            "description": "Cache invalidation check",
+            "items": [{"account_id": 1, "debit": 1}, {"account_id": 2, "credit": 1}],
+        })
+        response.raise_for_status()
+        revalidated = await client.get(ENDPOINTS[1], headers={"If-None-Match": etag})
+        print(f"\nafter a journal entry write the trial balance revalidates with {revalidated.status_code}")
+
+    return 0 if hit_queries == 0 and revalidated.status_code == 200 else 1
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=100000)
+    parser.add_argument("--accounts", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=20, help="Requests per measurement")
+    args = parser.parse_args(argv)
+
+    Base.metadata.create_all(engine)
+    db = SessionLocal()
+    account_ids = seed_accounts(db, args.accounts)
+    seed_ledger(db, account_ids, args.entries, years=2)
+    BalanceService.rebuild(db)
+    db.close()
+
+    return asyncio.run(main_async(args))
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,169 @@
+"""
+Train the local categorizer on a synthetic ledger and compare its latency with
+the language model path (the fake model server in benchmarks/fake_model.py).
+
+History entries post recurring vendors against the account the fake model
+would choose, so local predictions can be checked against the same answer.
+The evaluation feed mixes known vendors with vendors never seen in training.
+
+    python -m benchmarks.categorizer --entries 100000 --transactions 5000
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import string
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# Keep the model file and the app's engines away from real data
+_scratch = tempfile.mkdtemp(prefix="simplefi-bench-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_scratch, 'bench.db')}")
+os.environ["AI_LOCAL_MODEL_PATH"] = os.path.join(_scratch, "categorizer.npz")
+# Measure local predictions against the model, not result cache hits
+os.environ["AI_CACHE_ENABLED"] = "false"
+
+from sqlalchemy import insert
+
+from app.database import SessionLocal, engine
+from app.models.models import Account, AccountTypeEnum, Base, JournalEntry, JournalItem, NormalBalance
+from app.models.money import from_cents
+from app.services import categorizer_service
+from app.services.ai_client import OpenAIChatClient
+from app.services.ai_service import AIService
+from app.services.categorizer_service import CategorizerService
+from benchmarks import fake_model
+
+KEYWORDS = ["aws", "azure", "hosting", "payroll", "salary", "rent", "lease", "client", "stripe payout", "loan", "laptop", "furniture"]
+TEMPLATES = ["{vendor} {n}", "POS {vendor} ref {n}", "{vendor} - {month} {n}", "ACH {vendor} batch {n}"]
+MONTHS = ["january", "february", "march", "april", "may", "june"]
+
+def word(rng, length=6) -> str:
+    return "".join(rng.choices(string.ascii_lowercase, k=length))
+
+def make_vendor(rng) -> str:
+    # Most vendors name what they sell; the rest only the fake model's fallback account fits
+    return f"{word(rng)} {rng.choice(KEYWORDS)} {word(rng, 4)}" if rng.random() < 0.8 else f"{word(rng)} {word(rng, 5)}"
+
+def describe(rng, vendor) -> str:
+    return rng.choice(TEMPLATES).format(vendor=vendor, month=rng.choice(MONTHS), n=rng.randint(1000, 999999))
+
+def seed(db, vendors, entries, rng, chunk_size=10000):
+    """
+    A cash account plus one account per fake model answer, and entries posting vendors against them.
+    """
+    names = {account: category for _, category, account in fake_model.RULES}
+    names["General Expense"] = "Expense"
+    accounts = [Account(account_code="1000", account_name="Cash", account_type=AccountTypeEnum.Asset, normal_balance=NormalBalance.DEBIT)]
+    for code, (name, category) in enumerate(sorted(names.items()), start=2000):
+        debit_normal = category in ("Asset", "Expense")
+        accounts.append(Account(
+            account_code=str(code),
+            account_name=name,
+            account_type=AccountTypeEnum(category),
+            normal_balance=NormalBalance.DEBIT if debit_normal else NormalBalance.CREDIT,
+        ))
+    db.add_all(accounts)
+    db.commit()
+    cash_id = accounts[0].id
+    account_ids = {account.account_name: account.id for account in accounts}
+
+    start = datetime(2024, 1, 1)
+    for offset in range(0, entries, chunk_size):
+        entry_rows, item_rows = [], []
+        for entry_id in range(offset + 1, min(offset + chunk_size, entries) + 1):
+            description = describe(rng, rng.choice(vendors))
+            account_id = account_ids[fake_model.categorize(description)["account"]]
+            amount = from_cents(rng.randint(100, 500000))
+            entry_rows.append({"id": entry_id, "entry_date": start + timedelta(days=entry_id % 365), "description": description})
+            item_rows.append({"journal_entry_id": entry_id, "account_id": account_id, "debit": amount, "credit": 0})
+            item_rows.append({"journal_entry_id": entry_id, "account_id": cash_id, "debit": 0, "credit": amount})
+        db.execute(insert(JournalEntry), entry_rows)
+        db.execute(insert(JournalItem), item_rows)
+        db.commit()
+
+def percentile(values, share):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+async def model_latency(descriptions):
+    latencies = []
+    for description in descriptions:
+        start = time.perf_counter()
+        await AIService.suggest_categorization(description)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+async def model_calls(feed, args):
+    requests_before = fake_model.stats["requests"]
+    start = time.perf_counter()
+    result = await AIService.suggest_categorizations(feed, batch_size=args.batch_size, concurrency=args.concurrency)
+    return fake_model.stats["requests"] - requests_before, time.perf_counter() - start, result
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=100000, help="Historical journal entries to train on")
+    parser.add_argument("--vendors", type=int, default=500, help="Recurring vendors in the history")
+    parser.add_argument("--transactions", type=int, default=5000, help="New transactions to categorize")
+    parser.add_argument("--new-vendor-share", type=float, default=0.15, help="Share of new transactions from unseen vendors")
+    parser.add_argument("--model-sample", type=int, default=20, help="Escalated transactions timed through the model one at a time")
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency-ms", type=float, default=100, help="Fake model latency per call")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--max-local-us", type=float, default=1000.0, help="Fail if the local p50 is slower")
+    parser.add_argument("--min-accuracy", type=float, default=0.95, help="Fail if fewer local answers agree with the model")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    vendors = [make_vendor(rng) for _ in range(args.vendors)]
+    Base.metadata.create_all(engine)
+    db = SessionLocal()
+    seed(db, vendors, args.entries, rng)
+
+    start = time.perf_counter()
+    model = CategorizerService.train(db)
+    CategorizerService.save(model)
+    train_seconds = time.perf_counter() - start
+    db.close()
+
+    feed = [
+        {"description": describe(rng, make_vendor(rng) if rng.random() < args.new_vendor_share else rng.choice(vendors)), "amount": 100.0}
+        for _ in range(args.transactions)
+    ]
+    descriptions = [transaction["description"] for transaction in feed]
+    CategorizerService.get_model()
+
+    local_latencies, local, escalated = [], [], []
+    for description in descriptions:
+        start = time.perf_counter()
+        suggestion = CategorizerService.suggest([description])[0]
+        local_latencies.append(time.perf_counter() - start)
+        (local if suggestion else escalated).append((description, suggestion))
+    correct = sum(1 for description, suggestion in local if suggestion["account"] == fake_model.categorize(description)["account"])
+
+    fake_model.settings.update(latency_ms=args.latency_ms)
+    AIService.configure(OpenAIChatClient(api_key="fake", base_url=fake_model.start_fake_server()))
+    llm_latencies = asyncio.run(model_latency([description for description, _ in escalated[:args.model_sample]]))
+
+    with_local_calls, with_local_seconds, _ = asyncio.run(model_calls(feed, args))
+    categorizer_service.AI_LOCAL_ENABLED = False
+    without_local_calls, without_local_seconds, _ = asyncio.run(model_calls(feed, args))
+
+    print(f"history: {args.entries:,} entries, {args.vendors} vendors  trained in {train_seconds:.2f} s ({model['log_likelihood'].shape[0]:,} words)")
+    print(f"new transactions: {args.transactions:,}  unseen vendor share: {args.new_vendor_share:.0%}")
+    print(f"local latency    p50 {percentile(local_latencies, 0.5) * 1e6:7.1f} us  p99 {percentile(local_latencies, 0.99) * 1e6:7.1f} us")
+    if llm_latencies:
+        print(f"model latency    p50 {statistics.median(llm_latencies) * 1000:7.1f} ms  (one call each, {len(llm_latencies)} escalated transactions)")
+    print(f"answered locally {len(local):,}  escalated {len(escalated):,} ({len(escalated) / len(descriptions):.1%})")
+    accuracy = correct / max(len(local), 1)
+    print(f"local accuracy   {accuracy:.2%} agree with the model")
+    print(f"batch import     {with_local_calls} model calls in {with_local_seconds:.2f} s with the local model, "
+          f"{without_local_calls} in {without_local_seconds:.2f} s without")
+    return 0 if percentile(local_latencies, 0.5) * 1e6 <= args.max_local_us and accuracy >= args.min_accuracy else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+"""
+Shared helpers for the benchmark scripts. Each benchmark runs against a
+throwaway SQLite database unless BENCH_DATABASE_URL points elsewhere.
+"""
+import os
+import random
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from app.models.models import Base, Account, AccountTypeEnum, NormalBalance, Contact, Invoice, JournalEntry, JournalItem
+from app.models.money import from_cents
+
+def make_session_factory():
+    """
+    Create a fresh database with the full schema and return a session factory bound to it.
+    """
+    url = os.getenv("BENCH_DATABASE_URL")
+    if url is None:
+        path = os.path.join(tempfile.mkdtemp(prefix="simplefi-bench-"), "bench.db")
+        url = f"sqlite:///{path}"
+    engine = create_engine(url)
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+def seed_accounts(db, count: int = 20):
+    """
+    Insert a minimal chart of accounts and return the created ids.
+    """
+    types = [
+        (AccountTypeEnum.Asset, NormalBalance.DEBIT),
+        (AccountTypeEnum.Liability, NormalBalance.CREDIT),
+        (AccountTypeEnum.Equity, NormalBalance.CREDIT),
+        (AccountTypeEnum.Revenue, NormalBalance.CREDIT),
+        (AccountTypeEnum.Expense, NormalBalance.DEBIT),
+    ]
+    accounts = []
+    for i in range(count):
+        account_type, normal_balance = types[i % len(types)]
+        accounts.append(Account(
+            account_code=f"{(i % len(types) + 1) * 1000 + i}",
+            account_name=f"Account {i}",
+            account_type=account_type,
+            normal_balance=normal_balance,
+        ))
+    db.add_all(accounts)
+    db.commit()
+    return [account.id for account in accounts]
+
+def seed_ledger(db, account_ids, entries: int, years: int = 3, seed: int = 42, chunk_size: int = 10000):
+    """
+    Insert balanced two-line journal entries spread evenly over the given number of years.
+    """
+    rng = random.Random(seed)
+    start = datetime(2024 - years + 1, 1, 1)
+    days = years * 365
+    next_id = 1
+    for offset in range(0, entries, chunk_size):
+        count = min(chunk_size, entries - offset)
+        entry_rows, item_rows = [], []
+        for i in range(count):
+            entry_id = next_id + i
+            amount = from_cents(rng.randint(100, 500000))
+            debit_account, credit_account = rng.sample(account_ids, 2)
+            entry_rows.append({
+                "id": entry_id,
+                "entry_date": start + timedelta(days=(offset + i) * days // entries),
+                "description": f"Entry {entry_id}",
+            })
+            item_rows.append({"journal_entry_id": entry_id, "account_id": debit_account, "debit": amount, "credit": 0})
+            item_rows.append({"journal_entry_id": entry_id, "account_id": credit_account, "debit": 0, "credit": amount})
+        db.execute(insert(JournalEntry), entry_rows)
+        db.execute(insert(JournalItem), item_rows)
+        db.commit()
+        next_id += count
+
+@contextmanager
+def timer(results: dict, key: str):
+    """
+    Record the wall-clock seconds spent in the block under results[key].
+    """
+    start = time.perf_counter()
+    yield
+    results[key] = time.perf_counter() - start
+
+# Mostly settled invoices with about one in ten still open
+INVOICE_STATUSES = ["Paid"] * 18 + ["Sent", "Overdue"]
+
+def seed_invoices(db, contacts: int, invoices: int, years: int = 3, seed: int = 42, chunk_size: int = 10000):
+    """
+    Insert customers and vendors plus invoices due evenly at random over the given number of years.
+    """
+    rng = random.Random(seed)
+    db.execute(insert(Contact), [
+        {"id": i, "name": f"Contact {i}", "type": "Vendor" if i % 2 else "Customer"} for i in range(1, contacts + 1)
+    ])
+    start = datetime(2024 - years + 1, 1, 1)
+    for offset in range(0, invoices, chunk_size):
+        db.execute(insert(Invoice), [
+            {
+                "id": number + 1,
+                "invoice_number": f"INV-{number:08d}",
+                "contact_id": rng.randint(1, contacts),
+                "type": rng.choice(("Payable", "Receivable")),
+                "amount": from_cents(rng.randint(1000, 5000000)),
+                "due_date": start + timedelta(days=rng.randrange(years * 365)),
+                "status": rng.choice(INVOICE_STATUSES),
+            }
+            for number in range(offset, min(offset + chunk_size, invoices))
+        ])
+        db.commit()
@@ -0,0 +1,123 @@
+"""
+Load test the async database path.
+
+1. Throughput of the async trial balance endpoint at increasing concurrency.
+2. Latency of a trivial endpoint while slow reports are in flight, served by
+   the async handler versus the old pattern of calling the sync Session
+   inside an async def (which blocks the event loop for every request).
+
+    python -m benchmarks.concurrency --entries 100000
+
+Point DATABASE_URL at PostgreSQL to measure real network/IO overlap; on
+SQLite the queries are CPU-bound and only overlap on multi-core hosts.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date
+
+# The app binds its engines at import time, so point it at a scratch database first
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='simplefi-bench-'), 'bench.db')}"
+# Measure the database path, not response cache hits
+os.environ["RESPONSE_CACHE_SIZE"] = "0"
+
+import httpx
+
+from app.database import SessionLocal, engine
+from app.models.models import Base
+from app.services.balance_service import BalanceService
+from benchmarks.common import seed_accounts, seed_ledger
+from main import app
+
+# Mid-month so the report has to scan raw items for the partial month
+AS_OF = "2024-06-15"
+ASYNC_REPORT = f"/reports/trial-balance?as_of={AS_OF}"
+BLOCKING_REPORT = f"/bench/blocking-trial-balance?as_of={AS_OF}"
+
+@app.get("/bench/blocking-trial-balance")
+async def blocking_trial_balance(as_of: date):
+    # The pre-async pattern: a sync query that blocks the event loop
+    with SessionLocal() as db:
+        return BalanceService.trial_balance(db, as_of)
+
+async def timed_get(client: httpx.AsyncClient, path: str) -> float:
+    start = time.perf_counter()
+    response = await client.get(path)
+    response.raise_for_status()
+    return time.perf_counter() - start
+
+async def throughput(client: httpx.AsyncClient, path: str, requests: int, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            await timed_get(client, path)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    return requests / (time.perf_counter() - start)
+
+async def latency_under_load(client: httpx.AsyncClient, report_path: str, slow_requests: int, fast_requests: int, interval: float = 0.01) -> list:
+    """
+    Fire fast requests on a fixed schedule while slow reports run. Latency is measured from each
+    request's scheduled start, so time spent waiting on a blocked event loop is counted.
+    """
+    slow = [asyncio.create_task(timed_get(client, report_path)) for _ in range(slow_requests)]
+    start = time.perf_counter()
+    samples = []
+    for i in range(fast_requests):
+        scheduled = start + i * interval
+        await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+        await timed_get(client, "/")
+        samples.append(time.perf_counter() - scheduled)
+    await asyncio.gather(*slow)
+    return samples
+
+def percentile(values: list, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+async def main_async(args) -> None:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        print("Throughput of the async trial balance endpoint")
+        print(f"{'concurrency':>11} {'req/s':>8}")
+        for concurrency in args.concurrency:
+            rate = await throughput(client, ASYNC_REPORT, args.requests, concurrency)
+            print(f"{concurrency:>11} {rate:>8.1f}")
+
+        print(f"\nGET / latency while {args.slow} trial balance reports run")
+        print(f"{'handler':>9} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8}")
+        for name, path in (("async", ASYNC_REPORT), ("blocking", BLOCKING_REPORT)):
+            samples = await latency_under_load(client, path, args.slow, args.fast)
+            print(
+                f"{name:>9} {statistics.median(samples) * 1000:>8.1f} "
+                f"{percentile(samples, 0.95) * 1000:>8.1f} {max(samples) * 1000:>8.1f}"
+            )
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=100000)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--slow", type=int, default=10, help="Concurrent slow report requests")
+    parser.add_argument("--fast", type=int, default=50, help="Sequential fast requests measured meanwhile")
+    args = parser.parse_args(argv)
+
+    Base.metadata.create_all(engine)
+    db = SessionLocal()
+    account_ids = seed_accounts(db, 50)
+    seed_ledger(db, account_ids, args.entries, years=1)
+    BalanceService.rebuild(db)
+    db.close()
+
+    asyncio.run(main_async(args))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+"""
+Count dashboard push messages during a bulk import and time what the push adds to a commit.
+
+Subscribes to the dashboard hub in process, imports journal entries in
+chunks from another thread as the API would, and reports how many messages
+the subscriber received against how many commits were made, and whether the
+snapshot plus the deltas ends where a fresh snapshot does. Also times
+posting single entries with and without a subscriber.
+
+    python -m benchmarks.dashboard --entries 10000 --chunk-size 100
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date
+from decimal import Decimal
+
+from sqlalchemy import update
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=10000, help="Entries in the bulk import")
+    parser.add_argument("--chunk-size", type=int, default=100, help="Entries per commit")
+    parser.add_argument("--posts", type=int, default=300, help="Single entries timed with and without a subscriber")
+    args = parser.parse_args(argv)
+
+    # The app binds its engines at import, so point it at a throwaway database first
+    os.environ["DATABASE_URL"] = os.getenv("BENCH_DATABASE_URL") or f"sqlite:///{tempfile.mkdtemp(prefix='simplefi-bench-')}/bench.db"
+    from app.dashboard import DASHBOARD_DEBOUNCE_MS, DASHBOARD_MAX_WAIT_MS, dashboard_hub
+    from app.database import SessionLocal, engine
+    from app.models.models import Account, Base
+    from app.services.dashboard_service import DashboardService
+    from app.services.journal_service import JournalService
+    from benchmarks.common import seed_accounts
+
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    db = SessionLocal()
+    account_ids = seed_accounts(db)
+    # seed_accounts cycles through Asset, Liability, Equity, Revenue and Expense; name the first asset as cash
+    db.execute(update(Account).where(Account.id == account_ids[0]).values(account_name="Cash at bank"))
+    db.commit()
+    db.close()
+    cash_id, revenue_id, expense_id = account_ids[0], account_ids[3], account_ids[4]
+    year = date.today().year
+
+    def post(db, number: int) -> None:
+        JournalService.create_entry(db, date(year, 1, 1), f"Post {number}", [
+            {"account_id": cash_id, "debit": Decimal("1.00"), "credit": Decimal("0")},
+            {"account_id": revenue_id, "debit": Decimal("0"), "credit": Decimal("1.00")},
+        ])
+
+    def timed_posts() -> float:
+        db = SessionLocal()
+        times = []
+        for number in range(args.posts):
+            start = time.perf_counter()
+            post(db, number)
+            times.append(time.perf_counter() - start)
+        db.close()
+        return statistics.median(times) * 1000
+
+    def bulk_import() -> int:
+        def entry(number: int) -> dict:
+            # Alternating sales and paid expenses, so cash, revenue and expenses all move
+            debit_id, credit_id, amount = (cash_id, revenue_id, "2.50") if number % 2 else (expense_id, cash_id, "1.75")
+            return {"date": f"{year}-{number % 12 + 1:02d}-01", "description": f"Import {number}", "items": [
+                {"account_id": debit_id, "debit": amount},
+                {"account_id": credit_id, "credit": amount},
+            ]}
+
+        rows = ((number, entry(number)) for number in range(args.entries))
+        db = SessionLocal()
+        try:
+            return JournalService.bulk_insert(db, rows, args.chunk_size)["inserted"]
+        finally:
+            db.close()
+
+    async def run():
+        idle_ms = timed_posts()
+        subscriber, snapshot = await dashboard_hub.subscribe()
+        listening_ms = await asyncio.to_thread(timed_posts)
+        await asyncio.sleep((DASHBOARD_MAX_WAIT_MS + DASHBOARD_DEBOUNCE_MS) / 1000)
+        kpis = dict(snapshot["kpis"])
+        messages = 0
+
+        def apply(message) -> None:
+            for kpi, change in message["changes"].items():
+                kpis[kpi] = round(kpis[kpi] + change, 2)
+
+        while True:
+            message = await dashboard_hub.next(subscriber, 0.01)
+            if message is None:
+                break
+            apply(message)
+
+        start = time.perf_counter()
+        importing = asyncio.ensure_future(asyncio.to_thread(bulk_import))
+        while not importing.done() or subscriber.ready.is_set():
+            message = await dashboard_hub.next(subscriber, 0.05)
+            if message is not None:
+                messages += 1
+                apply(message)
+        inserted = importing.result()
+        elapsed = time.perf_counter() - start
+        # Changes committed at the end of the import arrive after the debounce window
+        await asyncio.sleep((DASHBOARD_MAX_WAIT_MS + DASHBOARD_DEBOUNCE_MS) / 1000)
+        while (message := await dashboard_hub.next(subscriber, 0.01)) is not None:
+            messages += 1
+            apply(message)
+        dashboard_hub.unsubscribe(subscriber)
+
+        db = SessionLocal()
+        expected = {kpi: cents / 100 for kpi, cents in DashboardService.snapshot(db, year).items()}
+        db.close()
+        commits = -(-inserted // args.chunk_size)
+        print(f"imported {inserted:,} entries in {commits} commits in {elapsed:.1f} s; {messages} messages")
+        print(f"{'post, nobody subscribed':<30} {idle_ms:7.2f} ms p50")
+        print(f"{'post, one subscriber':<30} {listening_ms:7.2f} ms p50")
+        print(f"snapshot plus deltas {'matches' if kpis == expected else 'differs from'} a fresh snapshot")
+        return 0 if kpis == expected and messages < commits else 1
+
+    return asyncio.run(run())
+
+if __name__ == "__main__":
+    sys.exit(main())
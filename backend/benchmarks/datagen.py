@@ -0,0 +1,326 @@
+"""
+Generate a coherent synthetic SimpleFi dataset at a chosen scale.
+
+Builds a small business's books from a fixed seed: a standard chart of
+accounts, customers and vendors, and day by day the entries such a business
+posts. Credit sales and vendor bills raise invoices that are mostly settled by
+a later receipt or payment, so invoice statuses agree with receivables and
+payables in the ledger. Bank statements for the last few months are drawn from
+the cash account's postings with clearing delays, bank charges and uncleared
+items, so reconciliation has realistic work to do. Account balances and aging
+summaries are rebuilt at the end.
+
+    python -m benchmarks.datagen --items 1M --years 3
+    BENCH_DATABASE_URL=postgresql://... python -m benchmarks.datagen --items 10M
+"""
+from typing import Dict, List, Tuple
+import argparse
+import random
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, text
+
+from app.models.models import (
+    Account, AccountTypeEnum, BankReconciliation, BankStatementLine, Contact, Invoice, JournalEntry, JournalItem, NormalBalance,
+)
+from app.models.money import from_cents
+from app.services.aging_service import AgingService
+from app.services.balance_service import BalanceService
+
+ASSET, LIABILITY, EQUITY, REVENUE, EXPENSE = (
+    AccountTypeEnum.Asset, AccountTypeEnum.Liability, AccountTypeEnum.Equity, AccountTypeEnum.Revenue, AccountTypeEnum.Expense,
+)
+
+# (code, name, type); ids follow the list order
+CHART = [
+    ("1000", "Cash at Bank", ASSET),
+    ("1100", "Accounts Receivable", ASSET),
+    ("1200", "Inventory", ASSET),
+    ("1500", "Equipment", ASSET),
+    ("2000", "Accounts Payable", LIABILITY),
+    ("2100", "Payroll Liabilities", LIABILITY),
+    ("2200", "Sales Tax Payable", LIABILITY),
+    ("3000", "Owner's Capital", EQUITY),
+    ("3100", "Retained Earnings", EQUITY),
+    ("4000", "Product Sales", REVENUE),
+    ("4100", "Service Revenue", REVENUE),
+    ("5000", "Cost of Goods Sold", EXPENSE),
+    ("6000", "Salaries and Wages", EXPENSE),
+    ("6100", "Rent", EXPENSE),
+    ("6200", "Utilities", EXPENSE),
+    ("6300", "Software Subscriptions", EXPENSE),
+    ("6400", "Travel", EXPENSE),
+    ("6500", "Office Supplies", EXPENSE),
+    ("6600", "Bank Charges", EXPENSE),
+    ("6700", "Marketing", EXPENSE),
+]
+ACCOUNT_IDS = {code: number for number, (code, _, _) in enumerate(CHART, start=1)}
+CASH, RECEIVABLE, PAYABLE, PAYROLL, SALES_TAX, CAPITAL = (ACCOUNT_IDS[code] for code in ("1000", "1100", "2000", "2100", "2200", "3000"))
+SALES_ACCOUNTS = [ACCOUNT_IDS["4000"], ACCOUNT_IDS["4100"]]
+BILL_ACCOUNTS = [ACCOUNT_IDS[code] for code in ("1200", "5000", "6100", "6200", "6300", "6700", "1500")]
+CASH_EXPENSE_ACCOUNTS = [ACCOUNT_IDS[code] for code in ("6400", "6500", "6600")]
+SALARIES = ACCOUNT_IDS["6000"]
+
+NAME_PARTS = (
+    ["Northwind", "Bluebird", "Summit", "Harbor", "Cedar", "Ironwood", "Lakeside", "Redstone", "Silverline", "Pioneer",
+     "Maple", "Granite", "Evergreen", "Beacon", "Sterling", "Orchard", "Falcon", "Riverside", "Copper", "Atlas"],
+    ["Traders", "Supply", "Logistics", "Consulting", "Foods", "Designs", "Systems", "Partners", "Outfitters", "Labs"],
+    ["Ltd", "Inc", "LLC", "Co", "Group"],
+)
+
+# Share of originating events per kind; receipts and payments follow from sales and bills
+EVENT_WEIGHTS = [("sale", 0.35), ("bill", 0.30), ("cash_expense", 0.35)]
+# Average items per event including the settlement it triggers, used to size the daily volume
+ITEMS_PER_EVENT = 0.35 * (3 + 0.92 * 2) + 0.30 * (2 + 0.95 * 2) + 0.35 * 2
+SALES_TAX_RATE = 8
+PAYROLL_EVERY_DAYS = 14
+
+def parse_scale(value: str) -> int:
+    """
+    Parse counts like 10000, 10k, 2.5M.
+    """
+    multipliers = {"k": 1000, "m": 1000000}
+    suffix = value[-1:].lower()
+    try:
+        if suffix in multipliers:
+            return int(float(value[:-1]) * multipliers[suffix])
+        return int(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(f"Invalid count {value!r}, expected e.g. 10000, 10k or 2.5M") from e
+
+class LedgerWriter:
+    """
+    Buffers generated rows and writes them in chunks with explicit ids, so ids are known without reading back.
+    """
+    def __init__(self, db, chunk_size: int):
+        self.db = db
+        self.chunk_size = chunk_size
+        self.entries: List[Dict] = []
+        self.items: List[Dict] = []
+        self.invoices: List[Dict] = []
+        self.entry_count = 0
+        self.item_count = 0
+        self.invoice_count = 0
+
+    def entry(self, day: datetime, description: str, lines: List[Tuple[int, int, int]]) -> List[int]:
+        """
+        Add one entry of (account id, debit cents, credit cents) lines and return the item ids.
+        """
+        self.entry_count += 1
+        self.entries.append({"id": self.entry_count, "entry_date": day, "description": description, "created_at": day, "updated_at": day})
+        item_ids = []
+        for account_id, debit, credit in lines:
+            self.item_count += 1
+            item_ids.append(self.item_count)
+            self.items.append({
+                "id": self.item_count, "journal_entry_id": self.entry_count, "account_id": account_id,
+                "debit": from_cents(debit), "credit": from_cents(credit),
+            })
+        if len(self.entries) >= self.chunk_size:
+            self.flush()
+        return item_ids
+
+    def invoice(self, contact_id: int, invoice_type: str, cents: int, issued: datetime, due: datetime, status: str) -> str:
+        self.invoice_count += 1
+        number = f"{'INV' if invoice_type == 'Receivable' else 'BILL'}-{self.invoice_count:08d}"
+        self.invoices.append({
+            "id": self.invoice_count, "invoice_number": number, "contact_id": contact_id, "type": invoice_type,
+            "amount": from_cents(cents), "due_date": due, "status": status, "created_at": issued, "updated_at": issued,
+        })
+        return number
+
+    def flush(self) -> None:
+        if self.entries:
+            self.db.execute(insert(JournalEntry), self.entries)
+            self.db.execute(insert(JournalItem), self.items)
+        if self.invoices:
+            self.db.execute(insert(Invoice), self.invoices)
+        self.db.commit()
+        self.entries, self.items, self.invoices = [], [], []
+
+def contact_names(rng: random.Random, count: int) -> List[str]:
+    first, second, suffix = NAME_PARTS
+    return [f"{rng.choice(first)} {rng.choice(second)} {rng.choice(suffix)}" for _ in range(count)]
+
+def reset_sequences(db, tables) -> None:
+    """
+    Move PostgreSQL id sequences past the explicitly inserted ids so later inserts do not collide.
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        return
+    for table in tables:
+        db.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), COALESCE((SELECT MAX(id) FROM {table}), 0) + 1, false)"
+        ))
+    db.commit()
+
+def generate(db, items: int, years: int = 3, contacts: int = 0, statement_months: int = 3, seed: int = 42, chunk_size: int = 10000) -> Dict:
+    """
+    Write a dataset of about the given number of journal items into an empty schema and return a summary of it.
+    """
+    rng = random.Random(seed)
+    days = years * 365
+    start = datetime(2024 - years + 1, 1, 1)
+    end = start + timedelta(days=days)
+    events_per_day = items / ITEMS_PER_EVENT / days
+    contacts = contacts or min(50000, max(20, items // 2000))
+
+    db.execute(insert(Account), [
+        {"id": number, "account_code": code, "account_name": name, "account_type": account_type,
+         "normal_balance": NormalBalance.DEBIT if account_type in (ASSET, EXPENSE) else NormalBalance.CREDIT}
+        for number, (code, name, account_type) in enumerate(CHART, start=1)
+    ])
+    names = contact_names(rng, contacts)
+    db.execute(insert(Contact), [
+        {"id": number, "name": names[number - 1], "type": "Customer" if number % 2 else "Vendor", "created_at": start, "updated_at": start}
+        for number in range(1, contacts + 1)
+    ])
+    customers = list(range(1, contacts + 1, 2))
+    vendors = list(range(2, contacts + 1, 2)) or customers
+    db.commit()
+
+    writer = LedgerWriter(db, chunk_size)
+    kinds, weights = zip(*EVENT_WEIGHTS)
+    # Day number -> settlements due that day as (kind, contact, cents, invoice number)
+    settlements = defaultdict(list)
+    # Cash postings in the statement window as (item id, day number, signed cents)
+    statement_start = max(0, days - statement_months * 30)
+    cash_postings = []
+
+    def post_cash(day_number: int, item_id: int, cents: int) -> None:
+        if day_number >= statement_start:
+            cash_postings.append((item_id, day_number, cents))
+
+    opening = max(1000000, int(events_per_day * 30 * 50000))
+    day = start
+    item_ids = writer.entry(day, "Owner's capital contribution", [(CASH, opening, 0), (CAPITAL, 0, opening)])
+    post_cash(0, item_ids[0], opening)
+
+    for day_number in range(days):
+        day = start + timedelta(days=day_number)
+        for _ in range(int(events_per_day) + (rng.random() < events_per_day % 1)):
+            kind = rng.choices(kinds, weights)[0]
+            if kind == "sale":
+                net = rng.randint(5000, 2000000)
+                tax = net * SALES_TAX_RATE // 100
+                # Skewed toward regular customers and vendors
+                customer = customers[int(len(customers) * rng.random() ** 2)]
+                settle = day_number + rng.randint(10, 75) if rng.random() < 0.92 else None
+                due = day + timedelta(days=30)
+                status = "Paid" if settle is not None and settle < days else "Overdue" if due < end else "Sent"
+                number = writer.invoice(customer, "Receivable", net + tax, day, due, status)
+                writer.entry(day, f"Invoice {number} to {names[customer - 1]}", [
+                    (RECEIVABLE, net + tax, 0), (rng.choice(SALES_ACCOUNTS), 0, net), (SALES_TAX, 0, tax),
+                ])
+                if status == "Paid":
+                    settlements[settle].append(("receipt", customer, net + tax, number))
+            elif kind == "bill":
+                cents = rng.randint(2000, 1500000)
+                vendor = vendors[int(len(vendors) * rng.random() ** 2)]
+                settle = day_number + rng.randint(20, 45) if rng.random() < 0.95 else None
+                due = day + timedelta(days=30)
+                status = "Paid" if settle is not None and settle < days else "Overdue" if due < end else "Sent"
+                number = writer.invoice(vendor, "Payable", cents, day, due, status)
+                writer.entry(day, f"Bill {number} from {names[vendor - 1]}", [(rng.choice(BILL_ACCOUNTS), cents, 0), (PAYABLE, 0, cents)])
+                if status == "Paid":
+                    settlements[settle].append(("payment", vendor, cents, number))
+            else:
+                cents = rng.randint(500, 50000)
+                item_ids = writer.entry(day, "Card purchase", [(rng.choice(CASH_EXPENSE_ACCOUNTS), cents, 0), (CASH, 0, cents)])
+                post_cash(day_number, item_ids[1], -cents)
+
+        for kind, contact, cents, number in settlements.pop(day_number, []):
+            if kind == "receipt":
+                item_ids = writer.entry(day, f"Receipt for {number} from {names[contact - 1]}", [(CASH, cents, 0), (RECEIVABLE, 0, cents)])
+                post_cash(day_number, item_ids[0], cents)
+            else:
+                item_ids = writer.entry(day, f"Payment of {number} to {names[contact - 1]}", [(PAYABLE, cents, 0), (CASH, 0, cents)])
+                post_cash(day_number, item_ids[1], -cents)
+
+        if day_number % PAYROLL_EVERY_DAYS == PAYROLL_EVERY_DAYS - 1:
+            gross = max(100000, int(events_per_day * PAYROLL_EVERY_DAYS * 20000))
+            withheld = gross * 22 // 100
+            item_ids = writer.entry(day, "Payroll", [(SALARIES, gross, 0), (CASH, 0, gross - withheld), (PAYROLL, 0, withheld)])
+            post_cash(day_number, item_ids[1], -(gross - withheld))
+    writer.flush()
+
+    reconciliations, line_count = write_statements(db, rng, start, statement_start, days, cash_postings)
+    reset_sequences(db, ["chart_of_accounts", "contacts", "journal_entries", "journal_items", "invoices"])
+    BalanceService.rebuild(db)
+    AgingService.rebuild(db)
+    return {
+        "seed": seed,
+        "start": start.date().isoformat(),
+        "end": (end - timedelta(days=1)).date().isoformat(),
+        "accounts": len(CHART),
+        "contacts": contacts,
+        "entries": writer.entry_count,
+        "items": writer.item_count,
+        "invoices": writer.invoice_count,
+        "bank_account_id": CASH,
+        "reconciliation_ids": reconciliations,
+        "statement_lines": line_count,
+    }
+
+def write_statements(db, rng: random.Random, start: datetime, first_day: int, days: int, cash_postings) -> Tuple[List[int], int]:
+    """
+    One bank statement per 30 days of the window: most postings clear within a few days, a few stay
+    uncleared, and the bank adds its monthly charge. The statement balance is the net of its lines,
+    which is what a reconciliation's matched items add up to. Returns the reconciliation ids and line count.
+    """
+    # Clearing day -> statement lines as (signed cents, description)
+    cleared = defaultdict(list)
+    for item_id, day_number, cents in cash_postings:
+        if rng.random() < 0.02:
+            continue
+        cleared[day_number + rng.randint(0, 3)].append((cents, f"Ref {item_id}"))
+
+    reconciliations, line_count = [], 0
+    for period_start in range(first_day, days, 30):
+        period_end = min(period_start + 30, days)
+        lines, balance = [], 0
+        for day_number in range(period_start, period_end):
+            for cents, description in cleared.get(day_number, []):
+                lines.append({"transaction_date": start + timedelta(days=day_number), "amount": from_cents(cents), "description": description})
+                balance += cents
+        charge = rng.randint(1000, 3000)
+        lines.append({"transaction_date": start + timedelta(days=period_end - 1), "amount": from_cents(-charge), "description": "Monthly service charge"})
+        balance -= charge
+
+        reconciliation_id = db.execute(insert(BankReconciliation).returning(BankReconciliation.id), {
+            "account_id": CASH, "statement_date": start + timedelta(days=period_end - 1), "statement_balance": from_cents(balance),
+            "reconciled_balance": from_cents(0), "status": "In Progress",
+        }).scalar_one()
+        db.execute(insert(BankStatementLine), [{"reconciliation_id": reconciliation_id, **line} for line in lines])
+        db.commit()
+        reconciliations.append(reconciliation_id)
+        line_count += len(lines)
+    return reconciliations, line_count
+
+def main(argv=None) -> int:
+    from benchmarks.common import make_session_factory
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=parse_scale, default=parse_scale("100k"), help="Approximate journal items, e.g. 10k to 10M")
+    parser.add_argument("--years", type=int, default=3)
+    parser.add_argument("--contacts", type=int, default=0, help="Customers and vendors; scales with --items when 0")
+    parser.add_argument("--statement-months", type=int, default=3, help="Months of bank statements for the cash account")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    db = make_session_factory()()
+    start = time.perf_counter()
+    summary = generate(db, args.items, args.years, args.contacts, args.statement_months, args.seed)
+    elapsed = time.perf_counter() - start
+    print(f"database: {db.get_bind().url.render_as_string(hide_password=True)}")
+    db.close()
+    for key, value in summary.items():
+        print(f"{key:<20} {value}")
+    print(f"generated in {elapsed:.1f} s ({summary['items'] / elapsed:,.0f} items/s)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
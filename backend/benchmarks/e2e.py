@@ -0,0 +1,241 @@
+"""
+End-to-end API benchmarks over a generated dataset.
+
+Generates books with benchmarks.datagen, then drives the ASGI app in process
+through httpx, timing account listing, journal listing, entry creation, the
+reports and bank reconciliation. Each case runs warmup rounds and then timed
+rounds; its statistics are printed and written as JSON in the layout
+pytest-benchmark uses, with the commit, machine and dataset they came from.
+--compare reports the change in median against an earlier results file and
+fails when a case slowed down by more than --max-regression.
+
+    python -m benchmarks.e2e --items 100k
+    python -m benchmarks.e2e --items 1M --compare .benchmarks/e2e-<commit>-<time>.json
+
+The response cache is off unless --cache is given, so cases measure the database work.
+"""
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime
+
+from benchmarks.datagen import parse_scale
+
+RESULTS_DIR = ".benchmarks"
+
+class Case:
+    """
+    One timed request, with optional untimed setup before each round.
+    """
+    def __init__(self, group: str, name: str, run: Callable[[], Awaitable[Any]], setup: Optional[Callable[[], None]] = None):
+        self.group = group
+        self.name = name
+        self.run = run
+        self.setup = setup
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """
+    pytest-benchmark's statistics for a list of durations in seconds.
+    """
+    ordered = sorted(samples)
+    q1, median, q3 = statistics.quantiles(ordered, n=4, method="inclusive") if len(ordered) > 1 else (ordered[0],) * 3
+    mean = statistics.fmean(ordered)
+    return {
+        "min": ordered[0],
+        "max": ordered[-1],
+        "mean": mean,
+        "stddev": statistics.stdev(ordered) if len(ordered) > 1 else 0.0,
+        "median": median,
+        "q1": q1,
+        "q3": q3,
+        "iqr": q3 - q1,
+        "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        "rounds": len(ordered),
+        "total": sum(ordered),
+        "ops": 1 / mean if mean else 0.0,
+    }
+
+def commit_info() -> Dict[str, Any]:
+    def git(*args):
+        try:
+            return subprocess.run(["git", *args], capture_output=True, text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+    return {"id": git("rev-parse", "HEAD"), "branch": git("rev-parse", "--abbrev-ref", "HEAD"), "dirty": bool(git("status", "--porcelain"))}
+
+def machine_info() -> Dict[str, Any]:
+    return {
+        "node": platform.node(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "python_version": platform.python_version(),
+        "system": platform.system(),
+        "release": platform.release(),
+    }
+
+def build_cases(client, dataset: Dict, session_factory) -> List[Case]:
+    from sqlalchemy import delete
+
+    from app.models.models import ReconciliationMatch
+
+    end = date.fromisoformat(dataset["end"])
+    year_start = date(end.year, 1, 1)
+    mid_month = date(end.year, 6, 15)
+    reconciliation_id = dataset["reconciliation_ids"][-1]
+    created = [0]
+
+    async def get(path: str):
+        response = await client.get(path)
+        response.raise_for_status()
+        return response
+
+    async def create_entry():
+        created[0] += 1
+        cents = 1000 + created[0]
+        response = await client.post("/journal_entries", json={
+            "date": end.isoformat(),
+            "description": f"Benchmark entry {created[0]}",
+            "items": [
+                {"account_id": dataset["bank_account_id"], "debit": f"{cents / 100:.2f}"},
+                {"account_id": dataset["bank_account_id"] + 1, "credit": f"{cents / 100:.2f}"},
+            ],
+        })
+        response.raise_for_status()
+
+    async def match():
+        response = await client.post(f"/reconciliations/{reconciliation_id}/match")
+        response.raise_for_status()
+
+    def clear_matches():
+        with session_factory() as db:
+            db.execute(delete(ReconciliationMatch).where(ReconciliationMatch.reconciliation_id == reconciliation_id))
+            db.commit()
+
+    journal_mid = f"start_date={mid_month.isoformat()}&end_date={end.isoformat()}"
+    return [
+        Case("accounts", "list accounts", lambda: get("/accounts")),
+        Case("accounts", "get account", lambda: get(f"/accounts/{dataset['bank_account_id']}")),
+        Case("journal", "first page", lambda: get("/journal_entries?limit=100")),
+        Case("journal", "page from mid-year", lambda: get(f"/journal_entries?limit=100&{journal_mid}")),
+        Case("journal", "account page from mid-year", lambda: get(f"/journal_entries?limit=100&account_id={dataset['bank_account_id']}&{journal_mid}")),
+        Case("journal", "get entry", lambda: get(f"/journal_entries/{dataset['entries'] // 2}")),
+        Case("journal", "create entry", create_entry),
+        Case("reports", "trial balance mid-month", lambda: get(f"/reports/trial-balance?as_of={mid_month.isoformat()}")),
+        Case("reports", "income statement, year", lambda: get(f"/reports/income-statement?start_date={year_start}&end_date={end}")),
+        Case("reports", "balance sheet, year by month", lambda: get(f"/reports/balance-sheet?start_date={year_start}&end_date={end}")),
+        Case("reports", "cash flow, year", lambda: get(f"/reports/cash-flow?start_date={year_start}&end_date={end}")),
+        Case("reports", "receivables aging", lambda: get(f"/reports/aging?type=Receivable&as_of={end}")),
+        Case("reconciliation", "match statement", match, setup=clear_matches),
+        Case("reconciliation", "unmatched lines", lambda: get(f"/reconciliations/{reconciliation_id}/unmatched")),
+    ]
+
+async def run_cases(cases: List[Case], rounds: int, warmup: int, selected: Optional[str]) -> List[Dict]:
+    results = []
+    for case in cases:
+        fullname = f"{case.group}/{case.name}"
+        if selected and selected not in fullname:
+            continue
+        samples = []
+        for number in range(warmup + rounds):
+            if case.setup is not None:
+                case.setup()
+            start = time.perf_counter()
+            await case.run()
+            if number >= warmup:
+                samples.append(time.perf_counter() - start)
+        stats = summarize(samples)
+        results.append({"group": case.group, "name": case.name, "fullname": fullname, "params": None, "stats": stats})
+        print(f"{fullname:<45} {stats['median'] * 1000:9.2f} ms median  {stats['p95'] * 1000:9.2f} ms p95  {stats['ops']:8.1f} ops/s")
+    return results
+
+def compare(results: List[Dict], baseline_path: str, max_regression: float) -> int:
+    """
+    Print the median change per case against a baseline file. Returns how many cases regressed beyond the limit.
+    """
+    with open(baseline_path) as f:
+        baseline = {bench["fullname"]: bench["stats"] for bench in json.load(f)["benchmarks"]}
+    regressions = 0
+    print(f"\ncompared with {baseline_path}")
+    for bench in results:
+        before = baseline.get(bench["fullname"])
+        if before is None:
+            print(f"{bench['fullname']:<45} new")
+            continue
+        change = bench["stats"]["median"] / before["median"] - 1
+        flag = ""
+        if change > max_regression:
+            regressions += 1
+            flag = "  REGRESSION"
+        print(f"{bench['fullname']:<45} {before['median'] * 1000:9.2f} -> {bench['stats']['median'] * 1000:9.2f} ms  ({change:+.1%}){flag}")
+    return regressions
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=parse_scale, default=parse_scale("100k"), help="Approximate journal items, e.g. 10k to 10M")
+    parser.add_argument("--years", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("-k", dest="selected", help="Only run cases whose group/name contains this text")
+    parser.add_argument("--cache", action="store_true", help="Leave the response cache on")
+    parser.add_argument("--output", help=f"Results file, by default under {RESULTS_DIR}/")
+    parser.add_argument("--compare", help="Earlier results file to compare medians with")
+    parser.add_argument("--max-regression", type=float, default=0.25, help="Fail when a median grows by more than this fraction")
+    args = parser.parse_args(argv)
+
+    # The app binds its engines at import, so point it at the benchmark database first
+    os.environ["DATABASE_URL"] = os.getenv("BENCH_DATABASE_URL") or f"sqlite:///{tempfile.mkdtemp(prefix='simplefi-bench-')}/bench.db"
+    if not args.cache:
+        os.environ["RESPONSE_CACHE_SIZE"] = "0"
+    import httpx
+
+    import main as api
+    from app.database import SessionLocal, engine
+    from app.models.models import Base
+    from benchmarks.datagen import generate
+
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    start = time.perf_counter()
+    with SessionLocal() as db:
+        dataset = generate(db, args.items, years=args.years, seed=args.seed)
+    print(f"dataset: {dataset['items']:,} items, {dataset['invoices']:,} invoices, {dataset['statement_lines']:,} statement lines "
+          f"generated in {time.perf_counter() - start:.1f} s  ({engine.dialect.name})")
+
+    async def run():
+        transport = httpx.ASGITransport(app=api.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://simplefi.bench") as client:
+            return await run_cases(build_cases(client, dataset, SessionLocal), args.rounds, args.warmup, args.selected)
+
+    results = asyncio.run(run())
+    commit = commit_info()
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"e2e-{(commit['id'] or 'unknown')[:10]}-{datetime.now():%Y%m%d-%H%M%S}.json"
+    )
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump({
+            "machine_info": machine_info(),
+            "commit_info": commit,
+            "datetime": datetime.now().isoformat(),
+            "dataset": {**dataset, "dialect": engine.dialect.name, "response_cache": args.cache},
+            "options": {"rounds": args.rounds, "warmup": args.warmup},
+            "benchmarks": results,
+        }, f, indent=2)
+    print(f"results written to {output}")
+
+    if args.compare:
+        return 1 if compare(results, args.compare, args.max_regression) else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
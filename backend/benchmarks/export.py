@@ -0,0 +1,72 @@
+"""
+Time ledger exports and measure their peak Python memory.
+
+Seeds a ledger and writes it as CSV, gzipped CSV and Parquet through the
+streaming exporter, next to loading every row first and writing the file
+with pandas, as an export without a server-side cursor would. Memory is the
+tracemalloc peak, so it counts rows held in Python, not the database's cache.
+
+    python -m benchmarks.export --entries 500000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+
+from app.services.export_service import LEDGER_COLUMNS, ExportService
+from benchmarks.common import make_session_factory, seed_accounts, seed_ledger
+
+def measure(run):
+    """
+    Seconds for one run, then the peak traced memory in MiB of a second run, since tracing slows Python down.
+    """
+    start = time.perf_counter()
+    run()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 2**20
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=500000, help="Journal entries to seed (two items each)")
+    parser.add_argument("--accounts", type=int, default=50)
+    args = parser.parse_args(argv)
+
+    Session = make_session_factory()
+    db = Session()
+    account_ids = seed_accounts(db, args.accounts)
+    seed_ledger(db, account_ids, args.entries, years=3)
+    items = args.entries * 2
+    print(f"items: {items:,}")
+
+    formats = [("ledger.csv", "streamed csv"), ("ledger.csv.gz", "streamed csv, gzip")]
+    try:
+        ExportService.check_format("parquet")
+        formats.append(("ledger.parquet", "streamed parquet"))
+    except RuntimeError as e:
+        print(f"skipping parquet: {e}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        def load_all():
+            rows = [row for batch in ExportService.ledger_rows(db) for row in batch]
+            pd.DataFrame(rows, columns=[name for name, _ in LEDGER_COLUMNS]).to_csv(os.path.join(directory, "all.csv"), index=False)
+
+        elapsed, peak = measure(load_all)
+        print(f"{'load all, pandas csv':<24} {elapsed:7.2f} s  {items / elapsed:12,.0f} rows/s  peak {peak:8.1f} MiB")
+        for filename, label in formats:
+            path = os.path.join(directory, filename)
+            elapsed, peak = measure(lambda: ExportService.write(path, LEDGER_COLUMNS, ExportService.ledger_rows(db)))
+            size = os.path.getsize(path) / 2**20
+            print(f"{label:<24} {elapsed:7.2f} s  {items / elapsed:12,.0f} rows/s  peak {peak:8.1f} MiB  file {size:7.1f} MiB")
+    db.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,155 @@
+"""
+OpenAI-compatible fake model server for exercising AIService without network access.
+
+    uvicorn benchmarks.fake_model:app --port 8100
+    OPENAI_BASE_URL=http://127.0.0.1:8100/v1 OPENAI_API_KEY=fake uvicorn main:app
+
+Each completion takes FAKE_MODEL_LATENCY_MS plus FAKE_MODEL_ITEM_MS per
+transaction or invoice line item in the prompt, plus FAKE_MODEL_PREFILL_MS per
+thousand prompt tokens read and FAKE_MODEL_TOKEN_MS per token written. With
+"stream": true the reply is sent as chunks once the prompt is read, like a
+real model streams. Requests beyond FAKE_MODEL_MAX_CONCURRENCY in flight are
+rejected with 429 and a Retry-After header, like a rate limit.
+"""
+import asyncio
+import json
+import os
+import re
+import socket
+import threading
+import time
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+import uvicorn
+
+settings = {
+    "latency_ms": float(os.getenv("FAKE_MODEL_LATENCY_MS", "100")),
+    "item_ms": float(os.getenv("FAKE_MODEL_ITEM_MS", "2")),
+    "max_concurrency": int(os.getenv("FAKE_MODEL_MAX_CONCURRENCY", "8")),
+    "retry_after": os.getenv("FAKE_MODEL_RETRY_AFTER", "0.2"),
+    "prefill_ms": float(os.getenv("FAKE_MODEL_PREFILL_MS", "0")),
+    "token_ms": float(os.getenv("FAKE_MODEL_TOKEN_MS", "0")),
+}
+stats = {"requests": 0, "rate_limited": 0, "in_flight": 0}
+
+TRANSACTIONS = re.compile(r"Transactions \(JSON\):\s*(\[.*?\])\s*$", re.S | re.M)
+DOCUMENT = re.compile(r"Document text:\s*(.*)", re.S)
+LINE_ITEM = re.compile(r"^\s*(.+?)\s+(\d+)\s*x\s*([\d.]+)\s*=\s*([\d.]+)\s*$", re.M)
+CHAT_REPLY = (
+    "Cash covers a little over two months of expenses at the current run rate. Revenue is ahead of last "
+    "quarter while expenses are flat, so margins improved. Receivables have grown faster than sales, which "
+    "is worth a collections review, and the unusual months listed come from one-off payments rather than a trend."
+)
+
+# Keyword rules standing in for the model's judgement
+RULES = [
+    (("aws", "azure", "hosting", "software", "subscription"), "Expense", "Software & Cloud Services"),
+    (("payroll", "salary", "adp", "gusto"), "Expense", "Payroll Expense"),
+    (("rent", "lease"), "Expense", "Rent Expense"),
+    (("client", "invoice payment", "stripe payout", "sales"), "Revenue", "Sales Revenue"),
+    (("loan", "credit line"), "Liability", "Notes Payable"),
+    (("laptop", "equipment", "furniture"), "Asset", "Equipment"),
+]
+
+app = FastAPI(title="Fake model server")
+
+def categorize(description: str) -> dict:
+    text = (description or "").lower()
+    for keywords, category, account in RULES:
+        if any(keyword in text for keyword in keywords):
+            return {"category": category, "account": account, "confidence": "High"}
+    return {"category": "Expense", "account": "General Expense", "confidence": "Low"}
+
+def extract_invoice(text: str) -> dict:
+    def field(pattern):
+        match = re.search(pattern, text)
+        return match.group(1).strip() if match else None
+
+    total = field(r"Total:\s*\$?([\d.,]+)")
+    return {
+        "invoice_number": field(r"Invoice Number:\s*(\S+)"),
+        "date": field(r"Date:\s*(\S+)"),
+        "vendor": field(r"Vendor:\s*(.+)"),
+        "currency": "USD" if "$" in text else None,
+        "total": float(total.replace(",", "")) if total else None,
+        "line_items": [
+            {"description": description, "quantity": int(quantity), "unit_price": float(unit_price), "amount": float(amount)}
+            for description, quantity, unit_price, amount in LINE_ITEM.findall(text)
+        ],
+    }
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    stats["requests"] += 1
+    if stats["in_flight"] >= settings["max_concurrency"]:
+        stats["rate_limited"] += 1
+        return JSONResponse(
+            status_code=429,
+            headers={"Retry-After": settings["retry_after"]},
+            content={"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}},
+        )
+
+    stats["in_flight"] += 1
+    prompt_tokens = sum(len(message["content"]) for message in body["messages"]) // 4
+    try:
+        prompt = body["messages"][-1]["content"]
+        match = TRANSACTIONS.search(prompt)
+        document = DOCUMENT.search(prompt)
+        transactions = json.loads(match.group(1)) if match else []
+        invoice = extract_invoice(document.group(1)) if document else None
+        items = len(transactions) + (len(invoice["line_items"]) if invoice else 0)
+        if match:
+            content = json.dumps({"results": [{"id": t["id"], **categorize(t.get("description"))} for t in transactions]})
+        elif invoice:
+            content = json.dumps(invoice)
+        elif body["messages"][0]["role"] == "system" and "assistant" in body["messages"][0]["content"]:
+            content = CHAT_REPLY
+        else:
+            content = "1. Account category: Expense\n2. Specific account: General Expense\n3. Confidence level: Low"
+        completion_tokens = len(content) // 4
+        await asyncio.sleep((settings["latency_ms"] + settings["item_ms"] * items + settings["prefill_ms"] * prompt_tokens / 1000) / 1000)
+        if body.get("stream"):
+            return StreamingResponse(stream_chunks(body, content, prompt_tokens), media_type="text/event-stream")
+        await asyncio.sleep(settings["token_ms"] * completion_tokens / 1000)
+    finally:
+        stats["in_flight"] -= 1
+
+    return {
+        "id": f"chatcmpl-fake-{stats['requests']}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "fake"),
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens},
+    }
+
+async def stream_chunks(body: dict, content: str, prompt_tokens: int):
+    """
+    The reply as chat.completion.chunk events, a word at a time, usage on the last one.
+    """
+    base = {"id": f"chatcmpl-fake-{stats['requests']}", "object": "chat.completion.chunk",
+            "created": int(time.time()), "model": body.get("model", "fake")}
+    words = re.findall(r"\S+\s*", content)
+    for number, word in enumerate(words):
+        if number:
+            await asyncio.sleep(settings["token_ms"] * max(1, len(word) // 4) / 1000)
+        chunk = {**base, "choices": [{"index": 0, "delta": {"content": word}, "finish_reason": None}]}
+        yield f"data: {json.dumps(chunk)}\n\n"
+    usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(content) // 4, "total_tokens": prompt_tokens + len(content) // 4}
+    yield f"data: {json.dumps({**base, 'choices': [{'index': 0, 'delta': {}, 'finish_reason': 'stop'}], 'usage': usage})}\n\n"
+    yield "data: [DONE]\n\n"
+
+def start_fake_server() -> str:
+    """
+    Run the fake model server on a free local port in a background thread and return its base URL.
+    """
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}/v1"
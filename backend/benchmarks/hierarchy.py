@@ -0,0 +1,114 @@
+"""
+Time consolidated balances over a deep chart of accounts.
+
+Seeds thousands of accounts arranged per account type as a tree with the
+given branching factor, posts a ledger across all of them and compares the
+roll-up read (HierarchyService.consolidated) with walking the tree one query
+per node, as reports had to before the hierarchy was stored. Also times
+posting entries to the deepest accounts, which updates every roll-up on
+their ancestor path, and checks the roll-ups tie out.
+
+    python -m benchmarks.hierarchy --accounts 5000 --branching 3 --entries 500000
+"""
+import argparse
+import statistics
+import sys
+import time
+from datetime import date
+from decimal import Decimal
+
+from sqlalchemy import func, select, update
+
+from app.models.models import Account, AccountBalance
+from app.services.balance_service import BalanceService
+from app.services.hierarchy_service import HierarchyService
+from app.services.journal_service import JournalService
+from benchmarks.common import make_session_factory, seed_accounts, seed_ledger
+
+def build_tree(db, account_ids, branching: int) -> int:
+    """
+    Give each account type's accounts a parent so they form a tree; returns the deepest depth.
+    """
+    by_type = {}
+    for account_id, account_type in db.execute(select(Account.id, Account.account_type).where(Account.id.in_(account_ids))):
+        by_type.setdefault(account_type, []).append(account_id)
+    depth = 0
+    for ids in by_type.values():
+        for position in range(1, len(ids)):
+            db.execute(update(Account).where(Account.id == ids[position]).values(parent_account_id=ids[(position - 1) // branching]))
+        level, span = 0, 1
+        while span < len(ids):
+            level, span = level + 1, span * branching + 1
+        depth = max(depth, level)
+    db.commit()
+    HierarchyService.rebuild(db)
+    return depth
+
+def walk(db, account_id: int) -> Decimal:
+    """
+    Net debit of an account and its descendants, one query for the children and one for the balance per node.
+    """
+    debit, credit = db.execute(
+        select(func.sum(AccountBalance.debit_total), func.sum(AccountBalance.credit_total))
+        .where(AccountBalance.account_id == account_id)
+    ).one()
+    own = (debit or Decimal("0")) - (credit or Decimal("0"))
+    children = db.execute(select(Account.id).where(Account.parent_account_id == account_id)).scalars().all()
+    return own + sum((walk(db, child) for child in children), Decimal("0"))
+
+def timed(run):
+    start = time.perf_counter()
+    result = run()
+    return (time.perf_counter() - start) * 1000, result
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--accounts", type=int, default=5000)
+    parser.add_argument("--branching", type=int, default=3, help="Children per account")
+    parser.add_argument("--entries", type=int, default=500000, help="Journal entries to seed (two items each)")
+    parser.add_argument("--posts", type=int, default=200, help="Entries posted to the deepest accounts")
+    args = parser.parse_args(argv)
+
+    Session = make_session_factory()
+    db = Session()
+    account_ids = seed_accounts(db, args.accounts)
+    depth = build_tree(db, account_ids, args.branching)
+    seed_ledger(db, account_ids, args.entries, years=1)
+    BalanceService.rebuild(db)
+    roots = db.execute(select(Account.id).where(Account.parent_account_id.is_(None)).order_by(Account.account_code)).scalars().all()
+    print(f"accounts: {args.accounts:,} in {len(roots)} trees, depth {depth}  items: {args.entries * 2:,}")
+
+    walk_ms, walked = timed(lambda: {root: walk(db, root) for root in roots})
+    full_ms, full = timed(lambda: HierarchyService.consolidated(db))
+    mid_ms, _ = timed(lambda: HierarchyService.consolidated(db, date(2024, 6, 15)))
+    subtree_ms, _ = timed(lambda: HierarchyService.consolidated(db, root_id=roots[0]))
+    print(f"{'walk per node, roots only':<36} {walk_ms:9.1f} ms")
+    print(f"{'consolidated, whole chart':<36} {full_ms:9.1f} ms  ({walk_ms / full_ms:.1f}x)")
+    print(f"{'consolidated mid-month':<36} {mid_ms:9.1f} ms")
+    print(f"{'consolidated, one tree':<36} {subtree_ms:9.1f} ms")
+
+    deepest = db.execute(
+        select(Account.id).where(Account.id.in_(account_ids)).order_by(Account.id.desc()).limit(2)
+    ).scalars().all()
+    posts = []
+    for number in range(args.posts):
+        start = time.perf_counter()
+        JournalService.create_entry(db, date(2024, 12, 31), f"Deep post {number}", [
+            {"account_id": deepest[0], "debit": Decimal("1.00"), "credit": Decimal("0")},
+            {"account_id": deepest[1], "debit": Decimal("0"), "credit": Decimal("1.00")},
+        ])
+        posts.append(time.perf_counter() - start)
+    print(f"{'post to deepest accounts':<36} {statistics.median(posts) * 1000:9.1f} ms p50")
+
+    consolidated = {node["account_id"]: node for node in full["accounts"]}
+    wrong = [
+        root for root in roots
+        if walked[root] != (consolidated[root]["debit"] - consolidated[root]["credit"])
+    ]
+    mismatches = BalanceService.verify(db)
+    db.close()
+    print(f"roll-ups differing from the walk {len(wrong)}  balance mismatches {len(mismatches)}")
+    return 0 if not wrong and not mismatches else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,144 @@
+"""
+Run the chunked invoice pipeline over a directory of generated PDFs against the
+local fake model server (benchmarks/fake_model.py).
+
+The directory holds many short invoices plus a few long vendor statements.
+The script reports parse throughput, chunking, model calls and end-to-end
+time, and checks every merged invoice against the line items that were written.
+
+    python -m benchmarks.invoice_pipeline --invoices 1000 --statements 3 --statement-pages 300
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+# Keep the app's engines on a scratch database and measure model calls, not cache hits
+_scratch = tempfile.mkdtemp(prefix="simplefi-bench-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_scratch, 'bench.db')}")
+os.environ["AI_CACHE_ENABLED"] = "false"
+
+from app.services import invoice_pipeline, pdf_text
+from app.services.ai_client import OpenAIChatClient
+from app.services.ai_service import AIService
+from app.services.invoice_pipeline import InvoicePipeline
+from benchmarks import fake_model
+
+LINES_PER_PAGE = 55
+PRODUCTS = ["Managed hosting", "Support hours", "Office chairs", "Printer toner", "Software seats", "Consulting day", "Cloud storage TB"]
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+def write_pdf(path: str, pages) -> None:
+    """
+    Minimal text-only PDF: one Helvetica content stream per page, one line per entry.
+    """
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for lines in pages:
+        stream = "BT /F1 9 Tf 11 TL 40 800 Td\n" + "".join(f"({_escape(line)}) Tj T*\n" for line in lines) + "ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream".encode("latin-1"))
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] /Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>".encode()
+        )
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>".encode()
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n".encode() + body + b"\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += b"".join(f"{offset:010d} 00000 n \n".encode() for offset in offsets)
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    with open(path, "wb") as f:
+        f.write(out)
+
+def make_invoice(rng, number: int, item_count: int):
+    """
+    Pages of invoice text and the expected (line item count, total).
+    """
+    lines = [f"Invoice Number: INV-{number:06d}", f"Vendor: Vendor {rng.randint(1, 300)} Ltd", f"Date: 2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}", ""]
+    total = 0.0
+    for _ in range(item_count):
+        quantity, price = rng.randint(1, 20), round(rng.uniform(1, 500), 2)
+        amount = round(quantity * price, 2)
+        total = round(total + amount, 2)
+        lines.append(f"{rng.choice(PRODUCTS)} {rng.randint(100, 999)} {quantity} x {price:.2f} = {amount:.2f}")
+    lines += ["", f"Total: ${total:.2f}"]
+    return [lines[i:i + LINES_PER_PAGE] for i in range(0, len(lines), LINES_PER_PAGE)], (item_count, total)
+
+def build_directory(directory: str, args, rng):
+    expected = {}
+    for number in range(args.invoices + args.statements):
+        long_document = number < args.statements
+        item_count = args.statement_pages * (LINES_PER_PAGE - 1) if long_document else rng.randint(3, 40)
+        pages, truth = make_invoice(rng, number, item_count)
+        name = f"{'statement' if long_document else 'invoice'}-{number:05d}.pdf"
+        write_pdf(os.path.join(directory, name), pages)
+        expected[name] = truth
+    return expected
+
+async def run(paths, args):
+    events, start = [], time.perf_counter()
+    async for event in InvoicePipeline.run(paths, concurrency=args.concurrency, max_tokens=args.chunk_tokens):
+        events.append(event)
+    return events, time.perf_counter() - start
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--invoices", type=int, default=1000, help="Short invoices (1 page)")
+    parser.add_argument("--statements", type=int, default=3, help="Long vendor statements")
+    parser.add_argument("--statement-pages", type=int, default=300)
+    parser.add_argument("--chunk-tokens", type=int, default=3000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Parsing processes")
+    parser.add_argument("--latency-ms", type=float, default=100, help="Fake model latency per call")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    directory = os.path.join(_scratch, "invoices")
+    os.makedirs(directory)
+    expected = build_directory(directory, args, rng)
+    paths = InvoicePipeline.resolve(directory=directory)
+
+    start = time.perf_counter()
+    sample_chunks = sum(len(pdf_text.parse_range(path, 0, 10 ** 6, args.chunk_tokens)) for path in paths[:50])
+    serial_per_file = (time.perf_counter() - start) / min(50, len(paths))
+
+    invoice_pipeline.INVOICE_PARSE_WORKERS = args.workers
+    fake_model.settings.update(latency_ms=args.latency_ms, max_concurrency=max(args.concurrency, fake_model.settings["max_concurrency"]))
+    AIService.configure(OpenAIChatClient(api_key="fake", base_url=fake_model.start_fake_server()))
+    events, elapsed = asyncio.run(run(paths, args))
+    InvoicePipeline.shutdown()
+
+    done = events[-1]
+    files = [event for event in events if event["event"] == "file_done"]
+    progress = sum(1 for event in events if event["event"] == "chunk_done")
+    mismatched = [
+        event["file"] for event in files
+        if event["status"] != "success"
+        or (len(event["invoice"]["line_items"]), event["invoice"]["total"]) != expected[event["file"]]
+        or abs(event["invoice"]["line_items_total"] - expected[event["file"]][1]) > 0.01
+    ]
+    largest = max((event for event in files if event["status"] == "success"), key=lambda event: event["pages"])
+
+    print(f"files: {len(paths):,} ({args.invoices:,} invoices, {args.statements} statements of {args.statement_pages} pages)  "
+          f"parse workers: {args.workers}  model concurrency: {args.concurrency}")
+    print(f"serial parse       {serial_per_file * 1000:8.1f} ms per file (first {min(50, len(paths))} files, {sample_chunks} chunks)")
+    print(f"pipeline           {elapsed:8.2f} s  ({done['pages'] / elapsed:,.0f} pages/s, {done['files'] / elapsed:,.1f} files/s)")
+    print(f"pages / chunks     {done['pages']:,} / {done['chunks']:,}  ({done['model_calls']:,} model calls, {progress:,} progress events)")
+    print(f"largest document   {largest['file']}: {largest['pages']} pages in {largest['chunks']} chunks, "
+          f"{len(largest['invoice']['line_items']):,} line items merged in {largest['elapsed_ms'] / 1000:.2f} s")
+    print(f"mismatched files   {len(mismatched)}  failed {done['failed']}")
+    return 0 if not mismatched and not done["failed"] else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,52 @@
+"""
+Compare aggregation of ledger amounts stored as floats, Decimal objects and
+integer cents, and report how far the float total drifts from the exact one.
+
+    python -m benchmarks.money --items 2000000
+"""
+import argparse
+import sys
+from decimal import Decimal
+
+import numpy as np
+
+from app.models.money import from_cents
+from benchmarks.common import timer
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=1000000, help="Amounts to aggregate")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--min-speedup", type=float, default=10.0, help="Fail if int64 cents are not this much faster than Decimal")
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(args.seed)
+    cents = rng.integers(1, 10000000, size=args.items, dtype=np.int64)
+    floats = [int(c) / 100 for c in cents]
+    float_array = cents / 100
+    decimals = [from_cents(int(c)) for c in cents]
+
+    results = {}
+    with timer(results, "float (python sum)"):
+        float_total = sum(floats)
+    with timer(results, "float (numpy)"):
+        float_array.sum()
+    with timer(results, "Decimal"):
+        decimal_total = sum(decimals, Decimal(0))
+    with timer(results, "int64 cents"):
+        cents_total = int(cents.sum())
+
+    exact = from_cents(cents_total)
+    print(f"items: {args.items:,}")
+    for name, seconds in results.items():
+        print(f"{name:<19} {seconds * 1000:8.1f} ms")
+    print(f"exact total       {exact}")
+    print(f"Decimal total     {decimal_total}")
+    print(f"float drift       {Decimal(float_total) - exact:.6f}")
+
+    speedup = results["Decimal"] / results["int64 cents"]
+    print(f"int64 cents speedup over Decimal: {speedup:.1f}x")
+    return 0 if decimal_total == exact and speedup >= args.min_speedup else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+"""
+Time historical reports before and after closing periods over a long ledger.
+
+Seeds ten years of entries, runs the trial balance and balance sheets for the
+last month, then closes every earlier month one at a time and runs them again
+from the snapshots. Checks the reports are unchanged and the snapshots tie out.
+
+    python -m benchmarks.period_close --entries 1000000 --years 10
+"""
+import argparse
+import statistics
+import sys
+import time
+from datetime import date
+
+from app.services.balance_service import BalanceService
+from app.services.period_service import PeriodService
+from app.services.report_service import ReportService
+from benchmarks.common import make_session_factory, seed_accounts, seed_ledger
+
+def reports(db, last_year: int) -> dict:
+    """
+    Run each report once and return {name: (milliseconds, result)}.
+    """
+    runs = {
+        "trial balance mid-month": lambda: BalanceService.trial_balance(db, date(last_year, 12, 15)),
+        "balance sheet, last month": lambda: ReportService.balance_sheet(db, date(last_year, 12, 1), date(last_year, 12, 31)),
+        "balance sheet mid-month": lambda: ReportService.balance_sheet(db, date(last_year, 12, 1), date(last_year, 12, 15)),
+        "balance sheet, last quarter": lambda: ReportService.balance_sheet(db, date(last_year, 10, 1), date(last_year, 12, 31), "quarter"),
+    }
+    results = {}
+    for name, run in runs.items():
+        start = time.perf_counter()
+        result = run()
+        results[name] = ((time.perf_counter() - start) * 1000, result)
+    return results
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=1000000, help="Journal entries to seed (two items each)")
+    parser.add_argument("--years", type=int, default=10)
+    parser.add_argument("--accounts", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    Session = make_session_factory()
+    db = Session()
+    account_ids = seed_accounts(db, args.accounts)
+    seed_ledger(db, account_ids, args.entries, years=args.years)
+    BalanceService.rebuild(db)
+    last_year = 2024
+
+    before = reports(db, last_year)
+
+    # Close month by month as a live system would, leaving the last month open
+    closes = []
+    for year in range(last_year - args.years + 1, last_year + 1):
+        for month in range(1, 13):
+            if (year, month) == (last_year, 12):
+                break
+            start = time.perf_counter()
+            PeriodService.close(db, year * 100 + month)
+            closes.append(time.perf_counter() - start)
+
+    after = reports(db, last_year)
+    mismatches = PeriodService.verify(db)
+    db.close()
+
+    print(f"items: {args.entries * 2:,} over {args.years} years, {len(closes)} periods closed, one month open")
+    print(f"period close           {statistics.median(closes) * 1000:8.1f} ms p50, {max(closes) * 1000:.1f} ms max")
+    print(f"{'report':<28} {'no closes':>10} {'closed':>10}")
+    changed = []
+    for name, (before_ms, before_result) in before.items():
+        after_ms, after_result = after[name]
+        print(f"{name:<28} {before_ms:8.1f} ms {after_ms:8.1f} ms  ({before_ms / after_ms:.1f}x)")
+        if after_result != before_result:
+            changed.append(name)
+    print(f"changed reports        {len(changed)}  snapshot mismatches {len(mismatches)}")
+    return 0 if not changed and not mismatches else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
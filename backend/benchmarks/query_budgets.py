@@ -0,0 +1,88 @@
+"""
+Hold the read endpoints to a fixed SQL statement budget.
+
+Seeds enough entries, invoices and contacts that a lazy load per row would
+blow any budget, then requests each endpoint through the ASGI app and counts
+its statements with app.query_debug.assert_max_queries. Exits 1 if an endpoint
+goes over, listing the statements it ran, so CI can run it as a performance
+contract.
+
+    python -m benchmarks.query_budgets --entries 5000
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+# (path, statements allowed); the response cache is disabled so every request reaches the database
+BUDGETS = [
+    ("/accounts", 1),
+    ("/accounts/1", 1),
+    ("/journal_entries?limit=100", 2),
+    ("/journal_entries?limit=100&account_id=1", 2),
+    ("/journal_entries/1", 1),
+    ("/reports/trial-balance?as_of=2024-06-15", 4),
+    ("/reports/income-statement?start_date=2024-01-01&end_date=2024-12-31", 2),
+    ("/reports/balance-sheet?start_date=2024-01-01&end_date=2024-12-31", 3),
+    ("/reports/cash-flow?start_date=2024-01-01&end_date=2024-12-31", 2),
+    ("/reports/aging?type=Receivable&as_of=2024-12-31", 1),
+    ("/reports/consolidated", 2),
+    ("/reports/consolidated?as_of=2024-06-15&account_id=1", 3),
+    ("/periods/closes", 1),
+    ("/anomalies?limit=100", 1),
+]
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=5000, help="Journal entries to seed (two items each)")
+    parser.add_argument("--invoices", type=int, default=5000)
+    parser.add_argument("--contacts", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    # The app binds its engines at import, so point it at a throwaway database first
+    os.environ["DATABASE_URL"] = os.getenv("BENCH_DATABASE_URL") or f"sqlite:///{tempfile.mkdtemp(prefix='simplefi-bench-')}/bench.db"
+    os.environ["RESPONSE_CACHE_SIZE"] = "0"
+    # Shared cache versions are polled at most once a second, not per request, so they are left out of the budgets
+    os.environ["CACHE_VERSIONS"] = "memory"
+    from fastapi.testclient import TestClient
+
+    import main as api
+    from app.database import SessionLocal, engine
+    from app.models.models import Base
+    from app.query_debug import assert_max_queries
+    from app.services.aging_service import AgingService
+    from app.services.anomaly_service import AnomalyService
+    from app.services.balance_service import BalanceService
+    from benchmarks.common import seed_accounts, seed_invoices, seed_ledger
+
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    db = SessionLocal()
+    account_ids = seed_accounts(db, 50)
+    seed_ledger(db, account_ids, args.entries, years=1)
+    BalanceService.rebuild(db)
+    seed_invoices(db, args.contacts, args.invoices, years=1)
+    AgingService.rebuild(db)
+    AnomalyService.scan(db)
+    db.close()
+
+    client = TestClient(api.app)
+    failures = 0
+    print(f"items: {args.entries * 2:,}  invoices: {args.invoices:,}  contacts: {args.contacts:,}")
+    for path, budget in BUDGETS:
+        try:
+            with assert_max_queries(budget) as log:
+                response = client.get(path)
+        except AssertionError as e:
+            failures += 1
+            print(f"{path:<70} OVER BUDGET\n{e}")
+            continue
+        if response.status_code != 200:
+            failures += 1
+            print(f"{path:<70} HTTP {response.status_code}: {response.text[:200]}")
+            continue
+        print(f"{path:<70} {len(log):3d} / {budget} statements")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
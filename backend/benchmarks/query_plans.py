@@ -0,0 +1,151 @@
+"""
+Check that the key ledger and invoice queries keep using indexes.
+
+Seeds a ledger of a million journal items plus invoices and contacts, runs
+each key query through the services that issue it, and EXPLAINs every SQL
+statement it executed. Fails if any statement falls back to a full scan of
+journal_entries, journal_items, invoices or contacts.
+
+    python -m benchmarks.query_plans --entries 500000
+    BENCH_DATABASE_URL=postgresql://... python -m benchmarks.query_plans
+
+--drop-indexes removes the indexes from migration 0006 first, to show the
+regressions the check catches.
+"""
+import argparse
+import json
+import re
+import sys
+import time
+from datetime import date, datetime
+
+from sqlalchemy import event, func, select, text
+
+from app.models.models import Invoice, JournalItem
+from app.services.balance_service import BalanceService
+from app.services.journal_service import JournalService
+from app.services.reconciliation_service import ReconciliationService
+from benchmarks.common import make_session_factory, seed_accounts, seed_invoices, seed_ledger
+
+GUARDED_TABLES = {"journal_entries", "journal_items", "invoices", "contacts"}
+MIGRATION_INDEXES = [
+    "ix_journal_entries_entry_date_id",
+    "ix_journal_items_journal_entry_id",
+    "ix_journal_items_account_id_journal_entry_id",
+    "ix_invoices_status_due_date",
+    "ix_invoices_contact_id",
+    "ix_contacts_type",
+]
+
+def key_queries(db, years: int):
+    """
+    (name, callable) pairs for the access paths the indexes exist for.
+    """
+    # A busy account and a one-month window in the middle of the ledger
+    account_id = db.execute(
+        select(JournalItem.account_id).group_by(JournalItem.account_id).order_by(func.count().desc()).limit(1)
+    ).scalar()
+    month = date(2024 - years // 2, 6, 1)
+    month_end = date(month.year, 6, 30)
+    as_of = date(month.year, 6, 15)
+
+    return [
+        ("journal page, date range", lambda: JournalService.fetch_page(db, 100, start_date=month, end_date=month_end)),
+        ("journal page, account + dates", lambda: JournalService.fetch_page(db, 100, start_date=month, end_date=month_end, account_id=account_id)),
+        ("account ledger window", lambda: db.execute(ReconciliationService._ledger_query(
+            account_id, datetime.combine(month, datetime.min.time()), datetime.combine(month_end, datetime.min.time())
+        )).all()),
+        ("balances as of mid-month", lambda: BalanceService.account_totals(db, as_of=as_of)),
+        ("open invoices due", lambda: db.execute(
+            select(Invoice.id, Invoice.amount).where(Invoice.status.in_(["Sent", "Overdue"]), Invoice.due_date < datetime.combine(as_of, datetime.min.time()))
+        ).all()),
+        ("invoices of a contact", lambda: db.execute(select(Invoice.id).where(Invoice.contact_id == 7)).all()),
+    ]
+
+def full_scans(db, statement: str, parameters) -> tuple:
+    """
+    The plan of one statement as text, and the guarded tables it scans in full.
+    """
+    connection = db.connection()
+    if connection.dialect.name == "sqlite":
+        rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+        details = [row[-1] for row in rows]
+        scanned = {
+            match.group(1).rstrip("_0123456789")
+            for detail in details
+            for match in [re.match(r"SCAN (\w+)", detail)] if match
+        }
+        return "; ".join(details), scanned & GUARDED_TABLES
+
+    plan = connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters).scalar()
+    plan = json.loads(plan) if isinstance(plan, str) else plan
+    nodes, scanned, summary = [plan[0]["Plan"]], set(), []
+    while nodes:
+        node = nodes.pop()
+        summary.append(f"{node['Node Type']} {node.get('Relation Name', '')}".strip())
+        if node["Node Type"] == "Seq Scan":
+            scanned.add(node.get("Relation Name"))
+        nodes.extend(node.get("Plans", []))
+    return "; ".join(summary), scanned & GUARDED_TABLES
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=500000, help="Journal entries to seed (two items each)")
+    parser.add_argument("--years", type=int, default=5)
+    parser.add_argument("--accounts", type=int, default=200)
+    parser.add_argument("--invoices", type=int, default=200000)
+    parser.add_argument("--contacts", type=int, default=5000)
+    parser.add_argument("--drop-indexes", action="store_true", help="Drop the migration 0006 indexes before checking")
+    parser.add_argument("--verbose", action="store_true", help="Print every statement's plan")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    Session = make_session_factory()
+    db = Session()
+    account_ids = seed_accounts(db, args.accounts)
+    seed_ledger(db, account_ids, args.entries, years=args.years, seed=args.seed)
+    BalanceService.rebuild(db)
+    seed_invoices(db, args.contacts, args.invoices, years=args.years, seed=args.seed)
+    if args.drop_indexes:
+        for name in MIGRATION_INDEXES:
+            db.execute(text(f"DROP INDEX {name}"))
+    # Planner statistics, as a maintained production database would have
+    db.execute(text("ANALYZE"))
+    db.commit()
+
+    captured = []
+    capturing = [False]
+
+    @event.listens_for(db.get_bind(), "before_cursor_execute")
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if capturing[0]:
+            captured.append((statement, parameters))
+
+    print(f"items: {args.entries * 2:,}  invoices: {args.invoices:,}  contacts: {args.contacts:,}  "
+          f"dialect: {db.get_bind().dialect.name}{'  (migration indexes dropped)' if args.drop_indexes else ''}")
+    failures = 0
+    for name, run in key_queries(db, args.years):
+        captured.clear()
+        capturing[0] = True
+        start = time.perf_counter()
+        run()
+        elapsed = time.perf_counter() - start
+        capturing[0] = False
+
+        scans = set()
+        plans = []
+        for statement, parameters in captured:
+            plan, scanned = full_scans(db, statement, parameters)
+            scans |= scanned
+            plans.append(plan)
+        failures += bool(scans)
+        status = f"FULL SCAN of {', '.join(sorted(scans))}" if scans else "indexed"
+        print(f"{name:<30} {elapsed * 1000:9.1f} ms  {status}")
+        if args.verbose or scans:
+            for plan in plans:
+                print(f"    {plan}")
+    db.close()
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,124 @@
+"""
+Reconcile a synthetic bank statement against a dense bank-account ledger.
+
+Statement lines are derived from known ledger lines: most clear a few days
+later for the same amount, some differ by a fee, some are batched deposits
+of two same-day ledger lines, and the rest have no counterpart.
+
+    python -m benchmarks.reconciliation --ledger 500000 --statement 50000
+"""
+import argparse
+import random
+import sys
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+
+from app.models.models import JournalEntry, JournalItem, ReconciliationMatch
+from app.models.money import from_cents
+from app.services.reconciliation_service import ReconciliationService
+from benchmarks.common import make_session_factory, seed_accounts, timer
+
+START = datetime(2024, 1, 1)
+
+def seed_bank_ledger(db, bank_account_id, other_account_id, count, days, rng, chunk_size=10000):
+    """
+    Insert balanced two-line entries that move cash in or out of the bank account.
+    Returns (item id, day offset, signed cents) for every bank-side item.
+    """
+    ledger = []
+    for offset in range(0, count, chunk_size):
+        size = min(chunk_size, count - offset)
+        entry_rows, item_rows = [], []
+        for i in range(size):
+            entry_id = offset + i + 1
+            day = rng.randrange(days)
+            cents = rng.randint(100, 500000) * rng.choice((1, -1))
+            amount = from_cents(abs(cents))
+            bank_side = {"debit": amount, "credit": 0} if cents > 0 else {"debit": 0, "credit": amount}
+            other_side = {"debit": bank_side["credit"], "credit": bank_side["debit"]}
+            entry_rows.append({"id": entry_id, "entry_date": START + timedelta(days=day), "description": f"Entry {entry_id}"})
+            # Bank items take odd ids so the ledger id is known without reading it back
+            item_rows.append({"id": entry_id * 2 - 1, "journal_entry_id": entry_id, "account_id": bank_account_id, **bank_side})
+            item_rows.append({"id": entry_id * 2, "journal_entry_id": entry_id, "account_id": other_account_id, **other_side})
+            ledger.append((entry_id * 2 - 1, day, cents))
+        db.execute(insert(JournalEntry), entry_rows)
+        db.execute(insert(JournalItem), item_rows)
+        db.commit()
+    return ledger
+
+def build_statement(ledger, count, rng):
+    """
+    Draw statement lines from the ledger. Returns the statement rows and the expected
+    ledger item ids for each row (empty for lines with no counterpart).
+    """
+    pool = ledger[:]
+    rng.shuffle(pool)
+    by_day_and_sign = {}
+    for line in pool[count * 2:]:
+        by_day_and_sign.setdefault((line[1], line[2] > 0), []).append(line)
+
+    statement, expected = [], []
+    for i in range(count):
+        item_id, day, cents = pool[i]
+        kind = rng.random()
+        if kind < 0.80:
+            day += rng.randint(0, 2)
+            truth = [item_id]
+        elif kind < 0.88:
+            cents += rng.choice((1, -1)) * rng.randint(1, 99)
+            day += rng.randint(0, 5)
+            truth = [item_id]
+        elif kind < 0.95 and by_day_and_sign.get((day, cents > 0)):
+            partner = by_day_and_sign[(day, cents > 0)].pop()
+            cents += partner[2]
+            day += rng.randint(0, 2)
+            truth = [item_id, partner[0]]
+        else:
+            cents = rng.randint(100, 500000) * rng.choice((1, -1))
+            truth = []
+        statement.append({"transaction_date": START + timedelta(days=day), "amount": from_cents(cents), "description": f"Line {i}"})
+        expected.append(truth)
+    return statement, expected
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ledger", type=int, default=500000, help="Bank-account ledger lines")
+    parser.add_argument("--statement", type=int, default=50000, help="Statement lines")
+    parser.add_argument("--days", type=int, default=365, help="Days the ledger is spread over")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--max-seconds", type=float, default=10.0, help="Fail if reconciling takes longer")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    Session = make_session_factory()
+    db = Session()
+    bank_account_id, other_account_id = seed_accounts(db, 2)
+    ledger = seed_bank_ledger(db, bank_account_id, other_account_id, args.ledger, args.days, rng)
+    statement, expected = build_statement(ledger, args.statement, rng)
+
+    reconciliation = ReconciliationService.create_reconciliation(db, bank_account_id, START + timedelta(days=args.days), 0)
+    ReconciliationService.import_statement(db, reconciliation.id, statement)
+
+    results = {}
+    with timer(results, "reconcile"):
+        summary = ReconciliationService.reconcile(db, reconciliation.id)
+
+    # Statement line ids follow import order in the scratch database
+    found = {}
+    for line_id, item_id in db.query(ReconciliationMatch.statement_line_id, ReconciliationMatch.journal_item_id):
+        found.setdefault(line_id - 1, set()).add(item_id)
+    db.close()
+
+    correct = sum(1 for i, truth in enumerate(expected) if truth and found.get(i) == set(truth))
+    with_counterpart = sum(1 for truth in expected if truth)
+
+    print(f"ledger lines: {args.ledger:,}  statement lines: {args.statement:,}  over {args.days} days")
+    print(f"reconcile          {results['reconcile'] * 1000:8.1f} ms")
+    print(f"matched by type    {summary['new_matches']}")
+    print(f"unmatched lines    {summary['unmatched_lines']:,}")
+    print(f"correct matches    {correct:,} of {with_counterpart:,} lines with a counterpart ({correct / max(with_counterpart, 1):.1%})")
+    return 0 if results["reconcile"] <= args.max_seconds else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,42 @@
+"""
+Time the pandas reporting engine over a multi-year ledger.
+
+    python -m benchmarks.reports --entries 500000 --years 5
+"""
+import argparse
+import sys
+
+from app.services.balance_service import BalanceService
+from app.services.report_service import ReportService
+from benchmarks.common import make_session_factory, seed_accounts, seed_ledger, timer
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=200000, help="Journal entries to seed (two items each)")
+    parser.add_argument("--years", type=int, default=5)
+    parser.add_argument("--accounts", type=int, default=200)
+    parser.add_argument("--max-seconds", type=float, default=1.0, help="Fail if any report takes longer")
+    args = parser.parse_args(argv)
+
+    Session = make_session_factory()
+    db = Session()
+    account_ids = seed_accounts(db, args.accounts)
+    seed_ledger(db, account_ids, args.entries, years=args.years)
+    BalanceService.rebuild(db)
+
+    results = {}
+    with timer(results, "income_statement"):
+        ReportService.income_statement(db, compare=True)
+    with timer(results, "balance_sheet"):
+        ReportService.balance_sheet(db)
+    with timer(results, "cash_flow"):
+        ReportService.cash_flow(db, cash_account_ids=account_ids[:2])
+    db.close()
+
+    print(f"items: {args.entries * 2:,} over {args.years} years, monthly buckets")
+    for name, seconds in results.items():
+        print(f"{name:<17} {seconds * 1000:8.1f} ms")
+    return 0 if max(results.values()) <= args.max_seconds else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,14 +1,35 @@
-from fastapi import FastAPI, Depends, HTTPException
-from app.routes import api
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response, UploadFile, File
+from fastapi.responses import StreamingResponse
+from app.routes import ai, anomalies, api, dashboard, exports, jobs, periods, reconciliations, reports
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
-from typing import List
+from typing import List, Optional
 from datetime import date
+from decimal import Decimal
 from pydantic import BaseModel, Field
-from app.models.models import AccountTypeEnum, Account  # Assuming AccountTypeEnum and Account models are defined in models.py
-from app.database import get_db
+from app.models.models import AccountTypeEnum, Account
+from app.models.money import MoneyAmount
+from app.cache import ACCOUNTS, cached_json
+from app.database import get_async_db, run_in_session, SessionLocal, async_engine, engine
+from app.metrics import CONTENT_TYPE, MetricsMiddleware, pool_stats, render as render_metrics
+from app.query_debug import QUERY_REPEAT_LIMIT, QueryDebugMiddleware
+from app.services.ai_client import OPENAI_BASE_URL
+from app.services.ai_service import AIService
+from app.services.anomaly_service import ANOMALY_SCAN_INTERVAL_SECONDS, AnomalyService
+from app.services.categorizer_service import CategorizerService
+from app.services.hierarchy_service import HierarchyService
+from app.services.invoice_pipeline import InvoicePipeline
+from app.services.job_service import JobService
+from app.services.journal_service import JournalService, StaleEntryError, BULK_CHUNK_SIZE
+from app.services.period_service import ClosedPeriodError
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from fastapi.staticfiles import StaticFiles
+import asyncio
+import codecs
+import os
+import time
 
 # Load environment variables
 load_dotenv()
@@ -20,6 +41,14 @@ app = FastAPI(
     version="1.0.0"
 )
 app.include_router(api.router)
+app.include_router(reports.router)
+app.include_router(reconciliations.router)
+app.include_router(periods.router)
+app.include_router(ai.router)
+app.include_router(jobs.router)
+app.include_router(exports.router)
+app.include_router(dashboard.router)
+app.include_router(anomalies.router)
 
 # Configure CORS
 # app.add_middleware(
@@ -35,9 +64,40 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "Server-Timing", "Content-Disposition"],
 )
-
-app.mount("/static", StaticFiles(directory="backend/public"), name="static")
+if QUERY_REPEAT_LIMIT:
+    app.add_middleware(QueryDebugMiddleware)
+# Outermost, so latency includes the other middleware
+app.add_middleware(MetricsMiddleware)
+
+app.mount("/static", StaticFiles(directory=os.path.join(os.path.dirname(__file__), "public")), name="static")
+
+@app.on_event("startup")
+async def load_local_categorizer():
+    # Read the categorizer model in the background so startup and the first request don't wait on it
+    asyncio.get_running_loop().run_in_executor(None, CategorizerService.get_model)
+
+@app.on_event("startup")
+async def watch_anomalies():
+    # Scan new postings in the background; reads only serve the stored findings
+    if ANOMALY_SCAN_INTERVAL_SECONDS > 0:
+        app.state.anomaly_watch = asyncio.create_task(AnomalyService.watch())
+
+@app.on_event("shutdown")
+async def stop_anomaly_watch():
+    task = getattr(app.state, "anomaly_watch", None)
+    if task is not None:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+@app.on_event("shutdown")
+def stop_invoice_workers():
+    InvoicePipeline.shutdown()
+
+@app.on_event("shutdown")
+async def stop_jobs():
+    await JobService.shutdown()
 
 # Root endpoint
 @app.get("/")
@@ -50,15 +110,32 @@ async def root():
 
 # Health check endpoint
 @app.get("/health")
-async def health_check():
+async def health_check(response: Response):
+    database = {"pools": {"sync": pool_stats(engine), "async": pool_stats(async_engine.sync_engine)}}
+    start = time.perf_counter()
+    try:
+        async with async_engine.connect() as connection:
+            await connection.execute(text("SELECT 1"))
+        database.update(status="connected", ping_ms=round((time.perf_counter() - start) * 1000, 2))
+    except Exception as e:
+        database.update(status="unavailable", error=str(e))
+        response.status_code = 503
+
+    # Configuration only; a health probe should not spend model calls
+    configured = AIService.client is not None or bool(os.getenv("OPENAI_API_KEY") or OPENAI_BASE_URL)
     return {
-        "status": "healthy",
+        "status": "healthy" if database["status"] == "connected" else "unhealthy",
         "services": {
-            "database": "connected",
-            "ai_service": "available"
+            "database": database,
+            "ai_service": {"status": "configured" if configured else "not configured"},
         }
     }
 
+# Prometheus scrape endpoint
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    return Response(render_metrics({"sync": engine, "async": async_engine.sync_engine}), media_type=CONTENT_TYPE)
+
 # Pydantic models for request/response validation
 class AccountBase(BaseModel):
     account_code: str = Field(..., description="Unique code for the GL account")
@@ -81,12 +158,15 @@ class AccountResponse(AccountBase):
 
 class JournalItemBase(BaseModel):
     account_id: int
-    debit: float = 0.0
-    credit: float = 0.0
+    debit: MoneyAmount = Decimal("0")
+    credit: MoneyAmount = Decimal("0")
 
 class JournalItemCreate(JournalItemBase):
     pass
 
+class JournalItemUpdate(JournalItemBase):
+    id: Optional[int] = Field(None, description="Existing item to update; omit to add a new item")
+
 class JournalItemResponse(JournalItemBase):
     id: int
     journal_entry_id: int
@@ -101,8 +181,13 @@ class JournalEntryBase(BaseModel):
 class JournalEntryCreate(JournalEntryBase):
     items: List[JournalItemCreate]
 
+class JournalEntryUpdate(JournalEntryBase):
+    items: List[JournalItemUpdate]
+    version: Optional[int] = Field(None, description="Version the edit is based on; rejected with 409 if the entry has changed since")
+
 class JournalEntryResponse(JournalEntryBase):
     id: int
+    version: int
     items: List[JournalItemResponse] = []
 
 class Config:
@@ -110,105 +195,174 @@ class Config:
 
 # Chart of Accounts Endpoints
 @app.get("/accounts", response_model=List[AccountResponse])
-async def get_all_accounts(db: Session = Depends(get_db)):
-    accounts = db.query(Account).all()
-    return accounts
+async def get_all_accounts(request: Request, db: AsyncSession = Depends(get_async_db)):
+    async def load():
+        result = await db.execute(select(Account).order_by(Account.id))
+        return [AccountResponse.model_validate(account, from_attributes=True) for account in result.scalars()]
+    return await cached_json(request, ACCOUNTS, load)
 
 @app.post("/accounts", response_model=AccountResponse)
-async def create_account(account: AccountCreate, db: Session = Depends(get_db)):
-    db_account = Account(**account.dict())
+async def create_account(account: AccountCreate, db: AsyncSession = Depends(get_async_db)):
+    # The parent is linked after the insert so the closure table can reference the new id
+    db_account = Account(**account.dict(exclude={"parent_account_id"}))
     db.add(db_account)
-    db.commit()
-    db.refresh(db_account)
+    await db.flush()
+    try:
+        await db.run_sync(HierarchyService.set_parent, db_account, account.parent_account_id)
+    except ValueError as e:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+    await db.commit()
+    await db.refresh(db_account)
     return db_account
 
 @app.get("/accounts/{account_id}", response_model=AccountResponse)
-async def get_account(account_id: int, db: Session = Depends(get_db)):
-    account = db.query(Account).filter(Account.id == account_id).first()
-    if account is None:
-        raise HTTPException(status_code=404, detail="Account not found")
-    return account
+async def get_account(account_id: int, request: Request, db: AsyncSession = Depends(get_async_db)):
+    async def load():
+        account = await db.get(Account, account_id)
+        if account is None:
+            raise HTTPException(status_code=404, detail="Account not found")
+        return AccountResponse.model_validate(account, from_attributes=True)
+    return await cached_json(request, ACCOUNTS, load)
 
 @app.put("/accounts/{account_id}", response_model=AccountResponse)
-async def update_account(account_id: int, account: AccountUpdate, db: Session = Depends(get_db)):
-    db_account = db.query(Account).filter(Account.id == account_id).first()
+async def update_account(account_id: int, account: AccountUpdate, db: AsyncSession = Depends(get_async_db)):
+    db_account = await db.get(Account, account_id)
     if db_account is None:
         raise HTTPException(status_code=404, detail="Account not found")
 
-    for key, value in account.dict(exclude_unset=True).items():
+    values = account.dict(exclude_unset=True)
+    move = "parent_account_id" in values
+    parent_account_id = values.pop("parent_account_id", None)
+    for key, value in values.items():
         setattr(db_account, key, value)
-
-    db.commit()
-    db.refresh(db_account)
+    try:
+        if move:
+            await db.run_sync(HierarchyService.set_parent, db_account, parent_account_id)
+        await db.run_sync(HierarchyService.check_type, db_account)
+    except ValueError as e:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+
+    await db.commit()
+    await db.refresh(db_account)
     return db_account
 
 @app.delete("/accounts/{account_id}")
-async def delete_account(account_id: int, db: Session = Depends(get_db)):
-    db_account = db.query(Account).filter(Account.id == account_id).first()
+async def delete_account(account_id: int, db: AsyncSession = Depends(get_async_db)):
+    db_account = await db.get(Account, account_id)
     if db_account is None:
         raise HTTPException(status_code=404, detail="Account not found")
-    db.delete(db_account)
-    db.commit()
+    try:
+        await db.run_sync(HierarchyService.remove, db_account)
+    except ValueError as e:
+        await db.rollback()
+        raise HTTPException(status_code=409, detail=str(e))
+    await db.delete(db_account)
+    await db.commit()
     return {"message": "Account deleted successfully"}
 
 # Journal Entry Endpoints
 @app.get("/journal_entries", response_model=List[JournalEntryResponse])
-async def get_all_journal_entries(db: Session = Depends(get_db)):
-    journal_entries = db.query(JournalEntry).options(joinedload(JournalEntry.items)).all()
+async def get_all_journal_entries(
+    response: Response,
+    limit: int = Query(100, ge=1, le=1000, description="Maximum number of entries per page"),
+    cursor: Optional[str] = Query(None, description="Value of X-Next-Cursor from the previous page"),
+    start_date: Optional[date] = Query(None, description="Only entries on or after this date"),
+    end_date: Optional[date] = Query(None, description="Only entries on or before this date"),
+    account_id: Optional[int] = Query(None, description="Only entries with an item posted to this account"),
+    stream: bool = Query(False, description="Stream every matching entry as NDJSON instead of a single page"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    filters = dict(cursor=cursor, start_date=start_date, end_date=end_date, account_id=account_id)
+    if cursor is not None:
+        try:
+            JournalService.decode_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    if stream:
+        def generate():
+            # Runs in the threadpool with its own session, since the body outlives the request dependency
+            stream_db = SessionLocal()
+            try:
+                yield from JournalService.stream_ndjson(stream_db, **filters)
+            finally:
+                stream_db.close()
+
+        return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+    def fetch_page(sync_db: Session):
+        journal_entries, next_cursor = JournalService.fetch_page(sync_db, limit, **filters)
+        return [JournalService.serialize(entry) for entry in journal_entries], next_cursor
+
+    journal_entries, next_cursor = await db.run_sync(fetch_page)
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = next_cursor
     return journal_entries
 
 @app.post("/journal_entries", response_model=JournalEntryResponse)
-async def create_journal_entry(journal_entry: JournalEntryCreate, db: Session = Depends(get_db)):
-    db_journal_entry = JournalEntry(date=journal_entry.date, description=journal_entry.description)
-    db.add(db_journal_entry)
-    db.commit()
-    db.refresh(db_journal_entry)
-
-    for item in journal_entry.items:
-        db_item = JournalItem(journal_entry_id=db_journal_entry.id, **item.dict())
-        db.add(db_item)
-
-    db.commit()
-    db.refresh(db_journal_entry)
-    return db_journal_entry
+async def create_journal_entry(
+    journal_entry: JournalEntryCreate,
+    adjust_closed: bool = Query(False, description="Post entries dated in a closed period as adjusting entries in the first open period"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    items = [item.dict() for item in journal_entry.items]
+    try:
+        return await db.run_sync(JournalService.create_entry, journal_entry.date, journal_entry.description, items, adjust_closed)
+    except ClosedPeriodError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/journal_entries/bulk")
+async def bulk_create_journal_entries(
+    file: UploadFile = File(..., description="JSON-lines (one entry per line) or CSV (one item per row)"),
+    format: Optional[str] = Query(None, description="jsonl or csv; inferred from the file name when omitted"),
+    chunk_size: int = Query(BULK_CHUNK_SIZE, ge=1, le=10000, description="Entries inserted per transaction"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    import_format = format or JournalService.detect_format(file.filename)
+    lines = codecs.iterdecode(file.file, "utf-8")
+    try:
+        rows = JournalService.parse(lines, import_format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    # Validation and inserts read the upload in the threadpool, off the event loop
+    return await run_in_session(JournalService.bulk_insert, rows, chunk_size)
 
 @app.get("/journal_entries/{journal_entry_id}", response_model=JournalEntryResponse)
-async def get_journal_entry(journal_entry_id: int, db: Session = Depends(get_db)):
-    journal_entry = db.query(JournalEntry).options(joinedload(JournalEntry.items)).filter(JournalEntry.id == journal_entry_id).first()
+async def get_journal_entry(journal_entry_id: int, db: AsyncSession = Depends(get_async_db)):
+    journal_entry = await db.run_sync(JournalService.get_entry, journal_entry_id)
     if journal_entry is None:
         raise HTTPException(status_code=404, detail="Journal Entry not found")
     return journal_entry
 
 @app.put("/journal_entries/{journal_entry_id}", response_model=JournalEntryResponse)
-async def update_journal_entry(journal_entry_id: int, journal_entry: JournalEntryCreate, db: Session = Depends(get_db)):
-    db_journal_entry = db.query(JournalEntry).options(joinedload(JournalEntry.items)).filter(JournalEntry.id == journal_entry_id).first()
+async def update_journal_entry(journal_entry_id: int, journal_entry: JournalEntryUpdate, db: AsyncSession = Depends(get_async_db)):
+    items = [item.dict() for item in journal_entry.items]
+    try:
+        db_journal_entry = await db.run_sync(
+            JournalService.update_entry, journal_entry_id, journal_entry.date, journal_entry.description, items, journal_entry.version
+        )
+    except (ClosedPeriodError, StaleEntryError) as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     if db_journal_entry is None:
         raise HTTPException(status_code=404, detail="Journal Entry not found")
-
-    db_journal_entry.date = journal_entry.date
-    db_journal_entry.description = journal_entry.description
-
-    # Update journal items - this is a simplified approach, a more robust solution might involve diffing and managing additions/deletions
-    # For simplicity, we'll just delete existing items and add new ones
-    db.query(JournalItem).filter(JournalItem.journal_entry_id == journal_entry_id).delete()
-    for item in journal_entry.items:
-        db_item = JournalItem(journal_entry_id=db_journal_entry.id, **item.dict())
-        db.add(db_item)
-
-    db.commit()
-    db.refresh(db_journal_entry)
     return db_journal_entry
 
 @app.delete("/journal_entries/{journal_entry_id}")
-async def delete_journal_entry(journal_entry_id: int, db: Session = Depends(get_db)):
-    db_journal_entry = db.query(JournalEntry).filter(JournalEntry.id == journal_entry_id).first()
-    if db_journal_entry is None:
+async def delete_journal_entry(journal_entry_id: int, db: AsyncSession = Depends(get_async_db)):
+    try:
+        deleted = await db.run_sync(JournalService.delete_entry, journal_entry_id)
+    except ClosedPeriodError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if not deleted:
         raise HTTPException(status_code=404, detail="Journal Entry not found")
-    db.delete(db_journal_entry)
-    db.commit()
     return {"message": "Journal Entry deleted successfully"}
 
-
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
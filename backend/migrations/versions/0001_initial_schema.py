@@ -0,0 +1,103 @@
+"""Initial schema
+
+Existing databases created before migrations were introduced should be
+marked with `alembic stamp 0001_initial_schema` instead of upgrading.
+
+Revision ID: 0001_initial_schema
+Revises:
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001_initial_schema"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.create_table(
+        "chart_of_accounts",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("account_code", sa.String()),
+        sa.Column("account_name", sa.String()),
+        sa.Column("account_type", sa.Enum("Asset", "Liability", "Equity", "Revenue", "Expense", name="accounttypeenum")),
+        sa.Column("description", sa.String(), nullable=True),
+        sa.Column("normal_balance", sa.Enum("DEBIT", "CREDIT", name="normalbalance")),
+    )
+    op.create_index("ix_chart_of_accounts_id", "chart_of_accounts", ["id"])
+    op.create_index("ix_chart_of_accounts_account_code", "chart_of_accounts", ["account_code"], unique=True)
+    op.create_index("ix_chart_of_accounts_account_name", "chart_of_accounts", ["account_name"], unique=True)
+
+    op.create_table(
+        "journal_entries",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("entry_date", sa.DateTime()),
+        sa.Column("description", sa.String()),
+        sa.Column("created_at", sa.DateTime()),
+        sa.Column("updated_at", sa.DateTime()),
+    )
+    op.create_index("ix_journal_entries_id", "journal_entries", ["id"])
+
+    op.create_table(
+        "journal_items",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("journal_entry_id", sa.Integer(), sa.ForeignKey("journal_entries.id")),
+        sa.Column("account_id", sa.Integer(), sa.ForeignKey("chart_of_accounts.id")),
+        sa.Column("debit", sa.Float()),
+        sa.Column("credit", sa.Float()),
+    )
+    op.create_index("ix_journal_items_id", "journal_items", ["id"])
+
+    op.create_table(
+        "contacts",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String()),
+        sa.Column("type", sa.String()),
+        sa.Column("email", sa.String()),
+        sa.Column("phone", sa.String()),
+        sa.Column("address", sa.String()),
+        sa.Column("tax_id", sa.String()),
+        sa.Column("created_at", sa.DateTime()),
+        sa.Column("updated_at", sa.DateTime()),
+    )
+    op.create_index("ix_contacts_id", "contacts", ["id"])
+    op.create_index("ix_contacts_name", "contacts", ["name"])
+
+    op.create_table(
+        "invoices",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("invoice_number", sa.String()),
+        sa.Column("contact_id", sa.Integer(), sa.ForeignKey("contacts.id")),
+        sa.Column("type", sa.String()),
+        sa.Column("amount", sa.Float()),
+        sa.Column("due_date", sa.DateTime()),
+        sa.Column("status", sa.String()),
+        sa.Column("created_at", sa.DateTime()),
+        sa.Column("updated_at", sa.DateTime()),
+    )
+    op.create_index("ix_invoices_id", "invoices", ["id"])
+    op.create_index("ix_invoices_invoice_number", "invoices", ["invoice_number"], unique=True)
+
+    op.create_table(
+        "bank_reconciliations",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("account_id", sa.Integer(), sa.ForeignKey("chart_of_accounts.id")),
+        sa.Column("statement_date", sa.DateTime()),
+        sa.Column("statement_balance", sa.Float()),
+        sa.Column("reconciled_balance", sa.Float()),
+        sa.Column("status", sa.String()),
+        sa.Column("created_at", sa.DateTime()),
+        sa.Column("updated_at", sa.DateTime()),
+    )
+    op.create_index("ix_bank_reconciliations_id", "bank_reconciliations", ["id"])
+
+def downgrade() -> None:
+    op.drop_table("bank_reconciliations")
+    op.drop_table("invoices")
+    op.drop_table("contacts")
+    op.drop_table("journal_items")
+    op.drop_table("journal_entries")
+    op.drop_table("chart_of_accounts")
+    sa.Enum(name="normalbalance").drop(op.get_bind(), checkfirst=True)
+    sa.Enum(name="accounttypeenum").drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,30 @@
+"""Add account_balances running totals
+
+Run `python -m app.cli rebuild-balances` after upgrading to fill the table.
+
+Revision ID: 0002_account_balances
+Revises: 0001_initial_schema
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002_account_balances"
+down_revision = "0001_initial_schema"
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.create_table(
+        "account_balances",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("account_id", sa.Integer(), sa.ForeignKey("chart_of_accounts.id"), nullable=False),
+        sa.Column("period", sa.Integer(), nullable=False),
+        sa.Column("debit_total", sa.Float(), nullable=False),
+        sa.Column("credit_total", sa.Float(), nullable=False),
+        sa.UniqueConstraint("account_id", "period", name="uq_account_balances_account_period"),
+    )
+    op.create_index("ix_account_balances_id", "account_balances", ["id"])
+
+def downgrade() -> None:
+    op.drop_table("account_balances")
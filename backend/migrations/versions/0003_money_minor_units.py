@@ -0,0 +1,45 @@
+"""Store money as integer cents
+
+Converts every Float money column to BIGINT minor units, rounding each
+stored value to the nearest cent.
+
+Revision ID: 0003_money_minor_units
+Revises: 0002_account_balances
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003_money_minor_units"
+down_revision = "0002_account_balances"
+branch_labels = None
+depends_on = None
+
+# Column name -> nullable, as the original Float column was declared
+MONEY_COLUMNS = {
+    "journal_items": {"debit": True, "credit": True},
+    "account_balances": {"debit_total": False, "credit_total": False},
+    "invoices": {"amount": True},
+    "bank_reconciliations": {"statement_balance": True, "reconciled_balance": True},
+}
+
+def _convert(table: str, columns: dict, new_type, expression: str) -> None:
+    # The new column starts nullable so it can be added to a populated table; once backfilled
+    # it takes over the original column's nullability
+    with op.batch_alter_table(table) as batch_op:
+        for column in columns:
+            batch_op.add_column(sa.Column(f"{column}_new", new_type, nullable=True))
+    for column in columns:
+        op.execute(f"UPDATE {table} SET {column}_new = {expression.format(column=column)}")
+    with op.batch_alter_table(table) as batch_op:
+        for column, nullable in columns.items():
+            batch_op.drop_column(column)
+            batch_op.alter_column(f"{column}_new", new_column_name=column, existing_type=new_type, nullable=nullable)
+
+def upgrade() -> None:
+    for table, columns in MONEY_COLUMNS.items():
+        _convert(table, columns, sa.BigInteger(), "CAST(ROUND({column} * 100) AS BIGINT)")
+
+def downgrade() -> None:
+    for table, columns in MONEY_COLUMNS.items():
+        _convert(table, columns, sa.Float(), "{column} / 100.0")
@@ -0,0 +1,44 @@
+"""Add bank statement lines and reconciliation matches
+
+Revision ID: 0004_bank_statement_matching
+Revises: 0003_money_minor_units
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004_bank_statement_matching"
+down_revision = "0003_money_minor_units"
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.create_table(
+        "bank_statement_lines",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("reconciliation_id", sa.Integer(), sa.ForeignKey("bank_reconciliations.id"), nullable=False),
+        sa.Column("transaction_date", sa.DateTime(), nullable=False),
+        sa.Column("amount", sa.BigInteger(), nullable=False),
+        sa.Column("description", sa.String()),
+        sa.Column("reference", sa.String()),
+    )
+    op.create_index("ix_bank_statement_lines_id", "bank_statement_lines", ["id"])
+    op.create_index("ix_bank_statement_lines_reconciliation_id", "bank_statement_lines", ["reconciliation_id"])
+
+    op.create_table(
+        "reconciliation_matches",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("reconciliation_id", sa.Integer(), sa.ForeignKey("bank_reconciliations.id"), nullable=False),
+        sa.Column("statement_line_id", sa.Integer(), sa.ForeignKey("bank_statement_lines.id"), nullable=False),
+        sa.Column("journal_item_id", sa.Integer(), sa.ForeignKey("journal_items.id"), nullable=False),
+        sa.Column("match_type", sa.String()),
+        sa.Column("created_at", sa.DateTime()),
+    )
+    op.create_index("ix_reconciliation_matches_id", "reconciliation_matches", ["id"])
+    op.create_index("ix_reconciliation_matches_reconciliation_id", "reconciliation_matches", ["reconciliation_id"])
+    op.create_index("ix_reconciliation_matches_statement_line_id", "reconciliation_matches", ["statement_line_id"])
+    op.create_index("ix_reconciliation_matches_journal_item_id", "reconciliation_matches", ["journal_item_id"], unique=True)
+
+def downgrade() -> None:
+    op.drop_table("reconciliation_matches")
+    op.drop_table("bank_statement_lines")
@@ -0,0 +1,32 @@
+"""Add ai_cache_entries for cached model results
+
+Revision ID: 0005_ai_cache_entries
+Revises: 0004_bank_statement_matching
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005_ai_cache_entries"
+down_revision = "0004_bank_statement_matching"
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.create_table(
+        "ai_cache_entries",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("kind", sa.String(), nullable=False),
+        sa.Column("key", sa.String(), nullable=False),
+        sa.Column("normalized_text", sa.Text(), nullable=False),
+        sa.Column("result", sa.Text(), nullable=False),
+        sa.Column("hits", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("last_used_at", sa.DateTime(), nullable=False),
+        sa.UniqueConstraint("kind", "key", name="uq_ai_cache_entries_kind_key"),
+    )
+    op.create_index("ix_ai_cache_entries_id", "ai_cache_entries", ["id"])
+    op.create_index("ix_ai_cache_entries_last_used_at", "ai_cache_entries", ["last_used_at"])
+
+def downgrade() -> None:
+    op.drop_table("ai_cache_entries")
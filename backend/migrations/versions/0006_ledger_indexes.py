@@ -0,0 +1,33 @@
+"""Index the ledger, invoice and contact access paths
+
+Revision ID: 0006_ledger_indexes
+Revises: 0005_ai_cache_entries
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+revision = "0006_ledger_indexes"
+down_revision = "0005_ai_cache_entries"
+branch_labels = None
+depends_on = None
+
+# (name, table, columns)
+INDEXES = [
+    ("ix_journal_entries_entry_date_id", "journal_entries", ["entry_date", "id"]),
+    ("ix_journal_items_journal_entry_id", "journal_items", ["journal_entry_id"]),
+    ("ix_journal_items_account_id_journal_entry_id", "journal_items", ["account_id", "journal_entry_id"]),
+    ("ix_invoices_status_due_date", "invoices", ["status", "due_date"]),
+    ("ix_invoices_contact_id", "invoices", ["contact_id"]),
+    ("ix_contacts_type", "contacts", ["type"]),
+]
+
+def upgrade() -> None:
+    # Build concurrently on PostgreSQL so a large ledger stays writable; CONCURRENTLY cannot run in a transaction
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, postgresql_concurrently=True)
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
@@ -0,0 +1,37 @@
+"""Add invoice_aging_balances open-invoice totals and an open invoice index
+
+Run `python -m app.cli rebuild-aging` after upgrading to fill the table.
+
+Revision ID: 0007_invoice_aging_balances
+Revises: 0006_ledger_indexes
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0007_invoice_aging_balances"
+down_revision = "0006_ledger_indexes"
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.create_table(
+        "invoice_aging_balances",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("contact_id", sa.Integer(), sa.ForeignKey("contacts.id"), nullable=False),
+        sa.Column("type", sa.String(), nullable=False),
+        sa.Column("period", sa.Integer(), nullable=False),
+        sa.Column("open_amount", sa.BigInteger(), nullable=False),
+        sa.Column("open_count", sa.Integer(), nullable=False),
+        sa.UniqueConstraint("contact_id", "type", "period", name="uq_invoice_aging_balances_contact_type_period"),
+    )
+    op.create_index("ix_invoice_aging_balances_id", "invoice_aging_balances", ["id"])
+    op.create_index(
+        "ix_invoices_open_type_due_date", "invoices", ["type", "due_date"],
+        sqlite_where=sa.text("status IN ('Sent', 'Overdue')"),
+        postgresql_where=sa.text("status IN ('Sent', 'Overdue')"),
+    )
+
+def downgrade() -> None:
+    op.drop_index("ix_invoices_open_type_due_date", table_name="invoices")
+    op.drop_table("invoice_aging_balances")
@@ -0,0 +1,36 @@
+"""Add period closes and per-account closing snapshots
+
+Revision ID: 0008_period_closes
+Revises: 0007_invoice_aging_balances
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0008_period_closes"
+down_revision = "0007_invoice_aging_balances"
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.create_table(
+        "period_closes",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("period", sa.Integer(), nullable=False, unique=True),
+        sa.Column("closed_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index("ix_period_closes_id", "period_closes", ["id"])
+    op.create_table(
+        "account_closing_balances",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("period", sa.Integer(), nullable=False),
+        sa.Column("account_id", sa.Integer(), sa.ForeignKey("chart_of_accounts.id"), nullable=False),
+        sa.Column("debit_total", sa.BigInteger(), nullable=False),
+        sa.Column("credit_total", sa.BigInteger(), nullable=False),
+        sa.UniqueConstraint("period", "account_id", name="uq_account_closing_balances_period_account"),
+    )
+    op.create_index("ix_account_closing_balances_id", "account_closing_balances", ["id"])
+
+def downgrade() -> None:
+    op.drop_table("account_closing_balances")
+    op.drop_table("period_closes")
@@ -0,0 +1,20 @@
+"""Add a version counter to journal entries for optimistic concurrency
+
+Revision ID: 0009_journal_entry_version
+Revises: 0008_period_closes
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0009_journal_entry_version"
+down_revision = "0008_period_closes"
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.add_column("journal_entries", sa.Column("version", sa.Integer(), nullable=False, server_default="1"))
+
+def downgrade() -> None:
+    with op.batch_alter_table("journal_entries") as batch_op:
+        batch_op.drop_column("version")
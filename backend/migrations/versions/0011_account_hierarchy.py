@@ -0,0 +1,54 @@
+"""Add the account hierarchy: parent accounts, a closure table and roll-up balances
+
+No account has a parent yet, so every roll-up starts out equal to the account's own balance.
+
+Revision ID: 0011_account_hierarchy
+Revises: 0010_jobs
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0011_account_hierarchy"
+down_revision = "0010_jobs"
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    with op.batch_alter_table("chart_of_accounts") as batch_op:
+        batch_op.add_column(sa.Column("parent_account_id", sa.Integer(), nullable=True))
+        batch_op.create_foreign_key("fk_chart_of_accounts_parent_account_id", "chart_of_accounts", ["parent_account_id"], ["id"])
+        batch_op.create_index("ix_chart_of_accounts_parent_account_id", ["parent_account_id"])
+
+    op.create_table(
+        "account_closure",
+        sa.Column("ancestor_id", sa.Integer(), sa.ForeignKey("chart_of_accounts.id"), primary_key=True),
+        sa.Column("descendant_id", sa.Integer(), sa.ForeignKey("chart_of_accounts.id"), primary_key=True),
+        sa.Column("depth", sa.Integer(), nullable=False),
+    )
+    op.create_index("ix_account_closure_descendant_id_ancestor_id", "account_closure", ["descendant_id", "ancestor_id"])
+
+    op.create_table(
+        "account_rollup_balances",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("account_id", sa.Integer(), sa.ForeignKey("chart_of_accounts.id"), nullable=False),
+        sa.Column("period", sa.Integer(), nullable=False),
+        sa.Column("debit_total", sa.BigInteger(), nullable=False),
+        sa.Column("credit_total", sa.BigInteger(), nullable=False),
+        sa.UniqueConstraint("account_id", "period", name="uq_account_rollup_balances_account_period"),
+    )
+    op.create_index("ix_account_rollup_balances_id", "account_rollup_balances", ["id"])
+    op.execute(
+        "INSERT INTO account_rollup_balances (account_id, period, debit_total, credit_total) "
+        "SELECT account_id, period, debit_total, credit_total FROM account_balances"
+    )
+
+def downgrade() -> None:
+    op.drop_index("ix_account_rollup_balances_id", table_name="account_rollup_balances")
+    op.drop_table("account_rollup_balances")
+    op.drop_index("ix_account_closure_descendant_id_ancestor_id", table_name="account_closure")
+    op.drop_table("account_closure")
+    with op.batch_alter_table("chart_of_accounts") as batch_op:
+        batch_op.drop_index("ix_chart_of_accounts_parent_account_id")
+        batch_op.drop_constraint("fk_chart_of_accounts_parent_account_id", type_="foreignkey")
+        batch_op.drop_column("parent_account_id")
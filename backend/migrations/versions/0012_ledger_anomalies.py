@@ -0,0 +1,65 @@
+"""Add the anomaly scan tables and an index for entries edited since a scan
+
+Revision ID: 0012_ledger_anomalies
+Revises: 0011_account_hierarchy
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0012_ledger_anomalies"
+down_revision = "0011_account_hierarchy"
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.create_index("ix_journal_entries_updated_at", "journal_entries", ["updated_at"])
+
+    op.create_table(
+        "anomaly_scans",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("kind", sa.String(), nullable=False),
+        sa.Column("through_item_id", sa.Integer(), nullable=False),
+        sa.Column("through_invoice_id", sa.Integer(), nullable=False),
+        sa.Column("items_scanned", sa.Integer(), nullable=False),
+        sa.Column("invoices_scanned", sa.Integer(), nullable=False),
+        sa.Column("flagged", sa.Integer(), nullable=False),
+        sa.Column("started_at", sa.DateTime(), nullable=False),
+        sa.Column("finished_at", sa.DateTime(), nullable=True),
+    )
+    op.create_index("ix_anomaly_scans_id", "anomaly_scans", ["id"])
+
+    op.create_table(
+        "account_amount_stats",
+        sa.Column("account_id", sa.Integer(), sa.ForeignKey("chart_of_accounts.id"), primary_key=True),
+        sa.Column("sample_count", sa.Integer(), nullable=False),
+        sa.Column("item_count", sa.Integer(), nullable=False),
+        sa.Column("median", sa.Float(), nullable=False),
+        sa.Column("mad", sa.Float(), nullable=False),
+        sa.Column("q1", sa.Float(), nullable=False),
+        sa.Column("q3", sa.Float(), nullable=False),
+    )
+
+    op.create_table(
+        "ledger_anomalies",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("journal_item_id", sa.Integer(), nullable=True, unique=True),
+        sa.Column("invoice_id", sa.Integer(), nullable=True, unique=True),
+        sa.Column("reasons", sa.String(), nullable=False),
+        sa.Column("score", sa.Float(), nullable=False),
+        sa.Column("amount", sa.BigInteger(), nullable=False),
+        sa.Column("typical_amount", sa.BigInteger(), nullable=True),
+        sa.Column("duplicate_of", sa.Integer(), nullable=True),
+        sa.Column("detected_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index("ix_ledger_anomalies_id", "ledger_anomalies", ["id"])
+    op.create_index("ix_ledger_anomalies_score", "ledger_anomalies", ["score"])
+
+def downgrade() -> None:
+    op.drop_index("ix_ledger_anomalies_score", table_name="ledger_anomalies")
+    op.drop_index("ix_ledger_anomalies_id", table_name="ledger_anomalies")
+    op.drop_table("ledger_anomalies")
+    op.drop_table("account_amount_stats")
+    op.drop_index("ix_anomaly_scans_id", table_name="anomaly_scans")
+    op.drop_table("anomaly_scans")
+    op.drop_index("ix_journal_entries_updated_at", table_name="journal_entries")
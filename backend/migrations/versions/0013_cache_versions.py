@@ -0,0 +1,26 @@
+"""Share response cache versions between processes
+
+Revision ID: 0013_cache_versions
+Revises: 0012_ledger_anomalies
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0013_cache_versions"
+down_revision = "0012_ledger_anomalies"
+branch_labels = None
+depends_on = None
+
+NAMESPACES = ["accounts", "ledger", "invoices", "anomalies"]
+
+def upgrade() -> None:
+    table = op.create_table(
+        "cache_versions",
+        sa.Column("namespace", sa.String(), primary_key=True),
+        sa.Column("version", sa.Integer(), nullable=False),
+    )
+    op.bulk_insert(table, [{"namespace": namespace, "version": 0} for namespace in NAMESPACES])
+
+def downgrade() -> None:
+    op.drop_table("cache_versions")
@@ -70,6 +70,119 @@ const api = {
     }
   },
 
+  getTrialBalance: async (asOf?: string) => {
+    try {
+      const response = await axios.get(`${API_BASE_URL}/reports/trial-balance`, { params: { as_of: asOf } });
+      return response.data;
+    } catch (error) {
+      console.error('Error fetching trial balance:', error);
+      throw error;
+    }
+  },
+
+  getReport: async (reportType: 'income-statement' | 'balance-sheet' | 'cash-flow', params: Record<string, string | boolean> = {}) => {
+    try {
+      const response = await axios.get(`${API_BASE_URL}/reports/${reportType}`, { params });
+      return response.data;
+    } catch (error) {
+      console.error(`Error fetching ${reportType} report:`, error);
+      throw error;
+    }
+  },
+
+  createReconciliation: async (reconciliation: { account_id: number; statement_date: string; statement_balance: number }) => {
+    try {
+      const response = await axios.post(`${API_BASE_URL}/reconciliations`, reconciliation);
+      return response.data;
+    } catch (error) {
+      console.error('Error creating reconciliation:', error);
+      throw error;
+    }
+  },
+
+  uploadBankStatement: async (reconciliationId: number, file: File) => {
+    try {
+      const formData = new FormData();
+      formData.append('file', file);
+      const response = await axios.post(`${API_BASE_URL}/reconciliations/${reconciliationId}/statement`, formData);
+      return response.data;
+    } catch (error) {
+      console.error(`Error uploading statement for reconciliation ${reconciliationId}:`, error);
+      throw error;
+    }
+  },
+
+  matchBankStatement: async (reconciliationId: number) => {
+    try {
+      const response = await axios.post(`${API_BASE_URL}/reconciliations/${reconciliationId}/match`);
+      return response.data;
+    } catch (error) {
+      console.error(`Error matching statement for reconciliation ${reconciliationId}:`, error);
+      throw error;
+    }
+  },
+
+  getUnmatched: async (reconciliationId: number) => {
+    try {
+      const response = await axios.get(`${API_BASE_URL}/reconciliations/${reconciliationId}/unmatched`);
+      return response.data;
+    } catch (error) {
+      console.error(`Error fetching unmatched lines for reconciliation ${reconciliationId}:`, error);
+      throw error;
+    }
+  },
+
+  // Calls onSnapshot with every KPI on connect (and on reconnect), then onDelta with the change
+  // of each KPI that moved. Returns a function that closes the stream.
+  subscribeDashboard: (
+    onSnapshot: (kpis: Record<string, number>) => void,
+    onDelta: (changes: Record<string, number>) => void,
+  ) => {
+    const source = new EventSource(`${API_BASE_URL}/dashboard/stream`);
+    source.addEventListener('snapshot', (event) => onSnapshot(JSON.parse((event as MessageEvent).data).kpis));
+    source.addEventListener('delta', (event) => onDelta(JSON.parse((event as MessageEvent).data).changes));
+    source.onerror = (error) => console.error('Dashboard stream error:', error);
+    return () => source.close();
+  },
+
+  // Streams the assistant's reply to message, calling onToken with each piece of text as it
+  // arrives. EventSource cannot POST, so the server-sent events are read from fetch.
+  // Resolves with the done event: prompt_tokens, time_to_first_token_ms and elapsed_ms.
+  streamChat: async (
+    message: string,
+    history: { role: 'user' | 'assistant'; content: string }[],
+    onToken: (text: string) => void,
+  ) => {
+    const response = await fetch(`${API_BASE_URL}/ai/chat`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ message, history }),
+    });
+    if (!response.ok || !response.body) {
+      throw new Error(`Chat request failed with status ${response.status}`);
+    }
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let done: Record<string, number> = {};
+    for (;;) {
+      const { value, done: finished } = await reader.read();
+      if (finished) break;
+      buffer += decoder.decode(value, { stream: true });
+      let end;
+      while ((end = buffer.indexOf('\n\n')) !== -1) {
+        const block = buffer.slice(0, end);
+        buffer = buffer.slice(end + 2);
+        const event = block.match(/^event: (.*)$/m)?.[1];
+        const data = JSON.parse(block.match(/^data: (.*)$/m)?.[1] ?? '{}');
+        if (event === 'token') onToken(data.text);
+        else if (event === 'done') done = data;
+        else if (event === 'error') throw new Error(data.detail);
+      }
+    }
+    return done;
+  },
+
   // Add other API functions as needed (e.g., updateAccount, deleteAccount)
 };
 
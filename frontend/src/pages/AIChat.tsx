@@ -1,25 +1,37 @@
 import React, { useState } from 'react';
 import { TextField, Button, Typography, Box, Paper } from '@mui/material';
+import api from '../api';
+
+type ChatTurn = { role: 'user' | 'assistant'; content: string };
 
 const AIChat: React.FC = () => {
   const [message, setMessage] = useState('');
-  const [chatHistory, setChatHistory] = useState<string[]>([]);
- 
+  const [chatHistory, setChatHistory] = useState<ChatTurn[]>([]);
+  const [sending, setSending] = useState(false);
+
   const handleSendMessage = async () => {
-    // Stub function to send message to backend
-    console.log("Sending message:", message);
-    setChatHistory([...chatHistory, `User: ${message}`]);
+    const question = message.trim();
+    if (!question || sending) return;
+    const history = chatHistory;
+    setChatHistory([...history, { role: 'user', content: question }, { role: 'assistant', content: '' }]);
     setMessage('');
-    // TODO: Call backend API to get response
-    const aiResponse = await getAIResponse(message);
-    setChatHistory(prevHistory => [...prevHistory, `AI: ${aiResponse}`]);
+    setSending(true);
+    // Append each streamed piece to the last (assistant) turn
+    const appendToReply = (text: string) =>
+      setChatHistory(prevHistory => {
+        const last = prevHistory[prevHistory.length - 1];
+        return [...prevHistory.slice(0, -1), { ...last, content: last.content + text }];
+      });
+    try {
+      await api.streamChat(question, history, appendToReply);
+    } catch (error) {
+      console.error('Error streaming chat reply:', error);
+      appendToReply('\n[The assistant could not answer. Please try again.]');
+    } finally {
+      setSending(false);
+    }
   };
- 
-  const getAIResponse = async (userMessage: string): Promise<string> => {
-    // Stub function to receive response from backend
-    return `This is a stub AI response to: "${userMessage}"`;
-  };
- 
+
   return (
     <Box sx={{ display: 'flex', flexDirection: 'column', height: 'calc(100vh - 64px)', backgroundColor: '#f0f4f9', padding: 3 }}>
       <Typography variant="h4" gutterBottom align="center" sx={{ color: '#333', marginBottom: 3 }}>
@@ -40,7 +52,7 @@ const AIChat: React.FC = () => {
             key={index}
             sx={{
               display: 'flex',
-              justifyContent: entry.startsWith('User:') ? 'flex-end' : 'flex-start',
+              justifyContent: entry.role === 'user' ? 'flex-end' : 'flex-start',
               marginBottom: 1,
             }}
           >
@@ -49,11 +61,11 @@ const AIChat: React.FC = () => {
               sx={{
                 padding: 1,
                 borderRadius: 2,
-                backgroundColor: entry.startsWith('User:') ? '#e3f2fd' : '#f5f5f5',
+                backgroundColor: entry.role === 'user' ? '#e3f2fd' : '#f5f5f5',
                 maxWidth: '75%',
               }}
             >
-              <Typography variant="body2">{entry.replace(/^(User|AI): /, '')}</Typography>
+              <Typography variant="body2" sx={{ whiteSpace: 'pre-wrap' }}>{entry.content || '…'}</Typography>
             </Paper>
           </Box>
         ))}
@@ -76,6 +88,7 @@ const AIChat: React.FC = () => {
       <Button
         variant="contained"
         onClick={handleSendMessage}
+        disabled={sending}
         fullWidth
         sx={{ borderRadius: 2, padding: '12px 0' }}
       >
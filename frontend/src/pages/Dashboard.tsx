@@ -22,6 +22,7 @@ import {
   ArcElement,
 } from 'chart.js';
 import { Line, Doughnut } from 'react-chartjs-2';
+import api from '../api';
 
 ChartJS.register(
   CategoryScale,
@@ -34,8 +35,27 @@ ChartJS.register(
   ArcElement
 );
 
+type Kpis = Record<'cash' | 'receivables' | 'payables' | 'revenue' | 'expenses', number>;
+
+const formatAmount = (amount: number | undefined) =>
+  amount === undefined ? '—' : amount.toLocaleString('en-US', { style: 'currency', currency: 'USD' });
+
 const Dashboard: React.FC = () => {
   const [selectedTab, setSelectedTab] = React.useState(0);
+  const [kpis, setKpis] = React.useState<Kpis | null>(null);
+
+  // The server sends the KPIs once, then only what changed
+  React.useEffect(() => api.subscribeDashboard(
+    (snapshot) => setKpis(snapshot as Kpis),
+    (changes) => setKpis((current) => {
+      if (!current) return current;
+      const next = { ...current };
+      Object.entries(changes).forEach(([kpi, change]) => {
+        next[kpi as keyof Kpis] = Math.round((next[kpi as keyof Kpis] + change) * 100) / 100;
+      });
+      return next;
+    }),
+  ), []);
 
   const handleTabChange = (event: React.SyntheticEvent, newValue: number) => {
     setSelectedTab(newValue);
@@ -59,7 +79,7 @@ const Dashboard: React.FC = () => {
     labels: ['Accounts Receivable', 'Accounts Payable'],
     datasets: [
       {
-        data: [63000, 42000],
+        data: [kpis?.receivables ?? 0, kpis?.payables ?? 0],
         backgroundColor: [
           theme.palette.success.main,
           theme.palette.error.main,
@@ -90,7 +110,7 @@ const Dashboard: React.FC = () => {
                   <Typography color="textSecondary" gutterBottom>
                     Total Revenue
                   </Typography>
-                  <Typography variant="h5">$245,000</Typography>
+                  <Typography variant="h5">{formatAmount(kpis?.revenue)}</Typography>
                 </CardContent>
               </Card>
             </Grid>
@@ -100,7 +120,7 @@ const Dashboard: React.FC = () => {
                   <Typography color="textSecondary" gutterBottom>
                     Total Expenses
                   </Typography>
-                  <Typography variant="h5">$182,000</Typography>
+                  <Typography variant="h5">{formatAmount(kpis?.expenses)}</Typography>
                 </CardContent>
               </Card>
             </Grid>
@@ -110,7 +130,7 @@ const Dashboard: React.FC = () => {
                   <Typography color="textSecondary" gutterBottom>
                     Net Profit
                   </Typography>
-                  <Typography variant="h5">$63,000</Typography>
+                  <Typography variant="h5">{formatAmount(kpis ? kpis.revenue - kpis.expenses : undefined)}</Typography>
                 </CardContent>
               </Card>
             </Grid>
@@ -120,7 +140,7 @@ const Dashboard: React.FC = () => {
                   <Typography color="textSecondary" gutterBottom>
                     Cash Balance
                   </Typography>
-                  <Typography variant="h5">$128,000</Typography>
+                  <Typography variant="h5">{formatAmount(kpis?.cash)}</Typography>
                 </CardContent>
               </Card>
             </Grid>
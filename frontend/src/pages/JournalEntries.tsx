@@ -40,6 +40,7 @@ interface JournalEntry {
   date: string;
   description: string;
   created_at: string; // Assuming a timestamp field exists
+  version?: number; // Sent back on update so edits of a stale copy are rejected
   journal_items: JournalItem[];
 }
 